@@ -1,5 +1,9 @@
 """Initialisation du package api"""
 from .deployment import deployment_bp
 from .status import status_bp
+from .metrics import metrics_bp
+from .images import images_bp
+from .admin import admin_bp
+from .terraform_state import terraform_state_bp
 
-__all__ = ['deployment_bp', 'status_bp']
+__all__ = ['deployment_bp', 'status_bp', 'metrics_bp', 'images_bp', 'admin_bp', 'terraform_state_bp']
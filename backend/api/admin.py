@@ -0,0 +1,73 @@
+"""
+API Routes d'administration (réglages modifiables à chaud)
+"""
+
+import logging
+from flask import Blueprint, request, jsonify
+
+from api.deployment import deployment_service
+
+logger = logging.getLogger(__name__)
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/admin/concurrency', methods=['GET'])
+def get_concurrency():
+    """Limites de concurrence, opérations en cours et temps d'attente"""
+    return jsonify(deployment_service.governor.stats())
+
+@admin_bp.route('/admin/concurrency', methods=['PUT', 'PATCH'])
+def update_concurrency():
+    """
+    Modifie les limites de concurrence sans redémarrage
+    
+    Body JSON (champs optionnels, 0 = illimité):
+    {
+        "global": 8,
+        "per_node": 4,
+        "per_storage": 3
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Corps JSON requis'}), 400
+        
+        unknown = set(data) - {'global', 'per_node', 'per_storage'}
+        if unknown:
+            return jsonify({'error': f"Limites inconnues: {', '.join(sorted(unknown))}"}), 400
+        
+        deployment_service.governor.set_limits(
+            global_limit=data.get('global'),
+            per_node=data.get('per_node'),
+            per_storage=data.get('per_storage')
+        )
+        
+        return jsonify({
+            'message': 'Limites mises à jour',
+            'limits': deployment_service.governor.limits
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la mise à jour des limites: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/workspaces', methods=['GET'])
+def get_workspaces():
+    """Nombre de workspaces Terraform, espace disque occupé et dernier nettoyage"""
+    try:
+        return jsonify(deployment_service.workspace_collector.usage())
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la mesure des workspaces: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/workspaces/collect', methods=['POST'])
+def collect_workspaces():
+    """Lance immédiatement le nettoyage des workspaces"""
+    try:
+        summary = deployment_service.workspace_collector.collect()
+        return jsonify({'message': 'Nettoyage terminé', **summary})
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du nettoyage des workspaces: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -2,13 +2,25 @@
 API Routes pour les déploiements
 """
 
+import uuid
 import logging
 from flask import Blueprint, request, jsonify
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from models.database import db, Deployment
+from models.database import db, Deployment, LogChunk
 from services.deployment_service import DeploymentService
-from utils.validators import validate_deployment_request
+from services.worker_pool import QueueFullError
+from services.admission import QUEUE, REJECT
+from services.task_tracker import parse_upid
+from utils.config import Config
+from utils.validators import (
+    validate_deployment_request,
+    validate_batch_request,
+    validate_bulk_delete_request,
+    expand_batch_request,
+    is_valid_idempotency_key,
+    request_fingerprint
+)
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +40,17 @@ def create_deployment():
         "cpu": 2,
         "memory": 2048,
         "disk": 20,
-        "name": "optional-name"
+        "name": "optional-name",
+        "idempotency_key": "optional-key"
     }
+    
+    Une requête identique à un déploiement en cours, ou portant une clé
+    d'idempotence déjà utilisée, retourne le déploiement existant.
+    
+    Les ressources demandées sont confrontées à la capacité libre du
+    cluster: un déploiement qui ne tient pas attend en statut
+    waiting_capacity (202), ou est refusé (503) si l'attente est
+    désactivée; un déploiement plus grand que chaque noeud est refusé (422).
     """
     try:
         data = request.get_json()
@@ -39,40 +60,278 @@ def create_deployment():
         if not is_valid:
             return jsonify({'error': error_message}), 400
         
+        # Clé d'idempotence: en-tête Idempotency-Key ou champ idempotency_key
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key is not None and not is_valid_idempotency_key(idempotency_key):
+            return jsonify({'error': "Clé d'idempotence invalide (1 à 128 caractères imprimables)"}), 400
+        
+        fingerprint = request_fingerprint(data)
+        
+        with deployment_service.admission_lock:
+            # Requête déjà reçue (nouvelle tentative d'un client, retry de CI...)
+            existing = deployment_service.find_duplicate(fingerprint, idempotency_key)
+            if existing:
+                return _duplicate_response(existing, fingerprint, idempotency_key)
+            
+            return _admit_deployment(data, idempotency_key, fingerprint)
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la création du déploiement: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def _admit_deployment(data, idempotency_key, fingerprint):
+    """Crée (ou attribue depuis le pool chaud) un déploiement et le place dans la file, ou en attente de capacité"""
+    name = data.get('name', f"{data['framework']}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}")
+    cpu = data.get('cpu', 2)
+    memory = data.get('memory', 2048)
+    disk = data.get('disk', 20)
+    
+    # Instance déjà prête dans le pool chaud: seul le déploiement de l'application reste à faire
+    deployment = deployment_service.warm_pool.claim(data['framework'], data['type'], cpu, memory, disk)
+    warm = deployment is not None
+    
+    if warm:
+        deployment.name = name
+        deployment.github_url = data['github_url']
+        deployment.created_at = datetime.utcnow()
+        deployment.idempotency_key = idempotency_key
+        deployment.request_hash = fingerprint
+    else:
         # Créer l'entrée de déploiement
         deployment = Deployment(
-            name=data.get('name', f"{data['framework']}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"),
+            name=name,
             type=data['type'],
             framework=data['framework'],
             github_url=data['github_url'],
-            cpu=data.get('cpu', 2),
-            memory=data.get('memory', 2048),
-            disk=data.get('disk', 20),
-            status='pending'
+            cpu=cpu,
+            memory=memory,
+            disk=disk,
+            provisioner=data.get('provisioner') or Config.PROVISIONER,
+            idempotency_key=idempotency_key,
+            request_hash=fingerprint,
+            status='queued'
         )
         
+        decision, reason = deployment_service.admission.check(deployment)
+        if decision == REJECT:
+            logger.warning(f"⚠️ Déploiement refusé: {reason}")
+            return jsonify({'error': reason}), 422
+        
+        if decision == QUEUE:
+            if not deployment_service.admission.max_wait:
+                logger.warning(f"⚠️ Déploiement refusé, capacité insuffisante: {reason}")
+                response = jsonify({'error': f"Capacité insuffisante, réessayez plus tard: {reason}"})
+                response.headers['Retry-After'] = str(Config.ADMISSION_RETRY_INTERVAL)
+                return response, 503
+            
+            deployment.status = 'waiting_capacity'
+            deployment.error_message = reason
+            db.session.add(deployment)
+            db.session.commit()
+            
+            logger.info(f"⏳ Déploiement {deployment.id} en attente de capacité: {reason}")
+            return jsonify({
+                'message': 'Déploiement en attente de capacité',
+                'deployment': deployment.to_dict(),
+                'warm': False,
+                'reason': reason
+            }), 202
+        
         db.session.add(deployment)
-        db.session.commit()
+    
+    db.session.commit()
+    
+    # Placer le déploiement dans la file d'attente des workers
+    try:
+        position = deployment_service.deploy_async(
+            deployment.id,
+            stage='deploy_app' if warm else 'provision'
+        )
+    except QueueFullError as e:
+        if warm:
+            deployment_service.warm_pool.release(deployment)
+        else:
+            db.session.delete(deployment)
+            db.session.commit()
+        logger.warning(f"⚠️ Déploiement refusé: {e}")
+        response = jsonify({
+            'error': "Trop de déploiements en attente, réessayez plus tard",
+            'queue': deployment_service.queue_stats()
+        })
+        response.headers['Retry-After'] = str(deployment_service.pool.retry_after())
+        return response, 429
+    
+    logger.info(f"✅ Déploiement créé: {deployment.id} - {deployment.name}")
+    
+    stats = deployment_service.queue_stats()
+    return jsonify({
+        'message': 'Déploiement en file d\'attente',
+        'deployment': deployment.to_dict(),
+        'warm': warm,
+        'queue': {
+            'position': position,
+            'depth': stats['queue_depth'],
+            'workers': stats['workers']
+        }
+    }), 202
+
+def _duplicate_response(deployment, fingerprint, idempotency_key):
+    """Réponse à une requête déjà reçue: le déploiement existant est retourné"""
+    if idempotency_key and deployment.request_hash != fingerprint:
+        return jsonify({
+            'error': "Clé d'idempotence déjà utilisée pour une requête différente",
+            'deployment_id': deployment.id
+        }), 409
+    
+    logger.info(f"♻️ Requête regroupée avec le déploiement {deployment.id}")
+    
+    response = jsonify({
+        'message': 'Déploiement existant',
+        'deployment': deployment.to_dict(),
+        'coalesced': True
+    })
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, 200
+
+@deployment_bp.route('/deploy/batch', methods=['POST'])
+def create_batch_deployment():
+    """
+    Crée un lot de déploiements provisionnés en un seul apply Terraform
+    
+    Body JSON:
+    {
+        "type": "vm|lxc",
+        "framework": "django|laravel|nodejs|...",
+        "github_url": "https://github.com/user/repo.git",
+        "cpu": 2,
+        "memory": 2048,
+        "disk": 20,
+        "count": 20,
+        "name_prefix": "optional-prefix"
+    }
+    
+    Ou, pour des instances différentes, une liste "instances" dont chaque
+    élément peut surcharger name, framework, github_url, cpu, memory et disk.
+    
+    Comme pour un déploiement seul, un lot qui ne tient pas attend en statut
+    waiting_capacity (202), ou est refusé (503) si l'attente est désactivée.
+    """
+    try:
+        data = request.get_json()
         
-        logger.info(f"✅ Déploiement créé: {deployment.id} - {deployment.name}")
+        # Validation
+        is_valid, error_message = validate_batch_request(data)
+        if not is_valid:
+            return jsonify({'error': error_message}), 400
         
-        # Lancer le déploiement en arrière-plan
-        deployment_service.deploy_async(deployment.id)
+        batch_id = str(uuid.uuid4())
+        deployments = [
+            Deployment(
+                name=instance['name'],
+                type=instance['type'],
+                framework=instance['framework'],
+                github_url=instance['github_url'],
+                cpu=instance.get('cpu', 2),
+                memory=instance.get('memory', 2048),
+                disk=instance.get('disk', 20),
+                batch_id=batch_id,
+                provisioner='terraform',
+                status='queued'
+            )
+            for instance in expand_batch_request(data)
+        ]
         
+        with deployment_service.admission_lock:
+            # Un seul apply crée tout le lot: il est admis si toutes ses instances tiennent
+            decision, reason = deployment_service.admission.check_batch(deployments)
+            if decision == REJECT:
+                logger.warning(f"⚠️ Lot refusé: {reason}")
+                return jsonify({'error': reason}), 422
+            
+            if decision == QUEUE:
+                if not deployment_service.admission.max_wait:
+                    logger.warning(f"⚠️ Lot refusé, capacité insuffisante: {reason}")
+                    response = jsonify({'error': f"Capacité insuffisante pour le lot, réessayez plus tard: {reason}"})
+                    response.headers['Retry-After'] = str(Config.ADMISSION_RETRY_INTERVAL)
+                    return response, 503
+                
+                for deployment in deployments:
+                    deployment.status = 'waiting_capacity'
+                    deployment.error_message = reason
+                db.session.add_all(deployments)
+                db.session.commit()
+                
+                logger.info(f"⏳ Lot {batch_id} en attente de capacité: {reason}")
+                return jsonify({
+                    'message': 'Lot en attente de capacité',
+                    'batch_id': batch_id,
+                    'deployments': [d.to_dict() for d in deployments],
+                    'reason': reason
+                }), 202
+            
+            db.session.add_all(deployments)
+            db.session.commit()
+            
+            # Placer le lot dans la file d'attente des workers
+            try:
+                position = deployment_service.deploy_batch_async(batch_id)
+            except QueueFullError as e:
+                for deployment in deployments:
+                    db.session.delete(deployment)
+                db.session.commit()
+                logger.warning(f"⚠️ Lot refusé: {e}")
+                response = jsonify({
+                    'error': "Trop de déploiements en attente, réessayez plus tard",
+                    'queue': deployment_service.queue_stats()
+                })
+                response.headers['Retry-After'] = str(deployment_service.pool.retry_after())
+                return response, 429
+        
+        logger.info(f"✅ Lot créé: {batch_id} - {len(deployments)} instances")
+        
+        stats = deployment_service.queue_stats()
         return jsonify({
-            'message': 'Déploiement démarré',
-            'deployment': deployment.to_dict()
+            'message': 'Lot en file d\'attente',
+            'batch_id': batch_id,
+            'deployments': [d.to_dict() for d in deployments],
+            'queue': {
+                'position': position,
+                'depth': stats['queue_depth'],
+                'workers': stats['workers']
+            }
         }), 202
         
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la création du déploiement: {e}")
+        logger.error(f"❌ Erreur lors de la création du lot: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Récupère l'état de chaque instance d'un lot"""
+    try:
+        deployments = Deployment.query.filter_by(batch_id=batch_id).order_by(Deployment.id).all()
+        if not deployments:
+            return jsonify({'error': 'Lot introuvable'}), 404
+        
+        summary = {}
+        for deployment in deployments:
+            summary[deployment.status] = summary.get(deployment.status, 0) + 1
+        
+        return jsonify({
+            'batch_id': batch_id,
+            'total': len(deployments),
+            'status': summary,
+            'deployments': [d.to_dict() for d in deployments]
+        })
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la récupération du lot {batch_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
 @deployment_bp.route('/deployments', methods=['GET'])
 def list_deployments():
     """Liste tous les déploiements"""
     try:
-        deployments = Deployment.query.order_by(Deployment.created_at.desc()).all()
+        deployments = Deployment.query.filter_by(warm_pool=False).order_by(Deployment.created_at.desc()).all()
         return jsonify({
             'deployments': [d.to_dict() for d in deployments],
             'total': len(deployments)
@@ -96,66 +355,273 @@ def get_deployment(deployment_id):
 
 @deployment_bp.route('/deployments/<int:deployment_id>', methods=['DELETE'])
 def delete_deployment(deployment_id):
-    """Supprime un déploiement"""
+    """
+    Supprime un déploiement
+    
+    La destruction de l'infrastructure est planifiée dans le pool de
+    destruction; le déploiement passe en 'deleting', puis 'deleted'.
+    """
     try:
         deployment = Deployment.query.get(deployment_id)
         if not deployment:
             return jsonify({'error': 'Déploiement introuvable'}), 404
         
-        # Détruire l'infrastructure
-        success, message = deployment_service.destroy(deployment_id)
+        if deployment.status == 'deleted':
+            return jsonify({
+                'message': 'Déploiement déjà supprimé',
+                'deployment_id': deployment_id
+            })
+        
+        _, jobs = deployment_service.destroy_async([deployment_id])
         
-        if success:
-            deployment.status = 'deleted'
-            deployment.updated_at = datetime.utcnow()
-            db.session.commit()
+        return jsonify({
+            'message': 'Suppression en cours',
+            'deployment_id': deployment_id,
+            'job_id': jobs[deployment_id].id
+        }), 202
             
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la suppression du déploiement {deployment_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/deployments/bulk-delete', methods=['POST'])
+def bulk_delete():
+    """
+    Supprime plusieurs déploiements en parallèle
+    
+    Body JSON:
+    {
+        "ids": [1, 2, 3],
+        "filter": {"status": ["failed"], "framework": "django", "older_than_hours": 24},
+        "dry_run": false
+    }
+    
+    Les critères se cumulent; le filtre ignore les instances du pool chaud.
+    Les destructions sont planifiées immédiatement (202) et suivies via
+    GET /api/deployments/bulk-delete/<bulk_id>.
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        is_valid, error_message = validate_bulk_delete_request(data)
+        if not is_valid:
+            return jsonify({'error': error_message}), 400
+        
+        query = Deployment.query.filter(Deployment.status != 'deleted')
+        
+        ids = data.get('ids')
+        if ids:
+            query = query.filter(Deployment.id.in_(ids))
+        
+        filters = data.get('filter') or {}
+        if filters:
+            query = query.filter(Deployment.warm_pool.is_(False))
+        if 'status' in filters:
+            statuses = filters['status']
+            query = query.filter(Deployment.status.in_([statuses] if isinstance(statuses, str) else statuses))
+        if 'framework' in filters:
+            query = query.filter(Deployment.framework == str(filters['framework']).lower())
+        if 'type' in filters:
+            query = query.filter(Deployment.type == filters['type'])
+        if 'batch_id' in filters:
+            query = query.filter(Deployment.batch_id == filters['batch_id'])
+        if 'older_than_hours' in filters:
+            cutoff = datetime.utcnow() - timedelta(hours=filters['older_than_hours'])
+            query = query.filter(Deployment.created_at < cutoff)
+        
+        deployment_ids = [d.id for d in query.order_by(Deployment.id).limit(Config.MAX_BULK_DELETE + 1)]
+        if len(deployment_ids) > Config.MAX_BULK_DELETE:
             return jsonify({
-                'message': 'Déploiement supprimé',
-                'deployment_id': deployment_id
+                'error': f"Plus de {Config.MAX_BULK_DELETE} déploiements correspondent: affiner le filtre"
+            }), 400
+        
+        not_found = sorted(set(ids or []) - set(deployment_ids)) if ids and not filters else []
+        
+        if data.get('dry_run'):
+            return jsonify({
+                'dry_run': True,
+                'deployment_ids': deployment_ids,
+                'total': len(deployment_ids),
+                'not_found': not_found
             })
+        
+        if not deployment_ids:
+            return jsonify({'error': 'Aucun déploiement ne correspond'}), 404
+        
+        bulk_id, jobs = deployment_service.destroy_async(deployment_ids)
+        logger.info(f"🗑️ Suppression groupée {bulk_id}: {len(jobs)} déploiements")
+        
+        return jsonify({
+            'message': 'Suppression en cours',
+            'bulk_id': bulk_id,
+            'deployment_ids': sorted(jobs),
+            'total': len(jobs),
+            'not_found': not_found
+        }), 202
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la suppression groupée: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/deployments/bulk-delete/<bulk_id>', methods=['GET'])
+def get_bulk_delete(bulk_id):
+    """Avancement d'une suppression groupée, par déploiement"""
+    try:
+        status = deployment_service.bulk_delete_status(bulk_id)
+        if status is None:
+            return jsonify({'error': 'Suppression groupée introuvable'}), 404
+        return jsonify(status)
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la récupération de la suppression {bulk_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/deployments/<int:deployment_id>/cancel', methods=['POST'])
+def cancel_deployment(deployment_id):
+    """Annule un déploiement en file d'attente ou en cours"""
+    try:
+        deployment = Deployment.query.get(deployment_id)
+        if not deployment:
+            return jsonify({'error': 'Déploiement introuvable'}), 404
+        
+        success, message = deployment_service.cancel(deployment_id)
+        
+        if success:
+            return jsonify({
+                'message': message,
+                'deployment_id': deployment_id
+            }), 202
         else:
-            return jsonify({'error': message}), 500
+            return jsonify({'error': message}), 409
             
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la suppression du déploiement {deployment_id}: {e}")
+        logger.error(f"❌ Erreur lors de l'annulation du déploiement {deployment_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/deployments/<int:deployment_id>/retry', methods=['POST'])
+def retry_deployment(deployment_id):
+    """Relance un déploiement échoué ou annulé"""
+    try:
+        deployment = Deployment.query.get(deployment_id)
+        if not deployment:
+            return jsonify({'error': 'Déploiement introuvable'}), 404
+        
+        success, message = deployment_service.retry(deployment_id)
+        
+        if success:
+            return jsonify({
+                'message': message,
+                'deployment_id': deployment_id,
+                'queue': deployment_service.queue_stats()
+            }), 202
+        else:
+            return jsonify({'error': message}), 409
+    
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Relance refusée: {e}")
+        response = jsonify({
+            'error': "Trop de déploiements en attente, réessayez plus tard",
+            'queue': deployment_service.queue_stats()
+        })
+        response.headers['Retry-After'] = str(deployment_service.pool.retry_after())
+        return response, 429
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la relance du déploiement {deployment_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
 @deployment_bp.route('/deployments/<int:deployment_id>/logs', methods=['GET'])
 def get_deployment_logs(deployment_id):
-    """Récupère les logs d'un déploiement"""
+    """
+    Récupère les logs d'un déploiement, par pages de fragments
+    
+    Query params:
+        after: Curseur (id du dernier fragment reçu); seuls les fragments
+            suivants sont retournés, pour paginer ou suivre un déploiement en cours
+        limit: Nombre maximal de fragments retournés (défaut: 200, max: 1000)
+    """
     try:
         deployment = Deployment.query.get(deployment_id)
         if not deployment:
             return jsonify({'error': 'Déploiement introuvable'}), 404
         
-        return jsonify({
+        after = request.args.get('after', type=int)
+        limit = min(max(request.args.get('limit', 200, type=int), 1), 1000)
+        
+        # Un fragment de plus que demandé indique s'il reste une page
+        chunks = LogChunk.query.filter(
+            LogChunk.deployment_id == deployment_id,
+            LogChunk.id > (after or 0)
+        ).order_by(LogChunk.id).limit(limit + 1).all()
+        has_more = len(chunks) > limit
+        chunks = chunks[:limit]
+        
+        payload = {
             'deployment_id': deployment_id,
-            'terraform_output': deployment.terraform_output,
-            'deployment_log': deployment.deployment_log
-        })
+            'status': deployment.status,
+            'chunks': [chunk.to_dict() for chunk in chunks],
+            'cursor': chunks[-1].id if chunks else (after or 0),
+            'has_more': has_more
+        }
+        
+        # Première page: logs des déploiements antérieurs aux fragments
+        if after is None:
+            payload['terraform_output'] = deployment.terraform_output
+            payload['deployment_log'] = deployment.deployment_log
+        
+        return jsonify(payload)
     except Exception as e:
         logger.error(f"❌ Erreur lors de la récupération des logs {deployment_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
 @deployment_bp.route('/deployments/<int:deployment_id>/restart', methods=['POST'])
 def restart_deployment(deployment_id):
-    """Redémarre un déploiement"""
+    """
+    Lance le redémarrage d'un déploiement
+    
+    La réponse n'attend pas la fin du redémarrage: son avancement se suit
+    sur /deployments/<id>/tasks/<upid>.
+    """
     try:
         deployment = Deployment.query.get(deployment_id)
         if not deployment:
             return jsonify({'error': 'Déploiement introuvable'}), 404
         
-        success, message = deployment_service.restart(deployment_id)
+        success, result = deployment_service.restart(deployment_id)
         
         if success:
             return jsonify({
-                'message': 'Déploiement redémarré',
-                'deployment_id': deployment_id
-            })
+                'message': 'Redémarrage lancé',
+                'deployment_id': deployment_id,
+                'task': result,
+                'task_url': f'/api/deployments/{deployment_id}/tasks/{result}'
+            }), 202
         else:
-            return jsonify({'error': message}), 500
+            return jsonify({'error': result}), 500
             
     except Exception as e:
         logger.error(f"❌ Erreur lors du redémarrage du déploiement {deployment_id}: {e}")
         return jsonify({'error': str(e)}), 500
+
+@deployment_bp.route('/deployments/<int:deployment_id>/tasks/<upid>', methods=['GET'])
+def get_deployment_task(deployment_id, upid):
+    """État d'une tâche Proxmox lancée pour un déploiement (redémarrage)"""
+    try:
+        deployment = Deployment.query.get(deployment_id)
+        if not deployment:
+            return jsonify({'error': 'Déploiement introuvable'}), 404
+        
+        # Seules les tâches portant sur la VM du déploiement sont consultables
+        try:
+            info = parse_upid(upid)
+        except ValueError:
+            return jsonify({'error': 'Tâche introuvable'}), 404
+        if info['id'] != str(deployment.proxmox_id) or info['node'] != deployment.proxmox_node:
+            return jsonify({'error': 'Tâche introuvable'}), 404
+        
+        task = deployment_service.proxmox_service.get_task(upid)
+        if task is None:
+            return jsonify({'error': 'État de la tâche indisponible'}), 502
+        
+        return jsonify(dict(task, deployment_id=deployment_id))
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la lecture de la tâche {upid}: {e}")
+        return jsonify({'error': str(e)}), 500
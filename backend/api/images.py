@@ -0,0 +1,66 @@
+"""
+API Routes pour les images dorées (templates pré-installés par framework)
+"""
+
+import logging
+from flask import Blueprint, request, jsonify
+
+from api.deployment import deployment_service
+from services.worker_pool import QueueFullError
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+images_bp = Blueprint('images', __name__)
+
+@images_bp.route('/images', methods=['GET'])
+def list_images():
+    """
+    Liste les images dorées et l'image utilisée pour chaque framework
+    
+    Query params:
+        framework: filtrer sur un framework
+    """
+    try:
+        image_service = deployment_service.image_service
+        framework = request.args.get('framework')
+        
+        current = {}
+        for name in Config.SUPPORTED_FRAMEWORKS:
+            if framework and name != framework:
+                continue
+            image = image_service.current_image(name)
+            current[name] = {
+                'template': image.template_name if image else Config.TEMPLATE_NAME,
+                'version': image.version if image else None,
+                'needs_build': image_service.needs_build(name)
+            }
+        
+        return jsonify({
+            'enabled': Config.GOLDEN_IMAGES_ENABLED,
+            'current': current,
+            'images': [image.to_dict() for image in image_service.list_images(framework)]
+        })
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la récupération des images: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@images_bp.route('/images/<framework>/build', methods=['POST'])
+def build_image(framework):
+    """Lance la (re)construction de l'image dorée d'un framework"""
+    try:
+        if not Config.is_framework_supported(framework):
+            return jsonify({'error': f'Framework non supporté: {framework}'}), 400
+        
+        position = deployment_service.image_service.schedule_build(framework)
+        
+        return jsonify({
+            'message': 'Construction planifiée',
+            'framework': framework.lower(),
+            'position': position
+        }), 202
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la planification de l'image {framework}: {e}")
+        return jsonify({'error': str(e)}), 500
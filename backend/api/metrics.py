@@ -0,0 +1,49 @@
+"""
+API Routes pour les métriques de la plateforme
+"""
+
+import logging
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+
+from services.pipeline_metrics import aggregate_pipeline_timings
+from services.proxmox_client import get_proxmox_client
+from services.task_tracker import get_task_tracker
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics/pipeline', methods=['GET'])
+def get_pipeline_metrics():
+    """
+    Durées des étapes du pipeline (p50/p95/p99 par étape, framework et type)
+    
+    Query params:
+        framework: filtrer sur un framework
+        type: filtrer sur vm ou lxc
+        since_hours: ne garder que les dernières heures
+        successful_only: true pour ignorer les étapes en échec
+    """
+    try:
+        since = None
+        since_hours = request.args.get('since_hours', type=float)
+        if since_hours:
+            since = datetime.utcnow() - timedelta(hours=since_hours)
+        
+        metrics = aggregate_pipeline_timings(
+            framework=request.args.get('framework'),
+            deployment_type=request.args.get('type'),
+            since=since,
+            successful_only=request.args.get('successful_only', 'false').lower() == 'true'
+        )
+        return jsonify(metrics)
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du calcul des métriques du pipeline: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/metrics/proxmox', methods=['GET'])
+def get_proxmox_metrics():
+    """Requêtes vers l'API Proxmox (compteurs, latences, reprises, limiteur) et tâches suivies"""
+    client = get_proxmox_client()
+    return jsonify({**client.stats(), 'tasks': get_task_tracker(client).stats()})
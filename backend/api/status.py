@@ -3,44 +3,74 @@ API Routes pour le statut et les informations système
 """
 
 import logging
-from flask import Blueprint, jsonify
-from services.proxmox_service import ProxmoxService
+from flask import Blueprint, request, jsonify
 from models.database import Deployment, db
+from api.deployment import deployment_service
+from services.ttl_cache import CacheMiss
+from services.cluster_inventory import GUEST_TYPES, guest_summary, storage_summary
+from utils.config import Config
 
 logger = logging.getLogger(__name__)
 
 status_bp = Blueprint('status', __name__)
-proxmox_service = ProxmoxService()
+status_cache = deployment_service.status_cache
 
 @status_bp.route('/status', methods=['GET'])
 def get_system_status():
     """Récupère le statut général du système"""
     try:
         # Statistiques des déploiements
-        total_deployments = Deployment.query.count()
-        running_deployments = Deployment.query.filter_by(status='running').count()
-        failed_deployments = Deployment.query.filter_by(status='failed').count()
-        pending_deployments = Deployment.query.filter_by(status='pending').count()
+        # (hors instances du pool chaud, non attribuées)
+        deployments = Deployment.query.filter_by(warm_pool=False)
+        total_deployments = deployments.count()
+        running_deployments = deployments.filter_by(status='running').count()
+        failed_deployments = deployments.filter_by(status='failed').count()
+        pending_deployments = deployments.filter_by(status='pending').count()
+        queued_deployments = deployments.filter_by(status='queued').count()
+        waiting_deployments = deployments.filter_by(status='waiting_capacity').count()
         
-        # Connexion Proxmox
-        proxmox_connected = proxmox_service.test_connection()
+        # Connexion Proxmox (vérifiée en arrière-plan)
+        proxmox_connected, _, checked_age = status_cache.get('proxmox_connected')
         
         return jsonify({
             'system': {
                 'status': 'operational',
-                'proxmox_connected': proxmox_connected
+                'proxmox_connected': proxmox_connected,
+                'proxmox_checked_age': round(checked_age, 1)
             },
             'deployments': {
                 'total': total_deployments,
                 'running': running_deployments,
                 'failed': failed_deployments,
-                'pending': pending_deployments
-            }
+                'pending': pending_deployments,
+                'queued': queued_deployments,
+                'waiting_capacity': waiting_deployments
+            },
+            'queue': deployment_service.queue_stats(),
+            'warm_pool': deployment_service.warm_pool.stats(),
+            'concurrency': deployment_service.governor.stats(),
+            'admission': deployment_service.admission.stats(),
+            'vmids': deployment_service.vmids.stats(),
+            'cache': status_cache.stats()
         })
     except Exception as e:
         logger.error(f"❌ Erreur lors de la récupération du statut: {e}")
         return jsonify({'error': str(e)}), 500
 
+@status_bp.route('/queue', methods=['GET'])
+def get_queue_status():
+    """Récupère l'état de la file d'attente des déploiements"""
+    return jsonify(deployment_service.queue_stats())
+
+@status_bp.route('/warm-pool', methods=['GET'])
+def get_warm_pool_status():
+    """Récupère l'état du pool chaud (tailles, instances prêtes, hit/miss)"""
+    try:
+        return jsonify(deployment_service.warm_pool.stats())
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la récupération du pool chaud: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @status_bp.route('/frameworks', methods=['GET'])
 def list_frameworks():
     """Liste les frameworks supportés"""
@@ -67,12 +97,76 @@ def list_frameworks():
     
     return jsonify(frameworks)
 
+def _cached_inventory():
+    """Inventaire du cluster depuis le cache de statut, avec son état et son âge"""
+    return status_cache.get('cluster_inventory')
+
+def _cache_headers(response, state, age):
+    response.headers['X-Cache'] = state.upper()
+    response.headers['Age'] = str(int(age))
+    return response
+
 @status_bp.route('/resources', methods=['GET'])
 def get_available_resources():
-    """Récupère les ressources disponibles sur Proxmox"""
+    """Ressources du cluster: agrégats par noeud et du cluster, storages (depuis le cache de statut)"""
     try:
-        resources = proxmox_service.get_cluster_resources()
-        return jsonify(resources)
+        inventory, state, age = _cached_inventory()
+        return _cache_headers(jsonify(inventory.to_dict(Config.PROXMOX_NODE)), state, age)
+    except CacheMiss as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"❌ Erreur lors de la récupération des ressources: {e}")
         return jsonify({'error': str(e)}), 500
+
+@status_bp.route('/resources/nodes/<name>', methods=['GET'])
+def get_node_resources(name):
+    """Agrégats, storages et instances d'un noeud"""
+    try:
+        inventory, state, age = _cached_inventory()
+        summary = inventory.node_summary(name)
+        if summary is None:
+            return jsonify({'error': 'Noeud introuvable'}), 404
+        
+        return _cache_headers(jsonify({
+            **summary,
+            'storages': [storage_summary(storage) for storage in inventory.storages(node=name)],
+            'guests': [guest_summary(guest) for guest in inventory.guests(node=name)]
+        }), state, age)
+    except CacheMiss as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la récupération du noeud {name}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@status_bp.route('/resources/guests', methods=['GET'])
+def list_guests():
+    """
+    VMs et conteneurs du cluster
+    
+    Query params:
+        node: filtrer sur un noeud
+        type: qemu ou lxc
+        status: running, stopped...
+        templates: false pour exclure les templates
+    """
+    guest_type = request.args.get('type')
+    if guest_type and guest_type not in GUEST_TYPES:
+        return jsonify({'error': f"Type invalide: {guest_type} (qemu ou lxc)"}), 400
+    
+    try:
+        inventory, state, age = _cached_inventory()
+        guests = inventory.guests(
+            node=request.args.get('node'),
+            guest_type=guest_type,
+            status=request.args.get('status'),
+            templates=request.args.get('templates', 'true').lower() != 'false'
+        )
+        return _cache_headers(jsonify({
+            'guests': [guest_summary(guest) for guest in guests],
+            'total': len(guests)
+        }), state, age)
+    except CacheMiss as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la liste des instances: {e}")
+        return jsonify({'error': str(e)}), 500
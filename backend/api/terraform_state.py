@@ -0,0 +1,164 @@
+"""
+API Routes du backend HTTP des états Terraform
+
+Protocole du backend "http" de Terraform: GET lit l'état, POST l'écrit
+(?ID=<verrou>), DELETE le supprime, LOCK/UNLOCK gèrent le verrou.
+"""
+
+import hmac
+import json
+import base64
+import hashlib
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify, Response
+
+from models.database import TerraformState
+from services import state_store
+from services.state_store import STATE_NAME_PATTERN
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+terraform_state_bp = Blueprint('terraform_state', __name__)
+
+def _require_auth(view):
+    """Authentification basique: utilisateur terraform, TERRAFORM_STATE_PASSWORD"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        auth = request.authorization
+        if (
+            not Config.TERRAFORM_STATE_PASSWORD
+            or not auth
+            or auth.username != 'terraform'
+            or not hmac.compare_digest(
+                (auth.password or '').encode('utf-8'),
+                Config.TERRAFORM_STATE_PASSWORD.encode('utf-8')
+            )
+        ):
+            return Response('Authentification requise', 401, {'WWW-Authenticate': 'Basic realm="terraform-state"'})
+        return view(*args, **kwargs)
+    return wrapper
+
+def _valid_name(view):
+    @wraps(view)
+    def wrapper(name, *args, **kwargs):
+        if not STATE_NAME_PATTERN.match(name):
+            return jsonify({'error': 'Nom d\'état invalide'}), 400
+        return view(name, *args, **kwargs)
+    return wrapper
+
+@terraform_state_bp.route('/terraform/state/<name>', methods=['GET'])
+@_require_auth
+@_valid_name
+def get_state(name):
+    """État courant (204 s'il n'existe pas encore)"""
+    state = state_store.get_state(name)
+    if not state or not state.size:
+        return '', 204
+
+    response = Response(state.content, 200, mimetype='application/json')
+    response.headers['Content-MD5'] = base64.b64encode(bytes.fromhex(state.md5)).decode('ascii')
+    return response
+
+@terraform_state_bp.route('/terraform/state/<name>', methods=['POST'])
+@_require_auth
+@_valid_name
+def save_state(name):
+    """Enregistre l'état (refusé si verrouillé par un autre détenteur)"""
+    content = request.get_data()
+
+    checksum = request.headers.get('Content-MD5')
+    if checksum and base64.b64encode(hashlib.md5(content).digest()).decode('ascii') != checksum:
+        return jsonify({'error': 'Content-MD5 invalide'}), 400
+
+    try:
+        content = content.decode('utf-8')
+    except UnicodeDecodeError:
+        return jsonify({'error': 'État non UTF-8'}), 400
+
+    success, lock_info = state_store.save_state(name, content, request.args.get('ID'))
+    if not success:
+        return jsonify(lock_info), 409
+    return '', 200
+
+@terraform_state_bp.route('/terraform/state/<name>', methods=['DELETE'])
+@_require_auth
+@_valid_name
+def delete_state(name):
+    """Supprime l'état (terraform workspace delete)"""
+    state = state_store.get_state(name)
+    if state and state.lock_id:
+        return jsonify(json.loads(state.lock_info or '{}')), 409
+
+    state_store.delete_state(name)
+    return '', 200
+
+@terraform_state_bp.route('/terraform/state/<name>', methods=['LOCK'])
+@_require_auth
+@_valid_name
+def lock_state(name):
+    """Prend le verrou (423 et informations du détenteur s'il est déjà pris)"""
+    info = request.get_json(force=True, silent=True)
+    if not isinstance(info, dict):
+        return jsonify({'error': 'Informations de verrou requises'}), 400
+
+    success, lock_info = state_store.lock_state(name, info)
+    if not success:
+        logger.info(f"🔒 État {name} déjà verrouillé ({lock_info.get('Operation')} par {lock_info.get('Who')})")
+        return jsonify(lock_info), 423
+    return jsonify(lock_info), 200
+
+@terraform_state_bp.route('/terraform/state/<name>', methods=['UNLOCK'])
+@_require_auth
+@_valid_name
+def unlock_state(name):
+    """Libère le verrou (terraform force-unlock envoie aussi son identifiant)"""
+    info = request.get_json(force=True, silent=True) or {}
+    lock_id = info.get('ID') if isinstance(info, dict) else None
+
+    success, lock_info = state_store.unlock_state(name, lock_id)
+    if not success:
+        return jsonify(lock_info), 409
+    return '', 200
+
+@terraform_state_bp.route('/terraform/states', methods=['GET'])
+@_require_auth
+def list_states():
+    """
+    Inventaire des états (sans leur contenu)
+
+    Query params:
+        locked: true pour ne lister que les états verrouillés
+    """
+    try:
+        query = TerraformState.query
+        if request.args.get('locked', '').lower() == 'true':
+            query = query.filter(TerraformState.lock_id.isnot(None))
+
+        states = query.order_by(TerraformState.name).all()
+        return jsonify({
+            'states': [state.to_dict() for state in states],
+            'total': len(states),
+            'resources': sum(state.resource_count for state in states)
+        })
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la liste des états: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@terraform_state_bp.route('/terraform/states/<name>/lock', methods=['DELETE'])
+@_require_auth
+def force_unlock(name):
+    """Libère de force le verrou d'un état (détenteur arrêté sans libérer)"""
+    if not STATE_NAME_PATTERN.match(name):
+        return jsonify({'error': 'Nom d\'état invalide'}), 400
+
+    state = state_store.get_state(name)
+    if not state:
+        return jsonify({'error': 'État introuvable'}), 404
+
+    holder = json.loads(state.lock_info) if state.lock_info else None
+    state_store.unlock_state(name)
+    logger.warning(f"🔓 Verrou de l'état {name} libéré de force")
+
+    return jsonify({'message': 'Verrou libéré', 'previous_lock': holder})
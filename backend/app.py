@@ -19,17 +19,22 @@ if sys.platform == 'win32':
     if hasattr(sys.stderr, 'buffer'):
         sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
 
-from models.database import init_db
-from api.deployment import deployment_bp
-from api.status import status_bp
-from utils.config import Config
-
 # Charger les variables d'environnement depuis le fichier .env à la racine du projet
+# (avant les imports locaux, Config et les services lisent l'environnement à l'import)
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(backend_dir)
 env_path = os.path.join(project_root, '.env')
 load_dotenv(dotenv_path=env_path)
 
+from models.database import init_db
+from api.deployment import deployment_bp
+from api.status import status_bp
+from api.metrics import metrics_bp
+from api.images import images_bp
+from api.admin import admin_bp
+from api.terraform_state import terraform_state_bp
+from utils.config import Config
+
 # Configuration du logging
 def setup_logging():
     """Configure le système de logging avec couleurs"""
@@ -92,6 +97,13 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Le mot de passe des états ne peut pas être dérivé de la clé secrète par défaut
+    if Config.TERRAFORM_STATE_BACKEND == 'http' and not Config.TERRAFORM_STATE_PASSWORD:
+        raise RuntimeError(
+            "Backend d'état http: définir TERRAFORM_STATE_PASSWORD, ou une FLASK_SECRET_KEY "
+            "autre que la valeur par défaut"
+        )
+    
     # CORS
     CORS(app)
     
@@ -101,6 +113,10 @@ def create_app():
     # Enregistrer les blueprints
     app.register_blueprint(deployment_bp, url_prefix='/api')
     app.register_blueprint(status_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(images_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(terraform_state_bp, url_prefix='/api')
     
     # Route principale
     @app.route('/')
@@ -169,11 +185,21 @@ if __name__ == '__main__':
     
     logger.info("🚀 Démarrage de la plateforme PaaS...")
     logger.info(f"📁 Répertoire de travail: {project_root}")
-    logger.info(f"📡 Interface disponible sur http://{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}")
+    host = os.getenv('FLASK_HOST', '0.0.0.0')
+    port = int(os.getenv('FLASK_PORT', 5000))
+    logger.info(f"📡 Interface disponible sur http://{host}:{port}")
+    
+    debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    
+    # Reprendre les tâches interrompues et maintenir les baux
+    # (avec le reloader, uniquement dans le processus qui sert les requêtes)
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from api.deployment import deployment_service
+        deployment_service.start_background_tasks()
     
     # Lancer l'application
     app.run(
-        host=os.getenv('FLASK_HOST', '0.0.0.0'),
-        port=int(os.getenv('FLASK_PORT', 5000)),
-        debug=os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+        host=host,
+        port=port,
+        debug=debug
     )
@@ -1,4 +1,4 @@
 """Initialisation du package models"""
-from .database import db, Deployment, init_db
+from .database import db, Deployment, Job, StageTiming, LogChunk, TerraformState, GoldenImage, VmidAllocation, init_db, migrate_db
 
-__all__ = ['db', 'Deployment', 'init_db']
+__all__ = ['db', 'Deployment', 'Job', 'StageTiming', 'LogChunk', 'TerraformState', 'GoldenImage', 'VmidAllocation', 'init_db', 'migrate_db']
@@ -2,16 +2,72 @@
 Modèles de base de données SQLAlchemy
 """
 
+import logging
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 def init_db(app):
     """Initialise la base de données"""
     db.init_app(app)
     with app.app_context():
         db.create_all()
+        migrate_db(db.engine)
+
+def migrate_db(engine):
+    """
+    Ajoute aux tables existantes les colonnes (et index) des modèles qu'elles n'ont pas
+    
+    create_all ne crée que les tables absentes: une base créée par une
+    version précédente n'aurait pas les nouvelles colonnes de deployments.
+    Une colonne NOT NULL est ajoutée avec sa valeur par défaut.
+    
+    Returns:
+        Liste des colonnes ajoutées ('table.colonne')
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in present]
+            for column in missing:
+                connection.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine.dialect)}'
+                ))
+                added.append(f'{table.name}.{column.name}')
+            
+            for index in table.indexes:
+                if any(column in missing for column in index.columns):
+                    index.create(connection, checkfirst=True)
+    
+    if added:
+        logger.info(f"🗄️ Schéma mis à jour, colonnes ajoutées: {', '.join(added)}")
+    return added
+
+def _column_ddl(column, dialect):
+    """Définition d'une colonne pour ALTER TABLE ADD COLUMN"""
+    ddl = f'{column.name} {column.type.compile(dialect=dialect)}'
+    
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, bool):
+        default = int(default)
+    if isinstance(default, str):
+        default = "'" + default.replace("'", "''") + "'"
+    
+    if default is not None:
+        ddl += f' DEFAULT {default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
 
 class Deployment(db.Model):
     """Modèle pour un déploiement"""
@@ -31,10 +87,34 @@ class Deployment(db.Model):
     # Proxmox
     proxmox_id = db.Column(db.Integer)
     proxmox_node = db.Column(db.String(50))
+    proxmox_storage = db.Column(db.String(50))
     ip_address = db.Column(db.String(15))
     
+    # Lot de déploiement (POST /api/deploy/batch)
+    batch_id = db.Column(db.String(36), index=True)
+    
+    # Template cloné et version de l'image dorée (None: template générique)
+    source_template = db.Column(db.String(100))
+    image_version = db.Column(db.Integer)
+    
+    # Provisionnement: terraform ou api (appels directs à Proxmox)
+    provisioner = db.Column(db.String(20), nullable=False, default='terraform')
+    
+    # Empreinte des fichiers Terraform au dernier apply réussi
+    render_hash = db.Column(db.String(64))
+    
+    # Déduplication des requêtes: clé d'idempotence fournie et empreinte de la requête
+    idempotency_key = db.Column(db.String(128), index=True)
+    request_hash = db.Column(db.String(64), index=True)
+    
+    # Instance du pool chaud (préprovisionnée, pas encore attribuée)
+    warm_pool = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    pooled_at = db.Column(db.DateTime)
+    
     # État
-    status = db.Column(db.String(20), default='pending')  # pending, creating, running, failed, stopped, deleted
+    # pending, waiting_capacity, queued, creating, warm, running, failed,
+    # cancelled, stopped, deleting, deleted
+    status = db.Column(db.String(20), default='pending')
     error_message = db.Column(db.Text)
     
     # Métadonnées
@@ -42,7 +122,7 @@ class Deployment(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     deployed_at = db.Column(db.DateTime)
     
-    # Logs
+    # Logs (historique: les nouveaux journaux sont enregistrés dans log_chunks)
     terraform_output = db.Column(db.Text)
     deployment_log = db.Column(db.Text)
     
@@ -62,8 +142,17 @@ class Deployment(db.Model):
             'proxmox': {
                 'id': self.proxmox_id,
                 'node': self.proxmox_node,
+                'storage': self.proxmox_storage,
                 'ip': self.ip_address
             },
+            'batch_id': self.batch_id,
+            'provisioner': self.provisioner,
+            'warm_pool': self.warm_pool,
+            'idempotency_key': self.idempotency_key,
+            'image': {
+                'template': self.source_template,
+                'version': self.image_version
+            },
             'status': self.status,
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -71,5 +160,242 @@ class Deployment(db.Model):
             'deployed_at': self.deployed_at.isoformat() if self.deployed_at else None
         }
 
+    @property
+    def vmid(self):
+        """VMID réservé par l'allocateur (None: choisi par Proxmox)"""
+        allocation = VmidAllocation.query.filter_by(deployment_id=self.id, status='allocated').first()
+        return allocation.vmid if allocation else None
+    
     def __repr__(self):
         return f'<Deployment {self.id}: {self.name} ({self.status})>'
+
+class Job(db.Model):
+    """Tâche persistante exécutée par les workers (réclamée via un bail)"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='deploy')  # deploy, batch, destroy
+    stage = db.Column(db.String(20), nullable=False, default='provision')  # provision, await_ready, configure
+    deployment_id = db.Column(db.Integer, db.ForeignKey('deployments.id'), index=True)
+    batch_id = db.Column(db.String(36), index=True)
+    
+    # Suppression groupée (POST /api/deployments/bulk-delete) à laquelle appartient la tâche
+    group_id = db.Column(db.String(36), index=True)
+    
+    # État: queued, running, waiting, done, failed, cancelled
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error_message = db.Column(db.Text)
+    
+    # Échéance de la tentative en cours et demande d'annulation
+    deadline_at = db.Column(db.DateTime)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    
+    # Bail: propriétaire (hôte:pid) et expiration, prolongée par heartbeat
+    owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime, index=True)
+    heartbeat_at = db.Column(db.DateTime)
+    
+    # Métadonnées
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Convertit la tâche en dictionnaire"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'deployment_id': self.deployment_id,
+            'batch_id': self.batch_id,
+            'group_id': self.group_id,
+            'stage': self.stage,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'deadline_at': self.deadline_at.isoformat() if self.deadline_at else None,
+            'cancel_requested': self.cancel_requested,
+            'owner': self.owner,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        target = f"batch={self.batch_id}" if self.batch_id else f"deployment={self.deployment_id}"
+        return f'<Job {self.id}: {self.kind} {target} ({self.status})>'
+
+class StageTiming(db.Model):
+    """Durée d'une étape du pipeline pour un déploiement"""
+    __tablename__ = 'stage_timings'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    deployment_id = db.Column(db.Integer, db.ForeignKey('deployments.id'), nullable=False, index=True)
+    
+    # workspace_render, terraform_init, terraform_plan, concurrency_wait,
+    # terraform_apply, terraform_outputs, api_create, api_outputs,
+    # wait_ready, install, app_deploy
+    stage = db.Column(db.String(30), nullable=False, index=True)
+    
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    ended_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)  # en secondes
+    success = db.Column(db.Boolean)
+    
+    def to_dict(self):
+        """Convertit la mesure en dictionnaire"""
+        return {
+            'deployment_id': self.deployment_id,
+            'stage': self.stage,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'duration': self.duration,
+            'success': self.success
+        }
+    
+    def __repr__(self):
+        return f'<StageTiming {self.deployment_id}:{self.stage} {self.duration}s>'
+
+class LogChunk(db.Model):
+    """Fragment du journal d'un déploiement, enregistré au fil de l'exécution"""
+    __tablename__ = 'log_chunks'
+    
+    # L'identifiant croissant sert de curseur de lecture (?after=)
+    id = db.Column(db.Integer, primary_key=True)
+    deployment_id = db.Column(db.Integer, db.ForeignKey('deployments.id'), nullable=False, index=True)
+    
+    # terraform (provisionnement: sortie de terraform apply ou appels API directs)
+    # ou deploy (scripts d'installation et de déploiement)
+    source = db.Column(db.String(20), nullable=False, default='deploy')
+    content = db.Column(db.Text, nullable=False)
+    lines = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertit le fragment en dictionnaire"""
+        return {
+            'id': self.id,
+            'source': self.source,
+            'content': self.content,
+            'lines': self.lines,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<LogChunk {self.id}: {self.deployment_id} {self.source} ({self.lines} lignes)>'
+
+class TerraformState(db.Model):
+    """État Terraform d'un workspace, servi par le backend HTTP de la plateforme"""
+    __tablename__ = 'terraform_states'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Nom du workspace: deployment-<id> ou batch-<id>
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    deployment_id = db.Column(db.Integer, index=True)
+    batch_id = db.Column(db.String(36), index=True)
+    
+    # Contenu (JSON Terraform) et métadonnées extraites à l'écriture
+    content = db.Column(db.Text)
+    serial = db.Column(db.Integer)
+    lineage = db.Column(db.String(64))
+    resource_count = db.Column(db.Integer, nullable=False, default=0)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    md5 = db.Column(db.String(32))
+    
+    # Verrou Terraform (LOCK/UNLOCK): identifiant et informations du détenteur
+    lock_id = db.Column(db.String(64))
+    lock_info = db.Column(db.Text)
+    locked_at = db.Column(db.DateTime)
+    
+    # Métadonnées
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertit l'état en dictionnaire (sans son contenu)"""
+        return {
+            'name': self.name,
+            'deployment_id': self.deployment_id,
+            'batch_id': self.batch_id,
+            'serial': self.serial,
+            'lineage': self.lineage,
+            'resource_count': self.resource_count,
+            'size': self.size,
+            'locked': self.lock_id is not None,
+            'locked_at': self.locked_at.isoformat() if self.locked_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<TerraformState {self.name} serial={self.serial}>'
+
+class GoldenImage(db.Model):
+    """Template Proxmox pré-installé pour un framework (image dorée)"""
+    __tablename__ = 'golden_images'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    framework = db.Column(db.String(50), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)
+    
+    # Template Proxmox produit et template générique de départ
+    template_name = db.Column(db.String(100), nullable=False)
+    template_vmid = db.Column(db.Integer)
+    proxmox_node = db.Column(db.String(50))
+    base_template = db.Column(db.String(100))
+    
+    # Empreinte du script d'installation cuit dans l'image
+    script_hash = db.Column(db.String(64), nullable=False)
+    
+    # État: building, ready, failed, retired
+    status = db.Column(db.String(20), nullable=False, default='building', index=True)
+    error_message = db.Column(db.Text)
+    
+    # Métadonnées
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    built_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.UniqueConstraint('framework', 'version', name='uq_golden_image_version'),
+    )
+    
+    def to_dict(self):
+        """Convertit l'image en dictionnaire"""
+        return {
+            'id': self.id,
+            'framework': self.framework,
+            'version': self.version,
+            'template_name': self.template_name,
+            'template_vmid': self.template_vmid,
+            'proxmox_node': self.proxmox_node,
+            'base_template': self.base_template,
+            'script_hash': self.script_hash,
+            'status': self.status,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'built_at': self.built_at.isoformat() if self.built_at else None
+        }
+    
+    def __repr__(self):
+        return f'<GoldenImage {self.framework} v{self.version} ({self.status})>'
+
+class VmidAllocation(db.Model):
+    """VMID d'une plage réservée, attribué à un déploiement (ou une image dorée) ou en quarantaine"""
+    __tablename__ = 'vmid_allocations'
+    
+    # La clé primaire garantit qu'un VMID n'est jamais attribué deux fois
+    vmid = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    deployment_id = db.Column(db.Integer, index=True)
+    golden_image_id = db.Column(db.Integer, index=True)
+    
+    # État: allocated, ou quarantine après la suppression du déploiement ou de l'image
+    status = db.Column(db.String(20), nullable=False, default='allocated', index=True)
+    
+    allocated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<VmidAllocation {self.vmid}: {self.deployment_id or self.golden_image_id} ({self.status})>'
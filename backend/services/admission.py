@@ -0,0 +1,243 @@
+"""
+Contrôle d'admission des déploiements selon la capacité du cluster
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+from models.database import db, Deployment
+from services.placement import PlacementError
+from services.ttl_cache import CacheMiss
+from services.worker_pool import QueueFullError
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+ADMIT = 'admit'
+QUEUE = 'queue'
+REJECT = 'reject'
+
+# Déploiements admis mais pas encore placés: leur capacité est déjà promise
+IN_FLIGHT_STATUSES = ('pending', 'queued', 'creating')
+
+
+class AdmissionController:
+    """
+    Admet, met en attente ou refuse un déploiement selon la capacité libre
+
+    La capacité libre est celle du placement (inventaire du cluster en
+    cache, surallocation comprise) moins les réservations: déploiements
+    placés mais pas encore visibles dans l'inventaire, puis déploiements
+    admis pas encore placés, simulés dans l'ordre d'arrivée. Un déploiement
+    qui ne tiendrait sur aucun noeud, même vide, est refusé; sinon il
+    attend en statut waiting_capacity et est réévalué en arrière-plan
+    jusqu'à ADMISSION_MAX_WAIT secondes. Sans inventaire (Proxmox
+    injoignable), les déploiements sont admis.
+    """
+
+    def __init__(self, deployment_service, scheduler, enabled=None, max_wait=None):
+        self.deployment_service = deployment_service
+        self.scheduler = scheduler
+        self.enabled = Config.ADMISSION_CONTROL if enabled is None else enabled
+        self.max_wait = Config.ADMISSION_MAX_WAIT if max_wait is None else max_wait
+
+        self._lock = threading.Lock()
+        self._counters = {'admitted': 0, 'queued': 0, 'rejected': 0, 'expired': 0, 'unchecked': 0}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def evaluate(self, deployment):
+        """
+        Confronte un déploiement à la capacité libre du cluster
+
+        Args:
+            deployment: Deployment (persisté ou non) avec type, cpu,
+                memory, disk, framework et name
+
+        Returns:
+            Tuple (décision, raison): ADMIT, QUEUE ou REJECT
+        """
+        return self._evaluate([deployment])
+
+    def evaluate_batch(self, deployments):
+        """
+        Confronte un lot à la capacité libre: il est admis seulement si toutes
+        ses instances tiennent ensemble (un seul apply les crée toutes)
+
+        Returns:
+            Tuple (décision, raison) de la première instance qui ne tient pas
+        """
+        return self._evaluate(deployments)
+
+    def _evaluate(self, deployments):
+        if not self.enabled:
+            return ADMIT, None
+
+        service = self.deployment_service
+        try:
+            inventory = service.status_cache.get('cluster_inventory')[0]
+        except CacheMiss as e:
+            logger.warning(f"⚠️ Inventaire du cluster indisponible, admission sans contrôle: {e}")
+            self._count('unchecked')
+            return ADMIT, None
+
+        # Même verrou que le placement: la capacité ne change pas pendant la simulation
+        with service._placement_lock:
+            first = deployments[0]
+            candidates = service._placement_candidates(inventory, first.type, self.scheduler, first.source_template)
+
+            for pending in self._unplaced(deployments):
+                try:
+                    self.scheduler.place(pending, candidates)
+                except PlacementError:
+                    pass
+
+            for deployment in deployments:
+                try:
+                    self.scheduler.place(deployment, candidates)
+                except PlacementError as e:
+                    oversized = candidates and self.scheduler.oversized(deployment, candidates)
+                    if oversized:
+                        return REJECT, oversized
+                    return QUEUE, str(e)
+
+            return ADMIT, None
+
+    def _unplaced(self, deployments):
+        """Déploiements admis sans noeud, dans l'ordre d'arrivée (hors ceux évalués)"""
+        query = Deployment.query.filter(
+            Deployment.proxmox_node.is_(None),
+            Deployment.status.in_(IN_FLIGHT_STATUSES)
+        )
+        ids = [d.id for d in deployments if d.id is not None]
+        if ids:
+            query = query.filter(Deployment.id.notin_(ids))
+        return query.order_by(Deployment.id).all()
+
+    def check(self, deployment):
+        """Évalue un nouveau déploiement (POST /api/deploy) et compte la décision"""
+        decision, reason = self.evaluate(deployment)
+        self._count({ADMIT: 'admitted', QUEUE: 'queued', REJECT: 'rejected'}[decision])
+        return decision, reason
+
+    def check_batch(self, deployments):
+        """Évalue un nouveau lot (POST /api/deploy/batch) et compte la décision"""
+        decision, reason = self.evaluate_batch(deployments)
+        self._count({ADMIT: 'admitted', QUEUE: 'queued', REJECT: 'rejected'}[decision])
+        return decision, reason
+
+    def retry_waiting(self):
+        """
+        Réévalue les déploiements en attente de capacité, dans l'ordre d'arrivée
+
+        Un déploiement qui tient désormais est mis en file; celui qui attend
+        depuis plus de ADMISSION_MAX_WAIT secondes, ou ne tiendrait plus sur
+        aucun noeud, passe en échec. Les instances en attente d'un même lot
+        sont réévaluées ensemble et admises d'un bloc (un seul apply).
+
+        Returns:
+            Nombre de déploiements admis
+        """
+        service = self.deployment_service
+        admitted = 0
+
+        with service.admission_lock:
+            waiting = Deployment.query.filter(
+                Deployment.status == 'waiting_capacity'
+            ).order_by(Deployment.id).all()
+
+            units = {}
+            for deployment in waiting:
+                units.setdefault(deployment.batch_id or deployment.id, []).append(deployment)
+
+            for members in units.values():
+                first = members[0]
+                if first.batch_id:
+                    decision, reason = self.evaluate_batch(members)
+                    label = f"Lot {first.batch_id}"
+                else:
+                    decision, reason = self.evaluate(first)
+                    label = f"Déploiement {first.id}"
+                waited = (datetime.utcnow() - first.created_at).total_seconds()
+
+                if decision == ADMIT:
+                    self._set_status(members, 'queued')
+
+                    try:
+                        if first.batch_id:
+                            service.deploy_batch_async(first.batch_id)
+                        else:
+                            service.deploy_async(first.id)
+                    except QueueFullError:
+                        self._set_status(members, 'waiting_capacity', reason)
+                        logger.info("ℹ️ File pleine, admission des déploiements en attente reportée")
+                        break
+
+                    admitted += len(members)
+                    self._count('admitted')
+                    logger.info(f"✅ {label} admis après {int(waited)}s d'attente de capacité")
+
+                elif decision == REJECT or waited > self.max_wait:
+                    self._set_status(members, 'failed', f"Capacité insuffisante: {reason}")
+                    self._count('expired')
+                    logger.warning(f"⚠️ {label} abandonné: {reason}")
+
+                elif first.error_message != reason:
+                    self._set_status(members, 'waiting_capacity', reason)
+
+        return admitted
+
+    @staticmethod
+    def _set_status(deployments, status, error_message=None):
+        for deployment in deployments:
+            deployment.status = status
+            deployment.error_message = error_message
+        db.session.commit()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def start(self):
+        """Démarre la réévaluation périodique des déploiements en attente"""
+        if self._thread or not self.enabled:
+            return
+
+        self._thread = threading.Thread(
+            target=self._retry_loop,
+            name='admission',
+            daemon=True
+        )
+        self._thread.start()
+
+    def _retry_loop(self):
+        from app import app
+
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self.retry_waiting()
+            except Exception as e:
+                logger.error(f"❌ Erreur du contrôle d'admission: {e}")
+
+            self._stop_event.wait(Config.ADMISSION_RETRY_INTERVAL)
+
+    def stats(self):
+        """Surallocation, déploiements en attente et compteurs des décisions"""
+        oldest = db.session.query(db.func.min(Deployment.created_at)).filter(
+            Deployment.status == 'waiting_capacity'
+        ).scalar()
+        waiting = Deployment.query.filter(Deployment.status == 'waiting_capacity').count()
+
+        with self._lock:
+            counters = dict(self._counters)
+
+        return {
+            'enabled': self.enabled,
+            'overcommit': dict(self.scheduler.overcommit),
+            'max_wait': self.max_wait,
+            'waiting': waiting,
+            'oldest_wait': int((datetime.utcnow() - oldest).total_seconds()) if oldest else None,
+            **counters
+        }
@@ -0,0 +1,270 @@
+"""
+Inventaire du cluster Proxmox en un seul appel à /cluster/resources
+"""
+
+from datetime import datetime
+
+GIB = 1024 ** 3
+
+GUEST_TYPES = ('qemu', 'lxc')
+
+
+def _gb(value):
+    return round((value or 0) / GIB, 2)
+
+
+def _usage(used, total):
+    return {
+        'total': _gb(total),
+        'used': _gb(used),
+        'free': _gb(max(0, (total or 0) - (used or 0)))
+    }
+
+
+def guest_summary(guest):
+    """Description d'une VM ou d'un conteneur pour l'API"""
+    return {
+        'vmid': guest['vmid'],
+        'name': guest.get('name'),
+        'type': guest['type'],
+        'node': guest.get('node'),
+        'status': guest.get('status'),
+        'template': bool(guest.get('template')),
+        'cpu': {
+            'cores': guest.get('maxcpu', 0),
+            'usage': round((guest.get('cpu') or 0) * 100, 2)
+        },
+        'memory': _usage(guest.get('mem'), guest.get('maxmem')),
+        'disk': _gb(guest.get('maxdisk')),
+        'uptime': guest.get('uptime', 0),
+        'tags': guest.get('tags')
+    }
+
+
+def storage_summary(storage):
+    """Description d'un storage (par noeud) pour l'API"""
+    return {
+        'storage': storage['storage'],
+        'node': storage.get('node'),
+        'type': storage.get('plugintype'),
+        'status': storage.get('status'),
+        'shared': bool(storage.get('shared')),
+        'content': [c for c in (storage.get('content') or '').split(',') if c],
+        **_usage(storage.get('disk'), storage.get('maxdisk'))
+    }
+
+
+class ClusterInventory:
+    """
+    Instantané du cluster indexé en mémoire
+
+    /cluster/resources décrit en une réponse tous les noeuds, VMs,
+    conteneurs et storages du cluster. L'instantané est immuable: il est
+    remplacé à chaque rafraîchissement et ses agrégats, calculés à la
+    demande, sont mémorisés.
+    """
+
+    def __init__(self, resources, fetched_at=None):
+        self.fetched_at = fetched_at or datetime.utcnow()
+
+        self._nodes = {}
+        self._guests = {}
+        self._storages = {}
+        self._by_node = {}
+        self._by_type = {kind: [] for kind in GUEST_TYPES}
+        self._by_status = {}
+        self._summaries = {}
+
+        for resource in resources or []:
+            kind = resource.get('type')
+
+            if kind == 'node':
+                self._nodes[resource['node']] = resource
+
+            elif kind in GUEST_TYPES and resource.get('vmid') is not None:
+                guest = dict(resource, vmid=int(resource['vmid']))
+                self._guests[guest['vmid']] = guest
+                self._by_node.setdefault(guest.get('node'), []).append(guest['vmid'])
+                self._by_type[kind].append(guest['vmid'])
+                self._by_status.setdefault(guest.get('status'), []).append(guest['vmid'])
+
+            elif kind == 'storage':
+                self._storages[(resource.get('node'), resource['storage'])] = resource
+
+    @classmethod
+    def fetch(cls, proxmox_service):
+        """
+        Interroge /cluster/resources
+
+        Raises:
+            RuntimeError: si Proxmox n'est pas configuré; erreurs de proxmoxer
+        """
+        api = proxmox_service.proxmox
+        if not api:
+            raise RuntimeError('Non connecté à Proxmox')
+        return cls(api.cluster.resources.get())
+
+    def node_names(self):
+        return sorted(self._nodes)
+
+    def node(self, name):
+        """Ressource brute d'un noeud (None s'il est inconnu)"""
+        return self._nodes.get(name)
+
+    def guest(self, vmid):
+        """Ressource brute d'une VM ou d'un conteneur (None si inconnu)"""
+        return self._guests.get(int(vmid))
+
+    def guests(self, node=None, guest_type=None, status=None, templates=True):
+        """VMs et conteneurs filtrés par noeud, type et statut (ressources brutes)"""
+        candidates = None
+        for index, key in ((self._by_node, node), (self._by_type, guest_type), (self._by_status, status)):
+            if key is None:
+                continue
+            vmids = set(index.get(key, ()))
+            candidates = vmids if candidates is None else candidates & vmids
+
+        vmids = self._guests if candidates is None else candidates
+        return [
+            self._guests[vmid] for vmid in sorted(vmids)
+            if templates or not self._guests[vmid].get('template')
+        ]
+
+    def storages(self, node=None):
+        """Storages (ressources brutes), un par noeud pour les storages partagés"""
+        return [
+            storage for (storage_node, _), storage in sorted(self._storages.items())
+            if node is None or storage_node == node
+        ]
+
+    def storage(self, node, name):
+        return self._storages.get((node, name))
+
+    def _guest_counts(self, guests):
+        counts = {
+            'vms': {'total': 0, 'running': 0},
+            'containers': {'total': 0, 'running': 0},
+            'templates': 0
+        }
+        for guest in guests:
+            if guest.get('template'):
+                counts['templates'] += 1
+                continue
+            entry = counts['vms' if guest['type'] == 'qemu' else 'containers']
+            entry['total'] += 1
+            entry['running'] += guest.get('status') == 'running'
+        return counts
+
+    def _allocated(self, guests):
+        """vCPU et mémoire configurés des instances (hors templates)"""
+        instances = [guest for guest in guests if not guest.get('template')]
+        return (
+            sum(guest.get('maxcpu') or 0 for guest in instances),
+            sum(guest.get('maxmem') or 0 for guest in instances)
+        )
+
+    def node_summary(self, name):
+        """
+        Agrégats d'un noeud
+
+        Returns:
+            Dictionnaire (CPU, mémoire et disque en Go, instances), ou None
+            si le noeud est inconnu
+        """
+        if name in self._summaries:
+            return self._summaries[name]
+
+        node = self._nodes.get(name)
+        if node is None:
+            return None
+
+        guests = self.guests(node=name)
+        allocated_cpu, allocated_memory = self._allocated(guests)
+        memory = _usage(node.get('mem'), node.get('maxmem'))
+        memory['allocated'] = _gb(allocated_memory)
+
+        summary = {
+            'name': name,
+            'status': node.get('status'),
+            'online': node.get('status') == 'online',
+            'cpu': {
+                'cores': node.get('maxcpu', 0),
+                'usage': round((node.get('cpu') or 0) * 100, 2),
+                'allocated': allocated_cpu
+            },
+            'memory': memory,
+            'disk': _usage(node.get('disk'), node.get('maxdisk')),
+            'uptime': node.get('uptime', 0),
+            **self._guest_counts(guests)
+        }
+        self._summaries[name] = summary
+        return summary
+
+    def cluster_summary(self):
+        """Agrégats du cluster (noeuds en ligne; storages partagés comptés une fois)"""
+        if None in self._summaries:
+            return self._summaries[None]
+
+        online = [self._nodes[name] for name in self._nodes if self._nodes[name].get('status') == 'online']
+        cores = sum(node.get('maxcpu') or 0 for node in online)
+        busy = sum((node.get('cpu') or 0) * (node.get('maxcpu') or 0) for node in online)
+
+        guests = list(self._guests.values())
+        allocated_cpu, allocated_memory = self._allocated(guests)
+        memory = _usage(
+            sum(node.get('mem') or 0 for node in online),
+            sum(node.get('maxmem') or 0 for node in online)
+        )
+        memory['allocated'] = _gb(allocated_memory)
+
+        shared = {}
+        local = []
+        for storage in self._storages.values():
+            if storage.get('status') != 'available':
+                continue
+            if storage.get('shared'):
+                shared[storage['storage']] = storage
+            else:
+                local.append(storage)
+        storages = list(shared.values()) + local
+
+        summary = {
+            'nodes': {'total': len(self._nodes), 'online': len(online)},
+            'cpu': {
+                'cores': cores,
+                'usage': round(busy / cores * 100, 2) if cores else 0,
+                'allocated': allocated_cpu
+            },
+            'memory': memory,
+            'storage': _usage(
+                sum(storage.get('disk') or 0 for storage in storages),
+                sum(storage.get('maxdisk') or 0 for storage in storages)
+            ),
+            **self._guest_counts(guests)
+        }
+        self._summaries[None] = summary
+        return summary
+
+    def to_dict(self, default_node=None):
+        """
+        Réponse de /api/resources
+
+        'node' décrit default_node (ou le premier noeud en ligne); 'vms' et
+        'containers' comptent les instances de tout le cluster.
+        """
+        cluster = self.cluster_summary()
+        if default_node not in self._nodes:
+            default_node = next(
+                (name for name in self.node_names() if self._nodes[name].get('status') == 'online'),
+                next(iter(self.node_names()), None)
+            )
+
+        return {
+            'node': self.node_summary(default_node) if default_node else None,
+            'vms': cluster['vms'],
+            'containers': cluster['containers'],
+            'cluster': cluster,
+            'nodes': [self.node_summary(name) for name in self.node_names()],
+            'storages': [storage_summary(storage) for storage in self.storages()],
+            'fetched_at': self.fetched_at.isoformat()
+        }
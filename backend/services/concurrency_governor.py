@@ -0,0 +1,154 @@
+"""
+Limitation des opérations concurrentes sur l'infrastructure Proxmox
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from utils.deadline import Deadline
+from utils.metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# Nombre de temps d'attente conservés par opération pour les statistiques
+WAIT_SAMPLES = 500
+
+LIMIT_NAMES = ('global', 'per_node', 'per_storage')
+
+
+class ConcurrencyGovernor:
+    """
+    Plafonne les opérations lourdes (clone, création, destruction) en cours
+
+    Trois limites s'appliquent simultanément: un plafond global, un plafond
+    par noeud Proxmox et un plafond par storage (0 = illimité). Une opération
+    peut peser plusieurs unités (un apply de lot crée plusieurs instances en
+    parallèle); une opération plus lourde que la limite passe seule.
+
+    Les limites sont modifiables à chaud: les opérations en attente sont
+    réévaluées immédiatement.
+    """
+
+    def __init__(self, global_limit=0, per_node=0, per_storage=0):
+        self._condition = threading.Condition()
+        self._limits = {}
+        self._active = {'global': 0, 'node': {}, 'storage': {}}
+        self._waiting = 0
+        self._waits = {}
+        self.set_limits(global_limit=global_limit, per_node=per_node, per_storage=per_storage)
+
+    @property
+    def limits(self):
+        with self._condition:
+            return dict(self._limits)
+
+    def set_limits(self, global_limit=None, per_node=None, per_storage=None):
+        """
+        Modifie les limites (None: inchangée, 0: illimitée)
+
+        Raises:
+            ValueError: si une limite est négative ou non entière
+        """
+        updates = {'global': global_limit, 'per_node': per_node, 'per_storage': per_storage}
+
+        for name, value in updates.items():
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+                raise ValueError(f"Limite invalide pour {name}: {value}")
+
+        with self._condition:
+            for name, value in updates.items():
+                if value is not None:
+                    self._limits[name] = value
+            self._condition.notify_all()
+
+        logger.info(f"🚦 Limites de concurrence: {self._format_limits()}")
+
+    def _format_limits(self):
+        return ', '.join(f"{name}={self._limits[name] or '∞'}" for name in LIMIT_NAMES)
+
+    def _fits(self, limit, active, weight):
+        return not limit or active == 0 or active + weight <= limit
+
+    def _can_start(self, node, storage, weight):
+        return (
+            self._fits(self._limits['global'], self._active['global'], weight)
+            and self._fits(self._limits['per_node'], self._active['node'].get(node, 0), weight)
+            and self._fits(self._limits['per_storage'], self._active['storage'].get(storage, 0), weight)
+        )
+
+    def acquire(self, operation, node, storage, weight=1, deadline=None):
+        """
+        Attend qu'une opération puisse démarrer et réserve ses unités
+
+        Returns:
+            Jeton à passer à release()
+
+        Raises:
+            DeadlineExceeded, OperationCancelled: pendant l'attente
+        """
+        deadline = deadline or Deadline()
+        start = time.monotonic()
+
+        with self._condition:
+            self._waiting += 1
+            try:
+                while not self._can_start(node, storage, weight):
+                    deadline.check()
+                    self._condition.wait(min(1.0, deadline.remaining()))
+            finally:
+                self._waiting -= 1
+
+            self._active['global'] += weight
+            self._active['node'][node] = self._active['node'].get(node, 0) + weight
+            self._active['storage'][storage] = self._active['storage'].get(storage, 0) + weight
+
+            waited = time.monotonic() - start
+            self._waits.setdefault(operation, deque(maxlen=WAIT_SAMPLES)).append(waited)
+
+        if waited >= 1:
+            logger.info(f"🚦 {operation} sur {node}/{storage}: {waited:.1f}s d'attente")
+
+        return (node, storage, weight)
+
+    def release(self, token):
+        """Libère les unités réservées par acquire()"""
+        node, storage, weight = token
+
+        with self._condition:
+            self._active['global'] -= weight
+            for key, name in (('node', node), ('storage', storage)):
+                remaining = self._active[key][name] - weight
+                if remaining:
+                    self._active[key][name] = remaining
+                else:
+                    del self._active[key][name]
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, operation, node, storage, weight=1, deadline=None):
+        """Réserve des unités pour la durée du bloc"""
+        token = self.acquire(operation, node, storage, weight, deadline)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def stats(self):
+        """Limites, opérations en cours et temps d'attente par opération"""
+        with self._condition:
+            return {
+                'limits': dict(self._limits),
+                'active': {
+                    'global': self._active['global'],
+                    'by_node': dict(self._active['node']),
+                    'by_storage': dict(self._active['storage'])
+                },
+                'waiting': self._waiting,
+                'wait_times': {
+                    operation: summarize(list(samples))
+                    for operation, samples in sorted(self._waits.items())
+                }
+            }
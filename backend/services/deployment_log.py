@@ -0,0 +1,67 @@
+"""
+Écriture incrémentale du journal d'un déploiement
+"""
+
+import time
+import logging
+
+from models.database import db, LogChunk
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentLogWriter:
+    """
+    Ajoute des lignes au journal d'un déploiement au fil de l'exécution
+
+    Les lignes sont regroupées et enregistrées toutes les flush_lines lignes
+    ou flush_interval secondes, chaque groupe dans un fragment (LogChunk),
+    afin que /api/deployments/<id>/logs montre la progression sans un commit
+    par ligne ni réécriture du journal complet.
+    """
+
+    def __init__(self, deployments, source='deploy', flush_lines=50, flush_interval=2.0):
+        """
+        Args:
+            deployments: Un déploiement ou une liste (sortie partagée d'un lot)
+            source: 'terraform' ou 'deploy'
+        """
+        if not isinstance(deployments, (list, tuple)):
+            deployments = [deployments]
+
+        self.deployments = deployments
+        self.source = source
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def write(self, line, stream='stdout'):
+        """Ajoute une ligne (préfixée pour stderr)"""
+        self._buffer.append(f"[stderr] {line}" if stream == 'stderr' else line)
+
+        if len(self._buffer) >= self.flush_lines or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def on_line(self, stream, line):
+        """Callback compatible avec RemoteSession.run et TerraformService.apply"""
+        self.write(line, stream)
+
+    def flush(self):
+        """Enregistre les lignes en attente dans un nouveau fragment"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        chunk = '\n'.join(self._buffer)
+        lines = len(self._buffer)
+        self._buffer = []
+
+        for deployment in self.deployments:
+            db.session.add(LogChunk(
+                deployment_id=deployment.id,
+                source=self.source,
+                content=chunk,
+                lines=lines
+            ))
+        db.session.commit()
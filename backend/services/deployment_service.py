@@ -3,13 +3,33 @@ Service de gestion des déploiements
 """
 
 import os
+import uuid
+import socket
 import logging
 import threading
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
-from models.database import db, Deployment
-from services.terraform_service import TerraformService
+from models.database import db, Deployment, Job
+from services.terraform_service import TerraformService, PLAN_FILE
 from services.proxmox_service import ProxmoxService
+from services.worker_pool import WorkerPool, QueueFullError
+from services.readiness_prober import ReadinessProber
+from services.pipeline_metrics import stage_timer, start_stage, end_stage
+from services.remote_executor import create_executor, RemoteCommandError
+from services.deployment_log import DeploymentLogWriter
+from services.image_service import ImageService
+from services.warm_pool import WarmPool
+from services.concurrency_governor import ConcurrencyGovernor
+from services.direct_provisioner import DirectProvisioner
+from services.workspace_collector import WorkspaceCollector
+from services.ttl_cache import TtlCache, CacheMiss
+from services.cluster_inventory import ClusterInventory
+from services.placement import PlacementScheduler, template_nodes
+from services.admission import AdmissionController
+from services.vmid_allocator import VmidAllocator
+from utils.config import Config
+from utils.deadline import Deadline, DeadlineExceeded, OperationCancelled
 from utils.script_generator import generate_install_script, generate_deploy_script
 
 logger = logging.getLogger(__name__)
@@ -20,116 +40,1166 @@ class DeploymentService:
     def __init__(self):
         self.terraform_service = TerraformService()
         self.proxmox_service = ProxmoxService()
+        self.direct_provisioner = DirectProvisioner(self.proxmox_service)
+        
+        # Plafonds des clones, créations et destructions simultanés
+        self.governor = ConcurrencyGovernor(
+            global_limit=Config.CONCURRENCY_GLOBAL_LIMIT,
+            per_node=Config.CONCURRENCY_PER_NODE_LIMIT,
+            per_storage=Config.CONCURRENCY_PER_STORAGE_LIMIT
+        )
+        self.pool = WorkerPool(
+            self._run_job,
+            workers=Config.DEPLOYMENT_WORKERS,
+            max_queue=Config.DEPLOYMENT_QUEUE_MAX,
+            name='deploy'
+        )
+        
+        # Destructions dans un pool séparé: un nettoyage massif ne retarde pas les déploiements
+        self.destroy_pool = WorkerPool(
+            self._run_job,
+            workers=Config.DESTROY_WORKERS,
+            max_queue=Config.DESTROY_QUEUE_MAX,
+            name='destroy'
+        )
+        
+        # Attente du démarrage des VMs sans occuper de worker
+        self.prober = ReadinessProber(
+            port=Config.READINESS_PORT,
+            probe=Config.READINESS_PROBE,
+            max_delay=Config.READINESS_MAX_DELAY
+        )
+        self._readiness = {}
+        self._readiness_lock = threading.Lock()
+        
+        # Signaux d'annulation et surveillances en cours, par tâche
+        self._cancel_events = {}
+        self._watches = {}
+        self._cancel_lock = threading.Lock()
+        
+        # Exécution des scripts sur les VMs (SSH, ou local pour les tests)
+        self.executor = create_executor(
+            Config.REMOTE_EXECUTOR,
+            user=Config.SSH_USER,
+            port=Config.SSH_PORT,
+            key_path=Config.SSH_KEY_PATH,
+            known_hosts_path=Config.SSH_KNOWN_HOSTS,
+            host_key_policy=Config.SSH_HOST_KEY_POLICY
+        )
+        
+        # Images dorées par framework (clonées à la place du template générique)
+        self.image_service = ImageService(self.proxmox_service, self.prober, self.executor, self.governor)
+        
+        # Instances préprovisionnées attribuées directement par POST /api/deploy
+        self.warm_pool = WarmPool(self)
+        
+        # Compactage et suppression des workspaces inutiles
+        self.workspace_collector = WorkspaceCollector(self.terraform_service)
+        
+        # État de Proxmox servi depuis la mémoire à /status et /resources
+        self.status_cache = TtlCache(Config.STATUS_CACHE_TTL, Config.STATUS_CACHE_MAX_STALE, name='status')
+        self.status_cache.register('proxmox_connected', self.proxmox_service.test_connection)
+        self.status_cache.register('cluster_inventory', lambda: ClusterInventory.fetch(self.proxmox_service))
+        
+        # Choix du noeud et du storage de chaque déploiement (static: PROXMOX_NODE)
+        overcommit = {
+            'cpu': Config.OVERCOMMIT_CPU,
+            'memory': Config.OVERCOMMIT_MEMORY,
+            'disk': Config.OVERCOMMIT_DISK
+        }
+        self.scheduler = None
+        if Config.PLACEMENT_POLICY != 'static':
+            self.scheduler = PlacementScheduler(
+                policy=Config.PLACEMENT_POLICY,
+                anti_affinity=Config.PLACEMENT_ANTI_AFFINITY,
+                nodes=Config.PLACEMENT_NODES,
+                storages=Config.PLACEMENT_STORAGES,
+                overcommit=overcommit
+            )
+        self._placement_lock = threading.Lock()
+        
+        # Capacité vérifiée par POST /api/deploy (static: noeud et storage par défaut)
+        self.admission = AdmissionController(self, self.scheduler or PlacementScheduler(
+            nodes=[Config.PROXMOX_NODE],
+            storages=[Config.PROXMOX_STORAGE],
+            overcommit=overcommit
+        ))
+        
+        # VMID réservés avant la création (clones simultanés sans collision)
+        self.vmids = VmidAllocator()
+        
+        # Sérialise la recherche de doublons et la création des déploiements
+        self.admission_lock = threading.Lock()
+        
+        # Identifiant de ce processus pour les baux des tâches
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._heartbeat_thread = None
+        self._stop_event = threading.Event()
+    
+    def deploy_async(self, deployment_id, stage='provision'):
+        """
+        Persiste une tâche de déploiement et la place dans la file des workers
+        
+        Args:
+            stage: Étape de départ ('deploy_app' pour une instance du pool chaud)
+        
+        Returns:
+            Position dans la file d'attente
+        
+        Raises:
+            QueueFullError: si la file d'attente est pleine
+        """
+        job, position = self._enqueue_job('deploy', deployment_id=deployment_id, stage=stage)
+        logger.info(f"🚀 Déploiement {deployment_id} en file d'attente (tâche {job.id}, position {position})")
+        return position
+    
+    def deploy_batch_async(self, batch_id):
+        """
+        Persiste la tâche de provisionnement d'un lot et la place dans la file
+        
+        Returns:
+            Position dans la file d'attente
+        
+        Raises:
+            QueueFullError: si la file d'attente est pleine
+        """
+        job, position = self._enqueue_job('batch', batch_id=batch_id)
+        logger.info(f"🚀 Lot {batch_id} en file d'attente (tâche {job.id}, position {position})")
+        return position
+    
+    def destroy_async(self, deployment_ids, group_id=None):
+        """
+        Planifie la destruction de déploiements dans le pool de destruction
+        
+        Chaque déploiement reçoit une tâche persistante 'destroy' (reprise
+        par le heartbeat si le processus s'arrête) et passe en 'deleting'.
+        Un déploiement en cours de création est d'abord annulé. Si la file
+        est pleine, les tâches restent en attente et sont soumises dès
+        qu'une place se libère.
+        
+        Args:
+            group_id: Identifiant de la suppression groupée (généré si absent)
+        
+        Returns:
+            Tuple (group_id, {deployment_id: job})
+        """
+        group_id = group_id or str(uuid.uuid4())
+        jobs = {}
+        
+        for deployment_id in deployment_ids:
+            deployment = Deployment.query.get(deployment_id)
+            if not deployment or deployment.status == 'deleted':
+                continue
+            
+            # Destruction déjà planifiée: réutiliser sa tâche
+            existing = Job.query.filter(
+                Job.kind == 'destroy',
+                Job.deployment_id == deployment_id,
+                Job.status.in_(['queued', 'running', 'waiting'])
+            ).first()
+            if existing:
+                jobs[deployment_id] = existing
+                continue
+            
+            if deployment.status in ('pending', 'queued', 'creating'):
+                self.cancel(deployment_id)
+            
+            deployment.status = 'deleting'
+            deployment.error_message = None
+            db.session.commit()
+            
+            job, _ = self._enqueue_job(
+                'destroy',
+                deployment_id=deployment_id,
+                group_id=group_id,
+                stage='destroy',
+                reject_when_full=False
+            )
+            jobs[deployment_id] = job
+        
+        logger.info(f"🗑️ Suppression {group_id}: {len(jobs)} destructions planifiées")
+        return group_id, jobs
+    
+    def bulk_delete_status(self, group_id):
+        """
+        Avancement d'une suppression groupée
+        
+        Returns:
+            Dictionnaire (items, compteurs par statut), ou None si inconnue
+        """
+        jobs = Job.query.filter(Job.kind == 'destroy', Job.group_id == group_id).order_by(Job.id).all()
+        if not jobs:
+            return None
+        
+        items = []
+        counts = {}
+        for job in jobs:
+            deployment = Deployment.query.get(job.deployment_id)
+            counts[job.status] = counts.get(job.status, 0) + 1
+            items.append({
+                'deployment_id': job.deployment_id,
+                'name': deployment.name if deployment else None,
+                'job_id': job.id,
+                'status': job.status,
+                'deployment_status': deployment.status if deployment else None,
+                'error_message': job.error_message,
+                'started_at': job.started_at.isoformat() if job.started_at else None,
+                'finished_at': job.finished_at.isoformat() if job.finished_at else None
+            })
+        
+        pending = sum(counts.get(status, 0) for status in ('queued', 'running', 'waiting'))
+        return {
+            'bulk_id': group_id,
+            'total': len(jobs),
+            'counts': counts,
+            'done': pending == 0,
+            'items': items
+        }
+    
+    def find_duplicate(self, fingerprint, idempotency_key=None):
+        """
+        Recherche un déploiement existant équivalent à une nouvelle requête
+        
+        Avec une clé d'idempotence, le déploiement portant cette clé est
+        retourné pendant IDEMPOTENCY_TTL_HOURS, sauf s'il a échoué ou été
+        annulé (la clé peut alors servir à une nouvelle tentative). Sans clé,
+        une requête identique encore en cours depuis moins de
+        DEPLOYMENT_COALESCE_WINDOW secondes est retournée.
+        
+        Args:
+            fingerprint: Empreinte de la requête (request_fingerprint)
+            idempotency_key: Clé fournie par le client
+        
+        Returns:
+            Deployment existant, ou None
+        """
+        now = datetime.utcnow()
+        
+        if idempotency_key:
+            return Deployment.query.filter(
+                Deployment.idempotency_key == idempotency_key,
+                Deployment.created_at >= now - timedelta(hours=Config.IDEMPOTENCY_TTL_HOURS),
+                Deployment.status.notin_(['failed', 'cancelled', 'deleting', 'deleted'])
+            ).order_by(Deployment.id.desc()).first()
+        
+        if Config.DEPLOYMENT_COALESCE_WINDOW <= 0:
+            return None
+        
+        return Deployment.query.filter(
+            Deployment.request_hash == fingerprint,
+            Deployment.warm_pool.is_(False),
+            Deployment.batch_id.is_(None),
+            Deployment.status.in_(['pending', 'waiting_capacity', 'queued', 'creating']),
+            Deployment.created_at >= now - timedelta(seconds=Config.DEPLOYMENT_COALESCE_WINDOW)
+        ).order_by(Deployment.id.desc()).first()
+    
+    def queue_stats(self):
+        """Statistiques de la file d'attente des déploiements"""
+        stats = self.pool.stats()
+        stats['readiness'] = self.prober.stats()
+        stats['destroy'] = self.destroy_pool.stats()
+        return stats
+    
+    def _pool_for(self, kind):
+        """Pool de workers exécutant les tâches d'un type"""
+        return self.destroy_pool if kind == 'destroy' else self.pool
+    
+    def _enqueue_job(self, kind, deployment_id=None, batch_id=None, stage='provision',
+                     reject_when_full=True, group_id=None):
+        """
+        Crée une tâche persistante et la soumet au pool
+        
+        Si la file est pleine, la tâche est supprimée et QueueFullError est
+        levée (reject_when_full), ou bien elle est libérée pour être reprise
+        par le heartbeat dès qu'une place se libère.
+        
+        Returns:
+            Tuple (job, position)
+        """
+        job = Job(
+            kind=kind,
+            deployment_id=deployment_id,
+            batch_id=batch_id,
+            group_id=group_id,
+            stage=stage,
+            status='queued',
+            owner=self.owner,
+            lease_expires_at=self._lease_deadline()
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        try:
+            position = self._pool_for(kind).submit(job.id)
+        except QueueFullError:
+            if reject_when_full:
+                db.session.delete(job)
+                db.session.commit()
+                raise
+            self._release_job(job.id)
+            logger.warning(f"⚠️ File pleine, tâche {job.id} différée")
+            return job, None
+        
+        return job, position
+    
+    def _release_job(self, job_id):
+        """Libère le bail d'une tâche pour qu'elle soit reprise plus tard"""
+        Job.query.filter(Job.id == job_id).update({
+            Job.owner: None,
+            Job.lease_expires_at: None
+        }, synchronize_session=False)
+        db.session.commit()
     
-    def deploy_async(self, deployment_id):
-        """Lance un déploiement en arrière-plan"""
-        thread = threading.Thread(target=self._deploy, args=(deployment_id,))
-        thread.daemon = True
-        thread.start()
-        logger.info(f"🚀 Déploiement {deployment_id} lancé en arrière-plan")
+    def _lease_deadline(self):
+        """Date d'expiration d'un bail pris maintenant"""
+        return datetime.utcnow() + timedelta(seconds=Config.JOB_LEASE_SECONDS)
     
-    def _deploy(self, deployment_id):
-        """Processus de déploiement complet"""
+    def start_background_tasks(self):
+        """
+        Démarre les tâches de fond du service
+        
+        Heartbeat des baux, reprise des tâches, maintenance des images et des
+        workspaces Terraform, cache de statut et admission des déploiements
+        en attente de capacité.
+        """
+        if self._heartbeat_thread:
+            return
+        
+        # Préparer le squelette Terraform avant le premier déploiement
+        threading.Thread(
+            target=self.terraform_service.prepare_skeleton,
+            name='terraform-skeleton',
+            daemon=True
+        ).start()
+        
+        if Config.GOLDEN_IMAGES_ENABLED:
+            self.image_service.start_scheduler()
+        self.warm_pool.start()
+        self.workspace_collector.start()
+        self.status_cache.start()
+        self.admission.start()
+        
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop,
+            name='job-heartbeat',
+            daemon=True
+        )
+        self._heartbeat_thread.start()
+    
+    def _heartbeat_loop(self):
+        """Prolonge les baux de ce processus et reprend les tâches orphelines"""
+        from app import app
+        
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self._renew_leases()
+                    self._propagate_cancellations()
+                    self.recover_jobs()
+            except Exception as e:
+                logger.error(f"❌ Erreur heartbeat des tâches: {e}")
+            
+            self._stop_event.wait(Config.JOB_HEARTBEAT_INTERVAL)
+    
+    def _renew_leases(self):
+        """Prolonge les baux des tâches détenues par ce processus"""
+        now = datetime.utcnow()
+        Job.query.filter(
+            Job.owner == self.owner,
+            Job.status.in_(['queued', 'running', 'waiting'])
+        ).update({
+            Job.lease_expires_at: self._lease_deadline(),
+            Job.heartbeat_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    def _propagate_cancellations(self):
+        """Relaie les annulations demandées via un autre processus"""
+        jobs = Job.query.filter(
+            Job.owner == self.owner,
+            Job.cancel_requested.is_(True),
+            Job.status.in_(['queued', 'running', 'waiting'])
+        ).all()
+        
+        for job in jobs:
+            if self._pool_for(job.kind).remove(job.id):
+                self._cancel_job(job.id)
+            else:
+                self._signal_cancel(job.id)
+    
+    def recover_jobs(self):
+        """
+        Reprend les tâches dont le bail a expiré (processus arrêté ou planté)
+        
+        Une tâche reprise repart de son étape courante: une VM déjà créée
+        n'est pas reprovisionnée, sa surveillance de démarrage est relancée.
+        
+        Les tâches sont réclamées une par une avec une mise à jour conditionnelle
+        afin que deux processus ne reprennent jamais la même tâche.
+        
+        Returns:
+            Nombre de tâches remises en file d'attente
+        """
+        now = datetime.utcnow()
+        expired = Job.query.filter(
+            Job.status.in_(['queued', 'running', 'waiting']),
+            db.or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+        ).order_by(Job.id).all()
+        
+        recovered = 0
+        for job in expired:
+            claimed = Job.query.filter(
+                Job.id == job.id,
+                Job.status.in_(['queued', 'running', 'waiting']),
+                db.or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+            ).update({
+                Job.owner: self.owner,
+                Job.status: 'queued',
+                Job.lease_expires_at: self._lease_deadline()
+            }, synchronize_session=False)
+            db.session.commit()
+            
+            if not claimed:
+                continue
+            
+            if job.cancel_requested:
+                self._cancel_job(job.id)
+                continue
+            
+            if job.attempts >= Config.JOB_MAX_ATTEMPTS:
+                self._finish_job(job.id, False, f"Abandon après {job.attempts} tentatives")
+                continue
+            
+            if job.kind != 'destroy':
+                for deployment in self._job_deployments(job):
+                    if deployment.status not in ('deleted', 'failed', 'running'):
+                        deployment.status = 'queued'
+                db.session.commit()
+            
+            try:
+                self._pool_for(job.kind).submit(job.id)
+            except QueueFullError:
+                # Libérer la tâche: elle sera reprise au prochain passage
+                self._release_job(job.id)
+                logger.warning(f"⚠️ File pleine, reprise de la tâche {job.id} différée")
+                continue
+            
+            recovered += 1
+            logger.info(f"♻️ Tâche {job.id} ({job.kind}) reprise")
+        
+        return recovered
+    
+    def _job_deployments(self, job):
+        """Déploiements concernés par une tâche"""
+        if job.batch_id:
+            return Deployment.query.filter_by(batch_id=job.batch_id).all()
+        if job.deployment_id:
+            deployment = Deployment.query.get(job.deployment_id)
+            return [deployment] if deployment else []
+        return []
+    
+    def _run_job(self, job_id):
+        """Réclame une tâche persistante et l'exécute"""
         from app import app
         
         with app.app_context():
-            deployment = Deployment.query.get(deployment_id)
-            if not deployment:
-                logger.error(f"❌ Déploiement {deployment_id} introuvable")
+            # Réclamation conditionnelle: la tâche doit toujours nous appartenir
+            job = Job.query.get(job_id)
+            resumed = job is not None and job.status == 'waiting'
+            
+            values = {
+                Job.status: 'running',
+                Job.lease_expires_at: self._lease_deadline()
+            }
+            if not resumed:
+                # Chaque tentative dispose du délai complet de déploiement
+                values[Job.attempts] = Job.attempts + 1
+                values[Job.started_at] = db.func.coalesce(Job.started_at, datetime.utcnow())
+                values[Job.deadline_at] = datetime.utcnow() + timedelta(seconds=Config.DEPLOYMENT_TIMEOUT)
+            
+            claimed = Job.query.filter(
+                Job.id == job_id,
+                Job.owner == self.owner,
+                Job.status.in_(['queued', 'waiting'])
+            ).update(values, synchronize_session=False)
+            db.session.commit()
+            
+            if not claimed:
+                logger.info(f"ℹ️ Tâche {job_id} déjà réclamée par un autre processus")
                 return
             
-            try:
-                logger.info(f"📦 Démarrage du déploiement {deployment_id}: {deployment.name}")
-                
-                # Étape 1: Créer la configuration Terraform
+            db.session.refresh(job)
+            deadline = Deadline(job.deadline_at, self._cancel_event(job_id))
+            if job.cancel_requested:
+                deadline.cancel()
+            
+            if job.kind == 'batch':
+                self._run_batch(job, deadline)
+            elif job.kind == 'destroy':
+                self._run_destroy(job, deadline)
+            else:
+                self._run_pipeline(job, deadline)
+    
+    def _cancel_event(self, job_id):
+        """Signal d'annulation d'une tâche (créé au besoin)"""
+        with self._cancel_lock:
+            return self._cancel_events.setdefault(job_id, threading.Event())
+    
+    def _signal_cancel(self, job_id):
+        """Interrompt une tâche de ce processus, en cours ou en attente de démarrage"""
+        self._cancel_event(job_id).set()
+        
+        with self._cancel_lock:
+            watch = self._watches.get(job_id)
+        if watch is not None:
+            # Le callback du sondeur resoumet la tâche, qui constate l'annulation
+            watch.cancel()
+    
+    def _forget_job(self, job_id):
+        """Oublie l'état en mémoire d'une tâche terminée"""
+        with self._cancel_lock:
+            self._cancel_events.pop(job_id, None)
+            self._watches.pop(job_id, None)
+        with self._readiness_lock:
+            self._readiness.pop(job_id, None)
+    
+    def _finish_job(self, job_id, success, error_message=None):
+        """Marque une tâche comme terminée"""
+        job = Job.query.get(job_id)
+        if not job:
+            return
+        
+        job.status = 'done' if success else 'failed'
+        job.finished_at = datetime.utcnow()
+        job.lease_expires_at = None
+        if error_message:
+            job.error_message = error_message
+            for deployment in self._job_deployments(job):
+                if deployment.status not in ('deleting', 'deleted', 'running', 'failed', 'cancelled'):
+                    self._mark_failed(deployment, error_message, commit=False)
+        db.session.commit()
+        self._forget_job(job_id)
+    
+    def _cancel_job(self, job_id):
+        """Termine une tâche annulée et passe ses déploiements inachevés en 'cancelled'"""
+        job = Job.query.get(job_id)
+        if not job:
+            return
+        
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+        job.lease_expires_at = None
+        for deployment in self._job_deployments(job):
+            if deployment.status not in ('deleting', 'deleted', 'running', 'failed', 'cancelled'):
+                deployment.status = 'cancelled'
+                deployment.error_message = "Déploiement annulé"
+        db.session.commit()
+        self._forget_job(job_id)
+        
+        logger.info(f"🛑 Tâche {job_id} annulée")
+    
+    def _fail_on_deadline(self, job):
+        """Termine une tâche dont l'échéance est dépassée"""
+        message = f"Délai de déploiement dépassé ({Config.DEPLOYMENT_TIMEOUT}s)"
+        logger.error(f"⏱️ Tâche {job.id}: {message}")
+        self._finish_job(job.id, False, message)
+    
+    def _mark_failed(self, deployment, error_message, commit=True):
+        """Passe un déploiement en échec"""
+        deployment.status = 'failed'
+        deployment.error_message = error_message
+        if commit:
+            db.session.commit()
+    
+    def _run_pipeline(self, job, deadline):
+        """
+        Exécute le pipeline d'un déploiement à partir de l'étape courante
+        
+        Étapes: provision -> await_ready -> configure. L'attente du démarrage
+        libère le worker: la tâche passe en 'waiting' et sera resoumise par
+        le sondeur dès que la VM répond. Une instance du pool chaud s'arrête
+        après l'installation; une fois attribuée, elle reprend directement à
+        l'étape deploy_app.
+        
+        La deadline est vérifiée entre les étapes et transmise à chacune:
+        son dépassement ou une annulation interrompt l'étape en cours.
+        """
+        deployment = Deployment.query.get(job.deployment_id)
+        if not deployment:
+            logger.error(f"❌ Déploiement {job.deployment_id} introuvable")
+            self._finish_job(job.id, False)
+            return
+        
+        try:
+            if job.stage == 'provision':
+                deadline.check()
+                logger.info(f"📦 Démarrage du déploiement {deployment.id}: {deployment.name}")
                 deployment.status = 'creating'
                 db.session.commit()
                 
-                logger.info(f"🔧 Génération de la configuration Terraform...")
-                workspace_dir = self.terraform_service.create_workspace(deployment)
-                
-                # Étape 2: Appliquer Terraform
-                logger.info(f"⚙️ Application de Terraform...")
-                success, output = self.terraform_service.apply(workspace_dir)
-                
-                deployment.terraform_output = output
-                
-                if not success:
-                    raise Exception(f"Terraform apply a échoué: {output}")
-                
-                # Étape 3: Récupérer les outputs Terraform
-                outputs = self.terraform_service.get_outputs(workspace_dir)
-                deployment.proxmox_id = outputs.get('vm_id')
-                deployment.ip_address = outputs.get('ip_address')
-                deployment.proxmox_node = os.getenv('PROXMOX_NODE')
+                self._provision(deployment, deadline)
+                job.stage = 'await_ready'
+                db.session.commit()
+            
+            if job.stage == 'await_ready':
+                with self._readiness_lock:
+                    ready = self._readiness.pop(job.id, None)
                 
-                logger.info(f"✅ VM créée - ID: {deployment.proxmox_id}, IP: {deployment.ip_address}")
+                if ready is None:
+                    deadline.check()
+                    self._watch_readiness(job, deployment, deadline)
+                    return
                 
-                # Étape 4: Attendre que la VM soit démarrée
-                logger.info(f"⏳ Attente du démarrage de la VM...")
-                if not self._wait_for_vm_ready(deployment.proxmox_id, deployment.ip_address):
+                end_stage(deployment, 'wait_ready', ready)
+                deadline.check()
+                if not ready:
                     raise Exception("Timeout en attendant que la VM soit prête")
                 
-                # Étape 5: Installer le framework
-                logger.info(f"📥 Installation du framework {deployment.framework}...")
-                install_log = self._install_framework(deployment)
-                
-                # Étape 6: Déployer l'application
-                logger.info(f"🚀 Déploiement de l'application depuis {deployment.github_url}...")
-                deploy_log = self._deploy_application(deployment)
-                
-                deployment.deployment_log = f"{install_log}\n\n{deploy_log}"
-                
-                # Succès !
-                deployment.status = 'running'
-                deployment.deployed_at = datetime.utcnow()
+                job.stage = 'configure'
                 db.session.commit()
-                
-                logger.info(f"🎉 Déploiement {deployment_id} terminé avec succès!")
-                logger.info(f"🌐 Application accessible sur http://{deployment.ip_address}")
-                
-            except Exception as e:
-                logger.error(f"❌ Erreur lors du déploiement {deployment_id}: {e}")
-                deployment.status = 'failed'
-                deployment.error_message = str(e)
+            
+            if job.stage == 'configure':
+                deadline.check()
+                self._configure(deployment, deadline)
+            
+            if job.stage == 'deploy_app':
+                deadline.check()
+                deployment.status = 'creating'
                 db.session.commit()
+                self._configure(deployment, deadline, install=False)
+            
+            self._finish_job(job.id, True)
+        
+        except OperationCancelled:
+            self._cancel_job(job.id)
+        
+        except DeadlineExceeded:
+            self._fail_on_deadline(job)
+        
+        except Exception as e:
+            # Une erreur provoquée par l'interruption (session fermée...) reste une annulation
+            if deadline.cancelled:
+                self._cancel_job(job.id)
+                return
+            
+            logger.error(f"❌ Erreur lors du déploiement {deployment.id}: {e}")
+            self._mark_failed(deployment, str(e))
+            self._finish_job(job.id, False)
     
-    def _wait_for_vm_ready(self, vm_id, ip_address, timeout=300):
-        """Attend que la VM soit prête"""
-        import time
-        import socket
+    def _run_batch(self, job, deadline):
+        """Exécute le provisionnement d'un lot sous la deadline de sa tâche"""
+        try:
+            self._finish_job(job.id, self._deploy_batch(job.batch_id, deadline))
+        except OperationCancelled:
+            self._cancel_job(job.id)
+        except DeadlineExceeded:
+            self._fail_on_deadline(job)
+    
+    def _run_destroy(self, job, deadline):
+        """
+        Détruit l'infrastructure d'un déploiement et le marque 'deleted'
+        
+        Si son déploiement est encore en cours (annulation demandée), la
+        destruction attend la fin de la tâche de déploiement.
+        """
+        deployment = Deployment.query.get(job.deployment_id)
+        if not deployment or deployment.status == 'deleted':
+            self._finish_job(job.id, True)
+            return
+        
+        try:
+            while Job.query.filter(
+                Job.kind.in_(['deploy', 'batch']),
+                db.or_(
+                    Job.deployment_id == deployment.id,
+                    db.and_(Job.batch_id.isnot(None), Job.batch_id == deployment.batch_id)
+                ),
+                Job.status.in_(['queued', 'running', 'waiting'])
+            ).count():
+                deadline.check()
+                self._stop_event.wait(1)
+                db.session.expire_all()
+            
+            success, message = self.destroy(deployment.id, deadline)
+        except (OperationCancelled, DeadlineExceeded) as e:
+            success, message = False, f"interrompue ({e})"
+        
+        db.session.refresh(deployment)
+        if not success:
+            # L'instance peut subsister: le déploiement reste supprimable
+            logger.error(f"❌ Destruction du déploiement {deployment.id} impossible: {message}")
+            self._mark_failed(deployment, f"Destruction impossible: {message}")
+            self._finish_job(job.id, False, f"Destruction impossible: {message}")
+            return
+        
+        deployment.status = 'deleted'
+        deployment.updated_at = datetime.utcnow()
+        db.session.commit()
+        self.vmids.release(deployment.id)
+        self._finish_job(job.id, True)
+        logger.info(f"🗑️ Déploiement {deployment.id} supprimé")
+    
+    def _watch_readiness(self, job, deployment, deadline):
+        """Étape 4: confie l'attente du démarrage au sondeur et libère le worker"""
+        logger.info(f"⏳ Attente du démarrage de la VM {deployment.proxmox_id} ({deployment.ip_address})...")
+        
+        job.status = 'waiting'
+        db.session.commit()
+        start_stage(deployment, 'wait_ready')
+        
+        # Nouvelle instance: la clé d'hôte d'une instance précédente à la même adresse ne vaut plus
+        self.executor.forget_host(deployment.ip_address)
         
-        start_time = time.time()
+        job_id = job.id
+        future = self.prober.watch(deployment.ip_address, deadline.timeout(Config.VM_START_TIMEOUT))
+        with self._cancel_lock:
+            self._watches[job_id] = future
+        future.add_done_callback(lambda f: self._on_ready(job_id, f))
         
-        while time.time() - start_time < timeout:
+        # Annulation arrivée avant l'enregistrement de la surveillance
+        if deadline.cancelled:
+            future.cancel()
+    
+    def _on_ready(self, job_id, future):
+        """Callback du sondeur: resoumet la tâche pour l'étape suivante"""
+        with self._cancel_lock:
+            self._watches.pop(job_id, None)
+        
+        if future.cancelled():
+            ready = False
+        else:
             try:
-                # Vérifier si le port SSH est ouvert
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                result = sock.connect_ex((ip_address, 22))
-                sock.close()
-                
-                if result == 0:
-                    logger.info(f"✅ VM prête - SSH accessible sur {ip_address}")
-                    return True
-                    
+                ready = future.result()
             except Exception as e:
-                logger.debug(f"VM pas encore prête: {e}")
+                logger.error(f"❌ Erreur du sondeur pour la tâche {job_id}: {e}")
+                ready = False
+        
+        with self._readiness_lock:
+            self._readiness[job_id] = ready
+        
+        # Travail déjà admis: ne pas le soumettre à la limite de la file
+        self.pool.submit(job_id, force=True)
+    
+    def _provision(self, deployment, deadline):
+        """Étapes 1 à 3: création de l'instance (Terraform ou API directe) et récupération des outputs"""
+        
+        self._select_image([deployment])
+        self._place([deployment])
+        self._allocate_vmids([deployment])
+        if deployment.provisioner == 'api':
+            self._provision_direct(deployment, deadline)
+            return
+        
+        # Étape 1: Créer la configuration Terraform
+        logger.info(f"🔧 Génération de la configuration Terraform...")
+        with stage_timer(deployment, 'workspace_render'):
+            workspace_dir = self.terraform_service.render_workspace(deployment)
+            render_hash = self.terraform_service.workspace_hash(workspace_dir)
+        
+        # Reprise d'un déploiement déjà provisionné avec les mêmes fichiers
+        if (
+            deployment.render_hash == render_hash
+            and deployment.proxmox_id
+            and self.terraform_service.has_state(workspace_dir)
+        ):
+            logger.info(f"♻️ Configuration Terraform inchangée, VM {deployment.proxmox_id} conservée")
+            return
+        
+        with stage_timer(deployment, 'terraform_init'):
+            self.terraform_service.init_workspace(workspace_dir, deadline)
+        
+        # Étape 2: Appliquer Terraform
+        logger.info(f"⚙️ Application de Terraform...")
+        success, output = self._apply_workspace(deployment, workspace_dir, deadline)
+        
+        if not success:
+            raise Exception(f"Terraform apply a échoué: {output}")
+        
+        # Étape 3: Récupérer les outputs Terraform
+        with stage_timer(deployment, 'terraform_outputs'):
+            outputs = self.terraform_service.get_outputs(workspace_dir, deadline)
+        deployment.proxmox_id = outputs.get('vm_id')
+        deployment.ip_address = outputs.get('ip_address')
+        deployment.render_hash = render_hash
+        db.session.commit()
+        
+        logger.info(f"✅ VM créée - ID: {deployment.proxmox_id}, IP: {deployment.ip_address}")
+    
+    def _provision_direct(self, deployment, deadline):
+        """Création de l'instance par appels directs à l'API Proxmox, sans Terraform"""
+        node = deployment.proxmox_node or Config.PROXMOX_NODE
+        
+        def on_created(vmid):
+            # Enregistré avant la création: une reprise retrouve l'instance
+            deployment.proxmox_id = vmid
+            deployment.proxmox_node = node
+            db.session.commit()
+        
+        logger.info(f"⚡ Provisionnement direct via l'API Proxmox...")
+        log = DeploymentLogWriter(deployment, source='terraform')
+        try:
+            with self._governed('clone' if deployment.type == 'vm' else 'create', deployment, deadline):
+                with stage_timer(deployment, 'api_create'):
+                    vmid = self.direct_provisioner.create(
+                        deployment, node, deadline, on_line=log.on_line, on_created=on_created
+                    )
+            
+            with stage_timer(deployment, 'api_outputs'):
+                outputs = self.direct_provisioner.wait_for_outputs(deployment, node, vmid, deadline)
+        finally:
+            log.flush()
+        
+        if not outputs.get('ip_address'):
+            raise Exception(f"Adresse IP de l'instance {vmid} introuvable")
+        
+        deployment.ip_address = outputs.get('ip_address')
+        db.session.commit()
+        
+        logger.info(f"✅ Instance créée - ID: {deployment.proxmox_id}, IP: {deployment.ip_address}")
+    
+    def _apply_workspace(self, deployments, workspace_dir, deadline):
+        """
+        Applique un workspace en diffusant la sortie dans le journal
+        
+        Si le workspace a déjà un état (reprise, configuration modifiée), un
+        plan est calculé d'abord: sans changement, apply n'est pas exécuté;
+        sinon le plan enregistré est appliqué.
+        
+        Returns:
+            Tuple (success, output)
+        """
+        log = DeploymentLogWriter(deployments, source='terraform')
+        try:
+            plan_file = None
+            if self.terraform_service.has_state(workspace_dir):
+                with stage_timer(deployments, 'terraform_plan') as timing:
+                    success, has_changes, output = self.terraform_service.plan(
+                        workspace_dir, deadline, on_line=log.on_line
+                    )
+                    timing['success'] = success
+                
+                if not success:
+                    return False, output
+                if not has_changes:
+                    log.write("=== Aucun changement d'infrastructure: apply ignoré ===")
+                    logger.info(f"♻️ Plan Terraform sans changement ({os.path.basename(workspace_dir)})")
+                    return True, output
+                plan_file = PLAN_FILE
+            
+            with self._governed('apply', deployments, deadline):
+                with stage_timer(deployments, 'terraform_apply') as timing:
+                    success, output = self.terraform_service.apply(
+                        workspace_dir, deadline, on_line=log.on_line, plan_file=plan_file
+                    )
+                    timing['success'] = success
+            return success, output
+        finally:
+            log.flush()
+    
+    @contextmanager
+    def _governed(self, operation, deployments, deadline=None):
+        """
+        Réserve auprès du gouverneur le droit d'exécuter une opération Terraform
+        
+        Un apply de lot compte pour autant d'opérations que Terraform en
+        mène en parallèle. L'attente est mesurée (étape concurrency_wait).
+        """
+        if not isinstance(deployments, (list, tuple)):
+            deployments = [deployments]
+        
+        node = deployments[0].proxmox_node or Config.PROXMOX_NODE
+        storage = deployments[0].proxmox_storage or Config.PROXMOX_STORAGE
+        weight = min(len(deployments), self.terraform_service.parallelism) or 1
+        
+        with stage_timer(deployments, 'concurrency_wait'):
+            token = self.governor.acquire(operation, node, storage, weight, deadline)
+        try:
+            yield
+        finally:
+            self.governor.release(token)
+    
+    def _select_image(self, deployments):
+        """
+        Choisit le template à cloner (image dorée ou générique) et l'enregistre
+        
+        Un déploiement garde le template choisi à son premier provisionnement,
+        et les instances d'un lot partagent le même template.
+        """
+        chosen = next((d for d in deployments if d.source_template), None)
+        if chosen:
+            template, version = chosen.source_template, chosen.image_version
+        else:
+            template, version = self.image_service.resolve_template(deployments[0])
+        
+        for deployment in deployments:
+            if not deployment.source_template:
+                deployment.source_template = template
+                deployment.image_version = version
+        db.session.commit()
+        
+        if version is not None:
+            logger.info(f"💿 Image dorée {template} (v{version})")
+    
+    def _place(self, deployments):
+        """
+        Choisit le noeud et le storage des déploiements qui n'en ont pas encore
+        
+        Le choix est enregistré avant la création: une reprise garde le même
+        noeud, et les placements suivants le comptent parmi les réservations.
+        Un déploiement dont le noeud est déjà fixé (pool chaud) n'y reçoit
+        que son storage, s'il est encore candidat. Sans inventaire du cluster
+        (Proxmox injoignable), PROXMOX_NODE et PROXMOX_STORAGE sont utilisés.
+        
+        Raises:
+            PlacementError: si aucun noeud ne peut accueillir un déploiement
+        """
+        pending = [d for d in deployments if not d.proxmox_node or not d.proxmox_storage]
+        if not pending:
+            return
+        
+        # Sérialisé: deux placements simultanés verraient la même capacité libre
+        with self._placement_lock:
+            inventory = None
+            if self.scheduler:
+                try:
+                    inventory = self.status_cache.get('cluster_inventory')[0]
+                except CacheMiss as e:
+                    logger.warning(
+                        f"⚠️ Inventaire du cluster indisponible, placement sur {Config.PROXMOX_NODE}: {e}"
+                    )
+            
+            if inventory is None:
+                for deployment in pending:
+                    deployment.proxmox_node = deployment.proxmox_node or Config.PROXMOX_NODE
+                    deployment.proxmox_storage = Config.PROXMOX_STORAGE
+            else:
+                candidates = self._placement_candidates(inventory, pending[0].type, template=pending[0].source_template)
+                for deployment in pending:
+                    pinned = deployment.proxmox_node
+                    allowed = {pinned: candidates[pinned]} if pinned in candidates else candidates
+                    deployment.proxmox_node, deployment.proxmox_storage = self.scheduler.place(deployment, allowed)
+                    logger.info(
+                        f"🧭 Déploiement {deployment.id} placé sur "
+                        f"{deployment.proxmox_node}/{deployment.proxmox_storage}"
+                    )
+            
+            db.session.commit()
+    
+    def _placement_candidates(self, inventory, deployment_type, scheduler=None, template=None):
+        """
+        Capacité des noeuds, déduction faite des déploiements placés mais absents de l'inventaire
+        
+        Seuls les noeuds où le template est disponible sont retenus, sauf si
+        les templates sont sur un storage partagé (PLACEMENT_SHARED_TEMPLATES).
+        """
+        scheduler = scheduler or self.scheduler
+        allowed = None
+        if not Config.PLACEMENT_SHARED_TEMPLATES:
+            if deployment_type == 'lxc':
+                template = Config.LXC_TEMPLATE
+            allowed = template_nodes(inventory, deployment_type, template or Config.TEMPLATE_NAME, Config.PROXMOX_NODE)
+        
+        placed = Deployment.query.filter(
+            Deployment.proxmox_node.isnot(None),
+            Deployment.status.notin_(['deleted', 'failed', 'cancelled'])
+        ).all()
+        
+        reservations = [
+            (d.proxmox_node, d.proxmox_storage, d.cpu, d.memory, d.disk)
+            for d in placed
+            if not d.proxmox_id or inventory.guest(d.proxmox_id) is None
+        ]
+        return scheduler.candidates(
+            inventory,
+            deployment_type,
+            reservations=reservations,
+            placed=[(d.proxmox_node, d.framework, d.name) for d in placed],
+            template_nodes=allowed
+        )
+    
+    def _allocate_vmids(self, deployments):
+        """
+        Réserve le VMID des déploiements pas encore créés
+        
+        Le VMID est transmis au provisionnement (Terraform ou API directe);
+        les VMID des instances présentes sur le cluster sont évités.
+        
+        Raises:
+            VmidExhausted: si la plage réservée est pleine
+        """
+        pending = [d for d in deployments if not d.proxmox_id]
+        if not self.vmids.enabled or not pending:
+            return
+        
+        db.session.commit()
+        
+        exclude = ()
+        try:
+            inventory = self.status_cache.get('cluster_inventory')[0]
+            exclude = [guest['vmid'] for guest in inventory.guests()]
+        except CacheMiss as e:
+            logger.warning(f"⚠️ Inventaire du cluster indisponible, VMID du cluster non vérifiés: {e}")
+        
+        for deployment in pending:
+            self.vmids.allocate(deployment.id, exclude)
+    
+    def _configure(self, deployment, deadline, install=True):
+        """
+        Étapes 5 et 6: installation du framework et déploiement de l'application
+        
+        Args:
+            install: False pour une instance du pool chaud, déjà installée
+        """
+        
+        log = DeploymentLogWriter(deployment)
+        
+        # Une seule connexion SSH pour l'installation et le déploiement
+        try:
+            with self.executor.session(deployment.ip_address) as session:
+                # Étape 5: Installer le framework (déjà présent dans une image dorée)
+                if not install:
+                    log.write(f"=== Instance du pool chaud: framework {deployment.framework} déjà installé ===")
+                elif deployment.image_version is not None:
+                    log.write(f"=== Image dorée {deployment.source_template}: installation du framework ignorée ===")
+                else:
+                    logger.info(f"📥 Installation du framework {deployment.framework}...")
+                    with stage_timer(deployment, 'install'):
+                        self._install_framework(deployment, session, log, deadline)
+                
+                # Une instance du pool chaud attend d'être attribuée
+                if deployment.warm_pool:
+                    deployment.status = 'warm'
+                    deployment.pooled_at = datetime.utcnow()
+                    db.session.commit()
+                    logger.info(f"🔥 Instance chaude {deployment.id} prête ({deployment.ip_address})")
+                    return
+                
+                # Étape 6: Déployer l'application
+                logger.info(f"🚀 Déploiement de l'application depuis {deployment.github_url}...")
+                with stage_timer(deployment, 'app_deploy'):
+                    self._deploy_application(deployment, session, log, deadline)
+        finally:
+            log.flush()
+        
+        # Succès !
+        deployment.status = 'running'
+        deployment.deployed_at = datetime.utcnow()
+        db.session.commit()
+        
+        logger.info(f"🎉 Déploiement {deployment.id} terminé avec succès!")
+        logger.info(f"🌐 Application accessible sur http://{deployment.ip_address}")
+    
+    def _deploy_batch(self, batch_id, deadline):
+        """
+        Provisionne toutes les instances d'un lot en un seul apply Terraform
+        
+        Les outputs sont ensuite répartis sur chaque déploiement, et chaque
+        instance créée reçoit sa propre tâche, qui reprend à l'attente du
+        démarrage: l'échec d'une instance n'empêche pas les autres d'aboutir.
+        
+        Returns:
+            True si toutes les instances ont été créées
+        """
+        members = Deployment.query.filter(
+            Deployment.batch_id == batch_id,
+            Deployment.status != 'deleted'
+        ).order_by(Deployment.id).all()
+        
+        deployments = [d for d in members if d.status not in ('running', 'failed', 'cancelled')]
+        if not deployments:
+            logger.info(f"ℹ️ Aucune instance à provisionner pour le lot {batch_id}")
+            return True
+        
+        # Le workspace doit décrire toutes les instances existantes du lot,
+        # sinon Terraform détruirait celles déjà terminées lors d'une reprise
+        instances = [d for d in members if d in deployments or d.proxmox_id]
+        
+        logger.info(f"📦 Démarrage du lot {batch_id}: {len(deployments)} instances")
+        
+        for deployment in deployments:
+            deployment.status = 'creating'
+        db.session.commit()
+        
+        try:
+            self._select_image(instances)
+            self._place(instances)
+            self._allocate_vmids(instances)
+            with stage_timer(deployments, 'workspace_render'):
+                workspace_dir = self.terraform_service.render_batch_workspace(batch_id, instances)
+                render_hash = self.terraform_service.workspace_hash(workspace_dir)
+            
+            with stage_timer(deployments, 'terraform_init'):
+                self.terraform_service.init_workspace(workspace_dir, deadline)
+            
+            success, output = self._apply_workspace(deployments, workspace_dir, deadline)
+        except (OperationCancelled, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du provisionnement du lot {batch_id}: {e}")
+            for deployment in deployments:
+                self._mark_failed(deployment, str(e), commit=False)
+            db.session.commit()
+            return False
+        
+        # Après un échec partiel, les outputs doivent être relus depuis l'état
+        with stage_timer(deployments, 'terraform_outputs'):
+            outputs = self.terraform_service.get_batch_outputs(workspace_dir, refresh=not success, deadline=deadline)
+        
+        created = 0
+        for deployment in deployments:
+            instance = outputs.get(deployment.id)
             
-            time.sleep(10)
+            if not instance or not instance.get('vm_id'):
+                error = "Instance non créée par Terraform"
+                if not success:
+                    error = f"{error}: {output[-2000:]}"
+                self._mark_failed(deployment, error, commit=False)
+                continue
+            
+            deployment.proxmox_id = instance.get('vm_id')
+            deployment.ip_address = instance.get('ip_address')
+            if success:
+                deployment.render_hash = render_hash
+            created += 1
+        db.session.commit()
+        
+        logger.info(f"✅ Lot {batch_id}: {created}/{len(deployments)} instances créées")
         
-        return False
+        for deployment in deployments:
+            if deployment.status != 'creating':
+                continue
+            active = Job.query.filter(
+                Job.kind == 'deploy',
+                Job.deployment_id == deployment.id,
+                Job.status.in_(['queued', 'running', 'waiting'])
+            ).count()
+            if not active:
+                self._enqueue_job(
+                    'deploy',
+                    deployment_id=deployment.id,
+                    stage='await_ready',
+                    reject_when_full=False
+                )
+        
+        return created == len(deployments)
     
-    def _install_framework(self, deployment):
+    def _install_framework(self, deployment, session, log, deadline):
         """Installe le framework sur la VM"""
         script = generate_install_script(deployment.framework, deployment.type)
         
-        # Exécuter le script via SSH (simulation pour l'exemple)
-        # Dans un cas réel, utiliser paramiko ou fabric
-        logger.info(f"Script d'installation généré pour {deployment.framework}")
-        return f"Framework {deployment.framework} installé"
+        log.write(f"=== Installation du framework {deployment.framework} ===")
+        exit_code = session.run(
+            script,
+            deadline.timeout(Config.INSTALL_TIMEOUT),
+            on_line=log.on_line,
+            deadline=deadline
+        )
+        if exit_code != 0:
+            raise RemoteCommandError(exit_code, "Installation du framework")
+        
+        logger.info(f"✅ Framework {deployment.framework} installé")
     
-    def _deploy_application(self, deployment):
+    def _deploy_application(self, deployment, session, log, deadline):
         """Déploie l'application depuis GitHub"""
         script = generate_deploy_script(
             deployment.framework,
@@ -137,12 +1207,30 @@ class DeploymentService:
             deployment.type
         )
         
-        # Exécuter le script via SSH (simulation pour l'exemple)
-        logger.info(f"Script de déploiement généré pour {deployment.github_url}")
-        return f"Application déployée depuis {deployment.github_url}"
+        log.write(f"=== Déploiement de l'application depuis {deployment.github_url} ===")
+        exit_code = session.run(
+            script,
+            deadline.timeout(Config.APP_DEPLOY_TIMEOUT),
+            on_line=log.on_line,
+            deadline=deadline
+        )
+        if exit_code != 0:
+            raise RemoteCommandError(exit_code, "Déploiement de l'application")
+        
+        logger.info(f"✅ Application déployée depuis {deployment.github_url}")
     
-    def destroy(self, deployment_id):
-        """Détruit un déploiement"""
+    def cancel(self, deployment_id):
+        """
+        Annule le déploiement en cours d'une instance
+        
+        Une tâche encore en file est retirée immédiatement; une tâche en cours
+        est interrompue (processus Terraform ou script arrêté) et libère son
+        worker. Les ressources déjà créées restent en place jusqu'à la
+        suppression du déploiement.
+        
+        Returns:
+            Tuple (success, message)
+        """
         from app import app
         
         with app.app_context():
@@ -150,14 +1238,119 @@ class DeploymentService:
             if not deployment:
                 return False, "Déploiement introuvable"
             
-            try:
-                workspace_dir = os.path.join(
-                    os.getenv('TERRAFORM_WORK_DIR', './terraform/workspaces'),
-                    f"deployment-{deployment_id}"
+            job = Job.query.filter(
+                Job.kind == 'deploy',
+                Job.deployment_id == deployment_id,
+                Job.status.in_(['queued', 'running', 'waiting'])
+            ).order_by(Job.id.desc()).first()
+            
+            if not job:
+                if deployment.status == 'waiting_capacity':
+                    # Jamais mis en file: annulation immédiate
+                    deployment.status = 'cancelled'
+                    deployment.error_message = None
+                    db.session.commit()
+                    return True, "Déploiement annulé"
+                if deployment.batch_id and deployment.status in ('queued', 'creating'):
+                    return False, "Provisionnement du lot en cours: annulation impossible pour une seule instance"
+                return False, "Aucun déploiement en cours"
+            
+            job.cancel_requested = True
+            db.session.commit()
+            
+            if self.pool.remove(job.id) or (job.status == 'queued' and job.owner is None):
+                # Pas encore démarrée: annulation immédiate
+                self._cancel_job(job.id)
+                return True, "Déploiement annulé"
+            
+            if job.owner == self.owner:
+                self._signal_cancel(job.id)
+            
+            # Tâche d'un autre processus: relayée par son heartbeat
+            logger.info(f"🛑 Annulation demandée pour la tâche {job.id} ({job.status})")
+            return True, "Annulation demandée"
+    
+    def retry(self, deployment_id):
+        """
+        Relance depuis le provisionnement un déploiement échoué ou annulé
+        
+        Le workspace est réutilisé: si ses fichiers sont identiques à ceux du
+        dernier apply réussi, Terraform n'est pas relancé; sinon seul un plan
+        avec changements donne lieu à un apply.
+        
+        Returns:
+            Tuple (success, message)
+        
+        Raises:
+            QueueFullError: si la file d'attente est pleine
+        """
+        from app import app
+        
+        with app.app_context():
+            deployment = Deployment.query.get(deployment_id)
+            if not deployment:
+                return False, "Déploiement introuvable"
+            
+            if deployment.batch_id:
+                return False, "Les instances d'un lot ne peuvent pas être relancées individuellement"
+            if deployment.warm_pool or deployment.status not in ('failed', 'cancelled'):
+                return False, (
+                    f"Seul un déploiement échoué ou annulé peut être relancé (statut: {deployment.status})"
                 )
+            
+            previous_status = deployment.status
+            deployment.status = 'queued'
+            deployment.error_message = None
+            db.session.commit()
+            
+            try:
+                position = self.deploy_async(deployment.id)
+            except QueueFullError:
+                deployment.status = previous_status
+                db.session.commit()
+                raise
+            
+            return True, f"Déploiement relancé (position {position})"
+    
+    def destroy(self, deployment_id, deadline=None):
+        """
+        Détruit l'infrastructure d'un déploiement (synchrone)
+        
+        Returns:
+            Tuple (success, message)
+        """
+        from app import app
+        
+        with app.app_context():
+            deployment = Deployment.query.get(deployment_id)
+            if not deployment:
+                return False, "Déploiement introuvable"
+            
+            try:
+                if deployment.provisioner == 'api':
+                    node = deployment.proxmox_node or Config.PROXMOX_NODE
+                    storage = deployment.proxmox_storage or Config.PROXMOX_STORAGE
+                    with self.governor.slot('destroy', node, storage, deadline=deadline):
+                        return self.direct_provisioner.destroy(deployment)
+                
+                workspace_dir = self.terraform_service.workspace_path(deployment)
+                
+                # Dans un lot, seule la ressource de ce déploiement est détruite
+                targets = None
+                if deployment.batch_id:
+                    targets = [self.terraform_service.resource_address(deployment)]
                 
                 if os.path.exists(workspace_dir):
-                    success, output = self.terraform_service.destroy(workspace_dir)
+                    # Workspace compacté: providers restaurés depuis le squelette
+                    if not self.terraform_service.is_initialized(workspace_dir):
+                        self.terraform_service.init_workspace(workspace_dir, deadline)
+                    
+                    node = deployment.proxmox_node or Config.PROXMOX_NODE
+                    storage = deployment.proxmox_storage or Config.PROXMOX_STORAGE
+                    with self.governor.slot('destroy', node, storage, deadline=deadline):
+                        success, output = self.terraform_service.destroy(
+                            workspace_dir, targets=targets, deadline=deadline
+                        )
                     if not success:
                         return False, f"Erreur Terraform: {output}"
                 
@@ -168,7 +1361,12 @@ class DeploymentService:
                 return False, str(e)
     
     def restart(self, deployment_id):
-        """Redémarre un déploiement"""
+        """
+        Lance le redémarrage d'un déploiement sans attendre sa fin
+        
+        Returns:
+            Tuple (success, UPID de la tâche Proxmox ou message d'erreur)
+        """
         from app import app
         
         with app.app_context():
@@ -177,15 +1375,15 @@ class DeploymentService:
                 return False, "Déploiement introuvable"
             
             try:
-                success = self.proxmox_service.restart_vm(
+                upid = self.proxmox_service.restart_vm(
                     deployment.proxmox_node,
                     deployment.proxmox_id
                 )
                 
-                if success:
+                if upid:
                     deployment.updated_at = datetime.utcnow()
                     db.session.commit()
-                    return True, "VM redémarrée"
+                    return True, upid
                 else:
                     return False, "Échec du redémarrage"
                     
@@ -0,0 +1,218 @@
+"""
+Provisionnement direct via l'API Proxmox, sans Terraform
+"""
+
+import time
+import logging
+import threading
+from urllib.parse import quote
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Disque système des VMs clonées (identique au template Terraform)
+VM_DISK = 'scsi0'
+
+# Intervalle entre deux lectures de l'adresse IP (secondes)
+IP_POLL_INTERVAL = 3
+
+
+class DirectProvisioner:
+    """
+    Crée les VMs et conteneurs par quelques appels à l'API Proxmox
+
+    Pour un simple clone configuré, cela évite le coût de Terraform (init,
+    processus provider, plan, écriture d'état). Les ressources créées sont
+    identiques à celles des templates Terraform et les outputs ont la même
+    forme que TerraformService.get_outputs: {'vm_id', 'ip_address'}.
+
+    Le VMID est communiqué dès sa réservation (on_created): une reprise
+    réutilise l'instance existante au lieu d'en créer une seconde.
+    """
+
+    def __init__(self, proxmox_service):
+        self.proxmox_service = proxmox_service
+        self._stop_event = threading.Event()
+
+    def create(self, deployment, node, deadline, on_line=None, on_created=None):
+        """
+        Crée (ou retrouve) et démarre l'instance d'un déploiement
+
+        Args:
+            on_line: Callback (stream, line) pour le journal du déploiement
+            on_created: Callback (vmid) appelé dès que le VMID est attribué
+
+        Returns:
+            VMID de l'instance
+
+        Raises:
+            RuntimeError: si une étape échoue
+        """
+        log = on_line or (lambda stream, line: None)
+
+        vmid = self._existing_instance(deployment, node)
+        if vmid:
+            log('stdout', f"Instance {vmid} existante réutilisée")
+        elif deployment.type == 'vm':
+            vmid = self._clone_vm(deployment, node, deadline, log, on_created)
+        else:
+            vmid = self._create_lxc(deployment, node, deadline, log, on_created)
+
+        self._start(deployment, node, vmid, log)
+        return vmid
+
+    def wait_for_outputs(self, deployment, node, vmid, deadline, timeout=None):
+        """
+        Attend l'adresse IP de l'instance
+
+        Returns:
+            Dictionnaire {'vm_id', 'ip_address'}, ip_address None si elle
+            n'est pas connue dans le délai
+        """
+        expires = time.monotonic() + deadline.timeout(timeout or Config.VM_START_TIMEOUT)
+
+        while True:
+            if deployment.type == 'vm':
+                ip_address = self.proxmox_service.get_vm_ip(node, vmid)
+            else:
+                ip_address = self.proxmox_service.get_lxc_ip(node, vmid)
+
+            remaining = expires - time.monotonic()
+            if ip_address or remaining <= 0:
+                return {'vm_id': vmid, 'ip_address': ip_address}
+
+            deadline.check()
+            self._stop_event.wait(min(IP_POLL_INTERVAL, remaining))
+
+    def destroy(self, deployment):
+        """
+        Supprime l'instance d'un déploiement
+
+        Returns:
+            Tuple (success, message)
+        """
+        if not deployment.proxmox_id:
+            return True, "Aucune instance à supprimer"
+
+        node = deployment.proxmox_node or Config.PROXMOX_NODE
+        if deployment.type == 'vm':
+            exists = self.proxmox_service.get_vm_status(node, deployment.proxmox_id) is not None
+            deleted = not exists or self.proxmox_service.delete_vm(node, deployment.proxmox_id)
+        else:
+            exists = self.proxmox_service.get_lxc_status(node, deployment.proxmox_id) is not None
+            deleted = not exists or self.proxmox_service.delete_lxc(node, deployment.proxmox_id)
+
+        if not deleted:
+            return False, f"Suppression de l'instance {deployment.proxmox_id} impossible"
+        return True, "Instance supprimée"
+
+    def _existing_instance(self, deployment, node):
+        """VMID de l'instance déjà créée lors d'une tentative précédente"""
+        if not deployment.proxmox_id:
+            return None
+
+        if deployment.type == 'vm':
+            status = self.proxmox_service.get_vm_status(node, deployment.proxmox_id)
+        else:
+            status = self.proxmox_service.get_lxc_status(node, deployment.proxmox_id)
+        return deployment.proxmox_id if status else None
+
+    def _reserve_vmid(self, deployment, on_created):
+        # VMID réservé par la plateforme, sinon le prochain libre du cluster
+        vmid = deployment.vmid or self.proxmox_service.next_vmid()
+        if not vmid:
+            raise RuntimeError("Aucun VMID disponible")
+        if on_created:
+            on_created(vmid)
+        return vmid
+
+    def _clone_vm(self, deployment, node, deadline, log, on_created):
+        """Clone complet du template, puis configuration des ressources et de cloud-init"""
+        proxmox = self.proxmox_service
+        template = deployment.source_template or Config.TEMPLATE_NAME
+
+        # TEMPLATE_NAME accepte un nom ou un VMID; le template peut être sur un autre noeud
+        located = proxmox.locate_vm(template)
+        if located is None:
+            raise RuntimeError(f"Template introuvable: {template}")
+        template_node, base_vmid = located
+
+        vmid = self._reserve_vmid(deployment, on_created)
+        log('stdout', f"Clonage de {template} ({base_vmid}, {template_node}) vers {vmid} sur {node}...")
+
+        upid = proxmox.clone_vm(
+            template_node,
+            base_vmid,
+            vmid,
+            deployment.name,
+            target=node,
+            storage=deployment.proxmox_storage
+        )
+        if not upid:
+            raise RuntimeError(f"Clonage de {template} impossible")
+        if not proxmox.wait_for_task(template_node, upid, timeout=deadline.timeout(600)):
+            raise RuntimeError(f"Clonage de {template} échoué")
+        deadline.check()
+
+        config = {
+            'cores': deployment.cpu,
+            'sockets': 1,
+            'memory': deployment.memory,
+            'net0': f"virtio,bridge={Config.PROXMOX_BRIDGE}",
+            'ipconfig0': 'ip=dhcp',
+            'agent': 1
+        }
+        if Config.SSH_PUBLIC_KEY:
+            # L'API attend la clé encodée comme une URL
+            config['sshkeys'] = quote(Config.SSH_PUBLIC_KEY, safe='')
+
+        log('stdout', f"Configuration: {deployment.cpu} CPU, {deployment.memory} MB, disque {deployment.disk} GB")
+        if not proxmox.configure_vm(node, vmid, **config):
+            raise RuntimeError(f"Configuration de la VM {vmid} impossible")
+        if not proxmox.resize_disk(node, vmid, VM_DISK, f"{deployment.disk}G"):
+            raise RuntimeError(f"Redimensionnement du disque de la VM {vmid} impossible")
+
+        return vmid
+
+    def _create_lxc(self, deployment, node, deadline, log, on_created):
+        """Création d'un conteneur depuis le template LXC"""
+        proxmox = self.proxmox_service
+        vmid = self._reserve_vmid(deployment, on_created)
+        log('stdout', f"Création du conteneur {vmid} depuis {Config.LXC_TEMPLATE}...")
+
+        config = {
+            'ostemplate': Config.LXC_TEMPLATE,
+            'hostname': deployment.name,
+            'cores': deployment.cpu,
+            'memory': deployment.memory,
+            'swap': 512,
+            'rootfs': f"{deployment.proxmox_storage or Config.PROXMOX_STORAGE}:{deployment.disk}",
+            'net0': f"name=eth0,bridge={Config.PROXMOX_BRIDGE},ip=dhcp",
+            'unprivileged': 1
+        }
+        if Config.SSH_PUBLIC_KEY:
+            config['ssh-public-keys'] = Config.SSH_PUBLIC_KEY
+
+        upid = proxmox.create_lxc(node, vmid, **config)
+        if not upid:
+            raise RuntimeError(f"Création du conteneur {vmid} impossible")
+        if not proxmox.wait_for_task(node, upid, timeout=deadline.timeout(600)):
+            raise RuntimeError(f"Création du conteneur {vmid} échouée")
+
+        return vmid
+
+    def _start(self, deployment, node, vmid, log):
+        """Démarre l'instance si elle n'est pas déjà en cours d'exécution"""
+        proxmox = self.proxmox_service
+
+        if deployment.type == 'vm':
+            status = proxmox.get_vm_status(node, vmid) or {}
+            if status.get('status') != 'running' and not proxmox.start_vm(node, vmid):
+                raise RuntimeError(f"Démarrage de la VM {vmid} impossible")
+        else:
+            status = proxmox.get_lxc_status(node, vmid) or {}
+            if status.get('status') != 'running' and not proxmox.start_lxc(node, vmid):
+                raise RuntimeError(f"Démarrage du conteneur {vmid} impossible")
+
+        log('stdout', f"Instance {vmid} démarrée")
@@ -0,0 +1,322 @@
+"""
+Service de gestion des images dorées (templates pré-installés par framework)
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from models.database import db, GoldenImage
+from services.cluster_inventory import ClusterInventory
+from services.vmid_allocator import VmidAllocator
+from services.worker_pool import WorkerPool
+from utils.config import Config
+from utils.deadline import Deadline
+from utils.script_generator import generate_install_script
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de vérification des images à reconstruire (secondes)
+SCHEDULER_INTERVAL = 900
+
+# Délai avant de retenter automatiquement une construction échouée (secondes)
+RETRY_AFTER_FAILURE = 3600
+
+# Nettoyage avant conversion en template: chaque clone doit régénérer
+# son identité (machine-id, clés SSH) et relancer cloud-init
+CLEANUP_SCRIPT = """#!/bin/bash
+set -e
+apt-get clean
+rm -rf /var/lib/apt/lists/*
+cloud-init clean --logs || true
+truncate -s 0 /etc/machine-id
+rm -f /var/lib/dbus/machine-id
+rm -f /etc/ssh/ssh_host_*
+"""
+
+
+class ImageService:
+    """
+    Construit et maintient une image dorée par framework
+
+    Une image est un clone du template générique sur lequel le script
+    d'installation du framework a été exécuté, puis converti en template
+    Proxmox. Les déploiements VM clonent l'image la plus récente du
+    framework et sautent l'étape d'installation.
+
+    Une image n'est utilisée que si elle a été construite avec le script
+    d'installation actuel: toute modification du script la rend obsolète
+    et déclenche sa reconstruction.
+    """
+
+    def __init__(self, proxmox_service, prober, executor, governor):
+        self.proxmox_service = proxmox_service
+        self.prober = prober
+        self.executor = executor
+        self.governor = governor
+        self.node = Config.PROXMOX_NODE
+        self.vmids = VmidAllocator(
+            Config.GOLDEN_IMAGE_VMID_START,
+            Config.GOLDEN_IMAGE_VMID_END,
+            owner='golden_image_id'
+        )
+
+        # Une seule construction à la fois: chacune occupe une VM complète
+        self.pool = WorkerPool(
+            self._build_job,
+            workers=1,
+            max_queue=len(Config.SUPPORTED_FRAMEWORKS),
+            name='images'
+        )
+
+        self._scheduler_thread = None
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def script_hash(framework):
+        """Empreinte du script d'installation d'un framework"""
+        script = generate_install_script(framework, 'vm')
+        return hashlib.sha256(script.encode('utf-8')).hexdigest()
+
+    def current_image(self, framework):
+        """Image prête la plus récente, construite avec le script actuel"""
+        return GoldenImage.query.filter_by(
+            framework=framework,
+            status='ready',
+            script_hash=self.script_hash(framework)
+        ).order_by(GoldenImage.version.desc()).first()
+
+    def resolve_template(self, deployment):
+        """
+        Template à cloner pour un déploiement
+
+        Returns:
+            Tuple (template_name, image_version): l'image dorée du framework
+            si elle existe, sinon le template générique avec une version None
+        """
+        if deployment.type != 'vm':
+            return None, None
+
+        if Config.GOLDEN_IMAGES_ENABLED:
+            image = self.current_image(deployment.framework)
+            if image:
+                return image.template_name, image.version
+
+        return Config.TEMPLATE_NAME, None
+
+    def needs_build(self, framework):
+        """Vrai si le framework n'a pas d'image à jour ou si elle est trop ancienne"""
+        image = self.current_image(framework)
+        if not image:
+            return True
+
+        max_age = timedelta(hours=Config.GOLDEN_IMAGE_REBUILD_HOURS)
+        return image.built_at is None or datetime.utcnow() - image.built_at > max_age
+
+    def schedule_build(self, framework):
+        """
+        Place la construction d'une image dans la file
+
+        Returns:
+            Position dans la file d'attente
+        """
+        return self.pool.submit(framework.lower())
+
+    def list_images(self, framework=None):
+        """Images connues, les plus récentes en premier"""
+        query = GoldenImage.query
+        if framework:
+            query = query.filter_by(framework=framework)
+        return query.order_by(GoldenImage.framework, GoldenImage.version.desc()).all()
+
+    def start_scheduler(self):
+        """Démarre la reconstruction périodique des images"""
+        if self._scheduler_thread:
+            return
+
+        self._scheduler_thread = threading.Thread(
+            target=self._scheduler_loop,
+            name='golden-images',
+            daemon=True
+        )
+        self._scheduler_thread.start()
+
+    def _scheduler_loop(self):
+        """Planifie la construction des images manquantes, obsolètes ou trop anciennes"""
+        from app import app
+
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    if self.proxmox_service.proxmox:
+                        for framework in Config.SUPPORTED_FRAMEWORKS:
+                            if self.needs_build(framework) and not self._recently_failed(framework):
+                                self.schedule_build(framework)
+            except Exception as e:
+                logger.error(f"❌ Erreur de planification des images dorées: {e}")
+
+            self._stop_event.wait(SCHEDULER_INTERVAL)
+
+    def _build_job(self, framework):
+        """Handler du pool: construit une image dans un contexte applicatif"""
+        from app import app
+
+        with app.app_context():
+            self.build(framework)
+
+    def _recently_failed(self, framework):
+        """Vrai si la dernière construction du framework a échoué il y a moins d'une heure"""
+        latest = GoldenImage.query.filter_by(framework=framework).order_by(GoldenImage.version.desc()).first()
+        return (
+            latest is not None
+            and latest.status == 'failed'
+            and datetime.utcnow() - latest.created_at < timedelta(seconds=RETRY_AFTER_FAILURE)
+        )
+
+    def build(self, framework):
+        """
+        Construit une nouvelle version de l'image dorée d'un framework
+
+        Returns:
+            GoldenImage construite (status 'ready' ou 'failed'), ou None si
+            une construction est déjà en cours
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=Config.GOLDEN_IMAGE_BUILD_TIMEOUT)
+        building = GoldenImage.query.filter(
+            GoldenImage.framework == framework,
+            GoldenImage.status == 'building',
+            GoldenImage.created_at > cutoff
+        ).first()
+        if building:
+            logger.info(f"ℹ️ Image dorée {framework} v{building.version} déjà en construction")
+            return None
+
+        latest = db.session.query(db.func.max(GoldenImage.version)).filter(
+            GoldenImage.framework == framework
+        ).scalar() or 0
+        version = latest + 1
+
+        image = GoldenImage(
+            framework=framework,
+            version=version,
+            template_name=f"{Config.GOLDEN_IMAGE_PREFIX}-{framework}-v{version}",
+            proxmox_node=self.node,
+            base_template=Config.TEMPLATE_NAME,
+            script_hash=self.script_hash(framework),
+            status='building'
+        )
+        db.session.add(image)
+        db.session.commit()
+
+        logger.info(f"🏗️ Construction de l'image dorée {image.template_name}...")
+        deadline = Deadline.after(Config.GOLDEN_IMAGE_BUILD_TIMEOUT)
+
+        try:
+            self._build_template(image, deadline)
+        except Exception as e:
+            logger.error(f"❌ Échec de la construction de {image.template_name}: {e}")
+            if image.template_vmid:
+                self.proxmox_service.delete_vm(self.node, image.template_vmid)
+            image.status = 'failed'
+            image.error_message = str(e)
+            db.session.commit()
+            self.vmids.release(image.id)
+            return image
+
+        image.status = 'ready'
+        image.built_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"✅ Image dorée {image.template_name} prête (VMID {image.template_vmid})")
+
+        self._retire_old_images(framework)
+        return image
+
+    def _build_template(self, image, deadline):
+        """Clone, installation, nettoyage et conversion en template"""
+        proxmox = self.proxmox_service
+
+        base_vmid = proxmox.find_vm_by_name(self.node, image.base_template)
+        if base_vmid is None:
+            raise RuntimeError(f"Template générique introuvable: {image.base_template}")
+
+        # Le clone complet occupe le storage: il compte parmi les opérations plafonnées
+        with self.governor.slot('clone', self.node, Config.PROXMOX_STORAGE, deadline=deadline):
+            vmid = self._allocate_vmid(image)
+            upid = proxmox.clone_vm(self.node, base_vmid, vmid, image.template_name) if vmid else None
+            if not upid:
+                raise RuntimeError("Clonage du template générique impossible")
+
+            image.template_vmid = vmid
+            db.session.commit()
+
+            if not proxmox.wait_for_task(self.node, upid, timeout=deadline.timeout(600)):
+                raise RuntimeError(f"Clonage de {image.base_template} échoué")
+
+        if not proxmox.start_vm(self.node, vmid):
+            raise RuntimeError(f"Démarrage de la VM {vmid} impossible")
+
+        ip_address = self._wait_for_ip(vmid, deadline)
+        self.executor.forget_host(ip_address)
+
+        ready = self.prober.watch(ip_address, deadline.timeout(Config.VM_START_TIMEOUT))
+        if not ready.result():
+            raise RuntimeError(f"VM {vmid} injoignable sur {ip_address}")
+
+        def on_line(stream, line):
+            logger.debug(f"[{image.template_name}] {line}")
+
+        with self.executor.session(ip_address) as session:
+            for description, script in (
+                ("Installation du framework", generate_install_script(image.framework, 'vm')),
+                ("Nettoyage de l'image", CLEANUP_SCRIPT)
+            ):
+                exit_code = session.run(script, deadline.timeout(), on_line=on_line, deadline=deadline)
+                if exit_code != 0:
+                    raise RuntimeError(f"{description} terminé avec le code {exit_code}")
+
+        if not proxmox.shutdown_vm(self.node, vmid, timeout=int(deadline.timeout(300))):
+            raise RuntimeError(f"Arrêt de la VM {vmid} impossible")
+
+        if not proxmox.convert_to_template(self.node, vmid):
+            raise RuntimeError(f"Conversion de la VM {vmid} en template impossible")
+
+    def _allocate_vmid(self, image):
+        """VMID du template, dans la plage réservée aux images (sinon cluster/nextid)"""
+        if not self.vmids.enabled:
+            return self.proxmox_service.next_vmid()
+
+        exclude = ()
+        try:
+            exclude = [guest['vmid'] for guest in ClusterInventory.fetch(self.proxmox_service).guests()]
+        except Exception as e:
+            logger.warning(f"⚠️ Inventaire du cluster indisponible, VMID du cluster non vérifiés: {e}")
+
+        return self.vmids.allocate(image.id, exclude)
+
+    def _wait_for_ip(self, vmid, deadline, interval=5):
+        """Attend que l'agent QEMU remonte l'adresse IP de la VM"""
+        while True:
+            ip_address = self.proxmox_service.get_vm_ip(self.node, vmid)
+            if ip_address:
+                return ip_address
+
+            deadline.check()
+            self._stop_event.wait(min(interval, deadline.remaining()))
+
+    def _retire_old_images(self, framework):
+        """Supprime les templates au-delà des GOLDEN_IMAGE_KEEP versions les plus récentes"""
+        ready = GoldenImage.query.filter_by(
+            framework=framework,
+            status='ready'
+        ).order_by(GoldenImage.version.desc()).all()
+
+        # Les VMs sont des clones complets: supprimer un template ne les affecte pas
+        for image in ready[max(1, Config.GOLDEN_IMAGE_KEEP):]:
+            if image.template_vmid and not self.proxmox_service.delete_vm(image.proxmox_node, image.template_vmid):
+                continue
+            image.status = 'retired'
+            self.vmids.release(image.id)
+            logger.info(f"🗑️ Image dorée {image.template_name} retirée")
+
+        db.session.commit()
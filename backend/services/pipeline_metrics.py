@@ -0,0 +1,143 @@
+"""
+Mesure et agrégation des durées des étapes du pipeline de déploiement
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from models.database import db, Deployment, StageTiming
+from utils.metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# Étapes du pipeline, dans l'ordre d'exécution
+PIPELINE_STAGES = [
+    'workspace_render',
+    'terraform_init',
+    'terraform_plan',
+    'concurrency_wait',
+    'terraform_apply',
+    'terraform_outputs',
+    'api_create',
+    'api_outputs',
+    'wait_ready',
+    'install',
+    'app_deploy'
+]
+
+@contextmanager
+def stage_timer(deployments, stage):
+    """
+    Mesure une étape et enregistre sa durée pour chaque déploiement
+
+    Args:
+        deployments: Un déploiement ou une liste (étape partagée d'un lot)
+        stage: Nom de l'étape (voir PIPELINE_STAGES)
+
+    Yields:
+        Dictionnaire dont la clé 'success' peut être mise à False par
+        l'appelant pour un échec sans exception (une exception l'y met aussi)
+    """
+    if not isinstance(deployments, (list, tuple)):
+        deployments = [deployments]
+
+    started_at = datetime.utcnow()
+    start = time.monotonic()
+    result = {'success': True}
+
+    try:
+        yield result
+    except BaseException:
+        result['success'] = False
+        raise
+    finally:
+        duration = time.monotonic() - start
+        for deployment in deployments:
+            db.session.add(StageTiming(
+                deployment_id=deployment.id,
+                stage=stage,
+                started_at=started_at,
+                ended_at=started_at + timedelta(seconds=duration),
+                duration=duration,
+                success=result['success']
+            ))
+        db.session.commit()
+        logger.debug(f"⏱️ Étape {stage}: {duration:.2f}s ({len(deployments)} déploiement(s))")
+
+def start_stage(deployment, stage):
+    """Ouvre une mesure pour une étape asynchrone (terminée par end_stage)"""
+    db.session.add(StageTiming(
+        deployment_id=deployment.id,
+        stage=stage,
+        started_at=datetime.utcnow()
+    ))
+    db.session.commit()
+
+def end_stage(deployment, stage, success):
+    """Termine la dernière mesure ouverte d'une étape asynchrone"""
+    timing = StageTiming.query.filter_by(
+        deployment_id=deployment.id,
+        stage=stage,
+        ended_at=None
+    ).order_by(StageTiming.id.desc()).first()
+
+    if not timing:
+        return
+
+    timing.ended_at = datetime.utcnow()
+    timing.duration = (timing.ended_at - timing.started_at).total_seconds()
+    timing.success = success
+    db.session.commit()
+
+def aggregate_pipeline_timings(framework=None, deployment_type=None, since=None, successful_only=False):
+    """
+    Agrège les durées par étape, par framework et par type (vm/lxc)
+
+    Args:
+        framework: Filtrer sur un framework
+        deployment_type: Filtrer sur un type (vm ou lxc)
+        since: Ne garder que les mesures commencées après cette date
+        successful_only: Ignorer les étapes en échec
+
+    Returns:
+        Dictionnaire avec les percentiles p50/p95/p99 de chaque étape
+    """
+    query = db.session.query(
+        StageTiming.stage,
+        StageTiming.duration,
+        Deployment.framework,
+        Deployment.type
+    ).join(Deployment, Deployment.id == StageTiming.deployment_id).filter(
+        StageTiming.duration.isnot(None)
+    )
+
+    if framework:
+        query = query.filter(Deployment.framework == framework)
+    if deployment_type:
+        query = query.filter(Deployment.type == deployment_type)
+    if since:
+        query = query.filter(StageTiming.started_at >= since)
+    if successful_only:
+        query = query.filter(StageTiming.success.is_(True))
+
+    by_stage = {}
+    by_framework = {}
+    by_type = {}
+
+    for stage, duration, row_framework, row_type in query.all():
+        by_stage.setdefault(stage, []).append(duration)
+        by_framework.setdefault(row_framework, {}).setdefault(stage, []).append(duration)
+        by_type.setdefault(row_type, {}).setdefault(stage, []).append(duration)
+
+    def _summarize_stages(durations):
+        ordered = [s for s in PIPELINE_STAGES if s in durations]
+        ordered += sorted(s for s in durations if s not in PIPELINE_STAGES)
+        return {stage: summarize(durations[stage]) for stage in ordered}
+
+    return {
+        'stages': _summarize_stages(by_stage),
+        'by_framework': {key: _summarize_stages(value) for key, value in sorted(by_framework.items())},
+        'by_type': {key: _summarize_stages(value) for key, value in sorted(by_type.items())}
+    }
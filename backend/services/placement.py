@@ -0,0 +1,370 @@
+"""
+Placement des déploiements sur les noeuds du cluster Proxmox
+"""
+
+import logging
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+GIB = 1024 ** 3
+
+# Contenu qu'un storage doit accepter selon le type d'instance
+STORAGE_CONTENT = {'vm': 'images', 'lxc': 'rootdir'}
+
+# Groupes d'anti-affinité: instances d'un même framework ou d'un même préfixe de nom
+ANTI_AFFINITY_KEYS = ('framework', 'prefix')
+
+# Surallocation par ressource: capacité = capacité physique x ratio
+# (vCPU: 0 = pas de limite sur les vCPU alloués, seulement les coeurs par instance)
+DEFAULT_OVERCOMMIT = {'cpu': 0, 'memory': 1.0, 'disk': 1.0}
+
+
+class PlacementError(Exception):
+    """Aucun noeud ne peut accueillir le déploiement"""
+
+
+def name_prefix(name):
+    """Préfixe d'un nom d'instance: 'shop-web-2' -> 'shop-web'"""
+    return name.rsplit('-', 1)[0] if '-' in name else name
+
+
+def template_nodes(inventory, deployment_type, template, default_node=None):
+    """
+    Noeuds sur lesquels une instance peut être créée depuis son template
+
+    Proxmox ne clone vers un autre noeud que si le template est sur un
+    storage partagé, et un conteneur ne peut être créé qu'à partir d'un
+    ostemplate présent sur son noeud.
+
+    Args:
+        template: Nom du template de VM, ou ostemplate ('storage:vztmpl/...')
+        default_node: Noeud où se trouve un ostemplate de storage local
+
+    Returns:
+        Ensemble de noeuds, ou None si le template est accessible partout
+        (ostemplate sur storage partagé, template de VM introuvable)
+    """
+    if deployment_type == 'lxc':
+        storage = template.split(':', 1)[0]
+        entries = [s for s in inventory.storages() if s.get('storage') == storage]
+        if any(entry.get('shared') for entry in entries):
+            return None
+        return {default_node} if default_node else None
+
+    nodes = {
+        guest['node'] for guest in inventory.guests(guest_type='qemu')
+        if guest.get('template') and guest.get('name') == template
+    }
+    return nodes or None
+
+
+class NodeCandidate:
+    """
+    Capacité disponible d'un noeud, réservations déduites
+
+    Mémoire et storages en octets; cpu_allocated compte les vCPU
+    configurés des instances du noeud. Les capacités (cpu_capacity,
+    memory_capacity, storage_capacity) incluent la surallocation;
+    cpu_capacity None signifie vCPU alloués sans limite.
+    """
+
+    def __init__(self, name, cores, cpu_allocated, memory_total, memory_free, storages, shared=(),
+                 cpu_capacity=None, memory_capacity=None, storage_capacity=None):
+        self.name = name
+        self.cores = cores
+        self.cpu_allocated = cpu_allocated
+        self.memory_total = memory_total
+        self.memory_free = memory_free
+        self.storages = dict(storages)
+        self.shared = set(shared)
+        self.cpu_capacity = cpu_capacity
+        self.memory_capacity = memory_total if memory_capacity is None else memory_capacity
+        self.storage_capacity = dict(storage_capacity or {})
+        self.groups = {}
+
+    def cpu_free_ratio(self, extra=0):
+        if not self.cores:
+            return 0.0
+        return 1 - (self.cpu_allocated + extra) / self.cores
+
+    def memory_free_ratio(self, extra=0):
+        if not self.memory_total:
+            return 0.0
+        return (self.memory_free - extra) / self.memory_total
+
+
+class PlacementPolicy(ABC):
+    """
+    Politique de placement: score des noeuds et choix du storage
+
+    Le noeud de plus haut score parmi ceux qui peuvent accueillir
+    l'instance l'emporte. Une politique est ajoutée par register_policy.
+    """
+
+    name = None
+
+    @abstractmethod
+    def score(self, candidate, deployment):
+        """Score d'un noeud pour le déploiement (le plus haut l'emporte)"""
+
+    def choose_storage(self, candidate, deployment, storages):
+        """Storage parmi ceux qui ont la place (liste de (nom, octets libres))"""
+        return max(storages, key=lambda item: (item[1], item[0]))[0]
+
+
+POLICIES = {}
+
+
+def register_policy(policy_class):
+    """Enregistre une politique sous son nom (utilisable en décorateur)"""
+    POLICIES[policy_class.name] = policy_class
+    return policy_class
+
+
+@register_policy
+class SpreadPolicy(PlacementPolicy):
+    """Répartition: le noeud qui garde le plus de CPU et de mémoire libres"""
+
+    name = 'spread'
+
+    def score(self, candidate, deployment):
+        return (
+            candidate.cpu_free_ratio(deployment.cpu)
+            + candidate.memory_free_ratio(deployment.memory * MIB)
+        ) / 2
+
+
+@register_policy
+class BinPackPolicy(PlacementPolicy):
+    """Remplissage: le noeud le plus chargé qui peut encore accueillir l'instance"""
+
+    name = 'binpack'
+
+    def score(self, candidate, deployment):
+        return -SpreadPolicy.score(self, candidate, deployment)
+
+    def choose_storage(self, candidate, deployment, storages):
+        return min(storages, key=lambda item: (item[1], item[0]))[0]
+
+
+class PlacementScheduler:
+    """
+    Choisit le noeud et le storage de chaque déploiement
+
+    La capacité vient de l'inventaire du cluster, dont sont déduites les
+    réservations: déploiements placés mais pas encore visibles dans
+    l'inventaire. La mémoire déjà prise sur un noeud est la plus grande
+    de la mémoire utilisée et de la mémoire configurée des instances en
+    cours d'exécution.
+
+    Contraintes: noeud en ligne (et autorisé), vCPU demandés inférieurs
+    aux coeurs du noeud, vCPU alloués, mémoire et storage (acceptant le
+    type d'instance) dans la limite de la capacité surallouée. Parmi les
+    noeuds possibles, l'anti-affinité (framework ou préfixe de nom) prime,
+    puis le score de la politique.
+    """
+
+    def __init__(self, policy='spread', anti_affinity=None, nodes=None, storages=None, overcommit=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique de placement inconnue: {policy} ({', '.join(sorted(POLICIES))})")
+        if anti_affinity and anti_affinity not in ANTI_AFFINITY_KEYS:
+            raise ValueError(f"Anti-affinité inconnue: {anti_affinity} ({', '.join(ANTI_AFFINITY_KEYS)})")
+
+        self.overcommit = {**DEFAULT_OVERCOMMIT, **(overcommit or {})}
+        for resource, ratio in self.overcommit.items():
+            if resource not in DEFAULT_OVERCOMMIT or ratio < 0 or (ratio == 0 and resource != 'cpu'):
+                raise ValueError(f"Surallocation invalide: {resource}={ratio}")
+
+        self.policy = POLICIES[policy]()
+        self.anti_affinity = anti_affinity or None
+        self.nodes = set(nodes) if nodes else None
+        self.storages = set(storages) if storages else None
+
+    def _capacity(self, resource, physical):
+        """Capacité surallouée d'une ressource (None si sans limite)"""
+        ratio = self.overcommit[resource]
+        return physical * ratio if ratio else None
+
+    def _group(self, framework, name):
+        if self.anti_affinity == 'framework':
+            return framework
+        if self.anti_affinity == 'prefix':
+            return name_prefix(name)
+        return None
+
+    def candidates(self, inventory, deployment_type, reservations=(), placed=(), template_nodes=None):
+        """
+        Noeuds candidats et leur capacité disponible
+
+        Args:
+            inventory: ClusterInventory
+            deployment_type: vm ou lxc (contenu requis du storage)
+            reservations: (node, storage, cpu, memory_mb, disk_gb) des
+                déploiements placés mais absents de l'inventaire
+            placed: (node, framework, name) des instances placées, pour
+                l'anti-affinité
+            template_nodes: Noeuds où le template est disponible (None:
+                tous), voir template_nodes()
+
+        Returns:
+            Dictionnaire {node: NodeCandidate}
+        """
+        content = STORAGE_CONTENT[deployment_type]
+        candidates = {}
+
+        for name in inventory.node_names():
+            node = inventory.node(name)
+            if node.get('status') != 'online' or (self.nodes and name not in self.nodes):
+                continue
+            if template_nodes is not None and name not in template_nodes:
+                continue
+
+            running = inventory.guests(node=name, status='running', templates=False)
+            committed = sum(guest.get('maxmem') or 0 for guest in running)
+            used = max(node.get('mem') or 0, committed)
+
+            storages = {}
+            capacity = {}
+            shared = set()
+            for storage in inventory.storages(node=name):
+                if storage.get('status') != 'available':
+                    continue
+                if content not in (storage.get('content') or '').split(','):
+                    continue
+                if self.storages and storage['storage'] not in self.storages:
+                    continue
+                size = self._capacity('disk', storage.get('maxdisk') or 0)
+                capacity[storage['storage']] = size
+                storages[storage['storage']] = size - (storage.get('disk') or 0)
+                if storage.get('shared'):
+                    shared.add(storage['storage'])
+
+            memory_capacity = self._capacity('memory', node.get('maxmem') or 0)
+            candidates[name] = NodeCandidate(
+                name,
+                cores=node.get('maxcpu') or 0,
+                cpu_allocated=inventory.node_summary(name)['cpu']['allocated'],
+                memory_total=node.get('maxmem') or 0,
+                memory_free=memory_capacity - used,
+                storages=storages,
+                shared=shared,
+                cpu_capacity=self._capacity('cpu', node.get('maxcpu') or 0),
+                memory_capacity=memory_capacity,
+                storage_capacity=capacity
+            )
+
+        for node, storage, cpu, memory, disk in reservations:
+            self._reserve(candidates, node, storage, cpu, memory, disk)
+
+        for node, framework, name in placed:
+            group = self._group(framework, name)
+            if group is not None and node in candidates:
+                groups = candidates[node].groups
+                groups[group] = groups.get(group, 0) + 1
+
+        return candidates
+
+    def _reserve(self, candidates, node, storage, cpu, memory, disk):
+        """Déduit une instance de la capacité (un storage partagé l'est sur tous les noeuds)"""
+        candidate = candidates.get(node)
+        if candidate:
+            candidate.cpu_allocated += cpu or 0
+            candidate.memory_free -= (memory or 0) * MIB
+
+        shared = candidate is None or storage in candidate.shared
+        for other in candidates.values():
+            if storage in other.storages and (other is candidate or (shared and storage in other.shared)):
+                other.storages[storage] -= (disk or 0) * GIB
+
+    def place(self, deployment, candidates):
+        """
+        Choisit le noeud et le storage d'un déploiement et les réserve
+
+        Placer plusieurs déploiements avec les mêmes candidats (lot) tient
+        compte des placements précédents.
+
+        Args:
+            deployment: Objet avec cpu, memory (Mo), disk (Go), type,
+                framework et name
+
+        Returns:
+            Tuple (node, storage)
+
+        Raises:
+            PlacementError: si aucun noeud ne convient (raisons par noeud)
+        """
+        if not candidates:
+            raise PlacementError("Aucun noeud en ligne pour le placement")
+
+        memory = deployment.memory * MIB
+        disk = deployment.disk * GIB
+        group = self._group(deployment.framework, deployment.name)
+
+        options = []
+        reasons = []
+        for candidate in sorted(candidates.values(), key=lambda c: c.name):
+            if deployment.cpu > candidate.cores:
+                reasons.append(f"{candidate.name}: {candidate.cores} coeurs")
+                continue
+            if candidate.cpu_capacity is not None and candidate.cpu_allocated + deployment.cpu > candidate.cpu_capacity:
+                free = max(0, int(candidate.cpu_capacity - candidate.cpu_allocated))
+                reasons.append(f"{candidate.name}: {free} vCPU libres")
+                continue
+            if candidate.memory_free < memory:
+                reasons.append(f"{candidate.name}: {int(max(0, candidate.memory_free) // MIB)} Mo de mémoire libres")
+                continue
+
+            storages = [(name, free) for name, free in candidate.storages.items() if free >= disk]
+            if not storages:
+                best = max(candidate.storages.values(), default=0)
+                reasons.append(f"{candidate.name}: {int(max(0, best) // GIB)} Go de disque libres")
+                continue
+
+            options.append((
+                -candidate.groups.get(group, 0) if group is not None else 0,
+                self.policy.score(candidate, deployment),
+                candidate,
+                self.policy.choose_storage(candidate, deployment, storages)
+            ))
+
+        if not options:
+            raise PlacementError(
+                f"Aucun noeud ne peut accueillir {deployment.cpu} CPU, {deployment.memory} Mo "
+                f"et {deployment.disk} Go ({'; '.join(reasons)})"
+            )
+
+        # À égalité, le premier noeud par ordre alphabétique
+        _, _, candidate, storage = max(options, key=lambda option: option[:2])
+
+        self._reserve(candidates, candidate.name, storage, deployment.cpu, deployment.memory, deployment.disk)
+        if group is not None:
+            candidate.groups[group] = candidate.groups.get(group, 0) + 1
+
+        return candidate.name, storage
+
+    def oversized(self, deployment, candidates):
+        """
+        Raison pour laquelle un déploiement ne tiendrait sur aucun noeud, même vide
+
+        Returns:
+            Message d'erreur, ou None si au moins un noeud peut l'accueillir
+            une fois de la capacité libérée
+        """
+        memory = deployment.memory * MIB
+        disk = deployment.disk * GIB
+
+        for candidate in candidates.values():
+            cpu_limit = min(candidate.cores, candidate.cpu_capacity or candidate.cores)
+            if deployment.cpu > cpu_limit:
+                continue
+            if memory > candidate.memory_capacity:
+                continue
+            if any(disk <= size for size in candidate.storage_capacity.values()):
+                return None
+
+        return (
+            f"{deployment.cpu} CPU, {deployment.memory} Mo et {deployment.disk} Go dépassent "
+            f"la capacité de chaque noeud du cluster"
+        )
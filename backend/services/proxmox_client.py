@@ -0,0 +1,387 @@
+"""
+Client partagé de l'API Proxmox: connexions persistantes, limitation de débit et reprises
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from proxmoxer import ProxmoxAPI
+
+from utils.config import Config
+from utils.metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures (secondes) de l'histogramme des latences
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Nombre de latences conservées par endpoint pour les percentiles
+LATENCY_SAMPLES = 500
+
+# Réponses rejouées: erreurs du serveur ou de pveproxy
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Méthodes rejouables quelle que soit l'erreur; POST et DELETE (clone,
+# création, suppression) ne le sont que si la requête n'a pas été traitée
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT')
+
+# Délai minimal entre deux reconstructions de la connexion (secondes)
+RECONNECT_INTERVAL = 5
+
+
+class TokenBucket:
+    """
+    Seau à jetons partagé entre tous les threads
+
+    rate jetons par seconde, au plus burst d'avance. Un jeton est réservé
+    dès l'appel (le seau peut devenir débiteur): les appelants sont servis
+    dans l'ordre d'arrivée et chacun dort hors du verrou le temps de sa dette.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst or rate or 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def reserve(self):
+        """
+        Réserve un jeton
+
+        Returns:
+            Attente nécessaire avant d'émettre la requête (secondes)
+        """
+        if not self.rate:
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        """Attend un jeton; retourne le temps d'attente (secondes)"""
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def _not_sent(error):
+    """Vrai si la connexion n'a pas pu être établie (la requête n'est pas partie)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def endpoint_name(method, url):
+    """
+    Nom d'endpoint à cardinalité bornée pour les métriques
+
+    Les noeuds, storages, VMIDs et UPIDs sont remplacés par des
+    paramètres: "GET /nodes/{node}/qemu/{vmid}/status/current".
+    """
+    path = re.sub(r'^[a-z]+://[^/]+', '', url.split('?', 1)[0])
+    path = re.sub(r'^/api2/(json|extjs)', '', path)
+
+    segments = []
+    previous = None
+    for segment in path.strip('/').split('/'):
+        if previous == 'nodes':
+            segment = '{node}'
+        elif previous == 'storage':
+            segment = '{storage}'
+        elif segment.startswith('UPID:'):
+            segment = '{upid}'
+        elif segment.isdigit():
+            segment = '{vmid}'
+        segments.append(segment)
+        previous = segment
+
+    return f"{method.upper()} /{'/'.join(segments)}"
+
+
+class ProxmoxClient:
+    """
+    Client Proxmox unique du processus
+
+    Toutes les requêtes de proxmoxer passent par request():
+    - connexions HTTPS persistantes (keep-alive) dans un pool de
+      PROXMOX_POOL_SIZE connexions réutilisées par tous les threads;
+    - débit plafonné par un seau à jetons partagé (PROXMOX_RATE_LIMIT
+      requêtes/s, rafales de PROXMOX_RATE_BURST);
+    - reprise avec backoff exponentiel des erreurs 5xx, délais dépassés et
+      connexions perdues (PROXMOX_MAX_RETRIES);
+    - sur 401 ou connexion perdue, la session est reconstruite et la
+      requête rejouée.
+    """
+
+    def __init__(self, api_url=None, token_id=None, token_secret=None, rate=None, burst=None,
+                 max_retries=None, backoff=None, pool_size=None, timeout=None):
+        self.api_url = Config.PROXMOX_API_URL if api_url is None else api_url
+        self.token_id = Config.PROXMOX_API_TOKEN_ID if token_id is None else token_id
+        self.token_secret = Config.PROXMOX_API_TOKEN_SECRET if token_secret is None else token_secret
+        self.max_retries = Config.PROXMOX_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = Config.PROXMOX_RETRY_BACKOFF if backoff is None else backoff
+        self.pool_size = Config.PROXMOX_POOL_SIZE if pool_size is None else pool_size
+        self.timeout = Config.PROXMOX_TIMEOUT if timeout is None else timeout
+        self.bucket = TokenBucket(
+            Config.PROXMOX_RATE_LIMIT if rate is None else rate,
+            Config.PROXMOX_RATE_BURST if burst is None else burst
+        )
+
+        self._lock = threading.Lock()
+        self._api = None
+        self._send = None
+        self._last_connect = -RECONNECT_INTERVAL
+        self._reconnects = 0
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+
+    @property
+    def configured(self):
+        return bool(self.api_url and self.token_id and self.token_secret)
+
+    @property
+    def api(self):
+        """ProxmoxAPI partagée (None si la configuration est incomplète)"""
+        if self._api is None:
+            self.connect()
+        return self._api
+
+    def connect(self, force=False):
+        """
+        (Re)construit la connexion à l'API
+
+        Une tentative au plus par RECONNECT_INTERVAL: les threads qui
+        constatent la même coupure réutilisent la nouvelle session.
+        """
+        with self._lock:
+            if self._api is not None and not force:
+                return self._api
+            if time.monotonic() - self._last_connect < RECONNECT_INTERVAL:
+                return self._api
+            self._last_connect = time.monotonic()
+
+            if not self.configured:
+                logger.warning("⚠️ Configuration Proxmox incomplète")
+                return None
+
+            try:
+                user, token_name = self.token_id.split('!')
+                api = ProxmoxAPI(
+                    self.api_url,
+                    user=user,
+                    token_name=token_name,
+                    token_value=self.token_secret,
+                    verify_ssl=False,
+                    timeout=self.timeout
+                )
+            except Exception as e:
+                logger.error(f"❌ Erreur de connexion à Proxmox: {e}")
+                return self._api
+
+            previous = self._api
+            # proxmoxer partage sa session entre toutes les ressources via _store
+            self.instrument(api._store['session'])
+            self._api = api
+
+            if previous is not None:
+                self._reconnects += 1
+                logger.warning(f"🔌 Session Proxmox reconstruite: {self.api_url}")
+            else:
+                logger.info(f"✅ Connecté à Proxmox: {self.api_url}")
+
+            return api
+
+    def instrument(self, session):
+        """
+        Installe le pool de connexions et le contrôle des requêtes sur une session
+
+        La méthode request d'origine de la session devient celle par
+        laquelle toutes les requêtes sont émises.
+        """
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        self._send = session.request
+        session.request = self.request
+
+    def request(self, method, url, **kwargs):
+        """
+        Émet une requête (débit limité, reprises, reconnexion)
+
+        Les requêtes d'une session remplacée sont émises par la nouvelle.
+        """
+        method = method.upper()
+        endpoint = endpoint_name(method, url)
+        retryable = method in IDEMPOTENT_METHODS
+        reconnected = False
+        attempt = 0
+
+        while True:
+            waited = self.bucket.acquire()
+            if waited:
+                self._record_throttle(waited)
+
+            send = self._send
+            start = time.monotonic()
+            try:
+                response = send(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error, safe = e, retryable or _not_sent(e)
+            else:
+                error = None
+
+            elapsed = time.monotonic() - start
+            status = response.status_code if error is None else None
+            self._record(endpoint, method, status, elapsed)
+
+            if status == 401 and not reconnected:
+                # Jeton révoqué ou session expirée: nouvelle session, un seul essai
+                reconnected = True
+                self.connect(force=True)
+                continue
+
+            if error is None:
+                # 503: pveproxy surchargé, la requête n'a pas été traitée
+                safe = retryable or status == 503
+                if status not in RETRY_STATUSES:
+                    return response
+
+            if not safe or attempt >= self.max_retries:
+                if error is not None:
+                    if not reconnected:
+                        self.connect(force=True)
+                    raise error
+                return response
+
+            attempt += 1
+            delay = min(self.backoff * 2 ** (attempt - 1), 30) * random.uniform(0.5, 1.0)
+            self._record_retry()
+            logger.warning(
+                f"🔁 Proxmox {endpoint}: {error or status}, nouvel essai {attempt}/{self.max_retries} "
+                f"dans {delay:.1f}s"
+            )
+            if error is not None and not reconnected:
+                reconnected = True
+                self.connect(force=True)
+            time.sleep(delay)
+
+    def _reset_metrics(self):
+        self._requests = 0
+        self._errors = 0
+        self._retries = 0
+        self._by_status = {}
+        self._by_method = {}
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._endpoints = {}
+        self._throttled = 0
+        self._throttle_total = 0.0
+        self._throttle_max = 0.0
+
+    def _record(self, endpoint, method, status, elapsed):
+        status_class = f"{status // 100}xx" if status else 'network'
+        failed = status is None or status >= 400
+
+        with self._metrics_lock:
+            self._requests += 1
+            self._errors += failed
+            self._by_status[status_class] = self._by_status.get(status_class, 0) + 1
+            self._by_method[method] = self._by_method.get(method, 0) + 1
+            self._buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            self._latency_sum += elapsed
+
+            entry = self._endpoints.setdefault(endpoint, {
+                'count': 0,
+                'errors': 0,
+                'latencies': deque(maxlen=LATENCY_SAMPLES)
+            })
+            entry['count'] += 1
+            entry['errors'] += failed
+            entry['latencies'].append(elapsed)
+
+    def _record_retry(self):
+        with self._metrics_lock:
+            self._retries += 1
+
+    def _record_throttle(self, waited):
+        with self._metrics_lock:
+            self._throttled += 1
+            self._throttle_total += waited
+            self._throttle_max = max(self._throttle_max, waited)
+
+    def stats(self):
+        """Compteurs de requêtes, histogramme des latences et attentes du limiteur"""
+        with self._metrics_lock:
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self._buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+
+            endpoints = {
+                name: {
+                    'count': entry['count'],
+                    'errors': entry['errors'],
+                    'latency': summarize(list(entry['latencies']))
+                }
+                for name, entry in sorted(self._endpoints.items())
+            }
+
+            return {
+                'connected': self._api is not None,
+                'reconnects': self._reconnects,
+                'pool_size': self.pool_size,
+                'timeout': self.timeout,
+                'requests': {
+                    'total': self._requests,
+                    'errors': self._errors,
+                    'retries': self._retries,
+                    'by_status': dict(self._by_status),
+                    'by_method': dict(self._by_method)
+                },
+                'latency': {
+                    'buckets': histogram,
+                    'sum': round(self._latency_sum, 3),
+                    'count': self._requests
+                },
+                'throttle': {
+                    'rate': self.bucket.rate,
+                    'burst': self.bucket.burst,
+                    'throttled': self._throttled,
+                    'wait_total': round(self._throttle_total, 3),
+                    'wait_max': round(self._throttle_max, 3)
+                },
+                'endpoints': endpoints
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_proxmox_client():
+    """Client Proxmox du processus (créé au premier appel)"""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = ProxmoxClient()
+        return _client
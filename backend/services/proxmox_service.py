@@ -4,45 +4,41 @@ Service Proxmox pour interagir avec l'API
 
 import os
 import logging
-from proxmoxer import ProxmoxAPI
+
+from services.proxmox_client import get_proxmox_client
+from services.cluster_inventory import ClusterInventory
+from services.task_tracker import get_task_tracker, parse_upid
+from utils.config import Config
 
 logger = logging.getLogger(__name__)
 
 class ProxmoxService:
     """Service pour interagir avec Proxmox"""
     
-    def __init__(self):
-        self.api_url = os.getenv('PROXMOX_API_URL', '')
-        self.token_id = os.getenv('PROXMOX_API_TOKEN_ID')
-        self.token_secret = os.getenv('PROXMOX_API_TOKEN_SECRET')
+    def __init__(self, client=None, tasks=None):
+        # Client partagé par tout le processus (pool de connexions, débit, reprises)
+        self.client = client or get_proxmox_client()
+        # Suivi des tâches (UPID) partagé avec les autres utilisateurs du client
+        self.tasks = tasks or get_task_tracker(self.client)
         self.node = os.getenv('PROXMOX_NODE', 'pve')
-        self.proxmox = None
-        
-        self._connect()
     
-    def _connect(self):
-        """Se connecte à l'API Proxmox"""
-        try:
-            if not self.api_url or not self.token_id or not self.token_secret:
-                logger.warning("⚠️ Configuration Proxmox incomplète")
-                return
-            
-            # Parse token
-            user, token_name = self.token_id.split('!')
-            
-            self.proxmox = ProxmoxAPI(
-                self.api_url,
-                user=user,
-                token_name=token_name,
-                token_value=self.token_secret,
-                verify_ssl=False
-            )
-            
-            logger.info(f"✅ Connecté à Proxmox: {self.api_url}")
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur de connexion à Proxmox: {e}")
-            self.proxmox = None
+    @property
+    def proxmox(self):
+        """API Proxmox (None si la configuration est incomplète)"""
+        return self.client.api
+    
+    def _run_task(self, upid, description, timeout=None):
+        """Attend la tâche lancée par un appel, journalise sa durée ou son code de sortie"""
+        timeout = Config.PROXMOX_TASK_TIMEOUT if timeout is None else timeout
+        task = self.tasks.track(upid)
+        
+        if not task.wait(timeout):
+            reason = task.exitstatus if task.done else f"toujours en cours après {timeout}s"
+            logger.error(f"❌ {description}: {reason}")
+            return False
+        
+        logger.info(f"✅ {description} terminé en {task.duration:.1f}s")
+        return True
     
     def test_connection(self):
         """Teste la connexion à Proxmox"""
@@ -59,41 +55,9 @@ class ProxmoxService:
             return False
     
     def get_cluster_resources(self):
-        """Récupère les ressources du cluster"""
+        """Récupère les ressources du cluster (un seul appel à /cluster/resources)"""
         try:
-            if not self.proxmox:
-                return {'error': 'Non connecté à Proxmox'}
-            
-            # Informations sur le noeud
-            node_status = self.proxmox.nodes(self.node).status.get()
-            
-            # VMs et conteneurs
-            vms = self.proxmox.nodes(self.node).qemu.get()
-            lxc = self.proxmox.nodes(self.node).lxc.get()
-            
-            return {
-                'node': {
-                    'name': self.node,
-                    'status': node_status.get('status'),
-                    'cpu': {
-                        'cores': node_status.get('cpuinfo', {}).get('cpus', 0),
-                        'usage': round(node_status.get('cpu', 0) * 100, 2)
-                    },
-                    'memory': {
-                        'total': round(node_status.get('memory', {}).get('total', 0) / 1024**3, 2),
-                        'used': round(node_status.get('memory', {}).get('used', 0) / 1024**3, 2),
-                        'free': round(node_status.get('memory', {}).get('free', 0) / 1024**3, 2)
-                    }
-                },
-                'vms': {
-                    'total': len(vms),
-                    'running': sum(1 for vm in vms if vm.get('status') == 'running')
-                },
-                'containers': {
-                    'total': len(lxc),
-                    'running': sum(1 for ct in lxc if ct.get('status') == 'running')
-                }
-            }
+            return ClusterInventory.fetch(self).to_dict(self.node)
             
         except Exception as e:
             logger.error(f"❌ Erreur récupération ressources: {e}")
@@ -112,64 +76,339 @@ class ProxmoxService:
             logger.error(f"❌ Erreur récupération statut VM {vmid}: {e}")
             return None
     
-    def start_vm(self, node, vmid):
-        """Démarre une VM"""
+    def start_vm(self, node, vmid, timeout=None):
+        """Démarre une VM et attend la fin de la tâche"""
         try:
             if not self.proxmox:
                 return False
             
-            self.proxmox.nodes(node).qemu(vmid).status.start.post()
-            logger.info(f"✅ VM {vmid} démarrée")
-            return True
+            upid = self.proxmox.nodes(node).qemu(vmid).status.start.post()
+            return self._run_task(upid, f"Démarrage VM {vmid}", timeout)
             
         except Exception as e:
             logger.error(f"❌ Erreur démarrage VM {vmid}: {e}")
             return False
     
-    def stop_vm(self, node, vmid):
-        """Arrête une VM"""
+    def stop_vm(self, node, vmid, timeout=None):
+        """Arrête une VM et attend la fin de la tâche"""
         try:
             if not self.proxmox:
                 return False
             
-            self.proxmox.nodes(node).qemu(vmid).status.stop.post()
-            logger.info(f"✅ VM {vmid} arrêtée")
-            return True
+            upid = self.proxmox.nodes(node).qemu(vmid).status.stop.post()
+            return self._run_task(upid, f"Arrêt VM {vmid}", timeout)
             
         except Exception as e:
             logger.error(f"❌ Erreur arrêt VM {vmid}: {e}")
             return False
     
     def restart_vm(self, node, vmid):
-        """Redémarre une VM"""
+        """
+        Lance le redémarrage d'une VM sans attendre la fin de la tâche
+        
+        La tâche est suivie par le TaskTracker; son état est consultable
+        avec get_task.
+        
+        Returns:
+            UPID de la tâche, ou None en cas d'erreur
+        """
+        try:
+            if not self.proxmox:
+                return None
+            
+            upid = self.proxmox.nodes(node).qemu(vmid).status.reboot.post()
+            self.tasks.track(upid)
+            logger.info(f"🔄 Redémarrage VM {vmid} lancé ({upid})")
+            return upid
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur redémarrage VM {vmid}: {e}")
+            return None
+    
+    def get_task(self, upid):
+        """
+        État d'une tâche Proxmox
+        
+        Returns:
+            Dictionnaire (upid, status running|stopped, exitstatus, success),
+            ou None si la tâche est inconnue ou Proxmox injoignable
+        """
+        try:
+            if not self.proxmox:
+                return None
+            
+            entry = self.proxmox.nodes(parse_upid(upid)['node']).tasks(upid).status.get()
+            exitstatus = entry.get('exitstatus')
+            return {
+                'upid': upid,
+                'status': entry.get('status'),
+                'exitstatus': exitstatus,
+                'success': exitstatus == 'OK' or str(exitstatus or '').startswith('WARNINGS')
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur statut tâche {upid}: {e}")
+            return None
+    
+    def delete_vm(self, node, vmid, timeout=None):
+        """Supprime une VM (arrêtée d'abord si elle tourne) et attend la fin de la tâche"""
+        try:
+            if not self.proxmox:
+                return False
+            
+            # Arrêter d'abord si en cours d'exécution: la suppression échoue tant
+            # que la tâche d'arrêt n'est pas terminée
+            status = self.get_vm_status(node, vmid)
+            if status and status.get('status') == 'running' and not self.stop_vm(node, vmid, timeout):
+                return False
+            
+            upid = self.proxmox.nodes(node).qemu(vmid).delete()
+            return self._run_task(upid, f"Suppression VM {vmid}", timeout)
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur suppression VM {vmid}: {e}")
+            return False
+    
+    def find_vm_by_name(self, node, name):
+        """Retourne le VMID d'une VM (ou d'un template) à partir de son nom"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            for vm in self.proxmox.nodes(node).qemu.get():
+                if vm.get('name') == name:
+                    return int(vm['vmid'])
+            return None
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche VM {name}: {e}")
+            return None
+    
+    def next_vmid(self):
+        """Prochain VMID libre du cluster"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            return int(self.proxmox.cluster.nextid.get())
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur récupération du prochain VMID: {e}")
+            return None
+    
+    def locate_vm(self, name_or_vmid):
+        """
+        Noeud et VMID d'une VM ou d'un template du cluster, par nom ou VMID
+        
+        Returns:
+            Tuple (node, vmid), ou None si elle est introuvable
+        """
+        try:
+            if not self.proxmox:
+                return None
+            
+            for vm in self.proxmox.cluster.resources.get(type='vm'):
+                if vm.get('type') != 'qemu':
+                    continue
+                if str(vm.get('vmid')) == str(name_or_vmid) or vm.get('name') == name_or_vmid:
+                    return vm['node'], int(vm['vmid'])
+            return None
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur recherche VM {name_or_vmid}: {e}")
+            return None
+    
+    def clone_vm(self, node, source_vmid, newid, name, target=None, storage=None):
+        """
+        Clone complet d'un template, retourne l'UPID de la tâche Proxmox
+        
+        Args:
+            node: Noeud du template (la tâche s'y exécute)
+            target: Noeud de destination (défaut: celui du template)
+            storage: Storage du disque cloné (défaut: celui du template)
+        """
+        try:
+            if not self.proxmox:
+                return None
+            
+            options = {}
+            if target and target != node:
+                options['target'] = target
+            if storage:
+                options['storage'] = storage
+            
+            upid = self.proxmox.nodes(node).qemu(source_vmid).clone.post(
+                newid=newid,
+                name=name,
+                full=1,
+                **options
+            )
+            logger.info(f"✅ Clone {source_vmid} -> {newid} ({name}) lancé")
+            return upid
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur clonage VM {source_vmid}: {e}")
+            return None
+    
+    def wait_for_task(self, node, upid, timeout=600):
+        """
+        Attend la fin d'une tâche Proxmox, retourne True si elle a réussi
+        
+        Le suivi est mutualisé par le TaskTracker (le noeud est celui de l'UPID).
+        """
+        try:
+            if not self.proxmox:
+                return False
+            
+            return self._run_task(upid, f"Tâche {upid}", timeout)
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur suivi tâche {upid}: {e}")
+            return False
+    
+    def get_vm_ip(self, node, vmid):
+        """Adresse IPv4 d'une VM via l'agent QEMU (None si indisponible)"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            result = self.proxmox.nodes(node).qemu(vmid).agent('network-get-interfaces').get()
+            for interface in result.get('result', []):
+                for address in interface.get('ip-addresses', []):
+                    ip = address.get('ip-address', '')
+                    if address.get('ip-address-type') == 'ipv4' and not ip.startswith('127.'):
+                        return ip
+            return None
+            
+        except Exception as e:
+            logger.debug(f"Agent QEMU de la VM {vmid} pas encore disponible: {e}")
+            return None
+    
+    def shutdown_vm(self, node, vmid, timeout=300):
+        """Arrêt propre d'une VM (ACPI), attend qu'elle soit arrêtée"""
         try:
             if not self.proxmox:
                 return False
             
-            self.proxmox.nodes(node).qemu(vmid).status.reboot.post()
-            logger.info(f"✅ VM {vmid} redémarrée")
+            upid = self.proxmox.nodes(node).qemu(vmid).status.shutdown.post(timeout=timeout)
+            return self.wait_for_task(node, upid, timeout=timeout + 30)
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur arrêt propre VM {vmid}: {e}")
+            return False
+    
+    def convert_to_template(self, node, vmid):
+        """Convertit une VM arrêtée en template"""
+        try:
+            if not self.proxmox:
+                return False
+            
+            self.proxmox.nodes(node).qemu(vmid).template.post()
+            logger.info(f"✅ VM {vmid} convertie en template")
             return True
             
         except Exception as e:
-            logger.error(f"❌ Erreur redémarrage VM {vmid}: {e}")
+            logger.error(f"❌ Erreur conversion en template de la VM {vmid}: {e}")
             return False
     
-    def delete_vm(self, node, vmid):
-        """Supprime une VM"""
+    def configure_vm(self, node, vmid, **config):
+        """Modifie la configuration d'une VM (CPU, mémoire, réseau, cloud-init...)"""
         try:
             if not self.proxmox:
                 return False
             
-            # Arrêter d'abord si en cours d'exécution
-            status = self.get_vm_status(node, vmid)
-            if status and status.get('status') == 'running':
-                self.stop_vm(node, vmid)
+            self.proxmox.nodes(node).qemu(vmid).config.put(**config)
+            return True
             
-            # Supprimer
-            self.proxmox.nodes(node).qemu(vmid).delete()
-            logger.info(f"✅ VM {vmid} supprimée")
+        except Exception as e:
+            logger.error(f"❌ Erreur configuration VM {vmid}: {e}")
+            return False
+    
+    def resize_disk(self, node, vmid, disk, size):
+        """Agrandit un disque de VM (size: taille absolue, ex. '20G')"""
+        try:
+            if not self.proxmox:
+                return False
+            
+            self.proxmox.nodes(node).qemu(vmid).resize.put(disk=disk, size=size)
             return True
             
         except Exception as e:
-            logger.error(f"❌ Erreur suppression VM {vmid}: {e}")
+            logger.error(f"❌ Erreur redimensionnement du disque {disk} de la VM {vmid}: {e}")
+            return False
+    
+    def create_lxc(self, node, vmid, **config):
+        """Crée un conteneur LXC, retourne l'UPID de la tâche Proxmox"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            upid = self.proxmox.nodes(node).lxc.post(vmid=vmid, **config)
+            logger.info(f"✅ Création du conteneur {vmid} lancée")
+            return upid
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur création conteneur {vmid}: {e}")
+            return None
+    
+    def get_lxc_status(self, node, vmid):
+        """Récupère le statut d'un conteneur LXC"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            return self.proxmox.nodes(node).lxc(vmid).status.current.get()
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur récupération statut conteneur {vmid}: {e}")
+            return None
+    
+    def start_lxc(self, node, vmid):
+        """Démarre un conteneur LXC et attend la fin de la tâche"""
+        try:
+            if not self.proxmox:
+                return False
+            
+            upid = self.proxmox.nodes(node).lxc(vmid).status.start.post()
+            return self._run_task(upid, f"Démarrage conteneur {vmid}")
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur démarrage conteneur {vmid}: {e}")
+            return False
+    
+    def get_lxc_ip(self, node, vmid):
+        """Adresse IPv4 d'un conteneur LXC (None si pas encore attribuée)"""
+        try:
+            if not self.proxmox:
+                return None
+            
+            for interface in self.proxmox.nodes(node).lxc(vmid).interfaces.get():
+                if interface.get('name') == 'lo':
+                    continue
+                ip = (interface.get('inet') or '').split('/')[0]
+                if ip:
+                    return ip
+            return None
+            
+        except Exception as e:
+            logger.debug(f"Interfaces du conteneur {vmid} pas encore disponibles: {e}")
+            return None
+    
+    def delete_lxc(self, node, vmid):
+        """Supprime un conteneur LXC (arrêté d'abord s'il tourne)"""
+        try:
+            if not self.proxmox:
+                return False
+            
+            status = self.get_lxc_status(node, vmid)
+            if status and status.get('status') == 'running':
+                upid = self.proxmox.nodes(node).lxc(vmid).status.stop.post()
+                if not self._run_task(upid, f"Arrêt conteneur {vmid}", timeout=120):
+                    return False
+            
+            upid = self.proxmox.nodes(node).lxc(vmid).delete()
+            return self._run_task(upid, f"Suppression conteneur {vmid}")
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur suppression conteneur {vmid}: {e}")
             return False
@@ -0,0 +1,153 @@
+"""
+Sondeur de disponibilité asynchrone partagé par tous les déploiements
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessProber:
+    """
+    Surveille la disponibilité des VMs depuis une unique boucle asyncio
+
+    Chaque surveillance est une coroutine qui tente une connexion TCP (ou lit
+    la bannière SSH) avec un backoff exponentiel et du jitter. Aucune VM en
+    attente n'occupe de thread: le résultat est livré via un Future dès que
+    le port répond, ou à False lorsque le délai est dépassé.
+    """
+
+    def __init__(self, port=22, probe='tcp', initial_delay=0.5, max_delay=5.0, connect_timeout=3.0):
+        self.port = port
+        self.probe = probe
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Statistiques
+        self._pending = 0
+        self._ready = 0
+        self._timeouts = 0
+        self._attempts = 0
+        self._ready_times = []
+
+    def _ensure_started(self):
+        """Démarre la boucle d'événements dans un thread dédié"""
+        with self._lock:
+            if self._loop:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever,
+                name='readiness-prober',
+                daemon=True
+            )
+            self._thread.start()
+            logger.info("📡 Sondeur de disponibilité démarré")
+
+    def watch(self, host, timeout, port=None):
+        """
+        Surveille un hôte jusqu'à ce qu'il réponde
+
+        Args:
+            host: Adresse IP de la VM
+            timeout: Délai maximal en secondes
+            port: Port à sonder (port configuré par défaut)
+
+        Returns:
+            concurrent.futures.Future résolu à True (prête) ou False (timeout)
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(
+            self._watch(host, port or self.port, timeout),
+            self._loop
+        )
+
+    async def _watch(self, host, port, timeout):
+        """Boucle de sondage avec backoff exponentiel et jitter"""
+        start = time.monotonic()
+        deadline = start + timeout
+        attempt = 0
+
+        # Compté ici et non dans watch: une surveillance annulée avant son
+        # démarrage n'exécute jamais le finally qui la décompte
+        with self._lock:
+            self._pending += 1
+
+        try:
+            while True:
+                with self._lock:
+                    self._attempts += 1
+
+                if await self._probe_once(host, port):
+                    elapsed = time.monotonic() - start
+                    with self._lock:
+                        self._ready += 1
+                        self._ready_times.append(elapsed)
+                        del self._ready_times[:-1000]
+                    logger.info(f"✅ VM prête - port {port} accessible sur {host} ({elapsed:.1f}s)")
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self._timeouts += 1
+                    logger.warning(f"⏱️ {host}:{port} toujours injoignable après {timeout}s")
+                    return False
+
+                delay = min(self.max_delay, self.initial_delay * (2 ** attempt))
+                delay = random.uniform(delay / 2, delay)
+                attempt += 1
+                await asyncio.sleep(min(delay, remaining))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def _probe_once(self, host, port):
+        """Une tentative de connexion (TCP simple ou bannière SSH)"""
+        if not host:
+            return False
+
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port),
+                timeout=self.connect_timeout
+            )
+
+            if self.probe == 'ssh':
+                banner = await asyncio.wait_for(reader.readline(), timeout=self.connect_timeout)
+                return banner.startswith(b'SSH-')
+
+            return True
+
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"VM pas encore prête ({host}:{port}): {e}")
+            return False
+        finally:
+            if writer:
+                writer.close()
+
+    def stats(self):
+        """Statistiques du sondeur"""
+        with self._lock:
+            times = sorted(self._ready_times)
+            return {
+                'pending': self._pending,
+                'ready': self._ready,
+                'timeouts': self._timeouts,
+                'attempts': self._attempts,
+                'time_to_ready_seconds': {
+                    'median': round(times[len(times) // 2], 3) if times else 0,
+                    'max': round(times[-1], 3) if times else 0
+                }
+            }
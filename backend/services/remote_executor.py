@@ -0,0 +1,402 @@
+"""
+Exécution de scripts sur les VMs (SSH) avec sortie diffusée ligne par ligne
+"""
+
+import os
+import time
+import select
+import signal
+import logging
+import threading
+import selectors
+import subprocess
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Politiques de vérification des clés d'hôte SSH (SSH_HOST_KEY_POLICY)
+HOST_KEY_POLICIES = ('tofu', 'reject', 'warning', 'auto')
+
+# Écritures concurrentes du known_hosts de la plateforme
+_known_hosts_lock = threading.Lock()
+
+# Le script tourne dans sa propre session, dont l'identifiant (PGID) est
+# écrit en première ligne: le groupe entier peut être tué à l'expiration
+SSH_WRAPPER = "setsid -w bash -c 'echo $$; exec bash -s'"
+
+
+class CommandTimeoutError(Exception):
+    """Levée lorsqu'une commande dépasse son délai d'exécution"""
+
+
+class RemoteCommandError(Exception):
+    """Levée lorsqu'une commande se termine avec un code de retour non nul"""
+
+    def __init__(self, exit_code, description=''):
+        self.exit_code = exit_code
+        super().__init__(f"{description or 'Commande'} terminée avec le code {exit_code}")
+
+
+class LineBuffer:
+    """Découpe un flux d'octets en lignes complètes"""
+
+    def __init__(self, stream, on_line):
+        self.stream = stream
+        self.on_line = on_line
+        self._pending = b''
+
+    def feed(self, data):
+        self._pending += data
+        *lines, self._pending = self._pending.split(b'\n')
+        for line in lines:
+            self.on_line(self.stream, line.decode('utf-8', errors='replace').rstrip('\r'))
+
+    def flush(self):
+        if self._pending:
+            self.on_line(self.stream, self._pending.decode('utf-8', errors='replace').rstrip('\r'))
+            self._pending = b''
+
+
+def _names_match(names, host):
+    """Vrai si le champ d'hôtes d'une ligne known_hosts désigne host (quel que soit le port)"""
+    return any(name == host or name.startswith(f'[{host}]:') for name in names.split(','))
+
+
+def forget_host_key(path, host):
+    """
+    Retire d'un known_hosts les clés d'un hôte
+
+    Appelé lorsqu'une nouvelle instance prend une adresse: la clé de
+    l'ancienne instance provoquerait un refus de connexion.
+
+    Returns:
+        Nombre de clés retirées
+    """
+    if not path or not host:
+        return 0
+
+    with _known_hosts_lock:
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        kept = [line for line in lines if not (line.strip() and _names_match(line.split()[0], host))]
+
+        if len(kept) != len(lines):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(kept)
+        return len(lines) - len(kept)
+
+
+class TrustOnFirstUsePolicy:
+    """
+    Politique paramiko: la clé d'un hôte inconnu est acceptée et enregistrée
+
+    Les connexions suivantes sont vérifiées contre la clé enregistrée (une
+    clé différente est refusée par paramiko). Les clés des instances créées
+    par la plateforme sont oubliées à leur création (forget_host_key).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def missing_host_key(self, client, hostname, key):
+        client.get_host_keys().add(hostname, key.get_name(), key)
+
+        if self.path:
+            with _known_hosts_lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(f"{hostname} {key.get_name()} {key.get_base64()}\n")
+
+        logger.info(f"🔑 Clé d'hôte {key.get_name()} de {hostname} enregistrée")
+
+
+class RemoteSession(ABC):
+    """Connexion à un hôte, réutilisable pour plusieurs commandes"""
+
+    def __init__(self, host):
+        self.host = host
+
+    @abstractmethod
+    def run(self, script, timeout, on_line=None, deadline=None):
+        """
+        Exécute un script bash sur l'hôte
+
+        Args:
+            script: Contenu du script (envoyé sur l'entrée standard de bash)
+            timeout: Délai maximal en secondes
+            on_line: Callback (stream, line) appelé pour chaque ligne produite
+            deadline: Deadline du déploiement (échéance globale et annulation)
+
+        Returns:
+            Code de retour du script
+
+        Raises:
+            CommandTimeoutError: si le délai est dépassé
+            DeadlineExceeded, OperationCancelled: si la deadline l'impose
+        """
+
+    def close(self):
+        """Ferme la connexion"""
+
+
+class SSHSession(RemoteSession):
+    """
+    Session SSH (paramiko) sur une VM
+
+    Les clés d'hôte connues sont lues dans le known_hosts du système et dans
+    known_hosts_path; une clé inconnue est acceptée et enregistrée dans
+    known_hosts_path (host_key_policy 'tofu'), refusée ('reject'), signalée
+    ('warning') ou acceptée sans être enregistrée ('auto').
+    """
+
+    def __init__(self, host, user='root', port=22, key_path=None, connect_timeout=10,
+                 known_hosts_path=None, host_key_policy='tofu'):
+        super().__init__(host)
+        self.user = user
+
+        try:
+            import paramiko
+        except ImportError:
+            raise RuntimeError("paramiko est requis pour l'exécution SSH (pip install paramiko)")
+
+        policies = {
+            'tofu': lambda: TrustOnFirstUsePolicy(known_hosts_path),
+            'reject': paramiko.RejectPolicy,
+            'warning': paramiko.WarningPolicy,
+            'auto': paramiko.AutoAddPolicy
+        }
+        if host_key_policy not in policies:
+            raise ValueError(f"Politique de clé d'hôte inconnue: {host_key_policy}")
+
+        self.client = paramiko.SSHClient()
+        self.client.load_system_host_keys()
+        if known_hosts_path and os.path.exists(known_hosts_path):
+            self.client.load_host_keys(known_hosts_path)
+        self.client.set_missing_host_key_policy(policies[host_key_policy]())
+        self.client.connect(
+            host,
+            port=port,
+            username=user,
+            key_filename=key_path or None,
+            timeout=connect_timeout,
+            banner_timeout=connect_timeout,
+            auth_timeout=connect_timeout
+        )
+        logger.info(f"🔐 Connexion SSH ouverte: {user}@{host}")
+
+    def _sudo(self, command):
+        return command if self.user == 'root' else f'sudo -n {command}'
+
+    def run(self, script, timeout, on_line=None, deadline=None):
+        on_line = on_line or (lambda stream, line: None)
+        process = {}
+
+        def on_stdout(stream, line):
+            # Première ligne: PGID du script, écrit par SSH_WRAPPER
+            if 'pgid' not in process:
+                process['pgid'] = int(line) if line.strip().isdigit() else None
+                return
+            on_line(stream, line)
+
+        channel = self.client.get_transport().open_session()
+        try:
+            channel.exec_command(self._sudo(SSH_WRAPPER))
+            channel.sendall(script.encode('utf-8'))
+            channel.shutdown_write()
+
+            stdout = LineBuffer('stdout', on_stdout)
+            stderr = LineBuffer('stderr', on_line)
+            expires = time.monotonic() + timeout
+
+            while True:
+                if deadline is not None and (deadline.cancelled or deadline.expired):
+                    self._kill(process.get('pgid'))
+                    deadline.check()
+
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    self._kill(process.get('pgid'))
+                    raise CommandTimeoutError(f"Commande sur {self.host} interrompue après {timeout}s")
+
+                select.select([channel], [], [], min(remaining, 1.0))
+
+                while channel.recv_ready():
+                    stdout.feed(channel.recv(32768))
+                while channel.recv_stderr_ready():
+                    stderr.feed(channel.recv_stderr(32768))
+
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+
+            stdout.flush()
+            stderr.flush()
+            return channel.recv_exit_status()
+        finally:
+            channel.close()
+
+    def _kill(self, pgid):
+        """Tue le groupe de processus du script sur l'hôte (fermer le canal ne l'arrête pas)"""
+        if not pgid:
+            logger.warning(f"⚠️ PGID du script sur {self.host} inconnu, processus distant non tué")
+            return
+
+        try:
+            _, stdout, _ = self.client.exec_command(self._sudo(f'kill -KILL -- -{pgid}'), timeout=10)
+            stdout.channel.recv_exit_status()
+        except Exception as e:
+            logger.warning(f"⚠️ Arrêt du script {pgid} sur {self.host} impossible: {e}")
+
+    def close(self):
+        self.client.close()
+        logger.info(f"🔐 Connexion SSH fermée: {self.host}")
+
+
+class LocalSession(RemoteSession):
+    """
+    Session exécutant les scripts localement dans un sous-processus
+
+    Se comporte comme un hôte distant (même interface, même diffusion des
+    lignes, même gestion des délais): utilisée par les tests et en développement.
+    """
+
+    def run(self, script, timeout, on_line=None, deadline=None):
+        on_line = on_line or (lambda stream, line: None)
+
+        process = subprocess.Popen(
+            ['bash', '-s'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=dict(os.environ, TARGET_HOST=str(self.host)),
+            start_new_session=True
+        )
+        process.stdin.write(script.encode('utf-8'))
+        process.stdin.close()
+
+        buffers = {
+            process.stdout: LineBuffer('stdout', on_line),
+            process.stderr: LineBuffer('stderr', on_line)
+        }
+        selector = selectors.DefaultSelector()
+        for pipe in buffers:
+            selector.register(pipe, selectors.EVENT_READ)
+
+        expires = time.monotonic() + timeout
+        try:
+            while selector.get_map():
+                if deadline is not None and (deadline.cancelled or deadline.expired):
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+                    deadline.check()
+
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+                    raise CommandTimeoutError(f"Commande locale interrompue après {timeout}s")
+
+                for key, _ in selector.select(min(remaining, 1.0)):
+                    data = os.read(key.fileobj.fileno(), 32768)
+                    if data:
+                        buffers[key.fileobj].feed(data)
+                    else:
+                        selector.unregister(key.fileobj)
+                        buffers[key.fileobj].flush()
+
+            return process.wait(timeout=max(expires - time.monotonic(), 0.1))
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            raise CommandTimeoutError(f"Commande locale interrompue après {timeout}s")
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+
+
+class RemoteExecutor:
+    """
+    Fournit des sessions réutilisées par hôte
+
+    Une seule connexion est ouverte par VM tant qu'au moins un appelant
+    l'utilise; elle est fermée lorsque le dernier la libère.
+    """
+
+    def __init__(self, session_factory, forget=None):
+        self.session_factory = session_factory
+        self.forget = forget
+        self._sessions = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, host):
+        """Context manager fournissant la session partagée d'un hôte"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is not None:
+                self._users[host] += 1
+
+        if session is None:
+            # Connexion ouverte hors du verrou pour ne pas bloquer les autres hôtes
+            created = self.session_factory(host)
+            with self._lock:
+                session = self._sessions.setdefault(host, created)
+                self._users[host] = self._users.get(host, 0) + 1
+            if session is not created:
+                created.close()
+
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._users[host] -= 1
+                if self._users[host] == 0:
+                    del self._users[host]
+                    del self._sessions[host]
+                    session.close()
+
+    def forget_host(self, host):
+        """Oublie la clé d'hôte d'une adresse reprise par une nouvelle instance"""
+        if self.forget and self.forget(host):
+            logger.info(f"🔑 Clé d'hôte de {host} oubliée (nouvelle instance)")
+
+    def open_sessions(self):
+        """Nombre de connexions actuellement ouvertes"""
+        with self._lock:
+            return len(self._sessions)
+
+
+def create_executor(mode='ssh', user='root', port=22, key_path=None, known_hosts_path=None,
+                    host_key_policy='tofu'):
+    """
+    Crée un exécuteur selon le mode configuré
+
+    Args:
+        mode: 'ssh' (VMs réelles) ou 'local' (sous-processus local)
+        known_hosts_path: known_hosts lu en plus de celui du système, où
+            la politique tofu enregistre les clés
+        host_key_policy: tofu, reject, warning ou auto (clés d'hôte inconnues)
+    """
+    if mode == 'local':
+        return RemoteExecutor(LocalSession)
+
+    if mode != 'ssh':
+        raise ValueError(f"Mode d'exécution inconnu: {mode}")
+
+    if host_key_policy not in HOST_KEY_POLICIES:
+        raise ValueError(f"Politique de clé d'hôte inconnue: {host_key_policy}")
+
+    key_path = os.path.expanduser(key_path) if key_path else None
+    known_hosts_path = os.path.expanduser(known_hosts_path) if known_hosts_path else None
+    return RemoteExecutor(
+        lambda host: SSHSession(host, user=user, port=port, key_path=key_path,
+                                known_hosts_path=known_hosts_path, host_key_policy=host_key_policy),
+        forget=lambda host: forget_host_key(known_hosts_path, host)
+    )
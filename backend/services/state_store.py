@@ -0,0 +1,196 @@
+"""
+Stockage des états Terraform et de leurs verrous dans la base de la plateforme
+"""
+
+import re
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, TerraformState
+
+logger = logging.getLogger(__name__)
+
+# Noms de workspaces acceptés par le backend HTTP
+STATE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$')
+
+
+def state_metadata(content):
+    """
+    Métadonnées indexées d'un état Terraform
+
+    Returns:
+        Dictionnaire {serial, lineage, resource_count, size, md5}
+    """
+    raw = content.encode('utf-8')
+    metadata = {
+        'serial': None,
+        'lineage': None,
+        'resource_count': 0,
+        'size': len(raw),
+        'md5': hashlib.md5(raw).hexdigest()
+    }
+
+    try:
+        state = json.loads(content)
+    except ValueError:
+        return metadata
+
+    if isinstance(state, dict):
+        metadata['serial'] = state.get('serial')
+        metadata['lineage'] = state.get('lineage')
+        metadata['resource_count'] = sum(
+            len(resource.get('instances') or [])
+            for resource in state.get('resources') or []
+            if resource.get('mode') == 'managed'
+        )
+    return metadata
+
+
+def _owner(name):
+    """Déploiement ou lot décrit par un workspace"""
+    match = re.match(r'^deployment-(\d+)$', name)
+    if match:
+        return int(match.group(1)), None
+    match = re.match(r'^batch-(.+)$', name)
+    if match:
+        return None, match.group(1)
+    return None, None
+
+
+def _lock_info(state):
+    try:
+        return json.loads(state.lock_info) if state.lock_info else {'ID': state.lock_id}
+    except ValueError:
+        return {'ID': state.lock_id}
+
+
+def get_state(name):
+    """État d'un workspace (None s'il n'existe pas)"""
+    return TerraformState.query.filter_by(name=name).first()
+
+
+def has_state(name):
+    """Vrai si le workspace a un état non vide"""
+    return db.session.query(TerraformState.id).filter(
+        TerraformState.name == name,
+        TerraformState.size > 0
+    ).first() is not None
+
+
+def _ensure_row(name):
+    """Crée la ligne de l'état si nécessaire (sans écraser une création concurrente)"""
+    if get_state(name):
+        return
+
+    deployment_id, batch_id = _owner(name)
+    try:
+        db.session.add(TerraformState(name=name, deployment_id=deployment_id, batch_id=batch_id))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def lock_state(name, info):
+    """
+    Prend le verrou d'un état (conditionnel: sûr entre plusieurs processus)
+
+    Args:
+        info: Informations de verrou envoyées par Terraform (ID, Operation, Who...)
+
+    Returns:
+        Tuple (success, lock_info): lock_info du détenteur actuel en cas d'échec
+    """
+    lock_id = str(info.get('ID') or '')
+    if not lock_id:
+        return False, {'error': 'Identifiant de verrou manquant'}
+
+    _ensure_row(name)
+    locked = TerraformState.query.filter(
+        TerraformState.name == name,
+        or_(TerraformState.lock_id.is_(None), TerraformState.lock_id == lock_id)
+    ).update({
+        TerraformState.lock_id: lock_id,
+        TerraformState.lock_info: json.dumps(info),
+        TerraformState.locked_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if locked:
+        return True, info
+
+    state = get_state(name)
+    return False, _lock_info(state) if state else {}
+
+
+def unlock_state(name, lock_id=None):
+    """
+    Libère le verrou d'un état
+
+    Args:
+        lock_id: Identifiant du verrou à libérer (None: libération forcée)
+
+    Returns:
+        Tuple (success, lock_info): lock_info du détenteur actuel en cas d'échec
+    """
+    query = TerraformState.query.filter(TerraformState.name == name)
+    if lock_id:
+        query = query.filter(or_(TerraformState.lock_id.is_(None), TerraformState.lock_id == lock_id))
+
+    released = query.update({
+        TerraformState.lock_id: None,
+        TerraformState.lock_info: None,
+        TerraformState.locked_at: None
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if released or not get_state(name):
+        return True, None
+
+    return False, _lock_info(get_state(name))
+
+
+def save_state(name, content, lock_id=None):
+    """
+    Enregistre l'état d'un workspace
+
+    L'écriture est refusée si l'état est verrouillé par un autre
+    détenteur que lock_id.
+
+    Returns:
+        Tuple (success, lock_info): lock_info du détenteur actuel en cas d'échec
+    """
+    _ensure_row(name)
+
+    metadata = state_metadata(content)
+    query = TerraformState.query.filter(TerraformState.name == name)
+    if lock_id:
+        query = query.filter(or_(TerraformState.lock_id.is_(None), TerraformState.lock_id == lock_id))
+    else:
+        query = query.filter(TerraformState.lock_id.is_(None))
+
+    saved = query.update({
+        TerraformState.content: content,
+        TerraformState.serial: metadata['serial'],
+        TerraformState.lineage: metadata['lineage'],
+        TerraformState.resource_count: metadata['resource_count'],
+        TerraformState.size: metadata['size'],
+        TerraformState.md5: metadata['md5'],
+        TerraformState.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if saved:
+        return True, None
+    return False, _lock_info(get_state(name))
+
+
+def delete_state(name):
+    """Supprime l'état d'un workspace (et son verrou)"""
+    deleted = TerraformState.query.filter(TerraformState.name == name).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted > 0
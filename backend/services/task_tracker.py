@@ -0,0 +1,290 @@
+"""
+Suivi des tâches Proxmox (UPID): un poller par noeud pour toutes les tâches en cours
+"""
+
+import time
+import logging
+import threading
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'erreurs consécutives avant d'abandonner le suivi d'une tâche
+MAX_POLL_ERRORS = 5
+
+# Tâches listées par appel à /nodes/{node}/tasks
+LIST_LIMIT = 500
+
+
+def parse_upid(upid):
+    """
+    Décode un UPID Proxmox
+
+    Format: UPID:node:pid:pstart:starttime:type:id:user:
+    (pid, pstart et starttime en hexadécimal)
+
+    Raises:
+        ValueError: si la chaîne n'est pas un UPID
+    """
+    parts = str(upid).split(':')
+    if len(parts) < 8 or parts[0] != 'UPID':
+        raise ValueError(f"UPID invalide: {upid}")
+
+    return {
+        'node': parts[1],
+        'pid': int(parts[2], 16),
+        'starttime': int(parts[4], 16),
+        'type': parts[5],
+        'id': parts[6],
+        'user': parts[7]
+    }
+
+
+class ProxmoxTask:
+    """
+    Tâche Proxmox suivie
+
+    status vaut running jusqu'à la fin de la tâche, puis stopped (ou lost
+    si le suivi a été abandonné); exitstatus est celui de Proxmox ('OK',
+    'WARNINGS: n' ou le message d'erreur).
+    """
+
+    def __init__(self, upid):
+        info = parse_upid(upid)
+        self.upid = upid
+        self.node = info['node']
+        self.type = info['type']
+        self.id = info['id']
+        self.starttime = info['starttime']
+        self.status = 'running'
+        self.exitstatus = None
+        self.endtime = None
+        self.errors = 0
+        self._tracked = time.monotonic()
+        self._duration = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def success(self):
+        exitstatus = self.exitstatus or ''
+        return exitstatus == 'OK' or exitstatus.startswith('WARNINGS')
+
+    @property
+    def duration(self):
+        """Durée de la tâche (secondes), en cours si elle n'est pas terminée"""
+        if self._duration is not None:
+            return self._duration
+        return time.monotonic() - self._tracked
+
+    def finish(self, exitstatus, endtime=None, status='stopped'):
+        self.status = status
+        self.exitstatus = exitstatus
+        self.endtime = endtime
+        if endtime and self.starttime:
+            self._duration = max(0, endtime - self.starttime)
+        else:
+            self._duration = time.monotonic() - self._tracked
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Attend la fin de la tâche; retourne True si elle a réussi (False si délai dépassé)"""
+        if not self._done.wait(timeout):
+            return False
+        return self.success
+
+    def to_dict(self):
+        return {
+            'upid': self.upid,
+            'node': self.node,
+            'type': self.type,
+            'id': self.id,
+            'status': self.status,
+            'exitstatus': self.exitstatus,
+            'duration': round(self.duration, 3)
+        }
+
+
+class TaskTracker:
+    """
+    Attente des tâches Proxmox sans scrutation par appelant
+
+    Chaque tâche suivie est rattachée au noeud de son UPID. Un seul thread
+    par noeud, lancé tant que des tâches y sont en cours, liste les tâches
+    du noeud depuis la plus ancienne suivie (/nodes/{node}/tasks) et
+    termine toutes celles qui sont finies; une tâche absente de la liste
+    est interrogée individuellement. Le suivi est abandonné (status lost)
+    après max_age secondes ou MAX_POLL_ERRORS erreurs consécutives.
+    """
+
+    def __init__(self, client, interval=None, max_age=None):
+        self.client = client
+        self.interval = Config.PROXMOX_TASK_POLL_INTERVAL if interval is None else interval
+        self.max_age = Config.PROXMOX_TASK_MAX_AGE if max_age is None else max_age
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._pollers = {}
+        self._counters = {'tracked': 0, 'ok': 0, 'failed': 0, 'lost': 0, 'polls': 0, 'lookups': 0}
+        self._durations = {}
+
+    def track(self, upid):
+        """
+        Suit une tâche (sans effet si elle l'est déjà)
+
+        Returns:
+            ProxmoxTask
+        """
+        with self._lock:
+            task = self._tasks.get(upid)
+            if task:
+                return task
+
+            task = ProxmoxTask(upid)
+            self._tasks[upid] = task
+            self._counters['tracked'] += 1
+
+            if task.node not in self._pollers:
+                poller = threading.Thread(target=self._poll_loop, args=(task.node,), daemon=True,
+                                          name=f'proxmox-tasks-{task.node}')
+                self._pollers[task.node] = poller
+                poller.start()
+
+        return task
+
+    def wait(self, upid, timeout=None):
+        """Suit une tâche et attend sa fin; retourne True si elle a réussi"""
+        return self.track(upid).wait(timeout)
+
+    def _pending(self, node):
+        return [task for task in self._tasks.values() if task.node == node]
+
+    def _poll_loop(self, node):
+        while True:
+            with self._lock:
+                pending = self._pending(node)
+                if not pending:
+                    # Plus rien à suivre: le prochain track relancera un poller
+                    del self._pollers[node]
+                    return
+
+            try:
+                self._poll(node, pending)
+            except Exception as e:
+                logger.warning(f"⚠️ Suivi des tâches du noeud {node}: {e}")
+                for task in pending:
+                    task.errors += 1
+
+            self._expire(pending)
+            time.sleep(self.interval)
+
+    def _poll(self, node, pending):
+        """Un appel pour toutes les tâches du noeud, un par tâche absente de la liste"""
+        api = self.client.api
+        if not api:
+            raise RuntimeError("Proxmox non configuré")
+
+        since = min(task.starttime for task in pending)
+        listed = api.nodes(node).tasks.get(source='all', since=since, limit=LIST_LIMIT)
+        self._count('polls')
+
+        entries = {entry.get('upid'): entry for entry in listed or []}
+        for task in pending:
+            entry = entries.get(task.upid)
+            try:
+                if entry is None:
+                    # Tâche hors de la liste (trop de tâches sur le noeud): statut direct
+                    entry = api.nodes(node).tasks(task.upid).status.get()
+                    self._count('lookups')
+            except Exception as e:
+                logger.warning(f"⚠️ Statut de la tâche {task.upid}: {e}")
+                task.errors += 1
+                continue
+
+            task.errors = 0
+            finished = self._exitstatus(entry)
+            if finished is not None:
+                self._complete(task, finished, entry.get('endtime'))
+
+    @staticmethod
+    def _exitstatus(entry):
+        """
+        Code de sortie d'une tâche terminée, None si elle tourne encore
+
+        /tasks/{upid}/status: status running|stopped et exitstatus;
+        /tasks (liste): endtime et status = code de sortie une fois finie.
+        """
+        if entry.get('status') == 'stopped':
+            return entry.get('exitstatus') or 'unknown'
+        if entry.get('endtime') and entry.get('status') not in (None, 'running'):
+            return entry.get('status')
+        return None
+
+    def _complete(self, task, exitstatus, endtime=None, status='stopped'):
+        with self._lock:
+            self._tasks.pop(task.upid, None)
+
+        task.finish(exitstatus, endtime, status)
+
+        outcome = 'lost' if status == 'lost' else ('ok' if task.success else 'failed')
+        with self._lock:
+            self._counters[outcome] += 1
+            durations = self._durations.setdefault(task.type, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            durations['count'] += 1
+            durations['sum'] += task.duration
+            durations['max'] = max(durations['max'], task.duration)
+
+        if outcome == 'failed':
+            logger.warning(f"⚠️ Tâche {task.type} {task.id} sur {task.node} en échec: {exitstatus}")
+
+    def _expire(self, pending):
+        now = time.monotonic()
+        for task in pending:
+            if task.done:
+                continue
+            if task.errors >= MAX_POLL_ERRORS:
+                self._complete(task, f"suivi abandonné après {task.errors} erreurs", status='lost')
+            elif self.max_age and now - task._tracked > self.max_age:
+                self._complete(task, f"toujours en cours après {self.max_age}s", status='lost')
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        """Tâches en cours par noeud, compteurs et durées par type de tâche"""
+        with self._lock:
+            running = {}
+            for task in self._tasks.values():
+                running.setdefault(task.node, []).append(task.to_dict())
+
+            return {
+                'running': running,
+                'pollers': sorted(self._pollers),
+                **self._counters,
+                'durations': {
+                    task_type: {
+                        'count': values['count'],
+                        'avg': round(values['sum'] / values['count'], 3),
+                        'max': round(values['max'], 3)
+                    }
+                    for task_type, values in sorted(self._durations.items())
+                }
+            }
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_task_tracker(client):
+    """Suivi des tâches partagé par tous les utilisateurs d'un même client Proxmox"""
+    with _trackers_lock:
+        tracker = _trackers.get(id(client))
+        if tracker is None or tracker.client is not client:
+            tracker = TaskTracker(client)
+            _trackers[id(client)] = tracker
+        return tracker
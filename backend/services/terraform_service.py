@@ -3,23 +3,92 @@ Service Terraform pour gérer l'infrastructure
 """
 
 import os
-import logging
+import gzip
 import json
-from python_terraform import Terraform, IsFlagged
+import time
+import errno
+import shutil
+import signal
+import hashlib
+import logging
+import tempfile
+import selectors
+import threading
+import subprocess
+from collections import deque
+
+from services import state_store
+from services.remote_executor import LineBuffer
+from utils.config import Config
+from utils.deadline import Deadline
 
 logger = logging.getLogger(__name__)
 
+# Délai laissé à Terraform pour s'arrêter proprement (libération du verrou d'état)
+TERMINATION_GRACE = 10
+
+# Délai avant de retenter la construction du squelette après un échec (secondes)
+SKELETON_RETRY_INTERVAL = 300
+
+# Lignes de sortie conservées pour le message d'erreur d'un apply diffusé
+OUTPUT_TAIL_LINES = 50
+
+# Fichiers d'entrée d'un workspace, pris en compte dans son empreinte
+WORKSPACE_INPUTS = ('main.tf', 'variables.tf', 'terraform.tfvars')
+
+# Plan enregistré par plan() et appliqué par apply()
+PLAN_FILE = 'tfplan'
+
+# Fichiers régénérables retirés par compact_workspace() (providers, plan)
+COMPACTABLE = ('.terraform', PLAN_FILE, 'terraform.tfstate.backup')
+
+# Suffixe des états archivés dans TERRAFORM_STATE_DIR
+STATE_ARCHIVE_SUFFIX = '.tfstate.gz'
+
+def _link_or_copy(src, dst):
+    """Lien physique vers le fichier du squelette, copie s'il est sur un autre système de fichiers"""
+    if os.path.exists(dst):
+        return dst
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
 class TerraformService:
     """Service pour gérer Terraform"""
     
     def __init__(self):
         self.work_dir = os.getenv('TERRAFORM_WORK_DIR', './terraform/workspaces')
         self.state_dir = os.getenv('TERRAFORM_STATE_DIR', './terraform/states')
+        self.terraform_bin = os.getenv('TERRAFORM_BIN', 'terraform')
+        self.parallelism = int(os.getenv('TERRAFORM_PARALLELISM', 4))
+        
+        # États: backend HTTP de la plateforme (base de données) ou fichiers locaux
+        self.state_backend = os.getenv('TERRAFORM_STATE_BACKEND', Config.TERRAFORM_STATE_BACKEND).lower()
+        self.state_address = os.getenv('TERRAFORM_STATE_ADDRESS', Config.TERRAFORM_STATE_ADDRESS).rstrip('/')
+        self.lock_timeout = int(os.getenv('TERRAFORM_LOCK_TIMEOUT', Config.TERRAFORM_LOCK_TIMEOUT))
+        
+        # Cache partagé des providers et workspace squelette pré-initialisé
+        self.plugin_cache_dir = os.path.abspath(os.getenv('TERRAFORM_PLUGIN_CACHE_DIR', './terraform/plugin-cache'))
+        self.skeleton_dir = os.path.abspath(os.getenv('TERRAFORM_SKELETON_DIR', './terraform/skeleton'))
+        self._skeleton_lock = threading.Lock()
+        self._skeleton_failed_at = None
+        
         os.makedirs(self.work_dir, exist_ok=True)
         os.makedirs(self.state_dir, exist_ok=True)
+        os.makedirs(self.plugin_cache_dir, exist_ok=True)
     
     def create_workspace(self, deployment):
         """Crée un workspace Terraform pour le déploiement"""
+        workspace_dir = self.render_workspace(deployment)
+        self.init_workspace(workspace_dir)
+        
+        logger.info(f"✅ Workspace Terraform créé: {workspace_dir}")
+        return workspace_dir
+    
+    def render_workspace(self, deployment):
+        """Génère les fichiers Terraform du déploiement (sans initialisation)"""
         workspace_dir = os.path.join(self.work_dir, f"deployment-{deployment.id}")
         os.makedirs(workspace_dir, exist_ok=True)
         
@@ -32,16 +101,315 @@ class TerraformService:
         # Générer le fichier terraform.tfvars
         self._generate_tfvars(workspace_dir, deployment)
         
-        # Initialiser Terraform
-        tf = Terraform(working_dir=workspace_dir)
-        return_code, stdout, stderr = tf.init()
+        return workspace_dir
+    
+    def create_batch_workspace(self, batch_id, deployments):
+        """
+        Crée un workspace unique pour un lot de déploiements identiques
+        
+        Toutes les instances sont décrites par une seule ressource for_each,
+        indexée par l'identifiant du déploiement.
+        """
+        workspace_dir = self.render_batch_workspace(batch_id, deployments)
+        self.init_workspace(workspace_dir)
+        
+        logger.info(f"✅ Workspace Terraform du lot créé: {workspace_dir} ({len(deployments)} instances)")
+        return workspace_dir
+    
+    def render_batch_workspace(self, batch_id, deployments):
+        """Génère les fichiers Terraform d'un lot (sans initialisation)"""
+        workspace_dir = os.path.join(self.work_dir, f"batch-{batch_id}")
+        os.makedirs(workspace_dir, exist_ok=True)
+        
+        deployment_type = deployments[0].type
+        if deployment_type == 'vm':
+            template = self._get_vm_batch_template()
+        else:
+            template = self._get_lxc_batch_template()
+        
+        self._write_if_changed(workspace_dir, 'main.tf', template)
+        
+        self._generate_variables_tf(workspace_dir, batch=True)
+        self._generate_batch_tfvars(workspace_dir, deployments)
+        
+        return workspace_dir
+    
+    def workspace_path(self, deployment):
+        """Chemin du workspace contenant l'infrastructure d'un déploiement"""
+        if deployment.batch_id:
+            return os.path.join(self.work_dir, f"batch-{deployment.batch_id}")
+        return os.path.join(self.work_dir, f"deployment-{deployment.id}")
+    
+    def _write_if_changed(self, workspace_dir, filename, content):
+        """Écrit un fichier du workspace seulement si son contenu change"""
+        path = os.path.join(workspace_dir, filename)
+        try:
+            with open(path, encoding='utf-8') as f:
+                if f.read() == content:
+                    return False
+        except FileNotFoundError:
+            pass
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return True
+    
+    def workspace_hash(self, workspace_dir):
+        """
+        Empreinte des fichiers d'entrée d'un workspace (configuration et valeurs)
+        
+        Comparée à celle du dernier apply réussi, elle permet de ne pas
+        relancer Terraform lorsque rien n'a changé.
+        """
+        digest = hashlib.sha256()
+        for filename in WORKSPACE_INPUTS:
+            digest.update(filename.encode('utf-8') + b'\0')
+            try:
+                with open(os.path.join(workspace_dir, filename), 'rb') as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                pass
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    @property
+    def remote_state(self):
+        """Vrai si les états sont servis par le backend HTTP de la plateforme"""
+        return self.state_backend == 'http'
+    
+    def has_state(self, workspace_dir):
+        """Vrai si le workspace a déjà un état Terraform (apply précédent)"""
+        if self.remote_state:
+            return state_store.has_state(self._state_name(workspace_dir))
+        
+        path = os.path.join(workspace_dir, 'terraform.tfstate')
+        return os.path.isfile(path) and os.path.getsize(path) > 0
+    
+    def _state_name(self, workspace_dir):
+        """Nom de l'état d'un workspace dans le backend HTTP"""
+        return os.path.basename(os.path.normpath(workspace_dir))
+    
+    def _read_state(self, workspace_dir):
+        """Contenu de l'état d'un workspace (None s'il est vide)"""
+        if self.remote_state:
+            state = state_store.get_state(self._state_name(workspace_dir))
+            return state.content.encode('utf-8') if state and state.size else None
+        
+        if not self.has_state(workspace_dir):
+            return None
+        with open(os.path.join(workspace_dir, 'terraform.tfstate'), 'rb') as f:
+            return f.read()
+    
+    def is_initialized(self, workspace_dir):
+        """Vrai si le workspace a ses providers (.terraform), faux après compactage"""
+        return os.path.isdir(os.path.join(workspace_dir, '.terraform'))
+    
+    def list_workspaces(self):
+        """Noms des répertoires de workspaces (deployment-<id>, batch-<id>)"""
+        try:
+            return sorted(
+                entry.name for entry in os.scandir(self.work_dir)
+                if entry.is_dir(follow_symlinks=False)
+            )
+        except FileNotFoundError:
+            return []
+    
+    def compact_workspace(self, workspace_dir):
+        """
+        Retire les fichiers régénérables d'un workspace inactif
+        
+        Les providers (.terraform), le plan enregistré et la sauvegarde de
+        l'état sont supprimés; la configuration et l'état restent en place,
+        init_workspace() les restaure depuis le squelette si nécessaire.
+        
+        Returns:
+            True si des fichiers ont été retirés
+        """
+        removed = False
+        for name in COMPACTABLE:
+            path = os.path.join(workspace_dir, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed = True
+            elif os.path.lexists(path):
+                os.remove(path)
+                removed = True
+        return removed
+    
+    def archive_state(self, workspace_dir):
+        """
+        Archive l'état Terraform d'un workspace (gzip) dans TERRAFORM_STATE_DIR
+        
+        L'archive est écrite sous un nom temporaire puis renommée: elle
+        n'est jamais visible incomplète.
+        
+        Returns:
+            Chemin de l'archive, ou None si le workspace n'a pas d'état
+        """
+        content = self._read_state(workspace_dir)
+        if content is None:
+            return None
+        
+        name = self._state_name(workspace_dir)
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+        archive = os.path.join(self.state_dir, f"{name}-{stamp}{STATE_ARCHIVE_SUFFIX}")
+        
+        os.makedirs(self.state_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.archive-', dir=self.state_dir)
+        try:
+            with os.fdopen(fd, 'wb') as raw, \
+                    gzip.GzipFile(filename='terraform.tfstate', mode='wb', fileobj=raw, compresslevel=9) as dst:
+                dst.write(content)
+            os.replace(tmp_path, archive)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        return archive
+    
+    def remove_workspace(self, workspace_dir):
+        """Supprime un workspace après archivage de son état"""
+        archive = self.archive_state(workspace_dir)
+        if self.remote_state:
+            state_store.delete_state(self._state_name(workspace_dir))
+        shutil.rmtree(workspace_dir)
+        return archive
+    
+    def resource_address(self, deployment):
+        """Adresse Terraform de la ressource d'un déploiement dans un lot"""
+        resource = 'proxmox_vm_qemu.vm' if deployment.type == 'vm' else 'proxmox_lxc.container'
+        return f'{resource}["{deployment.id}"]'
+    
+    def init_workspace(self, workspace_dir, deadline=None):
+        """
+        Initialise Terraform dans un workspace
+        
+        Le répertoire .terraform et le fichier de verrouillage sont repris du
+        workspace squelette (liens physiques, sans téléchargement). Si le
+        squelette n'est pas disponible, terraform init est exécuté avec le
+        cache de providers partagé. Avec le backend HTTP, un init (sans
+        téléchargement) configure ensuite le backend du workspace.
+        """
+        start = time.monotonic()
+        
+        if self._materialize_skeleton(workspace_dir, deadline):
+            source = 'squelette'
+            
+            # Le backend HTTP est configuré une fois par workspace (providers déjà en place)
+            if self.remote_state and not os.path.isfile(os.path.join(workspace_dir, '.terraform', 'terraform.tfstate')):
+                self._init(workspace_dir, deadline)
+                source = 'squelette + backend'
+        else:
+            self._init(workspace_dir, deadline)
+            source = 'terraform init'
+        
+        logger.info(
+            f"⏱️ Init Terraform de {os.path.basename(workspace_dir)}: "
+            f"{time.monotonic() - start:.2f}s ({source})"
+        )
+    
+    def _init(self, workspace_dir, deadline=None):
+        """
+        terraform init; un état local existant est copié dans le backend
+        HTTP (-force-copy)
+        """
+        args = ['init', '-input=false', '-no-color']
+        if self.remote_state:
+            args.append('-force-copy')
+        
+        return_code, stdout, stderr = self._run(workspace_dir, args, deadline)
         
         if return_code != 0:
             logger.error(f"Erreur init Terraform: {stderr}")
             raise RuntimeError(f"Terraform init failed: {stderr}")
+    
+    def skeleton_path(self):
+        """
+        Répertoire du squelette correspondant aux providers requis
         
-        logger.info(f"✅ Workspace Terraform créé: {workspace_dir}")
-        return workspace_dir
+        Le nom dépend de l'empreinte du bloc required_providers: changer la
+        version du provider produit un nouveau squelette.
+        """
+        digest = hashlib.sha256(self._get_required_providers().encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.skeleton_dir, digest)
+    
+    def prepare_skeleton(self, deadline=None):
+        """
+        Construit le workspace squelette s'il n'existe pas encore
+        
+        Le squelette ne contient que les providers requis; il est initialisé
+        une seule fois (seul accès au registre Terraform) dans un répertoire
+        temporaire, puis renommé pour ne jamais être vu à moitié construit.
+        
+        Returns:
+            Chemin du squelette, ou None si l'initialisation a échoué
+        """
+        skeleton = self.skeleton_path()
+        if os.path.isfile(os.path.join(skeleton, '.terraform.lock.hcl')):
+            return skeleton
+        
+        with self._skeleton_lock:
+            if os.path.isfile(os.path.join(skeleton, '.terraform.lock.hcl')):
+                return skeleton
+            
+            if self._skeleton_failed_at and time.monotonic() - self._skeleton_failed_at < SKELETON_RETRY_INTERVAL:
+                return None
+            
+            os.makedirs(self.skeleton_dir, exist_ok=True)
+            build_dir = tempfile.mkdtemp(prefix='.build-', dir=self.skeleton_dir)
+            
+            try:
+                with open(os.path.join(build_dir, 'versions.tf'), 'w', encoding='utf-8') as f:
+                    f.write(self._get_required_providers())
+                
+                return_code, stdout, stderr = self._run(build_dir, ['init', '-input=false', '-no-color'], deadline)
+                if return_code != 0:
+                    logger.warning(f"⚠️ Initialisation du squelette Terraform échouée: {stderr}")
+                    self._skeleton_failed_at = time.monotonic()
+                    return None
+                
+                try:
+                    os.rename(build_dir, skeleton)
+                except OSError as e:
+                    # Construit entre-temps par un autre processus
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+                
+                logger.info(f"✅ Squelette Terraform prêt: {skeleton}")
+                return skeleton
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+    
+    def _materialize_skeleton(self, workspace_dir, deadline=None):
+        """
+        Reprend l'initialisation du squelette dans un workspace
+        
+        Returns:
+            True si le workspace est initialisé, False pour revenir à terraform init
+        """
+        skeleton = self.prepare_skeleton(deadline)
+        if not skeleton:
+            return False
+        
+        try:
+            # Le fichier de verrouillage est copié: terraform peut le réécrire
+            shutil.copy2(
+                os.path.join(skeleton, '.terraform.lock.hcl'),
+                os.path.join(workspace_dir, '.terraform.lock.hcl')
+            )
+            shutil.copytree(
+                os.path.join(skeleton, '.terraform'),
+                os.path.join(workspace_dir, '.terraform'),
+                symlinks=True,
+                copy_function=_link_or_copy,
+                dirs_exist_ok=True
+            )
+        except OSError as e:
+            logger.warning(f"⚠️ Squelette Terraform inutilisable ({e}), terraform init complet")
+            return False
+        
+        return True
     
     def _generate_main_tf(self, workspace_dir, deployment):
         """Génère le fichier main.tf"""
@@ -51,30 +419,48 @@ class TerraformService:
         else:
             template = self._get_lxc_template(deployment)
         
-        with open(os.path.join(workspace_dir, 'main.tf'), 'w', encoding='utf-8') as f:
-            f.write(template)
+        self._write_if_changed(workspace_dir, 'main.tf', template)
     
-    def _get_vm_template(self, deployment):
-        """Template Terraform pour une VM"""
-        return f'''terraform {{
-  required_providers {{
-    proxmox = {{
+    def _get_required_providers(self, backend=False):
+        """
+        Providers requis, partagés par tous les workspaces et le squelette
+        
+        Args:
+            backend: déclarer le backend HTTP (adresses et identifiants
+                fournis par l'environnement TF_HTTP_*, voir _env)
+        """
+        backend_block = '''
+  backend "http" {}
+''' if backend else ''
+        
+        return '''terraform {
+  required_providers {
+    proxmox = {
       source  = "telmate/proxmox"
       version = "2.9.14"
-    }}
-  }}
-}}
-
-provider "proxmox" {{
+    }
+  }
+''' + backend_block + '''}
+'''
+    
+    def _get_terraform_header(self):
+        """En-tête commun: provider Proxmox et backend des états"""
+        return self._get_required_providers(backend=self.remote_state) + '''
+provider "proxmox" {
   pm_api_url          = var.proxmox_api_url
   pm_api_token_id     = var.proxmox_api_token_id
   pm_api_token_secret = var.proxmox_api_token_secret
   pm_tls_insecure     = true
-}}
+}
 
-resource "proxmox_vm_qemu" "vm" {{
+'''
+    
+    def _get_vm_template(self, deployment):
+        """Template Terraform pour une VM"""
+        return self._get_terraform_header() + f'''resource "proxmox_vm_qemu" "vm" {{
   name        = var.vm_name
   target_node = var.proxmox_node
+  vmid        = var.vmid
   
   # Clone depuis un template (Ubuntu 22.04 recommandé)
   clone = var.template_name
@@ -107,9 +493,11 @@ resource "proxmox_vm_qemu" "vm" {{
   # Démarrage automatique
   automatic_reboot = true
   
+  # Le template source (image dorée) peut évoluer sans recréer la VM
   lifecycle {{
     ignore_changes = [
       network,
+      clone,
     ]
   }}
 }}
@@ -125,25 +513,10 @@ output "ip_address" {{
     
     def _get_lxc_template(self, deployment):
         """Template Terraform pour un conteneur LXC"""
-        return f'''terraform {{
-  required_providers {{
-    proxmox = {{
-      source  = "telmate/proxmox"
-      version = "2.9.14"
-    }}
-  }}
-}}
-
-provider "proxmox" {{
-  pm_api_url          = var.proxmox_api_url
-  pm_api_token_id     = var.proxmox_api_token_id
-  pm_api_token_secret = var.proxmox_api_token_secret
-  pm_tls_insecure     = true
-}}
-
-resource "proxmox_lxc" "container" {{
+        return self._get_terraform_header() + f'''resource "proxmox_lxc" "container" {{
   hostname    = var.vm_name
   target_node = var.proxmox_node
+  vmid        = var.vmid
   ostemplate  = var.lxc_template
   
   # Ressources
@@ -183,8 +556,95 @@ output "ip_address" {{
 }}
 '''
     
-    def _generate_variables_tf(self, workspace_dir):
-        """Génère le fichier variables.tf"""
+    def _get_vm_batch_template(self):
+        """Template Terraform pour un lot de VMs (for_each sur var.instances)"""
+        return self._get_terraform_header() + '''resource "proxmox_vm_qemu" "vm" {
+  for_each = var.instances
+  
+  name        = each.value.name
+  target_node = each.value.node
+  vmid        = each.value.vmid
+  clone       = var.template_name
+  
+  cores   = each.value.cpu_cores
+  sockets = 1
+  memory  = each.value.memory_mb
+  
+  disk {
+    size    = "${each.value.disk_gb}G"
+    storage = each.value.storage
+    type    = "scsi"
+  }
+  
+  network {
+    model  = "virtio"
+    bridge = var.network_bridge
+  }
+  
+  os_type   = "cloud-init"
+  ipconfig0 = "ip=dhcp"
+  sshkeys   = var.ssh_public_key
+  
+  automatic_reboot = true
+  
+  lifecycle {
+    ignore_changes = [
+      network,
+      clone,
+    ]
+  }
+}
+
+output "vm_ids" {
+  value = { for key, vm in proxmox_vm_qemu.vm : key => vm.vmid }
+}
+
+output "ip_addresses" {
+  value = { for key, vm in proxmox_vm_qemu.vm : key => vm.default_ipv4_address }
+}
+'''
+    
+    def _get_lxc_batch_template(self):
+        """Template Terraform pour un lot de conteneurs LXC (for_each sur var.instances)"""
+        return self._get_terraform_header() + '''resource "proxmox_lxc" "container" {
+  for_each = var.instances
+  
+  hostname    = each.value.name
+  target_node = each.value.node
+  vmid        = each.value.vmid
+  ostemplate  = var.lxc_template
+  
+  cores  = each.value.cpu_cores
+  memory = each.value.memory_mb
+  swap   = 512
+  
+  rootfs {
+    storage = each.value.storage
+    size    = "${each.value.disk_gb}G"
+  }
+  
+  network {
+    name   = "eth0"
+    bridge = var.network_bridge
+    ip     = "dhcp"
+  }
+  
+  ssh_public_keys = var.ssh_public_key
+  unprivileged    = true
+  start           = true
+}
+
+output "vm_ids" {
+  value = { for key, ct in proxmox_lxc.container : key => ct.vmid }
+}
+
+output "ip_addresses" {
+  value = { for key, ct in proxmox_lxc.container : key => ct.network[0].ip }
+}
+'''
+    
+    def _generate_variables_tf(self, workspace_dir, batch=False):
+        """Génère le fichier variables.tf (variables par instance ou map d'instances)"""
         variables = '''variable "proxmox_api_url" {
   description = "URL de l'API Proxmox"
   type        = string
@@ -206,26 +666,6 @@ variable "proxmox_node" {
   type        = string
 }
 
-variable "vm_name" {
-  description = "Nom de la VM ou du conteneur"
-  type        = string
-}
-
-variable "cpu_cores" {
-  description = "Nombre de coeurs CPU"
-  type        = number
-}
-
-variable "memory_mb" {
-  description = "Mémoire RAM en MB"
-  type        = number
-}
-
-variable "disk_gb" {
-  description = "Taille du disque en GB"
-  type        = number
-}
-
 variable "storage" {
   description = "Nom du storage Proxmox"
   type        = string
@@ -255,56 +695,310 @@ variable "ssh_public_key" {
 }
 '''
         
-        with open(os.path.join(workspace_dir, 'variables.tf'), 'w', encoding='utf-8') as f:
-            f.write(variables)
+        if batch:
+            variables += '''
+variable "instances" {
+  description = "Instances à créer, indexées par identifiant de déploiement"
+  type = map(object({
+    name      = string
+    vmid      = number
+    node      = string
+    storage   = string
+    cpu_cores = number
+    memory_mb = number
+    disk_gb   = number
+  }))
+}
+'''
+        else:
+            variables += '''
+variable "vm_name" {
+  description = "Nom de la VM ou du conteneur"
+  type        = string
+}
+
+variable "vmid" {
+  description = "VMID attribué par la plateforme (0 = prochain libre)"
+  type        = number
+  default     = 0
+}
+
+variable "cpu_cores" {
+  description = "Nombre de coeurs CPU"
+  type        = number
+}
+
+variable "memory_mb" {
+  description = "Mémoire RAM en MB"
+  type        = number
+}
+
+variable "disk_gb" {
+  description = "Taille du disque en GB"
+  type        = number
+}
+'''
+        
+        self._write_if_changed(workspace_dir, 'variables.tf', variables)
     
     def _generate_tfvars(self, workspace_dir, deployment):
         """Génère le fichier terraform.tfvars"""
         
+        tfvars = self._render_common_tfvars(
+            deployment.source_template,
+            deployment.proxmox_node,
+            deployment.proxmox_storage
+        ) + f'''vm_name                  = "{deployment.name}"
+vmid                     = {self._vmid(deployment)}
+cpu_cores                = {deployment.cpu}
+memory_mb                = {deployment.memory}
+disk_gb                  = {deployment.disk}
+'''
+        
+        self._write_if_changed(workspace_dir, 'terraform.tfvars', tfvars)
+    
+    def _generate_batch_tfvars(self, workspace_dir, deployments):
+        """Génère le fichier terraform.tfvars d'un lot (map d'instances)"""
+        
+        instances = ''.join(
+            f'''  "{deployment.id}" = {{
+    name      = "{deployment.name}"
+    vmid      = {self._vmid(deployment)}
+    node      = "{deployment.proxmox_node or os.getenv('PROXMOX_NODE')}"
+    storage   = "{deployment.proxmox_storage or os.getenv('PROXMOX_STORAGE', 'local-lvm')}"
+    cpu_cores = {deployment.cpu}
+    memory_mb = {deployment.memory}
+    disk_gb   = {deployment.disk}
+  }}
+'''
+            for deployment in deployments
+        )
+        
+        tfvars = self._render_common_tfvars(deployments[0].source_template) + f'''instances = {{
+{instances}}}
+'''
+        
+        self._write_if_changed(workspace_dir, 'terraform.tfvars', tfvars)
+    
+    def _vmid(self, deployment):
+        """VMID de l'instance: celui de l'instance créée, sinon celui réservé (0: choisi par Proxmox)"""
+        return deployment.proxmox_id or deployment.vmid or 0
+    
+    def _render_common_tfvars(self, template_name=None, node=None, storage=None):
+        """
+        Variables communes à tous les workspaces (connexion, réseau, templates)
+        
+        Args:
+            template_name: Template à cloner (image dorée), le template
+                générique de .env par défaut
+            node, storage: Placement choisi, PROXMOX_NODE et PROXMOX_STORAGE
+                par défaut (les instances d'un lot portent le leur)
+        """
+        
         # Récupérer le nom du template depuis .env ou utiliser une valeur par défaut
-        template_name = os.getenv('TEMPLATE_NAME', 'ubuntu-22.04-template')
+        template_name = template_name or os.getenv('TEMPLATE_NAME', 'ubuntu-22.04-template')
         lxc_template = os.getenv('LXC_TEMPLATE', 'local:vztmpl/ubuntu-22.04-standard_22.04-1_amd64.tar.zst')
         
-        tfvars = f'''proxmox_api_url          = "{os.getenv('PROXMOX_API_URL')}"
+        return f'''proxmox_api_url          = "{os.getenv('PROXMOX_API_URL')}"
 proxmox_api_token_id     = "{os.getenv('PROXMOX_API_TOKEN_ID')}"
 proxmox_api_token_secret = "{os.getenv('PROXMOX_API_TOKEN_SECRET')}"
-proxmox_node             = "{os.getenv('PROXMOX_NODE')}"
-vm_name                  = "{deployment.name}"
-cpu_cores                = {deployment.cpu}
-memory_mb                = {deployment.memory}
-disk_gb                  = {deployment.disk}
-storage                  = "{os.getenv('PROXMOX_STORAGE', 'local-lvm')}"
+proxmox_node             = "{node or os.getenv('PROXMOX_NODE')}"
+storage                  = "{storage or os.getenv('PROXMOX_STORAGE', 'local-lvm')}"
 network_bridge           = "{os.getenv('PROXMOX_BRIDGE', 'vmbr0')}"
 template_name            = "{template_name}"
 lxc_template             = "{lxc_template}"
 '''
+    
+    def _run(self, workspace_dir, args, deadline=None, on_line=None):
+        """
+        Exécute une commande terraform dans son propre groupe de processus
+        
+        Le groupe entier (terraform et ses plugins providers) est arrêté dès
+        que l'échéance est dépassée ou que l'annulation est demandée.
+        
+        Args:
+            on_line: Callback (stream, line) appelé pour chaque ligne dès sa
+                production; la sortie n'est alors pas conservée
+        
+        Returns:
+            Tuple (return_code, stdout, stderr), sorties vides si on_line est fourni
+        
+        Raises:
+            DeadlineExceeded, OperationCancelled: après arrêt du processus
+        """
+        deadline = deadline or Deadline()
+        deadline.check()
+        
+        collected = {'stdout': [], 'stderr': []}
+        if on_line is None:
+            on_line = lambda stream, line: collected[stream].append(line)
         
-        with open(os.path.join(workspace_dir, 'terraform.tfvars'), 'w', encoding='utf-8') as f:
-            f.write(tfvars)
+        process = subprocess.Popen(
+            [self.terraform_bin, *args],
+            cwd=workspace_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self._env(workspace_dir),
+            start_new_session=True
+        )
+        
+        buffers = {
+            process.stdout: LineBuffer('stdout', on_line),
+            process.stderr: LineBuffer('stderr', on_line)
+        }
+        selector = selectors.DefaultSelector()
+        for pipe in buffers:
+            selector.register(pipe, selectors.EVENT_READ)
+        
+        def check_deadline():
+            if deadline.cancelled or deadline.expired:
+                logger.warning(f"🛑 Arrêt de terraform {args[0]} ({workspace_dir})")
+                self._terminate(process)
+                deadline.check()
+        
+        try:
+            while selector.get_map():
+                check_deadline()
+                for key, _ in selector.select(min(1.0, deadline.remaining())):
+                    data = os.read(key.fileobj.fileno(), 32768)
+                    if data:
+                        buffers[key.fileobj].feed(data)
+                    else:
+                        selector.unregister(key.fileobj)
+                        buffers[key.fileobj].flush()
+            
+            while True:
+                try:
+                    return_code = process.wait(timeout=min(1.0, deadline.remaining()))
+                    break
+                except subprocess.TimeoutExpired:
+                    check_deadline()
+            
+            return return_code, '\n'.join(collected['stdout']), '\n'.join(collected['stderr'])
+        except BaseException:
+            if process.poll() is None:
+                self._terminate(process)
+            raise
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
     
-    def apply(self, workspace_dir):
-        """Applique la configuration Terraform"""
-        tf = Terraform(working_dir=workspace_dir)
+    def _env(self, workspace_dir):
+        """Environnement de terraform: cache des providers et backend HTTP du workspace"""
+        env = dict(
+            os.environ,
+            TF_IN_AUTOMATION='1',
+            TF_INPUT='0',
+            TF_PLUGIN_CACHE_DIR=self.plugin_cache_dir
+        )
         
-        return_code, stdout, stderr = tf.apply(
-            skip_plan=False,
-            auto_approve=True
+        if self.remote_state:
+            address = f"{self.state_address}/{self._state_name(workspace_dir)}"
+            env.update(
+                TF_HTTP_ADDRESS=address,
+                TF_HTTP_LOCK_ADDRESS=address,
+                TF_HTTP_UNLOCK_ADDRESS=address,
+                TF_HTTP_USERNAME='terraform',
+                TF_HTTP_PASSWORD=Config.TERRAFORM_STATE_PASSWORD
+            )
+        
+        return env
+    
+    def _terminate(self, process):
+        """Arrête le groupe de processus: SIGTERM, puis SIGKILL après un délai de grâce"""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.communicate(timeout=TERMINATION_GRACE)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+        except ProcessLookupError:
+            process.communicate()
+    
+    def _run_streamed(self, workspace_dir, args, deadline=None, on_line=None):
+        """
+        Exécute une commande en diffusant sa sortie si on_line est fourni
+        
+        Returns:
+            Tuple (return_code, output): sortie complète, ou seulement les
+            OUTPUT_TAIL_LINES dernières lignes lorsqu'elle est diffusée
+        """
+        if on_line is None:
+            return_code, stdout, stderr = self._run(workspace_dir, args, deadline)
+            return return_code, f"{stdout}\n{stderr}"
+        
+        tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        
+        def stream(name, line):
+            tail.append(line)
+            on_line(name, line)
+        
+        return_code, _, _ = self._run(workspace_dir, args, deadline, stream)
+        return return_code, '\n'.join(tail)
+    
+    def plan(self, workspace_dir, deadline=None, on_line=None):
+        """
+        Calcule les changements et enregistre le plan dans PLAN_FILE
+        
+        Returns:
+            Tuple (success, has_changes, output); un plan sans changement
+            permet de ne pas exécuter apply
+        """
+        return_code, output = self._run_streamed(
+            workspace_dir,
+            [
+                'plan', '-input=false', '-no-color', '-detailed-exitcode',
+                f'-parallelism={self.parallelism}', f'-lock-timeout={self.lock_timeout}s', f'-out={PLAN_FILE}'
+            ],
+            deadline,
+            on_line
         )
         
-        output = f"{stdout}\n{stderr}"
+        # -detailed-exitcode: 0 = aucun changement, 1 = erreur, 2 = changements
+        if return_code not in (0, 2):
+            logger.error(f"❌ Terraform plan failed: {output}")
+            return False, False, output
+        
+        return True, return_code == 2, output
+    
+    def apply(self, workspace_dir, deadline=None, on_line=None, plan_file=None):
+        """
+        Applique la configuration Terraform
+        
+        Args:
+            on_line: Callback (stream, line) recevant la sortie pendant
+                l'exécution; seules les OUTPUT_TAIL_LINES dernières lignes
+                sont alors retournées
+            plan_file: Plan enregistré par plan() à appliquer tel quel
+        
+        Returns:
+            Tuple (success, output)
+        """
+        args = [
+            'apply', '-input=false', '-no-color',
+            f'-parallelism={self.parallelism}', f'-lock-timeout={self.lock_timeout}s'
+        ]
+        args += [plan_file] if plan_file else ['-auto-approve']
+        
+        return_code, output = self._run_streamed(workspace_dir, args, deadline, on_line)
         
         if return_code != 0:
-            logger.error(f"❌ Terraform apply failed: {stderr}")
+            logger.error(f"❌ Terraform apply failed: {output}")
             return False, output
         
         logger.info(f"✅ Terraform apply succeeded")
         return True, output
     
-    def destroy(self, workspace_dir):
-        """Détruit l'infrastructure Terraform"""
-        tf = Terraform(working_dir=workspace_dir)
+    def destroy(self, workspace_dir, targets=None, deadline=None):
+        """Détruit l'infrastructure Terraform (ou seulement les ressources ciblées)"""
+        args = [
+            'destroy', '-input=false', '-no-color', '-auto-approve',
+            f'-parallelism={self.parallelism}', f'-lock-timeout={self.lock_timeout}s'
+        ]
+        args += [f'-target={target}' for target in targets or []]
         
-        return_code, stdout, stderr = tf.destroy(auto_approve=True)
+        return_code, stdout, stderr = self._run(workspace_dir, args, deadline)
         
         output = f"{stdout}\n{stderr}"
         
@@ -315,11 +1009,9 @@ lxc_template             = "{lxc_template}"
         logger.info(f"✅ Terraform destroy succeeded")
         return True, output
     
-    def get_outputs(self, workspace_dir):
+    def get_outputs(self, workspace_dir, deadline=None):
         """Récupère les outputs Terraform"""
-        tf = Terraform(working_dir=workspace_dir)
-        
-        return_code, stdout, stderr = tf.output(json=IsFlagged)
+        return_code, stdout, stderr = self._run(workspace_dir, ['output', '-json', '-no-color'], deadline)
         
         if return_code != 0:
             logger.error(f"❌ Terraform output failed: {stderr}")
@@ -334,3 +1026,48 @@ lxc_template             = "{lxc_template}"
         except Exception as e:
             logger.error(f"❌ Erreur parsing outputs: {e}")
             return {}
+    
+    def get_batch_outputs(self, workspace_dir, refresh=False, deadline=None):
+        """
+        Récupère les outputs d'un lot, indexés par identifiant de déploiement
+        
+        Args:
+            refresh: rafraîchir d'abord les outputs depuis l'état (après un
+                apply partiellement échoué, les outputs ne sont pas réécrits)
+        
+        Returns:
+            Dictionnaire {deployment_id: {'vm_id': ..., 'ip_address': ...}}
+        """
+        if refresh:
+            return_code, stdout, stderr = self._run(
+                workspace_dir,
+                [
+                    'apply', '-refresh-only', '-input=false', '-no-color', '-auto-approve',
+                    f'-lock-timeout={self.lock_timeout}s'
+                ],
+                deadline
+            )
+            if return_code != 0:
+                logger.warning(f"⚠️ Rafraîchissement des outputs échoué: {stderr}")
+        
+        return_code, stdout, stderr = self._run(workspace_dir, ['output', '-json', '-no-color'], deadline)
+        
+        if return_code != 0:
+            logger.error(f"❌ Terraform output failed: {stderr}")
+            return {}
+        
+        try:
+            outputs = json.loads(stdout)
+            vm_ids = outputs.get('vm_ids', {}).get('value') or {}
+            ip_addresses = outputs.get('ip_addresses', {}).get('value') or {}
+            return {
+                int(key): {
+                    'vm_id': vm_id,
+                    'ip_address': ip_addresses.get(key)
+                }
+                for key, vm_id in vm_ids.items()
+            }
+        except Exception as e:
+            logger.error(f"❌ Erreur parsing outputs: {e}")
+            return {}
+
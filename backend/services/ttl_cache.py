@@ -0,0 +1,214 @@
+"""
+Cache à durée de vie avec rafraîchissement en arrière-plan (stale-while-revalidate)
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Part de la durée de vie après laquelle le rafraîchissement est anticipé
+REFRESH_AHEAD = 0.8
+
+# Intervalle minimal entre deux passages du rafraîchissement (secondes)
+MIN_REFRESH_WAIT = 0.5
+
+
+class CacheMiss(Exception):
+    """Aucune valeur disponible: le premier chargement a échoué"""
+
+
+class _Entry:
+    def __init__(self, loader, ttl):
+        self.loader = loader
+        self.ttl = ttl
+        self.value = None
+        self.loaded_at = None
+        self.updated_at = None
+        self.error = None
+        self.due = 0.0
+        self.load_lock = threading.Lock()
+        self.counters = {'hits': 0, 'stale': 0, 'misses': 0, 'refreshes': 0, 'failures': 0}
+        self.last_duration = None
+
+    def age(self, now=None):
+        if self.loaded_at is None:
+            return None
+        return (now or time.monotonic()) - self.loaded_at
+
+
+class TtlCache:
+    """
+    Valeurs lentes à obtenir, servies depuis la mémoire
+
+    Chaque entrée est rechargée par un unique thread de rafraîchissement
+    peu avant l'expiration de sa durée de vie: le nombre d'appels vers la
+    source est constant, quel que soit le nombre de lecteurs.
+
+    - valeur plus jeune que ttl: servie telle quelle (hit);
+    - plus ancienne, mais plus jeune que max_stale: servie immédiatement
+      (stale), un rechargement est déclenché s'il n'est pas déjà en cours;
+    - absente ou trop ancienne: chargée par le lecteur (miss), un seul
+      chargement à la fois, les autres lecteurs l'attendent.
+
+    Un chargement en échec conserve la valeur précédente. ttl à 0
+    désactive le cache (chaque lecture appelle la source).
+    """
+
+    def __init__(self, ttl, max_stale=0, name='cache'):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.name = name
+
+        self._entries = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def register(self, key, loader, ttl=None):
+        """Déclare une entrée et la fonction qui la charge"""
+        self._entries[key] = _Entry(loader, self.ttl if ttl is None else ttl)
+
+    def get(self, key):
+        """
+        Valeur d'une entrée
+
+        Returns:
+            Tuple (value, state, age): state parmi 'hit', 'stale', 'miss',
+            'bypass'; age de la valeur en secondes
+
+        Raises:
+            CacheMiss: si aucune valeur n'a encore pu être chargée
+        """
+        entry = self._entries[key]
+        if not entry.ttl:
+            return entry.loader(), 'bypass', 0.0
+
+        age = entry.age()
+        if age is not None and age < entry.ttl:
+            entry.counters['hits'] += 1
+            return entry.value, 'hit', age
+
+        if age is not None and (not self.max_stale or age < self.max_stale):
+            entry.counters['stale'] += 1
+            self._refresh_in_background(key, entry)
+            return entry.value, 'stale', age
+
+        with entry.load_lock:
+            # Un autre lecteur vient peut-être de charger la valeur; après
+            # un échec, la source n'est pas rappelée avant l'échéance prévue
+            age = entry.age()
+            if (age is None or age >= entry.ttl) and entry.due <= time.monotonic():
+                entry.counters['misses'] += 1
+                self._load(key, entry)
+
+        age = entry.age()
+        if age is None or (self.max_stale and age >= self.max_stale):
+            raise CacheMiss(entry.error or f"{key} indisponible")
+        return entry.value, 'miss', age
+
+    def invalidate(self, key):
+        """Force le rechargement d'une entrée à la prochaine lecture"""
+        entry = self._entries[key]
+        entry.loaded_at = None
+        entry.due = 0.0
+
+    def refresh(self, key):
+        """Recharge une entrée (attend un chargement en cours)"""
+        entry = self._entries[key]
+        with entry.load_lock:
+            return self._load(key, entry)
+
+    def _load(self, key, entry):
+        """Appelle la source; le verrou de l'entrée doit être tenu"""
+        start = time.monotonic()
+        try:
+            value = entry.loader()
+        except Exception as e:
+            entry.counters['failures'] += 1
+            entry.error = str(e)
+            entry.due = time.monotonic() + entry.ttl
+            logger.warning(f"⚠️ Cache {self.name}: rechargement de {key} impossible: {e}")
+            return False
+        finally:
+            entry.last_duration = time.monotonic() - start
+
+        entry.value = value
+        entry.loaded_at = time.monotonic()
+        entry.due = entry.loaded_at + entry.ttl * REFRESH_AHEAD
+        entry.updated_at = datetime.utcnow()
+        entry.error = None
+        entry.counters['refreshes'] += 1
+        return True
+
+    def _refresh_in_background(self, key, entry):
+        """Recharge une entrée périmée sans bloquer le lecteur"""
+        if entry.due > time.monotonic() or not entry.load_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._load(key, entry)
+            finally:
+                entry.load_lock.release()
+
+        threading.Thread(target=run, name=f"{self.name}-refresh", daemon=True).start()
+
+    def start(self):
+        """Démarre le rafraîchissement périodique des entrées"""
+        if self._thread or not self._entries or not any(e.ttl for e in self._entries.values()):
+            return
+
+        self._thread = threading.Thread(
+            target=self._refresh_loop,
+            name=f"{self.name}-cache",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"🗂️ Cache {self.name} rafraîchi toutes les {self.ttl}s")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            next_wait = None
+
+            for key, entry in list(self._entries.items()):
+                if not entry.ttl:
+                    continue
+
+                if entry.due <= now and entry.load_lock.acquire(blocking=False):
+                    try:
+                        self._load(key, entry)
+                    finally:
+                        entry.load_lock.release()
+
+                # Après un échec, nouvel essai une durée de vie plus tard
+                remaining = entry.due - time.monotonic()
+                next_wait = remaining if next_wait is None else min(next_wait, remaining)
+
+            self._stop_event.wait(max(MIN_REFRESH_WAIT, next_wait or 0))
+
+    def stats(self):
+        """Âge, durée de vie et compteurs de chaque entrée"""
+        now = time.monotonic()
+        entries = {}
+        for key, entry in sorted(self._entries.items()):
+            age = entry.age(now)
+            entries[key] = {
+                'ttl': entry.ttl,
+                'age': round(age, 3) if age is not None else None,
+                'updated_at': entry.updated_at.isoformat() if entry.updated_at else None,
+                'last_duration': round(entry.last_duration, 3) if entry.last_duration is not None else None,
+                'last_error': entry.error,
+                **entry.counters
+            }
+
+        return {
+            'ttl': self.ttl,
+            'max_stale': self.max_stale,
+            'entries': entries
+        }
@@ -0,0 +1,138 @@
+"""
+Attribution des VMID dans une plage réservée à la plateforme
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, VmidAllocation
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class VmidExhausted(Exception):
+    """Plus aucun VMID libre dans la plage réservée"""
+
+
+class VmidAllocator:
+    """
+    Attribue les VMID des déploiements avant leur création
+
+    Sans cela, les clones simultanés demandent chacun cluster/nextid et
+    obtiennent le même VMID. Chaque VMID attribué est une ligne de
+    vmid_allocations dont il est la clé primaire: l'insertion échoue si un
+    autre thread ou processus l'a pris entre-temps, et le suivant est
+    essayé. Le VMID d'un déploiement supprimé reste en quarantaine
+    VMID_QUARANTINE_HOURS avant d'être réattribué (sauvegardes, métriques
+    et caches encore associés à l'ancienne instance).
+
+    Les images dorées ont leur propre plage (owner='golden_image_id'): les
+    plages de deux allocateurs ne doivent pas se chevaucher.
+    """
+
+    def __init__(self, start=None, end=None, quarantine_hours=None, owner='deployment_id'):
+        self.start = Config.VMID_RANGE_START if start is None else start
+        self.end = Config.VMID_RANGE_END if end is None else end
+        self.quarantine_hours = Config.VMID_QUARANTINE_HOURS if quarantine_hours is None else quarantine_hours
+        self.owner = owner
+
+        if self.enabled and not 100 <= self.start <= self.end:
+            raise ValueError(f"Plage de VMID invalide: {self.start}-{self.end}")
+
+    @property
+    def enabled(self):
+        return bool(self.start and self.end)
+
+    def allocate(self, owner_id, exclude=()):
+        """
+        VMID d'un déploiement ou d'une image (le même à chaque appel tant qu'il n'est pas libéré)
+
+        La session est validée ou annulée: aucune modification ne doit y être
+        en attente.
+
+        Args:
+            exclude: VMID déjà présents sur le cluster (instances hors plateforme)
+
+        Returns:
+            VMID attribué
+
+        Raises:
+            VmidExhausted: si la plage est pleine
+        """
+        existing = VmidAllocation.query.filter_by(**{self.owner: owner_id}, status='allocated').first()
+        if existing:
+            return existing.vmid
+
+        self._recycle()
+
+        taken = {vmid for (vmid,) in db.session.query(VmidAllocation.vmid).filter(
+            VmidAllocation.vmid.between(self.start, self.end)
+        )}
+        taken.update(int(vmid) for vmid in exclude)
+
+        for vmid in range(self.start, self.end + 1):
+            if vmid in taken:
+                continue
+
+            db.session.add(VmidAllocation(vmid=vmid, status='allocated', **{self.owner: owner_id}))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Pris par une attribution concurrente: essayer le suivant
+                db.session.rollback()
+                continue
+
+            logger.info(f"🔢 VMID {vmid} attribué ({self.owner}={owner_id})")
+            return vmid
+
+        raise VmidExhausted(f"Plus aucun VMID libre entre {self.start} et {self.end}")
+
+    def release(self, owner_id):
+        """Met en quarantaine le VMID d'un déploiement ou d'une image supprimé"""
+        released = VmidAllocation.query.filter(
+            getattr(VmidAllocation, self.owner) == owner_id,
+            VmidAllocation.status == 'allocated'
+        ).update({
+            VmidAllocation.status: 'quarantine',
+            VmidAllocation.released_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return released
+
+    def _recycle(self):
+        """Libère les VMID dont la quarantaine est terminée"""
+        cutoff = datetime.utcnow() - timedelta(hours=self.quarantine_hours)
+        recycled = VmidAllocation.query.filter(
+            VmidAllocation.vmid.between(self.start, self.end),
+            VmidAllocation.status == 'quarantine',
+            VmidAllocation.released_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        if recycled:
+            logger.info(f"♻️ {recycled} VMID sortis de quarantaine")
+
+    def stats(self):
+        """Plage, VMID attribués, en quarantaine et libres"""
+        if not self.enabled:
+            return {'enabled': False}
+
+        counts = dict(db.session.query(
+            VmidAllocation.status,
+            db.func.count(VmidAllocation.vmid)
+        ).filter(
+            VmidAllocation.vmid.between(self.start, self.end)
+        ).group_by(VmidAllocation.status).all())
+
+        size = self.end - self.start + 1
+        return {
+            'enabled': True,
+            'range': [self.start, self.end],
+            'quarantine_hours': self.quarantine_hours,
+            'allocated': counts.get('allocated', 0),
+            'quarantine': counts.get('quarantine', 0),
+            'free': size - sum(counts.values())
+        }
@@ -0,0 +1,363 @@
+"""
+Pool chaud d'instances préprovisionnées par framework et type
+"""
+
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from models.database import db, Deployment
+from services.ttl_cache import CacheMiss
+from services.worker_pool import QueueFullError
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_pool_sizes(value):
+    """
+    Parse la taille des pools chauds
+
+    Args:
+        value: Chaîne "framework:type=taille" séparée par des virgules,
+            par exemple "django:vm=2,nodejs:lxc=1"
+
+    Returns:
+        Dictionnaire {(framework, type): taille}
+
+    Raises:
+        ValueError: si une entrée est invalide
+    """
+    sizes = {}
+
+    for entry in (value or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        try:
+            key, size = entry.split('=')
+            framework, deployment_type = key.strip().lower().split(':')
+            size = int(size)
+        except ValueError:
+            raise ValueError(f"Entrée de pool chaud invalide: '{entry}' (attendu framework:type=taille)")
+
+        if not Config.is_framework_supported(framework):
+            raise ValueError(f"Framework non supporté dans le pool chaud: {framework}")
+        if deployment_type not in ('vm', 'lxc'):
+            raise ValueError(f"Type invalide dans le pool chaud: {deployment_type}")
+        if size < 0:
+            raise ValueError(f"Taille de pool chaud négative: '{entry}'")
+
+        sizes[(framework, deployment_type)] = size
+
+    return sizes
+
+
+class WarmPool:
+    """
+    Maintient des instances déjà démarrées et installées, prêtes à recevoir une application
+
+    Une instance du pool est un déploiement marqué warm_pool qui suit le
+    pipeline habituel jusqu'à l'installation du framework, puis reste en
+    statut 'warm'. POST /api/deploy en réclame une compatible et ne
+    déroule plus que le déploiement de l'application; le pool est
+    ensuite complété en arrière-plan.
+    """
+
+    def __init__(self, deployment_service, sizes=None):
+        self.deployment_service = deployment_service
+        self.sizes = parse_pool_sizes(Config.WARM_POOL_SIZES) if sizes is None else sizes
+
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def enabled(self):
+        return any(self.sizes.values())
+
+    def claim(self, framework, deployment_type, cpu, memory, disk):
+        """
+        Réclame une instance prête disposant au moins des ressources demandées
+
+        La réclamation est une mise à jour conditionnelle: une instance n'est
+        jamais attribuée deux fois, même entre plusieurs processus.
+
+        Returns:
+            Déploiement réclamé (statut 'queued'), ou None si le pool est vide
+        """
+        key = (framework.lower(), deployment_type)
+        if not self.sizes.get(key):
+            return None
+
+        candidates = Deployment.query.filter(
+            Deployment.warm_pool.is_(True),
+            Deployment.status == 'warm',
+            Deployment.framework == key[0],
+            Deployment.type == deployment_type,
+            Deployment.cpu >= cpu,
+            Deployment.memory >= memory,
+            Deployment.disk >= disk
+        ).order_by(
+            Deployment.cpu,
+            Deployment.memory,
+            Deployment.disk,
+            Deployment.pooled_at
+        ).limit(5).all()
+
+        for candidate in candidates:
+            claimed = Deployment.query.filter(
+                Deployment.id == candidate.id,
+                Deployment.warm_pool.is_(True),
+                Deployment.status == 'warm'
+            ).update({
+                Deployment.warm_pool: False,
+                Deployment.status: 'queued'
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                db.session.refresh(candidate)
+                self._count(self._hits, key)
+                logger.info(f"🔥 Instance chaude {candidate.id} attribuée ({key[0]}/{deployment_type})")
+                return candidate
+
+        self._count(self._misses, key)
+        return None
+
+    def release(self, deployment):
+        """Remet dans le pool une instance réclamée qui n'a pas pu être utilisée"""
+        deployment.warm_pool = True
+        deployment.status = 'warm'
+        deployment.name = self._instance_name(deployment.framework, deployment.type)
+        deployment.github_url = ''
+        deployment.idempotency_key = None
+        deployment.request_hash = None
+        db.session.commit()
+
+    def _count(self, counters, key):
+        with self._lock:
+            counters[key] = counters.get(key, 0) + 1
+
+    def _instance_name(self, framework, deployment_type):
+        return f"warm-{framework}-{deployment_type}-{uuid.uuid4().hex[:6]}"
+
+    def start(self):
+        """Démarre le remplissage périodique du pool"""
+        if self._thread or not self.enabled:
+            return
+
+        self._thread = threading.Thread(
+            target=self._refill_loop,
+            name='warm-pool',
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"🔥 Pool chaud démarré: {self._format_sizes()}")
+
+    def _format_sizes(self):
+        return ', '.join(f"{f}:{t}={n}" for (f, t), n in sorted(self.sizes.items()))
+
+    def _refill_loop(self):
+        from app import app
+
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self.retire()
+                    self.refill()
+            except Exception as e:
+                logger.error(f"❌ Erreur du pool chaud: {e}")
+
+            self._stop_event.wait(Config.WARM_POOL_REFILL_INTERVAL)
+
+    def _pool_query(self):
+        """Instances du pool prêtes ou en cours de préparation"""
+        return Deployment.query.filter(
+            Deployment.warm_pool.is_(True),
+            Deployment.status.in_(['queued', 'creating', 'warm'])
+        )
+
+    def refill(self):
+        """
+        Lance la préparation des instances manquantes
+
+        Chaque instance est affectée au noeud candidat qui en a le moins,
+        chaque noeud en recevant au plus WARM_POOL_MAX_PER_NODE; si la file
+        des workers est pleine, le remplissage est reporté au passage suivant.
+
+        Returns:
+            Nombre d'instances lancées
+        """
+        per_node = dict(self._pool_query().with_entities(
+            Deployment.proxmox_node,
+            db.func.count(Deployment.id)
+        ).group_by(Deployment.proxmox_node).all())
+        started = 0
+
+        for (framework, deployment_type), target in sorted(self.sizes.items()):
+            current = self._pool_query().filter(
+                Deployment.framework == framework,
+                Deployment.type == deployment_type
+            ).count()
+
+            for _ in range(target - current):
+                deployment = Deployment(
+                    name=self._instance_name(framework, deployment_type),
+                    type=deployment_type,
+                    framework=framework,
+                    github_url='',
+                    cpu=Config.WARM_POOL_CPU,
+                    memory=Config.WARM_POOL_MEMORY_MB,
+                    disk=Config.WARM_POOL_DISK_GB,
+                    provisioner=Config.PROVISIONER,
+                    warm_pool=True,
+                    status='queued'
+                )
+
+                nodes = [
+                    node for node in self._nodes(deployment)
+                    if per_node.get(node, 0) < Config.WARM_POOL_MAX_PER_NODE
+                ]
+                if not nodes:
+                    logger.debug(
+                        f"Pool chaud: limite de {Config.WARM_POOL_MAX_PER_NODE} instances atteinte sur chaque noeud"
+                    )
+                    break
+
+                # Le placement choisit le storage sur ce noeud
+                deployment.proxmox_node = min(nodes, key=lambda node: per_node.get(node, 0))
+                db.session.add(deployment)
+                db.session.commit()
+
+                try:
+                    self.deployment_service.deploy_async(deployment.id)
+                except QueueFullError:
+                    db.session.delete(deployment)
+                    db.session.commit()
+                    logger.info("ℹ️ File pleine, remplissage du pool chaud reporté")
+                    return started
+
+                per_node[deployment.proxmox_node] = per_node.get(deployment.proxmox_node, 0) + 1
+                started += 1
+
+        return started
+
+    def _nodes(self, deployment):
+        """Noeuds pouvant accueillir une instance (PROXMOX_NODE sans inventaire ni placement)"""
+        service = self.deployment_service
+        if service.scheduler:
+            try:
+                inventory = service.status_cache.get('cluster_inventory')[0]
+            except CacheMiss:
+                pass
+            else:
+                template = service.image_service.resolve_template(deployment)[0]
+                return sorted(service._placement_candidates(inventory, deployment.type, template=template))
+
+        return [Config.PROXMOX_NODE]
+
+    def retire(self):
+        """
+        Détruit les instances inutiles du pool
+
+        Sont retirées: les instances restées inutilisées plus de
+        WARM_POOL_MAX_IDLE_HOURS, celles au-delà de la taille configurée
+        et celles dont la préparation a échoué.
+
+        Returns:
+            Nombre d'instances détruites
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=Config.WARM_POOL_MAX_IDLE_HOURS)
+        to_retire = []
+
+        ready = Deployment.query.filter(
+            Deployment.warm_pool.is_(True),
+            Deployment.status == 'warm'
+        ).order_by(Deployment.pooled_at.desc()).all()
+
+        kept = {}
+        for deployment in ready:
+            key = (deployment.framework, deployment.type)
+            kept[key] = kept.get(key, 0) + 1
+            if kept[key] > self.sizes.get(key, 0) or (deployment.pooled_at and deployment.pooled_at < cutoff):
+                to_retire.append(deployment)
+
+        failed = Deployment.query.filter(
+            Deployment.warm_pool.is_(True),
+            Deployment.status.in_(['failed', 'cancelled'])
+        ).all()
+
+        destroyed = 0
+        for deployment in to_retire + failed:
+            # Retirer l'instance des candidates avant de la détruire
+            claimed = Deployment.query.filter(
+                Deployment.id == deployment.id,
+                Deployment.warm_pool.is_(True),
+                Deployment.status == deployment.status
+            ).update({Deployment.status: 'deleted'}, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                continue
+
+            success, message = self.deployment_service.destroy(deployment.id)
+            db.session.refresh(deployment)
+            if not success:
+                deployment.status = 'failed'
+                deployment.error_message = message
+                db.session.commit()
+                logger.error(f"❌ Destruction de l'instance chaude {deployment.id} impossible: {message}")
+                continue
+
+            self.deployment_service.vmids.release(deployment.id)
+            destroyed += 1
+            logger.info(f"🗑️ Instance chaude {deployment.id} retirée du pool")
+
+        return destroyed
+
+    def stats(self):
+        """Tailles, contenu du pool et compteurs de réclamations (hit/miss)"""
+        counts = {}
+        for framework, deployment_type, status, count in db.session.query(
+            Deployment.framework,
+            Deployment.type,
+            Deployment.status,
+            db.func.count(Deployment.id)
+        ).filter(
+            Deployment.warm_pool.is_(True),
+            Deployment.status.in_(['queued', 'creating', 'warm'])
+        ).group_by(Deployment.framework, Deployment.type, Deployment.status):
+            entry = counts.setdefault((framework, deployment_type), {'ready': 0, 'provisioning': 0})
+            entry['ready' if status == 'warm' else 'provisioning'] += count
+
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+
+        pools = {}
+        for key in sorted(set(self.sizes) | set(counts)):
+            pools[f"{key[0]}:{key[1]}"] = {
+                'target': self.sizes.get(key, 0),
+                'ready': counts.get(key, {}).get('ready', 0),
+                'provisioning': counts.get(key, {}).get('provisioning', 0),
+                'hits': hits.get(key, 0),
+                'misses': misses.get(key, 0)
+            }
+
+        total_hits = sum(hits.values())
+        total_misses = sum(misses.values())
+        requests = total_hits + total_misses
+
+        return {
+            'enabled': self.enabled,
+            'max_per_node': Config.WARM_POOL_MAX_PER_NODE,
+            'max_idle_hours': Config.WARM_POOL_MAX_IDLE_HOURS,
+            'pools': pools,
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_rate': round(total_hits / requests, 3) if requests else None
+        }
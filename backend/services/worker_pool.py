@@ -0,0 +1,184 @@
+"""
+Pool de workers borné avec file d'attente d'admission pour les déploiements
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Levée lorsque la file d'attente a atteint sa taille maximale"""
+
+    def __init__(self, depth, max_queue):
+        self.depth = depth
+        self.max_queue = max_queue
+        super().__init__(f"File d'attente pleine ({depth}/{max_queue})")
+
+
+class WorkerPool:
+    """
+    Pool de taille fixe alimenté par une file FIFO
+
+    Chaque élément soumis est un identifiant passé au handler par l'un des
+    workers. La file est bornée : au-delà de max_queue éléments en attente,
+    submit() lève QueueFullError au lieu d'accepter du travail supplémentaire.
+    """
+
+    def __init__(self, handler, workers=4, max_queue=50, name='deploy'):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.name = name
+
+        self._queue = deque()
+        self._enqueued_at = {}
+        self._running = set()
+        self._rerun = set()
+        self._condition = threading.Condition()
+        self._threads = []
+
+        # Statistiques
+        self._wait_times = deque(maxlen=1000)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _ensure_started(self):
+        """Démarre les threads workers au premier usage"""
+        if self._threads:
+            return
+
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"{self.name}-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"🧵 Pool '{self.name}' démarré avec {self.workers} workers")
+
+    def submit(self, item_id, force=False):
+        """
+        Ajoute un élément à la file
+
+        Args:
+            item_id: Identifiant passé au handler
+            force: Ignorer la taille maximale (reprise d'un travail déjà admis)
+
+        Returns:
+            Position dans la file (1 = prochain élément traité)
+
+        Raises:
+            QueueFullError: si la file a atteint sa taille maximale
+        """
+        with self._condition:
+            self._ensure_started()
+
+            if item_id in self._enqueued_at:
+                return self._position_locked(item_id)
+
+            # Resoumis pendant son exécution: il repassera dans la file ensuite
+            if item_id in self._running:
+                self._rerun.add(item_id)
+                return 0
+
+            if not force and len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                raise QueueFullError(len(self._queue), self.max_queue)
+
+            self._queue.append(item_id)
+            self._enqueued_at[item_id] = time.monotonic()
+            self._submitted += 1
+            self._condition.notify()
+
+            return len(self._queue)
+
+    def remove(self, item_id):
+        """Retire un élément encore en attente, retourne True s'il a été retiré"""
+        with self._condition:
+            if item_id not in self._enqueued_at:
+                return False
+
+            self._queue.remove(item_id)
+            del self._enqueued_at[item_id]
+            return True
+
+    def position(self, item_id):
+        """Position d'un élément dans la file (0 = en cours, None = inconnu)"""
+        with self._condition:
+            return self._position_locked(item_id)
+
+    def _position_locked(self, item_id):
+        if item_id in self._running:
+            return 0
+        if item_id in self._enqueued_at:
+            return self._queue.index(item_id) + 1
+        return None
+
+    def retry_after(self):
+        """Estimation grossière (en secondes) avant qu'une place se libère"""
+        with self._condition:
+            waits = list(self._wait_times)
+        if not waits:
+            return 30
+        return max(1, int(sum(waits) / len(waits)))
+
+    def stats(self):
+        """Statistiques du pool et de la file d'attente"""
+        now = time.monotonic()
+
+        with self._condition:
+            waits = list(self._wait_times)
+            oldest = min(self._enqueued_at.values()) if self._enqueued_at else None
+
+            return {
+                'workers': self.workers,
+                'busy': len(self._running),
+                'queue_depth': len(self._queue),
+                'max_queue': self.max_queue,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'wait_seconds': {
+                    'avg': round(sum(waits) / len(waits), 3) if waits else 0,
+                    'max': round(max(waits), 3) if waits else 0,
+                    'oldest_pending': round(now - oldest, 3) if oldest is not None else 0
+                }
+            }
+
+    def _worker_loop(self):
+        """Boucle principale d'un worker"""
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                item_id = self._queue.popleft()
+                enqueued_at = self._enqueued_at.pop(item_id)
+                self._wait_times.append(time.monotonic() - enqueued_at)
+                self._running.add(item_id)
+
+            try:
+                self.handler(item_id)
+                with self._condition:
+                    self._completed += 1
+            except Exception as e:
+                logger.error(f"❌ Erreur dans le worker '{self.name}' pour {item_id}: {e}")
+                with self._condition:
+                    self._failed += 1
+            finally:
+                with self._condition:
+                    self._running.discard(item_id)
+                    if item_id in self._rerun:
+                        self._rerun.discard(item_id)
+                        self._queue.append(item_id)
+                        self._enqueued_at[item_id] = time.monotonic()
+                        self._condition.notify()
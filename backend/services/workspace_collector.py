@@ -0,0 +1,289 @@
+"""
+Nettoyage des workspaces Terraform et mesure de leur occupation disque
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from models.database import db, Deployment, Job
+from services.terraform_service import STATE_ARCHIVE_SUFFIX
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Statuts pendant lesquels Terraform peut travailler dans le workspace
+ACTIVE_STATUSES = ('pending', 'queued', 'creating', 'deleting')
+
+# Statuts d'une instance qui n'a pas abouti (l'état peut être vide)
+UNFINISHED_STATUSES = ('failed', 'cancelled')
+
+
+def directory_usage(path):
+    """
+    Nombre de fichiers et octets occupés par une arborescence
+
+    Un fichier présent sous plusieurs liens physiques (providers repris
+    du squelette) n'est compté qu'une fois.
+
+    Returns:
+        Tuple (files, bytes)
+    """
+    seen = set()
+    files = 0
+    size = 0
+
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            files += 1
+            size += st.st_blocks * 512 if hasattr(st, 'st_blocks') else st.st_size
+
+    return files, size
+
+
+def workspace_action(statuses, idle_since, has_state, now, compact_after, delete_after):
+    """
+    Décide du sort d'un workspace selon ses déploiements
+
+    Args:
+        statuses: Statuts des déploiements décrits par le workspace (vide
+            pour un workspace orphelin)
+        idle_since: Dernière modification des déploiements
+        has_state: Le workspace a un état Terraform non vide
+        compact_after: Inactivité avant compactage (timedelta)
+        delete_after: Délai avant suppression des workspaces supprimés ou
+            sans instance (timedelta)
+
+    Returns:
+        'keep', 'compact' ou 'delete'
+    """
+    if any(status in ACTIVE_STATUSES for status in statuses):
+        return 'keep'
+
+    idle = now - idle_since if idle_since else timedelta.max
+
+    # Plus aucune instance: l'état est archivé puis le workspace supprimé
+    if all(status == 'deleted' for status in statuses):
+        return 'delete' if idle >= delete_after else 'keep'
+
+    # Échec sans rien créer: rien à détruire ni à auditer
+    if not has_state and all(status in UNFINISHED_STATUSES + ('deleted',) for status in statuses):
+        return 'delete' if idle >= compact_after else 'keep'
+
+    return 'compact' if idle >= compact_after else 'keep'
+
+
+class WorkspaceCollector:
+    """
+    Compacte ou supprime périodiquement les workspaces inutiles
+
+    Politique de rétention:
+    - déploiements supprimés (ou workspace orphelin): l'état est archivé en
+      gzip dans TERRAFORM_STATE_DIR, puis le workspace est supprimé après
+      WORKSPACE_DELETED_RETENTION_HOURS;
+    - échecs sans état: workspace supprimé après WORKSPACE_COMPACT_AFTER_HOURS;
+    - instances existantes inactives depuis WORKSPACE_COMPACT_AFTER_HOURS:
+      providers et plan retirés, configuration et état conservés;
+    - archives d'état plus anciennes que STATE_ARCHIVE_RETENTION_DAYS
+      supprimées (0 = conservées).
+
+    Un lot n'est traité que lorsqu'aucune de ses instances n'est active.
+    """
+
+    def __init__(self, terraform_service):
+        self.terraform_service = terraform_service
+
+        self._lock = threading.Lock()
+        self._last_run = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Démarre le nettoyage périodique"""
+        if self._thread or not Config.WORKSPACE_GC_INTERVAL:
+            return
+
+        self._thread = threading.Thread(
+            target=self._collect_loop,
+            name='workspace-gc',
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"🧹 Nettoyage des workspaces toutes les {Config.WORKSPACE_GC_INTERVAL}s")
+
+    def _collect_loop(self):
+        from app import app
+
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self.collect()
+            except Exception as e:
+                logger.error(f"❌ Erreur du nettoyage des workspaces: {e}")
+
+            self._stop_event.wait(Config.WORKSPACE_GC_INTERVAL)
+
+    def _workspace_members(self):
+        """Déploiements par nom de workspace (deployment-<id> ou batch-<id>)"""
+        members = {}
+        for deployment in Deployment.query.filter(Deployment.provisioner == 'terraform'):
+            name = os.path.basename(self.terraform_service.workspace_path(deployment))
+            members.setdefault(name, []).append(deployment)
+        return members
+
+    def _busy_workspaces(self):
+        """Workspaces utilisés par une tâche en cours"""
+        busy = set()
+        for deployment_id, batch_id in db.session.query(Job.deployment_id, Job.batch_id).filter(
+            Job.status.in_(['queued', 'running', 'waiting'])
+        ):
+            if batch_id:
+                busy.add(f"batch-{batch_id}")
+            if deployment_id:
+                deployment = Deployment.query.get(deployment_id)
+                if deployment:
+                    busy.add(os.path.basename(self.terraform_service.workspace_path(deployment)))
+        return busy
+
+    def collect(self):
+        """
+        Applique la politique de rétention à tous les workspaces
+
+        Returns:
+            Résumé: workspaces compactés, supprimés, états archivés,
+            archives expirées et octets libérés
+        """
+        with self._lock:
+            start = time.monotonic()
+            now = datetime.utcnow()
+            compact_after = timedelta(hours=Config.WORKSPACE_COMPACT_AFTER_HOURS)
+            delete_after = timedelta(hours=Config.WORKSPACE_DELETED_RETENTION_HOURS)
+
+            members = self._workspace_members()
+            busy = self._busy_workspaces()
+            summary = {'compacted': 0, 'deleted': 0, 'archived': 0, 'expired_archives': 0, 'freed_bytes': 0}
+
+            for name in self.terraform_service.list_workspaces():
+                if name in busy:
+                    continue
+
+                deployments = members.get(name, [])
+                workspace_dir = os.path.join(self.terraform_service.work_dir, name)
+                idle_since = max((d.updated_at or d.created_at for d in deployments), default=None)
+                if not deployments:
+                    # Workspace orphelin: la date de modification fait foi
+                    idle_since = datetime.utcfromtimestamp(os.path.getmtime(workspace_dir))
+
+                action = workspace_action(
+                    [d.status for d in deployments],
+                    idle_since,
+                    self.terraform_service.has_state(workspace_dir),
+                    now,
+                    compact_after,
+                    delete_after
+                )
+                if action == 'keep':
+                    continue
+
+                try:
+                    summary['freed_bytes'] += self._apply(action, workspace_dir, summary)
+                except OSError as e:
+                    logger.warning(f"⚠️ Nettoyage du workspace {name} impossible: {e}")
+
+            summary['expired_archives'] = self._expire_archives()
+
+            self._last_run = {
+                'at': now.isoformat(),
+                'duration': round(time.monotonic() - start, 3),
+                **summary
+            }
+
+        if summary['compacted'] or summary['deleted'] or summary['expired_archives']:
+            logger.info(
+                f"🧹 Workspaces: {summary['compacted']} compactés, {summary['deleted']} supprimés "
+                f"({summary['archived']} états archivés), {summary['freed_bytes'] // (1024 * 1024)} Mo libérés"
+            )
+        return summary
+
+    def _apply(self, action, workspace_dir, summary):
+        """Compacte ou supprime un workspace; retourne les octets libérés"""
+        before = directory_usage(workspace_dir)[1]
+
+        if action == 'delete':
+            if self.terraform_service.remove_workspace(workspace_dir):
+                summary['archived'] += 1
+            summary['deleted'] += 1
+            return before
+
+        if not self.terraform_service.compact_workspace(workspace_dir):
+            return 0
+        summary['compacted'] += 1
+        return before - directory_usage(workspace_dir)[1]
+
+    def _archives(self):
+        state_dir = self.terraform_service.state_dir
+        try:
+            return [
+                entry for entry in os.scandir(state_dir)
+                if entry.is_file() and entry.name.endswith(STATE_ARCHIVE_SUFFIX)
+            ]
+        except FileNotFoundError:
+            return []
+
+    def _expire_archives(self):
+        """Supprime les archives d'état au-delà de STATE_ARCHIVE_RETENTION_DAYS"""
+        if not Config.STATE_ARCHIVE_RETENTION_DAYS:
+            return 0
+
+        cutoff = time.time() - Config.STATE_ARCHIVE_RETENTION_DAYS * 86400
+        expired = 0
+        for entry in self._archives():
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                expired += 1
+        return expired
+
+    def usage(self):
+        """Nombre de workspaces, octets occupés et dernier nettoyage"""
+        service = self.terraform_service
+        workspaces = service.list_workspaces()
+
+        files, size = directory_usage(service.work_dir) if workspaces else (0, 0)
+        compacted = sum(
+            1 for name in workspaces
+            if not service.is_initialized(os.path.join(service.work_dir, name))
+        )
+
+        archives = self._archives()
+        with self._lock:
+            last_run = dict(self._last_run) if self._last_run else None
+
+        return {
+            'workspaces': {
+                'count': len(workspaces),
+                'compacted': compacted,
+                'files': files,
+                'bytes': size
+            },
+            'state_archives': {
+                'count': len(archives),
+                'bytes': sum(entry.stat().st_size for entry in archives)
+            },
+            'plugin_cache_bytes': directory_usage(service.plugin_cache_dir)[1],
+            'skeleton_bytes': directory_usage(service.skeleton_dir)[1],
+            'retention': {
+                'compact_after_hours': Config.WORKSPACE_COMPACT_AFTER_HOURS,
+                'deleted_retention_hours': Config.WORKSPACE_DELETED_RETENTION_HOURS,
+                'archive_retention_days': Config.STATE_ARCHIVE_RETENTION_DAYS
+            },
+            'last_collection': last_run
+        }
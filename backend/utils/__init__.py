@@ -1,12 +1,19 @@
 """Initialisation du package utils"""
 from .config import Config
-from .validators import validate_deployment_request, is_valid_github_url
+from .validators import (
+    validate_deployment_request, validate_batch_request, validate_bulk_delete_request, is_valid_github_url,
+    is_valid_idempotency_key, request_fingerprint
+)
 from .script_generator import generate_install_script, generate_deploy_script
 
 __all__ = [
     'Config',
     'validate_deployment_request',
+    'validate_batch_request',
+    'validate_bulk_delete_request',
     'is_valid_github_url',
+    'is_valid_idempotency_key',
+    'request_fingerprint',
     'generate_install_script',
     'generate_deploy_script'
 ]
@@ -3,6 +3,7 @@ Configuration de l'application
 """
 
 import os
+import hmac
 
 class Config:
     """Configuration globale"""
@@ -14,6 +15,32 @@ class Config:
     PROXMOX_NODE = os.getenv('PROXMOX_NODE', 'pve')
     PROXMOX_STORAGE = os.getenv('PROXMOX_STORAGE', 'local-lvm')
     PROXMOX_BRIDGE = os.getenv('PROXMOX_BRIDGE', 'vmbr0')
+    TEMPLATE_NAME = os.getenv('TEMPLATE_NAME', 'ubuntu-22.04-template')
+    LXC_TEMPLATE = os.getenv('LXC_TEMPLATE', 'local:vztmpl/ubuntu-22.04-standard_22.04-1_amd64.tar.zst')
+    
+    # Client API Proxmox partagé: débit (requêtes/s, 0 = illimité), rafale,
+    # reprises des erreurs 5xx/délais, connexions persistantes et délai par requête
+    PROXMOX_RATE_LIMIT = float(os.getenv('PROXMOX_RATE_LIMIT', 20))
+    PROXMOX_RATE_BURST = int(os.getenv('PROXMOX_RATE_BURST', 40))
+    PROXMOX_MAX_RETRIES = int(os.getenv('PROXMOX_MAX_RETRIES', 3))
+    PROXMOX_RETRY_BACKOFF = float(os.getenv('PROXMOX_RETRY_BACKOFF', 0.5))
+    PROXMOX_POOL_SIZE = int(os.getenv('PROXMOX_POOL_SIZE', 16))
+    PROXMOX_TIMEOUT = int(os.getenv('PROXMOX_TIMEOUT', 10))
+    
+    # Suivi des tâches Proxmox (UPID): intervalle de scrutation par noeud, attente
+    # par défaut des démarrages/arrêts/suppressions et durée max de suivi (secondes)
+    PROXMOX_TASK_POLL_INTERVAL = float(os.getenv('PROXMOX_TASK_POLL_INTERVAL', 1))
+    PROXMOX_TASK_TIMEOUT = int(os.getenv('PROXMOX_TASK_TIMEOUT', 300))
+    PROXMOX_TASK_MAX_AGE = int(os.getenv('PROXMOX_TASK_MAX_AGE', 3600))
+    
+    # Cache de /status et /resources: durée de vie (secondes, 0 = désactivé) et âge
+    # au-delà duquel une valeur périmée n'est plus servie (0 = toujours servie)
+    STATUS_CACHE_TTL = int(os.getenv('STATUS_CACHE_TTL', 15))
+    STATUS_CACHE_MAX_STALE = int(os.getenv('STATUS_CACHE_MAX_STALE', 300))
+    
+    # Provisionnement par défaut: terraform, ou api (appels directs à Proxmox)
+    PROVISIONER = os.getenv('PROVISIONER', 'terraform').lower()
+    PROVISIONERS = ['terraform', 'api']
     
     # Flask
     FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
@@ -35,6 +62,68 @@ class Config:
     # Terraform
     TERRAFORM_WORK_DIR = os.getenv('TERRAFORM_WORK_DIR', './terraform/workspaces')
     TERRAFORM_STATE_DIR = os.getenv('TERRAFORM_STATE_DIR', './terraform/states')
+    TERRAFORM_BIN = os.getenv('TERRAFORM_BIN', 'terraform')
+    TERRAFORM_PLUGIN_CACHE_DIR = os.getenv('TERRAFORM_PLUGIN_CACHE_DIR', './terraform/plugin-cache')
+    TERRAFORM_SKELETON_DIR = os.getenv('TERRAFORM_SKELETON_DIR', './terraform/skeleton')
+    TERRAFORM_PARALLELISM = int(os.getenv('TERRAFORM_PARALLELISM', 4))
+    
+    # États Terraform: 'local' (terraform.tfstate dans chaque workspace) ou 'http'
+    # (backend HTTP de la plateforme, états et verrous en base; nécessite un mot de passe)
+    TERRAFORM_STATE_BACKEND = os.getenv('TERRAFORM_STATE_BACKEND', 'local').lower()
+    TERRAFORM_STATE_ADDRESS = os.getenv('TERRAFORM_STATE_ADDRESS', f"http://127.0.0.1:{FLASK_PORT}/api/terraform/state")
+    # Mot de passe (authentification basique) du backend: explicite, ou dérivé de
+    # FLASK_SECRET_KEY si elle a été changée (vide sinon: l'application refuse de démarrer
+    # avec le backend http, et l'API des états refuse toute requête)
+    TERRAFORM_STATE_PASSWORD = os.getenv('TERRAFORM_STATE_PASSWORD') or (
+        hmac.new(FLASK_SECRET_KEY.encode('utf-8'), b'terraform-state', 'sha256').hexdigest()
+        if FLASK_SECRET_KEY not in ('dev-secret-key', 'change-this-to-a-random-secret-key')
+        else ''
+    )
+    TERRAFORM_LOCK_TIMEOUT = int(os.getenv('TERRAFORM_LOCK_TIMEOUT', 300))
+    
+    # Nettoyage des workspaces: intervalle (secondes, 0 = désactivé), compactage des
+    # workspaces inactifs, suppression des workspaces supprimés, rétention des états archivés
+    WORKSPACE_GC_INTERVAL = int(os.getenv('WORKSPACE_GC_INTERVAL', 3600))
+    WORKSPACE_COMPACT_AFTER_HOURS = float(os.getenv('WORKSPACE_COMPACT_AFTER_HOURS', 24))
+    WORKSPACE_DELETED_RETENTION_HOURS = float(os.getenv('WORKSPACE_DELETED_RETENTION_HOURS', 1))
+    STATE_ARCHIVE_RETENTION_DAYS = int(os.getenv('STATE_ARCHIVE_RETENTION_DAYS', 365))
+    
+    # Placement des déploiements: politique (spread, binpack, ou static = PROXMOX_NODE et
+    # PROXMOX_STORAGE), anti-affinité (framework, prefix ou vide), noeuds et storages
+    # autorisés (séparés par des virgules, vide = tous)
+    PLACEMENT_POLICY = os.getenv('PLACEMENT_POLICY', 'spread').lower()
+    PLACEMENT_ANTI_AFFINITY = os.getenv('PLACEMENT_ANTI_AFFINITY', '').lower()
+    PLACEMENT_NODES = [n.strip() for n in os.getenv('PLACEMENT_NODES', '').split(',') if n.strip()]
+    PLACEMENT_STORAGES = [s.strip() for s in os.getenv('PLACEMENT_STORAGES', '').split(',') if s.strip()]
+    # Templates (VM et ostemplate LXC) sur un storage partagé: clonables vers tous les noeuds.
+    # Sinon, seuls les noeuds qui détiennent le template sont candidats
+    PLACEMENT_SHARED_TEMPLATES = os.getenv('PLACEMENT_SHARED_TEMPLATES', 'false').lower() == 'true'
+    
+    # Surallocation par ressource: vCPU alloués (0 = illimité), mémoire et disque
+    # (ratio appliqué à la capacité physique des noeuds et des storages)
+    OVERCOMMIT_CPU = float(os.getenv('OVERCOMMIT_CPU', 4))
+    OVERCOMMIT_MEMORY = float(os.getenv('OVERCOMMIT_MEMORY', 1))
+    OVERCOMMIT_DISK = float(os.getenv('OVERCOMMIT_DISK', 1))
+    
+    # VMID attribués par la plateforme dans une plage réservée (0 = cluster/nextid)
+    # et durée de quarantaine d'un VMID libéré avant sa réattribution (heures)
+    VMID_RANGE_START = int(os.getenv('VMID_RANGE_START', 10000))
+    VMID_RANGE_END = int(os.getenv('VMID_RANGE_END', 19999))
+    VMID_QUARANTINE_HOURS = float(os.getenv('VMID_QUARANTINE_HOURS', 24))
+    # Plage distincte pour les templates des images dorées (0 = cluster/nextid)
+    GOLDEN_IMAGE_VMID_START = int(os.getenv('GOLDEN_IMAGE_VMID_START', 20000))
+    GOLDEN_IMAGE_VMID_END = int(os.getenv('GOLDEN_IMAGE_VMID_END', 20999))
+    
+    # Contrôle d'admission de POST /api/deploy: attente max d'un déploiement faute de
+    # capacité (secondes, 0 = refus immédiat) et intervalle de réévaluation
+    ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', 'true').lower() == 'true'
+    ADMISSION_MAX_WAIT = int(os.getenv('ADMISSION_MAX_WAIT', 3600))
+    ADMISSION_RETRY_INTERVAL = int(os.getenv('ADMISSION_RETRY_INTERVAL', 30))
+    
+    # Opérations concurrentes (clone, création, destruction), 0 = illimité
+    CONCURRENCY_GLOBAL_LIMIT = int(os.getenv('CONCURRENCY_GLOBAL_LIMIT', 8))
+    CONCURRENCY_PER_NODE_LIMIT = int(os.getenv('CONCURRENCY_PER_NODE_LIMIT', 4))
+    CONCURRENCY_PER_STORAGE_LIMIT = int(os.getenv('CONCURRENCY_PER_STORAGE_LIMIT', 3))
     
     # Logs
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -44,11 +133,65 @@ class Config:
     MAX_CPU_CORES = int(os.getenv('MAX_CPU_CORES', 8))
     MAX_MEMORY_MB = int(os.getenv('MAX_MEMORY_MB', 16384))
     MAX_DISK_GB = int(os.getenv('MAX_DISK_GB', 500))
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 50))
+    MAX_BULK_DELETE = int(os.getenv('MAX_BULK_DELETE', 500))
     
     # Timeouts
     DEPLOYMENT_TIMEOUT = int(os.getenv('DEPLOYMENT_TIMEOUT', 1800))
     VM_START_TIMEOUT = int(os.getenv('VM_START_TIMEOUT', 300))
     
+    # Détection du démarrage des VMs (probe: 'tcp' ou 'ssh' pour lire la bannière)
+    READINESS_PORT = int(os.getenv('READINESS_PORT', 22))
+    READINESS_PROBE = os.getenv('READINESS_PROBE', 'tcp')
+    READINESS_MAX_DELAY = float(os.getenv('READINESS_MAX_DELAY', 5))
+    
+    # Exécution des scripts sur les VMs ('ssh', ou 'local' pour les tests)
+    REMOTE_EXECUTOR = os.getenv('REMOTE_EXECUTOR', 'ssh')
+    SSH_USER = os.getenv('SSH_USER', 'root')
+    SSH_PORT = int(os.getenv('SSH_PORT', 22))
+    SSH_KEY_PATH = os.getenv('SSH_KEY_PATH', '')
+    # Clés d'hôte: known_hosts de la plateforme (lu en plus de celui du système), et clé
+    # inconnue enregistrée à la première connexion (tofu), refusée (reject), signalée
+    # (warning) ou acceptée sans être enregistrée (auto)
+    SSH_KNOWN_HOSTS = os.getenv('SSH_KNOWN_HOSTS', './data/known_hosts')
+    SSH_HOST_KEY_POLICY = os.getenv('SSH_HOST_KEY_POLICY', 'tofu').lower()
+    SSH_PUBLIC_KEY = os.getenv('SSH_PUBLIC_KEY', '')
+    INSTALL_TIMEOUT = int(os.getenv('INSTALL_TIMEOUT', 1200))
+    APP_DEPLOY_TIMEOUT = int(os.getenv('APP_DEPLOY_TIMEOUT', 900))
+    
+    # Images dorées: templates pré-installés par framework (VMs uniquement, désactivées
+    # par défaut: chaque construction occupe une VM et du storage sur PROXMOX_NODE)
+    GOLDEN_IMAGES_ENABLED = os.getenv('GOLDEN_IMAGES_ENABLED', 'False').lower() == 'true'
+    GOLDEN_IMAGE_PREFIX = os.getenv('GOLDEN_IMAGE_PREFIX', 'golden')
+    GOLDEN_IMAGE_REBUILD_HOURS = int(os.getenv('GOLDEN_IMAGE_REBUILD_HOURS', 168))
+    GOLDEN_IMAGE_KEEP = int(os.getenv('GOLDEN_IMAGE_KEEP', 2))
+    GOLDEN_IMAGE_BUILD_TIMEOUT = int(os.getenv('GOLDEN_IMAGE_BUILD_TIMEOUT', 2400))
+    
+    # Pool chaud: instances préprovisionnées par framework et type
+    # (format: "django:vm=2,nodejs:lxc=1", vide pour désactiver)
+    WARM_POOL_SIZES = os.getenv('WARM_POOL_SIZES', '')
+    WARM_POOL_MAX_IDLE_HOURS = int(os.getenv('WARM_POOL_MAX_IDLE_HOURS', 24))
+    WARM_POOL_MAX_PER_NODE = int(os.getenv('WARM_POOL_MAX_PER_NODE', 10))
+    WARM_POOL_REFILL_INTERVAL = int(os.getenv('WARM_POOL_REFILL_INTERVAL', 30))
+    WARM_POOL_CPU = int(os.getenv('WARM_POOL_CPU', 2))
+    WARM_POOL_MEMORY_MB = int(os.getenv('WARM_POOL_MEMORY_MB', 2048))
+    WARM_POOL_DISK_GB = int(os.getenv('WARM_POOL_DISK_GB', 20))
+    
+    # Déduplication de POST /api/deploy: durée de validité des clés
+    # d'idempotence et fenêtre de regroupement des requêtes identiques (0 = désactivé)
+    IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', 24))
+    DEPLOYMENT_COALESCE_WINDOW = int(os.getenv('DEPLOYMENT_COALESCE_WINDOW', 600))
+    
+    # File d'attente des déploiements
+    DEPLOYMENT_WORKERS = int(os.getenv('DEPLOYMENT_WORKERS', 4))
+    DEPLOYMENT_QUEUE_MAX = int(os.getenv('DEPLOYMENT_QUEUE_MAX', 50))
+    # Destructions (DELETE et suppressions groupées): pool séparé des déploiements
+    DESTROY_WORKERS = int(os.getenv('DESTROY_WORKERS', 4))
+    DESTROY_QUEUE_MAX = int(os.getenv('DESTROY_QUEUE_MAX', 200))
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+    JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', 15))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    
     # Frameworks supportés
     SUPPORTED_FRAMEWORKS = {
         'django': {'language': 'python', 'port': 8000},
@@ -0,0 +1,68 @@
+"""
+Échéances et annulation coopérative des opérations longues
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+
+class DeadlineExceeded(Exception):
+    """Levée lorsque l'échéance d'une opération est dépassée"""
+
+
+class OperationCancelled(Exception):
+    """Levée lorsqu'une opération a été annulée"""
+
+
+class Deadline:
+    """
+    Échéance absolue associée à un signal d'annulation
+
+    Transmise à chaque étape d'un déploiement: les opérations bloquantes
+    bornent leurs délais avec timeout() et appellent check() régulièrement.
+    """
+
+    def __init__(self, expires_at=None, cancel_event=None):
+        self.expires_at = expires_at
+        self.cancel_event = cancel_event or threading.Event()
+
+    @classmethod
+    def after(cls, seconds, cancel_event=None):
+        """Échéance dans un nombre de secondes donné"""
+        return cls(datetime.utcnow() + timedelta(seconds=seconds), cancel_event)
+
+    def remaining(self):
+        """Secondes restantes (float('inf') sans échéance)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, (self.expires_at - datetime.utcnow()).total_seconds())
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and datetime.utcnow() >= self.expires_at
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """Demande l'annulation"""
+        self.cancel_event.set()
+
+    def check(self):
+        """
+        Raises:
+            OperationCancelled: si l'annulation a été demandée
+            DeadlineExceeded: si l'échéance est dépassée
+        """
+        if self.cancelled:
+            raise OperationCancelled("Opération annulée")
+        if self.expired:
+            raise DeadlineExceeded("Échéance dépassée")
+
+    def timeout(self, limit=None):
+        """Délai à utiliser pour une opération: le plus court entre limit et le temps restant"""
+        remaining = self.remaining()
+        if limit is None:
+            return remaining
+        return min(limit, remaining)
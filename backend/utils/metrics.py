@@ -0,0 +1,47 @@
+"""
+Outils de calcul de statistiques pour les métriques
+"""
+
+def percentile(values, pct):
+    """
+    Calcule un percentile par interpolation linéaire
+
+    Args:
+        values: Liste de nombres (pas nécessairement triée)
+        pct: Percentile entre 0 et 100
+
+    Returns:
+        Valeur du percentile, ou None si la liste est vide
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = rank - lower
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+def summarize(values):
+    """
+    Résumé statistique d'une série de durées
+
+    Returns:
+        Dictionnaire avec count, avg, p50, p95, p99 et max
+    """
+    if not values:
+        return {'count': 0, 'avg': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    return {
+        'count': len(values),
+        'avg': round(sum(values) / len(values), 3),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(max(values), 3)
+    }
@@ -3,6 +3,9 @@ Validateurs pour les requêtes API
 """
 
 import re
+import json
+import hashlib
+from datetime import datetime
 from utils.config import Config
 
 def validate_deployment_request(data):
@@ -55,8 +58,153 @@ def validate_deployment_request(data):
     if name and not is_valid_name(name):
         return False, "Nom invalide (caractères alphanumériques et tirets uniquement)"
     
+    # Provisionnement (optionnel, PROVISIONER par défaut)
+    provisioner = data.get('provisioner')
+    if provisioner is not None and provisioner not in Config.PROVISIONERS:
+        return False, f"Provisionnement doit être l'un de: {', '.join(Config.PROVISIONERS)}"
+    
+    # Clé d'idempotence (optionnelle, aussi acceptée dans l'en-tête Idempotency-Key)
+    idempotency_key = data.get('idempotency_key')
+    if idempotency_key is not None and not is_valid_idempotency_key(idempotency_key):
+        return False, "Clé d'idempotence invalide (1 à 128 caractères imprimables)"
+    
+    return True, None
+
+def validate_batch_request(data):
+    """
+    Valide une requête de déploiement par lot
+    
+    Args:
+        data: Champs communs (type, framework, github_url, cpu, memory, disk)
+              avec soit 'count' (+ 'name_prefix' optionnel), soit une liste
+              'instances' dont chaque élément peut surcharger name, framework,
+              github_url, cpu, memory et disk
+        
+    Returns:
+        Tuple (is_valid, error_message)
+    """
+    
+    if not isinstance(data, dict):
+        return False, "Corps de requête invalide"
+    
+    if 'type' not in data:
+        return False, "Champ obligatoire manquant: type"
+    
+    instances = data.get('instances')
+    if instances is not None:
+        if not isinstance(instances, list) or not instances:
+            return False, "instances doit être une liste non vide"
+        size = len(instances)
+    else:
+        size = data.get('count')
+        if not isinstance(size, int) or size < 1:
+            return False, "count doit être un entier positif (ou fournir instances)"
+    
+    if size > Config.MAX_BATCH_SIZE:
+        return False, f"Un lot ne peut pas dépasser {Config.MAX_BATCH_SIZE} instances"
+    
+    # Un lot est provisionné par un seul apply Terraform
+    if data.get('provisioner', 'terraform') != 'terraform':
+        return False, "Un lot est toujours provisionné par Terraform"
+    
+    expanded = expand_batch_request(data)
+    for index, instance in enumerate(expanded):
+        is_valid, error_message = validate_deployment_request(instance)
+        if not is_valid:
+            return False, f"Instance {index + 1}: {error_message}"
+        if instance['type'] != data['type']:
+            return False, f"Instance {index + 1}: toutes les instances d'un lot doivent avoir le même type"
+        if instance.get('provisioner', 'terraform') != 'terraform':
+            return False, f"Instance {index + 1}: un lot est toujours provisionné par Terraform"
+    
+    names = [instance['name'] for instance in expanded]
+    if len(set(names)) != len(names):
+        return False, "Les noms des instances d'un lot doivent être uniques"
+    
+    return True, None
+
+def validate_bulk_delete_request(data):
+    """
+    Valide une demande de suppression groupée
+    
+    Args:
+        data: 'ids' (liste d'identifiants) et/ou 'filter' (status, framework,
+              type, batch_id, older_than_hours), 'dry_run' optionnel
+        
+    Returns:
+        Tuple (is_valid, error_message)
+    """
+    
+    if not isinstance(data, dict):
+        return False, "Corps de requête invalide"
+    
+    ids = data.get('ids')
+    filters = data.get('filter')
+    
+    # Sans critère, la demande viserait tous les déploiements
+    if not ids and not filters:
+        return False, "Fournir ids ou un filtre non vide"
+    
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) and i > 0 for i in ids):
+            return False, "ids doit être une liste d'identifiants"
+        if len(ids) > Config.MAX_BULK_DELETE:
+            return False, f"Une suppression groupée ne peut pas dépasser {Config.MAX_BULK_DELETE} déploiements"
+    
+    if filters is not None:
+        if not isinstance(filters, dict):
+            return False, "filter doit être un objet"
+        
+        unknown = set(filters) - {'status', 'framework', 'type', 'batch_id', 'older_than_hours'}
+        if unknown:
+            return False, f"Filtres inconnus: {', '.join(sorted(unknown))}"
+        
+        statuses = filters.get('status')
+        if statuses is not None:
+            statuses = [statuses] if isinstance(statuses, str) else statuses
+            if not isinstance(statuses, list) or not statuses or 'deleted' in statuses:
+                return False, "status doit être un statut ou une liste de statuts (hors 'deleted')"
+        
+        age = filters.get('older_than_hours')
+        if age is not None and (isinstance(age, bool) or not isinstance(age, (int, float)) or age < 0):
+            return False, "older_than_hours doit être un nombre positif"
+    
+    if not isinstance(data.get('dry_run', False), bool):
+        return False, "dry_run doit être un booléen"
+    
     return True, None
 
+def expand_batch_request(data):
+    """
+    Développe une requête de lot en une liste de requêtes de déploiement
+    
+    Returns:
+        Liste de dictionnaires au format de validate_deployment_request
+    """
+    common = {
+        key: data[key]
+        for key in ('type', 'framework', 'github_url', 'cpu', 'memory', 'disk')
+        if key in data
+    }
+    
+    overrides = data.get('instances')
+    if overrides is None:
+        overrides = [{} for _ in range(data.get('count', 0))]
+    
+    prefix = data.get('name_prefix') or (
+        f"{data.get('framework', 'batch')}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+    )
+    
+    expanded = []
+    for index, override in enumerate(overrides):
+        instance = dict(common)
+        if isinstance(override, dict):
+            instance.update(override)
+        instance.setdefault('name', f"{prefix}-{index + 1}")
+        expanded.append(instance)
+    
+    return expanded
+
 def is_valid_github_url(url):
     """Valide une URL GitHub"""
     pattern = r'^https://github\.com/[\w-]+/[\w.-]+(?:\.git)?$'
@@ -67,6 +215,33 @@ def is_valid_name(name):
     pattern = r'^[a-zA-Z0-9-_]+$'
     return bool(re.match(pattern, name)) and len(name) <= 100
 
+def is_valid_idempotency_key(key):
+    """Valide une clé d'idempotence"""
+    return isinstance(key, str) and bool(re.match(r'^[\x21-\x7e]{1,128}$', key))
+
+def request_fingerprint(data):
+    """
+    Empreinte d'une requête de déploiement, pour regrouper les requêtes identiques
+    
+    Le nom n'est pris en compte que s'il est fourni: un nom généré
+    (horodaté) diffère à chaque nouvelle tentative.
+    
+    Returns:
+        Empreinte SHA-256 hexadécimale
+    """
+    normalized = {
+        'type': data['type'],
+        'framework': data['framework'].lower(),
+        'github_url': sanitize_github_url(data['github_url'].strip().rstrip('/')).lower(),
+        'cpu': data.get('cpu', 2),
+        'memory': data.get('memory', 2048),
+        'disk': data.get('disk', 20),
+        'name': data.get('name'),
+        'provisioner': data.get('provisioner') or Config.PROVISIONER
+    }
+    payload = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 def sanitize_github_url(url):
     """Nettoie une URL GitHub"""
     # Retirer .git à la fin si présent
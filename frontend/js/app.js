@@ -324,17 +324,19 @@ function displayResources(data) {
         return;
     }
     
+    const cluster = data.cluster;
+    
     container.innerHTML = `
         <div class="resources-grid">
             <div class="resource-card">
-                <h3><i class="fas fa-server"></i> Noeud Proxmox</h3>
+                <h3><i class="fas fa-server"></i> Cluster Proxmox</h3>
                 <div class="resource-stat">
-                    <span>Nom:</span>
-                    <strong>${data.node.name}</strong>
+                    <span>Noeuds en ligne:</span>
+                    <strong style="color: var(--success-color)">${cluster.nodes.online} / ${cluster.nodes.total}</strong>
                 </div>
                 <div class="resource-stat">
-                    <span>Statut:</span>
-                    <strong style="color: var(--success-color)">${data.node.status}</strong>
+                    <span>Stockage libre:</span>
+                    <strong>${cluster.storage.free} GB</strong>
                 </div>
             </div>
             
@@ -342,11 +344,15 @@ function displayResources(data) {
                 <h3><i class="fas fa-microchip"></i> CPU</h3>
                 <div class="resource-stat">
                     <span>Coeurs:</span>
-                    <strong>${data.node.cpu.cores}</strong>
+                    <strong>${cluster.cpu.cores}</strong>
                 </div>
                 <div class="resource-stat">
                     <span>Utilisation:</span>
-                    <strong>${data.node.cpu.usage}%</strong>
+                    <strong>${cluster.cpu.usage}%</strong>
+                </div>
+                <div class="resource-stat">
+                    <span>vCPU alloués:</span>
+                    <strong>${cluster.cpu.allocated}</strong>
                 </div>
             </div>
             
@@ -354,15 +360,15 @@ function displayResources(data) {
                 <h3><i class="fas fa-memory"></i> Mémoire</h3>
                 <div class="resource-stat">
                     <span>Total:</span>
-                    <strong>${data.node.memory.total} GB</strong>
+                    <strong>${cluster.memory.total} GB</strong>
                 </div>
                 <div class="resource-stat">
                     <span>Utilisée:</span>
-                    <strong>${data.node.memory.used} GB</strong>
+                    <strong>${cluster.memory.used} GB</strong>
                 </div>
                 <div class="resource-stat">
                     <span>Disponible:</span>
-                    <strong>${data.node.memory.free} GB</strong>
+                    <strong>${cluster.memory.free} GB</strong>
                 </div>
             </div>
             
@@ -389,6 +395,28 @@ function displayResources(data) {
                     <strong>${data.containers.running}</strong>
                 </div>
             </div>
+            
+            ${data.nodes.map(node => `
+                <div class="resource-card">
+                    <h3><i class="fas fa-server"></i> ${node.name}</h3>
+                    <div class="resource-stat">
+                        <span>Statut:</span>
+                        <strong style="color: var(${node.online ? '--success-color' : '--danger-color'})">${node.status}</strong>
+                    </div>
+                    <div class="resource-stat">
+                        <span>CPU:</span>
+                        <strong>${node.cpu.usage}% de ${node.cpu.cores} coeurs</strong>
+                    </div>
+                    <div class="resource-stat">
+                        <span>Mémoire libre:</span>
+                        <strong>${node.memory.free} / ${node.memory.total} GB</strong>
+                    </div>
+                    <div class="resource-stat">
+                        <span>Instances:</span>
+                        <strong>${node.vms.running + node.containers.running} / ${node.vms.total + node.containers.total}</strong>
+                    </div>
+                </div>
+            `).join('')}
         </div>
     `;
 }
@@ -405,7 +433,7 @@ async function deleteDeployment(id) {
         });
         
         if (response.ok) {
-            showNotification('Déploiement supprimé', 'success');
+            showNotification('Suppression en cours', 'success');
             loadDeployments();
         } else {
             const data = await response.json();
@@ -424,7 +452,7 @@ async function restartDeployment(id) {
         });
         
         if (response.ok) {
-            showNotification('Déploiement redémarré', 'success');
+            showNotification('Redémarrage lancé', 'success');
             setTimeout(() => loadDeployments(), 2000);
         } else {
             const data = await response.json();
@@ -438,10 +466,24 @@ async function restartDeployment(id) {
 
 async function showLogs(id) {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/deployments/${id}/logs`);
-        const data = await response.json();
+        const lines = [];
+        let query = '';
+        let data;
+        
+        do {
+            const response = await fetch(`${API_BASE_URL}/api/deployments/${id}/logs${query}`);
+            data = await response.json();
+            
+            if (data.deployment_log) {
+                lines.push(data.deployment_log);
+            }
+            data.chunks
+                .filter(chunk => chunk.source === 'deploy')
+                .forEach(chunk => lines.push(chunk.content));
+            query = `?after=${data.cursor}&limit=1000`;
+        } while (data.has_more);
         
-        alert(`Logs du déploiement ${id}:\n\n${data.deployment_log || 'Aucun log disponible'}`);
+        alert(`Logs du déploiement ${id}:\n\n${lines.join('\n') || 'Aucun log disponible'}`);
     } catch (error) {
         console.error('Erreur récupération logs:', error);
         showNotification('Erreur lors de la récupération des logs', 'error');
@@ -452,10 +494,14 @@ async function showLogs(id) {
 function getStatusLabel(status) {
     const labels = {
         'pending': 'En attente',
+        'waiting_capacity': 'En attente de capacité',
+        'queued': 'En file d\'attente',
         'creating': 'Création...',
         'running': 'En cours',
         'failed': 'Échoué',
+        'cancelled': 'Annulé',
         'stopped': 'Arrêté',
+        'deleting': 'Suppression...',
         'deleted': 'Supprimé'
     };
     return labels[status] || status;
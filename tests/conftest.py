@@ -4,6 +4,7 @@ Fichier de configuration pour pytest
 
 import sys
 import os
+from types import SimpleNamespace
 
 # Ajouter le répertoire backend au path Python
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
@@ -24,6 +25,57 @@ def app():
         yield app
         db.drop_all()
 
+@pytest.fixture
+def database(tmp_path):
+    """
+    Base SQLite vide pour les services
+    
+    Les services importent models.database (backend dans le path), un module
+    distinct de backend.models.database: c'est son db qui est initialisé.
+    """
+    from flask import Flask
+    from models.database import db as service_db
+    
+    db_app = Flask(__name__)
+    db_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'deployments.db'}"
+    service_db.init_app(db_app)
+    
+    with db_app.app_context():
+        service_db.create_all()
+        yield service_db
+        service_db.session.remove()
+
+@pytest.fixture
+def make_deployment():
+    """
+    Fabrique de déploiements simulés (SimpleNamespace), non enregistrés
+
+    Valeurs par défaut d'une VM Django de 2 CPU, 2 Go et 20 Go, ni placée
+    ni créée; chaque argument nommé remplace une valeur.
+    """
+    def make(**overrides):
+        values = dict(id=1, name='app', type='vm', framework='django', github_url='https://github.com/a/b',
+                      cpu=2, memory=2048, disk=20, batch_id=None, source_template=None,
+                      proxmox_id=None, proxmox_node=None, proxmox_storage=None, vmid=None)
+        values.update(overrides)
+        return SimpleNamespace(**values)
+    return make
+
+@pytest.fixture
+def add_deployment(database):
+    """Fabrique de déploiements enregistrés en base (mêmes valeurs par défaut, statut running)"""
+    from models.database import Deployment
+
+    def add(**overrides):
+        values = dict(name='app', type='vm', framework='django', github_url='https://github.com/a/b',
+                      cpu=2, memory=2048, disk=20, status='running')
+        values.update(overrides)
+        deployment = Deployment(**values)
+        database.session.add(deployment)
+        database.session.commit()
+        return deployment
+    return add
+
 @pytest.fixture
 def client(app):
     """Fixture pour le client de test"""
@@ -0,0 +1,53 @@
+"""
+Tests pour le contrôle d'admission
+"""
+
+import threading
+from types import SimpleNamespace
+from backend.services.cluster_inventory import ClusterInventory
+from models.database import Deployment
+from services.admission import AdmissionController, ADMIT, QUEUE, REJECT
+from services.placement import PlacementScheduler
+from tests.test_placement import RESOURCES
+
+def _controller():
+    scheduler = PlacementScheduler('spread')
+    inventory = ClusterInventory(RESOURCES)
+    service = SimpleNamespace(
+        queued=[],
+        admission_lock=threading.Lock(),
+        status_cache=SimpleNamespace(get=lambda key: (inventory, 0)),
+        _placement_lock=threading.Lock(),
+        _placement_candidates=lambda inventory, deployment_type, scheduler, template=None: scheduler.candidates(
+            inventory, deployment_type
+        )
+    )
+    service.deploy_async = lambda deployment_id: service.queued.append(deployment_id)
+    service.deploy_batch_async = lambda batch_id: service.queued.append(batch_id)
+    return AdmissionController(service, scheduler, enabled=True, max_wait=600)
+
+class TestBatchAdmission:
+    """Tests de l'admission d'un lot d'un bloc"""
+
+    def test_batch_is_admitted_only_if_all_instances_fit(self, database, make_deployment):
+        controller = _controller()
+        # 24 Go libres sur pve1, 56 Go sur pve2: quatre instances de 16 Go
+        fits = [make_deployment(id=None, memory=16 * 1024) for _ in range(4)]
+        too_many = [make_deployment(id=None, memory=16 * 1024) for _ in range(5)]
+
+        assert controller.check_batch(fits) == (ADMIT, None)
+        assert controller.check_batch(too_many)[0] == QUEUE
+        assert controller.check_batch([make_deployment(id=None, memory=80 * 1024)])[0] == REJECT
+        assert controller.stats()['queued'] == 1
+
+    def test_waiting_batch_is_admitted_as_one_job(self, database):
+        controller = _controller()
+        for _ in range(4):
+            database.session.add(Deployment(name='preview', type='vm', framework='nodejs',
+                                            github_url='https://github.com/a/b', cpu=1, memory=16 * 1024, disk=10,
+                                            batch_id='b1', status='waiting_capacity'))
+        database.session.commit()
+
+        assert controller.retry_waiting() == 4
+        assert controller.deployment_service.queued == ['b1']
+        assert {d.status for d in Deployment.query.filter_by(batch_id='b1')} == {'queued'}
@@ -0,0 +1,53 @@
+"""
+Tests pour la suppression groupée
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import current_app
+import api.deployment
+from models.database import Deployment, Job
+from services.deployment_service import DeploymentService
+
+@pytest.fixture
+def delete_client(database, monkeypatch):
+    submitted = []
+    service = SimpleNamespace(
+        owner='worker-a',
+        submitted=submitted,
+        _lease_deadline=lambda: datetime.utcnow() + timedelta(seconds=60),
+        _pool_for=lambda kind: SimpleNamespace(submit=lambda job_id: submitted.append((kind, job_id)) or len(submitted))
+    )
+    service._enqueue_job = lambda *args, **kwargs: DeploymentService._enqueue_job(service, *args, **kwargs)
+    service.destroy_async = lambda *args, **kwargs: DeploymentService.destroy_async(service, *args, **kwargs)
+    monkeypatch.setattr(api.deployment, 'deployment_service', service)
+
+    app = current_app._get_current_object()
+    app.register_blueprint(api.deployment.deployment_bp, url_prefix='/api')
+    client = app.test_client()
+    client.service = service
+    return client
+
+class TestBulkDelete:
+    """Tests de la planification des destructions"""
+
+    def test_one_destroy_job_per_deployment(self, database, delete_client, add_deployment):
+        ids = [add_deployment().id, add_deployment(status='failed').id]
+
+        response = delete_client.post('/api/deployments/bulk-delete', json={'ids': ids + [999]})
+
+        assert response.status_code == 202
+        body = response.get_json()
+        assert body['deployment_ids'] == ids
+        assert body['not_found'] == [999]
+
+        jobs = Job.query.filter_by(kind='destroy').order_by(Job.deployment_id).all()
+        assert [job.deployment_id for job in jobs] == ids
+        assert {job.group_id for job in jobs} == {body['bulk_id']}
+        assert delete_client.service.submitted == [('destroy', job.id) for job in jobs]
+        assert {d.status for d in Deployment.query.all()} == {'deleting'}
+
+        # Destructions déjà planifiées: leurs tâches sont réutilisées
+        delete_client.post('/api/deployments/bulk-delete', json={'ids': ids})
+        assert Job.query.filter_by(kind='destroy').count() == 2
@@ -0,0 +1,73 @@
+"""
+Tests pour l'inventaire du cluster
+"""
+
+from backend.services.cluster_inventory import ClusterInventory
+
+GIB = 1024 ** 3
+
+RESOURCES = [
+    {'type': 'node', 'id': 'node/pve1', 'node': 'pve1', 'status': 'online', 'cpu': 0.5, 'maxcpu': 16,
+     'mem': 32 * GIB, 'maxmem': 64 * GIB, 'disk': 10 * GIB, 'maxdisk': 100 * GIB},
+    {'type': 'node', 'id': 'node/pve2', 'node': 'pve2', 'status': 'online', 'cpu': 0.25, 'maxcpu': 16,
+     'mem': 16 * GIB, 'maxmem': 64 * GIB, 'disk': 10 * GIB, 'maxdisk': 100 * GIB},
+    {'type': 'node', 'id': 'node/pve3', 'node': 'pve3', 'status': 'offline', 'maxcpu': 8, 'maxmem': 32 * GIB},
+    {'type': 'qemu', 'id': 'qemu/100', 'vmid': 100, 'node': 'pve1', 'status': 'running', 'name': 'web',
+     'maxcpu': 2, 'maxmem': 4 * GIB, 'template': 0},
+    {'type': 'qemu', 'id': 'qemu/101', 'vmid': 101, 'node': 'pve2', 'status': 'stopped', 'name': 'db',
+     'maxcpu': 4, 'maxmem': 8 * GIB},
+    {'type': 'qemu', 'id': 'qemu/9000', 'vmid': 9000, 'node': 'pve1', 'status': 'stopped',
+     'name': 'ubuntu-template', 'maxcpu': 2, 'maxmem': 2 * GIB, 'template': 1},
+    {'type': 'lxc', 'id': 'lxc/200', 'vmid': 200, 'node': 'pve1', 'status': 'running', 'name': 'api',
+     'maxcpu': 1, 'maxmem': 1 * GIB},
+    {'type': 'storage', 'id': 'storage/pve1/ceph', 'storage': 'ceph', 'node': 'pve1', 'status': 'available',
+     'shared': 1, 'disk': 100 * GIB, 'maxdisk': 1000 * GIB, 'content': 'images,rootdir'},
+    {'type': 'storage', 'id': 'storage/pve2/ceph', 'storage': 'ceph', 'node': 'pve2', 'status': 'available',
+     'shared': 1, 'disk': 100 * GIB, 'maxdisk': 1000 * GIB, 'content': 'images,rootdir'},
+    {'type': 'storage', 'id': 'storage/pve1/local-lvm', 'storage': 'local-lvm', 'node': 'pve1',
+     'status': 'available', 'shared': 0, 'disk': 50 * GIB, 'maxdisk': 200 * GIB},
+    {'type': 'pool', 'id': '/pool/dev', 'pool': 'dev'}
+]
+
+class TestClusterInventory:
+    """Tests des index et des agrégats"""
+
+    def test_indexes(self):
+        inventory = ClusterInventory(RESOURCES)
+
+        assert inventory.node_names() == ['pve1', 'pve2', 'pve3']
+        assert inventory.guest('100')['name'] == 'web'
+        assert [g['vmid'] for g in inventory.guests(node='pve1')] == [100, 200, 9000]
+        assert [g['vmid'] for g in inventory.guests(guest_type='qemu', status='stopped')] == [101, 9000]
+        assert [g['vmid'] for g in inventory.guests(guest_type='qemu', templates=False)] == [100, 101]
+        assert inventory.guests(node='pve9') == []
+        assert len(inventory.storages(node='pve1')) == 2
+
+    def test_node_summary(self):
+        summary = ClusterInventory(RESOURCES).node_summary('pve1')
+
+        assert summary['online']
+        assert summary['cpu'] == {'cores': 16, 'usage': 50.0, 'allocated': 3}
+        assert summary['memory'] == {'total': 64.0, 'used': 32.0, 'free': 32.0, 'allocated': 5.0}
+        assert summary['vms'] == {'total': 1, 'running': 1}
+        assert summary['containers'] == {'total': 1, 'running': 1}
+        assert summary['templates'] == 1
+        assert ClusterInventory(RESOURCES).node_summary('pve9') is None
+
+    def test_cluster_summary(self):
+        cluster = ClusterInventory(RESOURCES).cluster_summary()
+
+        assert cluster['nodes'] == {'total': 3, 'online': 2}
+        assert cluster['cpu']['cores'] == 32
+        assert cluster['cpu']['usage'] == 37.5
+        assert cluster['memory']['total'] == 128.0
+        # Le storage partagé n'est compté qu'une fois
+        assert cluster['storage']['total'] == 1200.0
+        assert cluster['vms'] == {'total': 2, 'running': 1}
+
+    def test_default_node(self):
+        inventory = ClusterInventory(RESOURCES)
+
+        assert inventory.to_dict('pve2')['node']['name'] == 'pve2'
+        assert inventory.to_dict('pve')['node']['name'] == 'pve1'
+        assert ClusterInventory([]).to_dict('pve')['node'] is None
@@ -0,0 +1,73 @@
+"""
+Tests pour le gouverneur de concurrence
+"""
+
+import time
+import threading
+import pytest
+from backend.services.concurrency_governor import ConcurrencyGovernor
+from backend.utils.deadline import Deadline, DeadlineExceeded
+
+def _acquire_in_thread(governor, *args, **kwargs):
+    acquired = threading.Event()
+
+    def run():
+        governor.acquire(*args, **kwargs)
+        acquired.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return acquired
+
+class TestConcurrencyGovernor:
+    """Tests des plafonds global, par noeud et par storage"""
+
+    def test_per_node_limit(self):
+        governor = ConcurrencyGovernor(global_limit=10, per_node=1)
+        token = governor.acquire('apply', 'pve1', 'local-lvm')
+
+        other_node = _acquire_in_thread(governor, 'apply', 'pve2', 'local-lvm')
+        same_node = _acquire_in_thread(governor, 'apply', 'pve1', 'local-lvm')
+
+        assert other_node.wait(1)
+        assert not same_node.wait(0.2)
+
+        governor.release(token)
+        assert same_node.wait(1)
+
+    def test_per_storage_limit(self):
+        governor = ConcurrencyGovernor(per_storage=1)
+        governor.acquire('clone', 'pve1', 'ceph')
+
+        assert not _acquire_in_thread(governor, 'clone', 'pve2', 'ceph').wait(0.2)
+        assert _acquire_in_thread(governor, 'clone', 'pve2', 'local-lvm').wait(1)
+
+    def test_limits_are_hot_adjustable(self):
+        governor = ConcurrencyGovernor(global_limit=1)
+        governor.acquire('apply', 'pve', 'local-lvm')
+
+        waiting = _acquire_in_thread(governor, 'apply', 'pve', 'local-lvm')
+        assert not waiting.wait(0.2)
+
+        governor.set_limits(global_limit=2)
+        assert waiting.wait(1)
+        assert governor.stats()['active']['global'] == 2
+
+    def test_heavy_operation_runs_alone(self):
+        governor = ConcurrencyGovernor(global_limit=2)
+        token = governor.acquire('apply', 'pve', 'local-lvm', weight=5)
+        governor.release(token)
+        assert governor.stats()['active'] == {'global': 0, 'by_node': {}, 'by_storage': {}}
+
+    def test_wait_respects_deadline(self):
+        governor = ConcurrencyGovernor(global_limit=1)
+        governor.acquire('apply', 'pve', 'local-lvm')
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            governor.acquire('apply', 'pve', 'local-lvm', deadline=Deadline.after(0.3))
+        assert time.monotonic() - start < 2
+        assert governor.stats()['waiting'] == 0
+
+    def test_invalid_limit(self):
+        with pytest.raises(ValueError):
+            ConcurrencyGovernor().set_limits(per_node=-1)
@@ -0,0 +1,66 @@
+"""
+Tests pour la mise à jour du schéma de la base
+"""
+
+import sqlite3
+from flask import Flask
+from models.database import db, init_db, migrate_db, Deployment
+
+# Table deployments telle que créée par la première version de la plateforme
+BASELINE_SCHEMA = '''
+CREATE TABLE deployments (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    framework VARCHAR(50) NOT NULL,
+    github_url VARCHAR(500) NOT NULL,
+    cpu INTEGER NOT NULL,
+    memory INTEGER NOT NULL,
+    disk INTEGER NOT NULL,
+    proxmox_id INTEGER,
+    proxmox_node VARCHAR(50),
+    ip_address VARCHAR(15),
+    status VARCHAR(20),
+    error_message TEXT,
+    created_at DATETIME,
+    updated_at DATETIME,
+    deployed_at DATETIME,
+    terraform_output TEXT,
+    deployment_log TEXT
+)
+'''
+
+class TestMigration:
+    """Tests de l'ajout des colonnes manquantes au démarrage"""
+
+    def test_baseline_database_is_upgraded(self, tmp_path):
+        path = tmp_path / 'deployments.db'
+        connection = sqlite3.connect(path)
+        connection.execute(BASELINE_SCHEMA)
+        connection.execute(
+            "INSERT INTO deployments (name, type, framework, github_url, cpu, memory, disk, status) "
+            "VALUES ('app', 'vm', 'django', 'https://github.com/a/b', 2, 2048, 20, 'running')"
+        )
+        connection.commit()
+        connection.close()
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+        init_db(app)
+
+        upgraded = sqlite3.connect(path)
+        columns = {row[1] for row in upgraded.execute('PRAGMA table_info(deployments)')}
+        indexes = {row[1] for row in upgraded.execute('PRAGMA index_list(deployments)')}
+        assert {'batch_id', 'proxmox_storage', 'source_template', 'image_version', 'provisioner',
+                'render_hash', 'idempotency_key', 'request_hash', 'warm_pool', 'pooled_at'} <= columns
+        assert 'ix_deployments_idempotency_key' in indexes
+
+        with app.app_context():
+            deployment = Deployment.query.one()
+            # Colonnes NOT NULL remplies avec leur valeur par défaut
+            assert deployment.provisioner == 'terraform'
+            assert deployment.warm_pool is False
+            assert Deployment.query.filter_by(idempotency_key=None).count() == 1
+
+            # Base déjà à jour: rien à ajouter
+            assert migrate_db(db.engine) == []
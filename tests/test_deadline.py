@@ -0,0 +1,80 @@
+"""
+Tests pour les échéances et l'annulation des opérations longues
+"""
+
+import time
+import stat
+import threading
+import pytest
+from datetime import datetime, timedelta
+from backend.utils.deadline import Deadline, DeadlineExceeded, OperationCancelled
+from backend.services.terraform_service import TerraformService
+from backend.services.remote_executor import LocalSession
+
+def _process_alive(pid):
+    """Vrai si le processus existe et n'est pas un zombie"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+class TestDeadline:
+    """Tests de l'objet Deadline"""
+
+    def test_without_expiry(self):
+        deadline = Deadline()
+        deadline.check()
+        assert deadline.timeout(30) == 30
+
+    def test_timeout_is_capped_by_remaining_time(self):
+        deadline = Deadline.after(5)
+        assert deadline.timeout(300) <= 5
+        assert deadline.timeout(1) == 1
+
+    def test_expired(self):
+        deadline = Deadline(datetime.utcnow() - timedelta(seconds=1))
+        assert deadline.remaining() == 0
+        with pytest.raises(DeadlineExceeded):
+            deadline.check()
+
+    def test_cancel_takes_precedence(self):
+        deadline = Deadline(datetime.utcnow() - timedelta(seconds=1))
+        deadline.cancel()
+        with pytest.raises(OperationCancelled):
+            deadline.check()
+
+class TestProcessInterruption:
+    """Arrêt des sous-processus lorsque la deadline l'impose"""
+
+    def test_terraform_process_tree_is_killed(self, tmp_path, monkeypatch):
+        child_pid = tmp_path / 'child.pid'
+        fake_terraform = tmp_path / 'terraform'
+        fake_terraform.write_text(f'#!/bin/bash\nsleep 60 &\necho $! > {child_pid}\nwait\n')
+        fake_terraform.chmod(fake_terraform.stat().st_mode | stat.S_IEXEC)
+
+        monkeypatch.setenv('TERRAFORM_BIN', str(fake_terraform))
+        monkeypatch.setenv('TERRAFORM_WORK_DIR', str(tmp_path / 'workspaces'))
+        monkeypatch.setenv('TERRAFORM_STATE_DIR', str(tmp_path / 'states'))
+        service = TerraformService()
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            service.apply(str(tmp_path), Deadline.after(0.5))
+        assert time.monotonic() - start < 10
+
+        pid = int(child_pid.read_text())
+        for _ in range(20):
+            if not _process_alive(pid):
+                break
+            time.sleep(0.1)
+        assert not _process_alive(pid)
+
+    def test_local_script_is_cancelled(self):
+        deadline = Deadline.after(60)
+        threading.Timer(0.3, deadline.cancel).start()
+
+        start = time.monotonic()
+        with pytest.raises(OperationCancelled):
+            LocalSession('h').run('sleep 30\n', timeout=60, deadline=deadline)
+        assert time.monotonic() - start < 5
@@ -0,0 +1,42 @@
+"""
+Tests pour la lecture paginée des logs d'un déploiement
+"""
+
+import pytest
+from flask import current_app
+import api.deployment
+from models.database import LogChunk
+
+@pytest.fixture
+def logs_client(database, add_deployment):
+    deployment = add_deployment(status='creating', deployment_log='ancien log')
+    database.session.add_all([
+        LogChunk(deployment_id=deployment.id, source='terraform', content=f'ligne {i}', lines=1)
+        for i in range(5)
+    ])
+    database.session.commit()
+
+    app = current_app._get_current_object()
+    app.register_blueprint(api.deployment.deployment_bp, url_prefix='/api')
+    client = app.test_client()
+    client.deployment_id = deployment.id
+    return client
+
+class TestDeploymentLogs:
+    """Tests de la pagination des fragments de logs"""
+
+    def test_first_page_is_limited(self, logs_client):
+        data = logs_client.get(f'/api/deployments/{logs_client.deployment_id}/logs?limit=2').get_json()
+
+        assert [chunk['content'] for chunk in data['chunks']] == ['ligne 0', 'ligne 1']
+        assert data['has_more'] is True
+        assert data['deployment_log'] == 'ancien log'
+
+    def test_cursor_reads_the_following_pages(self, logs_client):
+        url = f'/api/deployments/{logs_client.deployment_id}/logs'
+        first = logs_client.get(f'{url}?limit=3').get_json()
+        second = logs_client.get(f"{url}?after={first['cursor']}&limit=3").get_json()
+
+        assert [chunk['content'] for chunk in second['chunks']] == ['ligne 3', 'ligne 4']
+        assert second['has_more'] is False
+        assert 'deployment_log' not in second
@@ -0,0 +1,91 @@
+"""
+Tests pour le provisionnement direct via l'API Proxmox
+"""
+
+import pytest
+from backend.services.direct_provisioner import DirectProvisioner
+from backend.utils.deadline import Deadline
+
+class FakeProxmoxService:
+    """Enregistre les appels faits à l'API Proxmox"""
+
+    def __init__(self):
+        self.calls = []
+        self.vms = {9000: {'status': 'stopped'}}
+
+    def locate_vm(self, name_or_vmid):
+        return ('pve-templates', 9000) if name_or_vmid in ('ubuntu-template', '9000') else None
+
+    def next_vmid(self):
+        return 120
+
+    def clone_vm(self, node, source_vmid, newid, name, target=None, storage=None):
+        self.calls.append(('clone', source_vmid, newid, node, target, storage))
+        self.vms[newid] = {'status': 'stopped'}
+        return 'UPID:clone'
+
+    def wait_for_task(self, node, upid, timeout=600):
+        return True
+
+    def configure_vm(self, node, vmid, **config):
+        self.calls.append(('config', vmid, config))
+        return True
+
+    def resize_disk(self, node, vmid, disk, size):
+        self.calls.append(('resize', vmid, disk, size))
+        return True
+
+    def get_vm_status(self, node, vmid):
+        return self.vms.get(vmid)
+
+    def start_vm(self, node, vmid):
+        self.calls.append(('start', vmid))
+        self.vms[vmid]['status'] = 'running'
+        return True
+
+    def get_vm_ip(self, node, vmid):
+        return '10.0.0.12'
+
+class TestDirectProvisioner:
+    """Tests de la création des VMs sans Terraform"""
+
+    def test_clone_configure_and_start(self, make_deployment):
+        proxmox = FakeProxmoxService()
+        provisioner = DirectProvisioner(proxmox)
+        created = []
+
+        deployment = make_deployment(memory=4096, disk=30, source_template='ubuntu-template')
+        vmid = provisioner.create(deployment, 'pve', Deadline(), on_created=created.append)
+        outputs = provisioner.wait_for_outputs(deployment, 'pve', vmid, Deadline())
+
+        assert created == [120]
+        assert outputs == {'vm_id': 120, 'ip_address': '10.0.0.12'}
+        assert [call[0] for call in proxmox.calls] == ['clone', 'config', 'resize', 'start']
+        # Clone lancé sur le noeud du template, vers le noeud choisi
+        assert proxmox.calls[0][3:] == ('pve-templates', 'pve', None)
+        config = proxmox.calls[1][2]
+        assert (config['cores'], config['memory'], config['ipconfig0']) == (2, 4096, 'ip=dhcp')
+        assert proxmox.calls[2][3] == '30G'
+
+    def test_reserved_vmid_is_used(self, make_deployment):
+        proxmox = FakeProxmoxService()
+
+        vmid = DirectProvisioner(proxmox).create(make_deployment(vmid=10007, source_template='ubuntu-template'), 'pve', Deadline())
+
+        assert vmid == 10007
+        assert proxmox.calls[0][2] == 10007
+
+    def test_existing_instance_is_reused(self, make_deployment):
+        proxmox = FakeProxmoxService()
+        proxmox.vms[120] = {'status': 'running'}
+
+        vmid = DirectProvisioner(proxmox).create(make_deployment(proxmox_id=120), 'pve', Deadline())
+
+        assert vmid == 120
+        assert proxmox.calls == []
+
+    def test_unknown_template(self, make_deployment):
+        with pytest.raises(RuntimeError):
+            DirectProvisioner(FakeProxmoxService()).create(
+                make_deployment(source_template='missing'), 'pve', Deadline()
+            )
@@ -0,0 +1,60 @@
+"""
+Tests pour le regroupement des requêtes de déploiement dupliquées
+"""
+
+import threading
+import pytest
+from types import SimpleNamespace
+from flask import current_app
+import api.deployment
+from models.database import Deployment
+from services.admission import ADMIT
+from services.deployment_service import DeploymentService
+
+REQUEST = {'type': 'vm', 'framework': 'django', 'github_url': 'https://github.com/user/shop.git',
+           'cpu': 2, 'memory': 2048, 'disk': 20}
+
+@pytest.fixture
+def deploy_client(database, monkeypatch):
+    queued = []
+    service = SimpleNamespace(
+        queued=queued,
+        admission_lock=threading.Lock(),
+        admission=SimpleNamespace(check=lambda deployment: (ADMIT, None)),
+        warm_pool=SimpleNamespace(claim=lambda *args: None),
+        deploy_async=lambda deployment_id, stage='provision': queued.append(deployment_id) or len(queued),
+        queue_stats=lambda: {'queue_depth': len(queued), 'workers': 1}
+    )
+    service.find_duplicate = lambda *args: DeploymentService.find_duplicate(service, *args)
+    monkeypatch.setattr(api.deployment, 'deployment_service', service)
+
+    app = current_app._get_current_object()
+    app.register_blueprint(api.deployment.deployment_bp, url_prefix='/api')
+    client = app.test_client()
+    client.service = service
+    return client
+
+class TestIdempotency:
+    """Tests des clés d'idempotence"""
+
+    def test_same_key_creates_one_deployment(self, deploy_client):
+        headers = {'Idempotency-Key': 'ci-run-42'}
+
+        first = deploy_client.post('/api/deploy', json=REQUEST, headers=headers)
+        second = deploy_client.post('/api/deploy', json=REQUEST, headers=headers)
+
+        assert first.status_code == 202
+        assert second.status_code == 200
+        assert second.headers['Idempotent-Replayed'] == 'true'
+        assert second.get_json()['deployment']['id'] == first.get_json()['deployment']['id']
+        assert Deployment.query.count() == 1
+        assert len(deploy_client.service.queued) == 1
+
+    def test_same_key_for_different_request_is_a_conflict(self, deploy_client):
+        headers = {'Idempotency-Key': 'ci-run-43'}
+
+        deploy_client.post('/api/deploy', json=REQUEST, headers=headers)
+        response = deploy_client.post('/api/deploy', json=dict(REQUEST, cpu=4), headers=headers)
+
+        assert response.status_code == 409
+        assert Deployment.query.count() == 1
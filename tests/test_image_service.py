@@ -0,0 +1,111 @@
+"""
+Tests pour les images dorées: choix du template, construction et invalidation
+"""
+
+import pytest
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import SimpleNamespace
+import services.image_service as image_module
+from services.image_service import ImageService
+
+def _proxmox(start_vm=True):
+    """ProxmoxService simulé: enregistre les VMs supprimées"""
+    deleted = []
+    return SimpleNamespace(
+        deleted=deleted,
+        proxmox=None,
+        find_vm_by_name=lambda node, name: 9000,
+        clone_vm=lambda node, base_vmid, vmid, name: f'UPID:pve:clone:{vmid}',
+        wait_for_task=lambda node, upid, timeout=600: True,
+        start_vm=lambda node, vmid: start_vm,
+        get_vm_ip=lambda node, vmid: '10.0.0.9',
+        shutdown_vm=lambda node, vmid, timeout=None: True,
+        convert_to_template=lambda node, vmid: True,
+        delete_vm=lambda node, vmid: deleted.append(vmid) or True
+    )
+
+@pytest.fixture
+def images(database):
+    def build(start_vm=True):
+        ready = Future()
+        ready.set_result(True)
+        session = SimpleNamespace(run=lambda script, timeout, on_line=None, deadline=None: 0)
+        return ImageService(
+            _proxmox(start_vm),
+            prober=SimpleNamespace(watch=lambda host, timeout: ready),
+            executor=SimpleNamespace(
+                session=contextmanager(lambda host: (yield session)),
+                forget_host=lambda host: None
+            ),
+            governor=SimpleNamespace(slot=contextmanager(lambda *args, **kwargs: (yield)))
+        )
+    return build
+
+def _vm(framework='django', type='vm'):
+    return SimpleNamespace(framework=framework, type=type)
+
+class TestResolveTemplate:
+    """Tests du choix du template à cloner"""
+
+    def test_disabled_uses_generic_template(self, images, monkeypatch):
+        service = images()
+        service.build('django')
+        monkeypatch.setattr(image_module.Config, 'GOLDEN_IMAGES_ENABLED', False)
+
+        assert service.resolve_template(_vm()) == (image_module.Config.TEMPLATE_NAME, None)
+
+    def test_ready_image_is_used(self, images, monkeypatch):
+        monkeypatch.setattr(image_module.Config, 'GOLDEN_IMAGES_ENABLED', True)
+        service = images()
+        image = service.build('django')
+
+        assert service.resolve_template(_vm()) == (image.template_name, 1)
+
+    def test_miss_uses_generic_template(self, images, monkeypatch):
+        monkeypatch.setattr(image_module.Config, 'GOLDEN_IMAGES_ENABLED', True)
+        service = images()
+        service.build('django')
+
+        assert service.resolve_template(_vm('flask')) == (image_module.Config.TEMPLATE_NAME, None)
+        assert service.resolve_template(_vm(type='lxc')) == (None, None)
+
+class TestBuild:
+    """Tests de la construction et de l'invalidation des images"""
+
+    def test_build_creates_template_in_reserved_range(self, images):
+        image = images().build('django')
+
+        assert image.status == 'ready'
+        assert image.built_at is not None
+        assert image.template_name == f'{image_module.Config.GOLDEN_IMAGE_PREFIX}-django-v1'
+        assert image_module.Config.GOLDEN_IMAGE_VMID_START <= image.template_vmid <= image_module.Config.GOLDEN_IMAGE_VMID_END
+
+    def test_failed_build_deletes_clone(self, images):
+        service = images(start_vm=False)
+        image = service.build('django')
+
+        assert image.status == 'failed'
+        assert service.proxmox_service.deleted == [image.template_vmid]
+        assert service.current_image('django') is None
+
+    def test_script_change_invalidates_image(self, images, monkeypatch):
+        monkeypatch.setattr(image_module.Config, 'GOLDEN_IMAGES_ENABLED', True)
+        service = images()
+        service.build('django')
+        assert not service.needs_build('django')
+
+        monkeypatch.setattr(image_module, 'generate_install_script', lambda framework, type: 'pip install django==5')
+
+        assert service.needs_build('django')
+        assert service.resolve_template(_vm()) == (image_module.Config.TEMPLATE_NAME, None)
+
+    def test_old_versions_are_retired(self, images, monkeypatch):
+        monkeypatch.setattr(image_module.Config, 'GOLDEN_IMAGE_KEEP', 1)
+        service = images()
+        first = service.build('django')
+        second = service.build('django')
+
+        assert first.status == 'retired'
+        assert second.status == 'ready'
+        assert service.proxmox_service.deleted == [first.template_vmid]
@@ -0,0 +1,59 @@
+"""
+Tests pour la reprise des tâches dont le bail a expiré
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from models.database import Deployment, Job
+from services.deployment_service import DeploymentService
+
+def _service(owner='worker-b'):
+    submitted = []
+    service = SimpleNamespace(
+        owner=owner,
+        submitted=submitted,
+        _lease_deadline=lambda: datetime.utcnow() + timedelta(seconds=60),
+        _pool_for=lambda kind: SimpleNamespace(submit=submitted.append)
+    )
+    service._job_deployments = lambda job: DeploymentService._job_deployments(service, job)
+    return service
+
+def _job(database, lease_expires_at, status='running'):
+    deployment = Deployment(name='app', type='vm', framework='django', github_url='https://github.com/a/b',
+                            cpu=2, memory=2048, disk=20, status='creating')
+    database.session.add(deployment)
+    database.session.commit()
+
+    job = Job(kind='deploy', deployment_id=deployment.id, stage='provision', status=status,
+              owner='worker-a', lease_expires_at=lease_expires_at, attempts=1)
+    database.session.add(job)
+    database.session.commit()
+    return job, deployment
+
+class TestRecoverJobs:
+    """Tests de la réclamation des baux"""
+
+    def test_expired_lease_is_reclaimed(self, database):
+        job, deployment = _job(database, datetime.utcnow() - timedelta(seconds=1))
+        service = _service()
+
+        assert DeploymentService.recover_jobs(service) == 1
+
+        database.session.expire_all()
+        assert service.submitted == [job.id]
+        assert job.owner == 'worker-b'
+        assert job.status == 'queued'
+        assert job.lease_expires_at > datetime.utcnow()
+        assert deployment.status == 'queued'
+
+    def test_live_lease_is_left_alone(self, database):
+        job, deployment = _job(database, datetime.utcnow() + timedelta(seconds=60))
+        service = _service()
+
+        assert DeploymentService.recover_jobs(service) == 0
+
+        database.session.expire_all()
+        assert service.submitted == []
+        assert job.owner == 'worker-a'
+        assert job.status == 'running'
+        assert deployment.status == 'creating'
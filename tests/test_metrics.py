@@ -0,0 +1,34 @@
+"""
+Tests pour les outils de métriques
+"""
+
+import pytest
+from backend.utils.metrics import percentile, summarize
+
+class TestPercentile:
+    """Tests du calcul de percentile"""
+    
+    def test_empty_list(self):
+        assert percentile([], 50) is None
+    
+    def test_single_value(self):
+        assert percentile([4.2], 99) == 4.2
+    
+    def test_median_interpolated(self):
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+    
+    def test_unsorted_input(self):
+        assert percentile([10, 1, 5], 100) == 10
+        assert percentile([10, 1, 5], 0) == 1
+
+class TestSummarize:
+    """Tests du résumé statistique"""
+    
+    def test_summarize_empty(self):
+        assert summarize([])['count'] == 0
+    
+    def test_summarize_values(self):
+        summary = summarize(list(range(1, 101)))
+        assert summary['count'] == 100
+        assert summary['p50'] == 50.5
+        assert summary['max'] == 100
@@ -0,0 +1,96 @@
+"""
+Tests pour l'enregistrement et l'agrégation des durées du pipeline
+"""
+
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import SimpleNamespace
+from flask import current_app
+import api.metrics
+from models.database import Deployment, Job, StageTiming
+from services.deployment_service import DeploymentService
+from utils.deadline import Deadline
+
+def _service(tmp_path):
+    """Service dont Terraform, le sondeur et les sessions SSH sont simulés"""
+    ready = Future()
+    ready.set_result(True)
+    session = SimpleNamespace(run=lambda script, timeout, on_line=None, deadline=None: 0)
+
+    service = DeploymentService.__new__(DeploymentService)
+    service.terraform_service = SimpleNamespace(
+        parallelism=1,
+        render_workspace=lambda deployment: str(tmp_path),
+        workspace_hash=lambda workspace_dir: 'hash',
+        has_state=lambda workspace_dir: False,
+        init_workspace=lambda workspace_dir, deadline: None,
+        apply=lambda workspace_dir, deadline, on_line=None, plan_file=None: (True, 'Apply complete!'),
+        get_outputs=lambda workspace_dir, deadline: {'vm_id': 105, 'ip_address': '10.0.0.5'}
+    )
+    service.image_service = SimpleNamespace(resolve_template=lambda deployment: ('ubuntu-template', None))
+    service.governor = SimpleNamespace(acquire=lambda *args: 'token', release=lambda token: None)
+    service.scheduler = None
+    service.vmids = SimpleNamespace(enabled=False)
+    service.prober = SimpleNamespace(watch=lambda host, timeout: ready)
+    service.executor = SimpleNamespace(
+        session=contextmanager(lambda host: (yield session)),
+        forget_host=lambda host: None
+    )
+    service.pool = SimpleNamespace(submit=lambda job_id, force=False: None)
+    service._placement_lock = threading.Lock()
+    service._readiness = {}
+    service._readiness_lock = threading.Lock()
+    service._cancel_events = {}
+    service._watches = {}
+    service._cancel_lock = threading.Lock()
+    return service
+
+def _run(database, service):
+    deployment = Deployment(name='shop', type='vm', framework='django', github_url='https://github.com/a/b',
+                            cpu=2, memory=2048, disk=20, status='queued')
+    database.session.add(deployment)
+    database.session.commit()
+    job = Job(kind='deploy', deployment_id=deployment.id, stage='provision', status='running', attempts=1)
+    database.session.add(job)
+    database.session.commit()
+
+    # Provisionnement jusqu'à l'attente du démarrage, puis reprise par le callback du sondeur
+    service._run_pipeline(job, Deadline.after(300))
+    service._run_pipeline(job, Deadline.after(300))
+    return deployment, job
+
+class TestPipelineMetrics:
+    """Tests des mesures d'un pipeline complet"""
+
+    def test_stage_timings_are_stored(self, database, tmp_path):
+        deployment, job = _run(database, _service(tmp_path))
+
+        assert deployment.status == 'running'
+        assert job.status == 'done'
+
+        timings = StageTiming.query.filter_by(deployment_id=deployment.id).order_by(StageTiming.id).all()
+        assert [timing.stage for timing in timings] == [
+            'workspace_render', 'terraform_init', 'concurrency_wait', 'terraform_apply',
+            'terraform_outputs', 'wait_ready', 'install', 'app_deploy'
+        ]
+        assert all(timing.success for timing in timings)
+        assert all(timing.duration is not None and timing.duration >= 0 for timing in timings)
+        assert all(timing.ended_at >= timing.started_at for timing in timings)
+
+    def test_pipeline_endpoint_aggregates_stored_timings(self, database, tmp_path):
+        service = _service(tmp_path)
+        _run(database, service)
+        _run(database, service)
+
+        app = current_app._get_current_object()
+        app.register_blueprint(api.metrics.metrics_bp, url_prefix='/api')
+        data = app.test_client().get('/api/metrics/pipeline?type=vm').get_json()
+
+        assert set(data['stages']) == {
+            'workspace_render', 'terraform_init', 'concurrency_wait', 'terraform_apply',
+            'terraform_outputs', 'wait_ready', 'install', 'app_deploy'
+        }
+        assert data['stages']['terraform_apply']['count'] == 2
+        assert data['by_framework']['django']['app_deploy']['count'] == 2
+        assert list(data['by_type']) == ['vm']
@@ -0,0 +1,132 @@
+"""
+Tests pour le placement des déploiements
+"""
+
+import pytest
+from backend.services.cluster_inventory import ClusterInventory
+from backend.services.placement import PlacementScheduler, PlacementPolicy, PlacementError, name_prefix, template_nodes
+
+GIB = 1024 ** 3
+
+def _node(name, maxmem_gb=64, mem_gb=8, maxcpu=16, status='online'):
+    return {'type': 'node', 'node': name, 'status': status, 'maxcpu': maxcpu, 'cpu': 0.1,
+            'maxmem': maxmem_gb * GIB, 'mem': mem_gb * GIB}
+
+def _storage(node, name='local-lvm', free_gb=500, shared=0, content='images,rootdir'):
+    return {'type': 'storage', 'node': node, 'storage': name, 'status': 'available', 'shared': shared,
+            'content': content, 'maxdisk': 1000 * GIB, 'disk': (1000 - free_gb) * GIB}
+
+def _guest(vmid, node, maxmem_gb, maxcpu=2, status='running'):
+    return {'type': 'qemu', 'vmid': vmid, 'node': node, 'status': status, 'name': f'vm-{vmid}',
+            'maxcpu': maxcpu, 'maxmem': maxmem_gb * GIB}
+
+# pve1 chargé (40 Go engagés), pve2 peu chargé, pve3 hors ligne
+RESOURCES = [
+    _node('pve1'), _node('pve2'), _node('pve3', status='offline'),
+    _storage('pve1'), _storage('pve2'), _storage('pve3'),
+    _guest(100, 'pve1', 40, maxcpu=12),
+    _guest(101, 'pve2', 8)
+]
+INVENTORY = ClusterInventory(RESOURCES)
+
+class TestPlacementScheduler:
+    """Tests des politiques, contraintes et réservations"""
+
+    def test_spread_picks_least_loaded_node(self, make_deployment):
+        scheduler = PlacementScheduler('spread')
+        candidates = scheduler.candidates(INVENTORY, 'vm')
+
+        assert sorted(candidates) == ['pve1', 'pve2']
+        assert scheduler.place(make_deployment(), candidates) == ('pve2', 'local-lvm')
+
+    def test_binpack_fills_loaded_node(self, make_deployment):
+        scheduler = PlacementScheduler('binpack')
+        assert scheduler.place(make_deployment(), scheduler.candidates(INVENTORY, 'vm')) == ('pve1', 'local-lvm')
+
+    def test_reservations_are_deducted(self, make_deployment):
+        scheduler = PlacementScheduler('spread')
+        # 40 Go réservés sur pve2 par des déploiements pas encore créés
+        candidates = scheduler.candidates(INVENTORY, 'vm', reservations=[('pve2', 'local-lvm', 8, 40 * 1024, 20)])
+
+        assert scheduler.place(make_deployment(), candidates)[0] == 'pve1'
+
+    def test_batch_placement_accounts_previous_choices(self, make_deployment):
+        scheduler = PlacementScheduler('spread')
+        candidates = scheduler.candidates(INVENTORY, 'vm')
+
+        nodes = [scheduler.place(make_deployment(memory=8192), candidates)[0] for _ in range(6)]
+
+        assert set(nodes) == {'pve1', 'pve2'}
+
+    def test_anti_affinity_by_prefix(self, make_deployment):
+        scheduler = PlacementScheduler('binpack', anti_affinity='prefix')
+        candidates = scheduler.candidates(INVENTORY, 'vm', placed=[('pve1', 'django', 'shop-web-0')])
+
+        assert name_prefix('shop-web-1') == 'shop-web'
+        assert scheduler.place(make_deployment(name='shop-web-1'), candidates)[0] == 'pve2'
+        # Les deux noeuds hébergent le groupe: la politique départage
+        assert scheduler.place(make_deployment(name='shop-web-2'), candidates)[0] == 'pve1'
+
+    def test_storage_must_accept_type_and_fit(self, make_deployment):
+        inventory = ClusterInventory([
+            _node('pve1'),
+            _storage('pve1', 'local', free_gb=900, content='iso,vztmpl'),
+            _storage('pve1', 'small', free_gb=10),
+            _storage('pve1', 'ceph', free_gb=300, shared=1)
+        ])
+        scheduler = PlacementScheduler('spread')
+
+        assert scheduler.place(make_deployment(disk=50), scheduler.candidates(inventory, 'vm')) == ('pve1', 'ceph')
+
+    def test_no_capacity(self, make_deployment):
+        scheduler = PlacementScheduler('spread')
+        candidates = scheduler.candidates(INVENTORY, 'vm')
+
+        with pytest.raises(PlacementError, match='pve1.*Mo de mémoire libres'):
+            scheduler.place(make_deployment(memory=60 * 1024), candidates)
+
+    def test_overcommit_ratios(self, make_deployment):
+        # pve1: 12 vCPU alloués sur 16 coeurs
+        strict = PlacementScheduler('binpack', overcommit={'cpu': 1.0})
+        assert strict.place(make_deployment(cpu=6), strict.candidates(INVENTORY, 'vm'))[0] == 'pve2'
+
+        # Mémoire surallouée x1.5: 96 Go de capacité, 56 Go libres sur pve1
+        relaxed = PlacementScheduler('binpack', overcommit={'memory': 1.5})
+        assert relaxed.place(make_deployment(memory=50 * 1024), relaxed.candidates(INVENTORY, 'vm'))[0] == 'pve1'
+
+        with pytest.raises(ValueError):
+            PlacementScheduler(overcommit={'memory': 0})
+
+    def test_oversized(self, make_deployment):
+        scheduler = PlacementScheduler('spread')
+        candidates = scheduler.candidates(INVENTORY, 'vm', reservations=[('pve1', 'local-lvm', 0, 50 * 1024, 0)])
+
+        # Ne tient pas maintenant, mais tiendrait sur un noeud libéré
+        assert scheduler.oversized(make_deployment(memory=60 * 1024), candidates) is None
+        assert 'capacité de chaque noeud' in scheduler.oversized(make_deployment(memory=80 * 1024), candidates)
+        assert scheduler.oversized(make_deployment(cpu=32), candidates)
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            PlacementScheduler('random')
+
+        with pytest.raises(TypeError):
+            PlacementPolicy()
+
+    def test_candidates_limited_to_template_location(self, make_deployment):
+        template = dict(_guest(9000, 'pve1', 2, status='stopped'), name='ubuntu-22.04-template', template=1)
+        inventory = ClusterInventory(RESOURCES + [
+            template, _storage('pve1', 'cephfs', shared=1, content='vztmpl')
+        ])
+        scheduler = PlacementScheduler('spread')
+
+        # Template de VM sur le seul pve1: spread ne peut plus choisir pve2
+        nodes = template_nodes(inventory, 'vm', 'ubuntu-22.04-template')
+        assert nodes == {'pve1'}
+        assert scheduler.place(make_deployment(), scheduler.candidates(inventory, 'vm', template_nodes=nodes))[0] == 'pve1'
+        # Template introuvable dans l'inventaire: aucune restriction
+        assert template_nodes(inventory, 'vm', 'debian-12') is None
+
+        # ostemplate LXC: noeud par défaut s'il est local, tous s'il est partagé
+        assert template_nodes(inventory, 'lxc', 'local:vztmpl/ubuntu.tar.zst', 'pve1') == {'pve1'}
+        assert template_nodes(inventory, 'lxc', 'cephfs:vztmpl/ubuntu.tar.zst', 'pve1') is None
@@ -0,0 +1,111 @@
+"""
+Tests pour le client Proxmox partagé
+"""
+
+import requests
+from requests.adapters import BaseAdapter
+from backend.services.proxmox_client import ProxmoxClient, TokenBucket, endpoint_name
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ScriptedAdapter(BaseAdapter):
+    """Répond successivement les codes HTTP (ou exceptions) fournis"""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.request = request
+        response.url = request.url
+        response._content = b'{"data": null}'
+        return response
+
+    def close(self):
+        pass
+
+def _client(outcomes, **kwargs):
+    client = ProxmoxClient(api_url='', rate=0, backoff=0, max_retries=2, **kwargs)
+    session = requests.Session()
+    client.instrument(session)
+    adapter = ScriptedAdapter(outcomes)
+    session.mount('https://', adapter)
+    return client, session, adapter
+
+class TestTokenBucket:
+    """Tests du limiteur de débit"""
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert abs(bucket.reserve() - 0.1) < 1e-9
+        assert abs(bucket.reserve() - 0.2) < 1e-9
+
+        clock.now = 1.0
+        assert bucket.reserve() == 0
+
+    def test_unlimited(self):
+        bucket = TokenBucket(rate=0)
+        assert all(bucket.reserve() == 0 for _ in range(100))
+
+class TestProxmoxClient:
+    """Tests des reprises et des métriques"""
+
+    def test_endpoint_name(self):
+        url = 'https://pve:8006/api2/json/nodes/pve1/qemu/104/status/current'
+        assert endpoint_name('get', url) == 'GET /nodes/{node}/qemu/{vmid}/status/current'
+        url = 'https://pve:8006/api2/json/nodes/pve1/tasks/UPID:pve1:0001:clone:/status'
+        assert endpoint_name('GET', url) == 'GET /nodes/{node}/tasks/{upid}/status'
+
+    def test_get_retried_on_server_error(self):
+        client, session, adapter = _client([502, requests.exceptions.ReadTimeout(), 200])
+
+        response = session.request('GET', 'https://pve/api2/json/version')
+
+        assert response.status_code == 200
+        assert adapter.calls == 3
+        stats = client.stats()
+        assert stats['requests']['total'] == 3
+        assert stats['requests']['retries'] == 2
+        assert stats['requests']['by_status'] == {'5xx': 1, 'network': 1, '2xx': 1}
+        assert stats['latency']['buckets']['+Inf'] == 3
+
+    def test_post_not_replayed_after_server_error(self):
+        client, session, adapter = _client([500, 200])
+
+        response = session.request('POST', 'https://pve/api2/json/nodes/pve1/qemu/9000/clone')
+
+        assert response.status_code == 500
+        assert adapter.calls == 1
+
+    def test_post_replayed_when_unavailable(self):
+        client, session, adapter = _client([503, 200])
+
+        response = session.request('POST', 'https://pve/api2/json/nodes/pve1/qemu/9000/clone')
+
+        assert response.status_code == 200
+        assert adapter.calls == 2
+
+    def test_retries_exhausted(self):
+        client, session, adapter = _client([504, 504, 504, 200])
+
+        response = session.request('GET', 'https://pve/api2/json/cluster/resources')
+
+        assert response.status_code == 504
+        assert adapter.calls == 3
+        assert client.stats()['endpoints']['GET /cluster/resources']['errors'] == 3
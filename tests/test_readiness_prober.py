@@ -0,0 +1,61 @@
+"""
+Tests pour le sondeur de disponibilité
+"""
+
+import time
+import socket
+import pytest
+from concurrent.futures import CancelledError
+from backend.services.readiness_prober import ReadinessProber
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _prober():
+    return ReadinessProber(initial_delay=0.01, max_delay=0.05, connect_timeout=0.5)
+
+def _wait_idle(prober, timeout=2):
+    expires = time.monotonic() + timeout
+    while prober.stats()['pending'] and time.monotonic() < expires:
+        time.sleep(0.01)
+    return prober.stats()['pending']
+
+class TestReadinessProber:
+    """Tests de la surveillance d'un port"""
+
+    def test_listening_port_is_ready(self):
+        prober = _prober()
+        with socket.socket() as server:
+            server.bind(('127.0.0.1', 0))
+            server.listen()
+
+            assert prober.watch('127.0.0.1', 2, port=server.getsockname()[1]).result(3) is True
+
+        stats = prober.stats()
+        assert stats['ready'] == 1
+        assert stats['pending'] == 0
+
+    def test_closed_port_times_out(self):
+        prober = _prober()
+
+        assert prober.watch('127.0.0.1', 0.2, port=_free_port()).result(3) is False
+        assert prober.stats()['timeouts'] == 1
+        assert prober.stats()['attempts'] > 1
+        assert _wait_idle(prober) == 0
+
+    def test_cancelled_watch_is_no_longer_pending(self):
+        prober = _prober()
+        future = prober.watch('127.0.0.1', 30, port=_free_port())
+        time.sleep(0.05)
+
+        assert future.cancel()
+        with pytest.raises(CancelledError):
+            future.result(1)
+        assert _wait_idle(prober) == 0
+        assert prober.stats()['timeouts'] == 0
+
+        # Annulée avant même d'avoir démarré
+        prober.watch('127.0.0.1', 30, port=_free_port()).cancel()
+        assert _wait_idle(prober) == 0
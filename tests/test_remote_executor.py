@@ -0,0 +1,86 @@
+"""
+Tests pour l'exécuteur de scripts (session locale)
+"""
+
+import pytest
+from types import SimpleNamespace
+from backend.services.remote_executor import (
+    create_executor,
+    forget_host_key,
+    RemoteSession,
+    LocalSession,
+    TrustOnFirstUsePolicy,
+    CommandTimeoutError
+)
+
+class TestLocalSession:
+    """Tests de la session locale qui simule un hôte distant"""
+    
+    def test_lines_are_streamed_per_stream(self):
+        lines = []
+        session = LocalSession('10.0.0.5')
+        exit_code = session.run(
+            'echo "un"\necho "deux" >&2\necho "hôte $TARGET_HOST"\n',
+            timeout=10,
+            on_line=lambda stream, line: lines.append((stream, line))
+        )
+        assert exit_code == 0
+        assert ('stdout', 'un') in lines
+        assert ('stderr', 'deux') in lines
+        assert ('stdout', 'hôte 10.0.0.5') in lines
+    
+    def test_exit_code_is_returned(self):
+        assert LocalSession('h').run('exit 3\n', timeout=10) == 3
+    
+    def test_timeout_kills_command(self):
+        with pytest.raises(CommandTimeoutError):
+            LocalSession('h').run('sleep 30\n', timeout=0.5)
+
+class TestRemoteExecutor:
+    """Tests du partage des sessions par hôte"""
+    
+    def test_session_is_reused_per_host(self):
+        executor = create_executor('local')
+        with executor.session('vm-1') as first:
+            with executor.session('vm-1') as second:
+                assert first is second
+                assert executor.open_sessions() == 1
+        assert executor.open_sessions() == 0
+    
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            create_executor('telnet')
+    
+    def test_unknown_host_key_policy(self):
+        with pytest.raises(ValueError):
+            create_executor('ssh', host_key_policy='trust')
+    
+    def test_session_must_implement_run(self):
+        with pytest.raises(TypeError):
+            RemoteSession('h')
+
+class TestHostKeys:
+    """Tests de l'enregistrement des clés d'hôte à la première connexion"""
+    
+    def test_unknown_key_is_recorded(self, tmp_path):
+        path = tmp_path / 'data' / 'known_hosts'
+        added = []
+        client = SimpleNamespace(get_host_keys=lambda: SimpleNamespace(add=lambda *args: added.append(args)))
+        key = SimpleNamespace(get_name=lambda: 'ssh-ed25519', get_base64=lambda: 'AAAAkey')
+        
+        TrustOnFirstUsePolicy(str(path)).missing_host_key(client, '10.0.0.5', key)
+        
+        assert added == [('10.0.0.5', 'ssh-ed25519', key)]
+        assert path.read_text() == '10.0.0.5 ssh-ed25519 AAAAkey\n'
+    
+    def test_forget_removes_only_the_host(self, tmp_path):
+        path = tmp_path / 'known_hosts'
+        path.write_text(
+            '10.0.0.5 ssh-ed25519 AAAAold\n'
+            '[10.0.0.5]:2222 ssh-rsa AAAAport\n'
+            '10.0.0.50 ssh-ed25519 AAAAother\n'
+        )
+        
+        assert forget_host_key(str(path), '10.0.0.5') == 2
+        assert path.read_text() == '10.0.0.50 ssh-ed25519 AAAAother\n'
+        assert forget_host_key(str(tmp_path / 'absent'), '10.0.0.5') == 0
@@ -0,0 +1,48 @@
+"""
+Tests pour le redémarrage asynchrone d'un déploiement
+"""
+
+import pytest
+from types import SimpleNamespace
+from flask import current_app
+import api.deployment
+
+UPID = 'UPID:pve1:0000A1B2:0012C3D4:656C8F2A:qmreboot:105:root@pam:'
+
+@pytest.fixture
+def restart_client(add_deployment, monkeypatch):
+    deployment = add_deployment(proxmox_id=105, proxmox_node='pve1')
+
+    service = SimpleNamespace(
+        restart=lambda deployment_id: (True, UPID),
+        proxmox_service=SimpleNamespace(
+            get_task=lambda upid: {'upid': upid, 'status': 'stopped', 'exitstatus': 'OK', 'success': True}
+        )
+    )
+    monkeypatch.setattr(api.deployment, 'deployment_service', service)
+
+    app = current_app._get_current_object()
+    app.register_blueprint(api.deployment.deployment_bp, url_prefix='/api')
+    client = app.test_client()
+    client.deployment_id = deployment.id
+    return client
+
+class TestRestart:
+    """Tests du lancement et du suivi d'un redémarrage"""
+
+    def test_restart_returns_task_to_poll(self, restart_client):
+        response = restart_client.post(f'/api/deployments/{restart_client.deployment_id}/restart')
+
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['task'] == UPID
+
+        task = restart_client.get(data['task_url']).get_json()
+        assert task['status'] == 'stopped'
+        assert task['success'] is True
+
+    def test_task_of_another_vm_is_not_found(self, restart_client):
+        other = UPID.replace(':105:', ':106:')
+        response = restart_client.get(f'/api/deployments/{restart_client.deployment_id}/tasks/{other}')
+
+        assert response.status_code == 404
@@ -0,0 +1,130 @@
+"""
+Tests pour le suivi des tâches Proxmox
+"""
+
+import time
+import threading
+from types import SimpleNamespace
+from backend.services.task_tracker import TaskTracker, parse_upid
+
+def _upid(node, starttime, task_type='qmstart', vmid=100):
+    return f'UPID:{node}:0000A1B2:00C3D4E5:{starttime:08X}:{task_type}:{vmid}:root@pam:'
+
+class FakeTasks:
+    """/nodes/{node}/tasks: liste (limitée) et statut par UPID"""
+
+    def __init__(self, api, node):
+        self.api = api
+        self.node = node
+
+    def get(self, **params):
+        self.api.list_calls.append((self.node, params))
+        return [dict(entry) for entry in self.api.listed.get(self.node, [])]
+
+    def __call__(self, upid):
+        status = SimpleNamespace(get=lambda: self.api.lookup(upid))
+        return SimpleNamespace(status=status)
+
+class FakeApi:
+    def __init__(self):
+        self.listed = {}
+        self.statuses = {}
+        self.list_calls = []
+        self.lookups = []
+
+    def nodes(self, node):
+        return SimpleNamespace(tasks=FakeTasks(self, node))
+
+    def lookup(self, upid):
+        self.lookups.append(upid)
+        return self.statuses[upid]
+
+def _tracker(api, **kwargs):
+    return TaskTracker(SimpleNamespace(api=api), interval=0.01, max_age=0, **kwargs)
+
+class TestTaskTracker:
+    """Tests du poller par noeud"""
+
+    def test_parse_upid(self):
+        info = parse_upid(_upid('pve2', 0x6500, 'qmdestroy', 101))
+
+        assert info['node'] == 'pve2'
+        assert info['type'] == 'qmdestroy'
+        assert info['id'] == '101'
+        assert info['starttime'] == 0x6500
+
+    def test_one_list_call_for_all_tasks_of_a_node(self):
+        api = FakeApi()
+        first, second = _upid('pve1', 1000), _upid('pve1', 1005, 'qmstop', 101)
+        api.listed['pve1'] = [{'upid': first}, {'upid': second}]
+        tracker = _tracker(api)
+
+        tasks = [tracker.track(first), tracker.track(second)]
+        assert tracker.track(first) is tasks[0]
+
+        api.listed['pve1'] = [
+            {'upid': first, 'status': 'OK', 'endtime': 1003},
+            {'upid': second, 'status': 'VM quit/powerdown failed', 'endtime': 1010}
+        ]
+
+        assert tasks[0].wait(2)
+        assert not tasks[1].wait(2)
+        assert tasks[0].duration == 3
+        assert tasks[1].exitstatus == 'VM quit/powerdown failed'
+        # Un seul poller, qui liste depuis la plus ancienne tâche suivie
+        assert {node for node, _ in api.list_calls} == {'pve1'}
+        assert api.list_calls[0][1]['since'] == 1000
+        assert api.lookups == []
+
+        stats = tracker.stats()
+        assert stats['ok'] == 1 and stats['failed'] == 1
+        assert stats['running'] == {}
+
+    def test_task_missing_from_list_is_looked_up(self):
+        api = FakeApi()
+        upid = _upid('pve1', 2000, 'qmdestroy')
+        api.statuses[upid] = {'status': 'stopped', 'exitstatus': 'OK'}
+        tracker = _tracker(api)
+
+        assert tracker.wait(upid, timeout=2)
+        assert api.lookups == [upid]
+
+    def test_lost_after_repeated_errors(self):
+        api = FakeApi()
+        upid = _upid('pve3', 3000)
+        tracker = _tracker(api)
+
+        task = tracker.track(upid)
+        # Statut inconnu: KeyError à chaque interrogation
+        assert not task.wait(2)
+        assert task.status == 'lost'
+        assert tracker.stats()['lost'] == 1
+
+    def test_waiters_share_the_poller(self):
+        api = FakeApi()
+        upid = _upid('pve1', 4000)
+        api.listed['pve1'] = [{'upid': upid}]
+        tracker = _tracker(api)
+
+        tracked = []
+        results = []
+
+        def waiter():
+            task = tracker.track(upid)
+            tracked.append(task)
+            results.append(task.wait(2))
+
+        waiters = [threading.Thread(target=waiter) for _ in range(5)]
+        for waiter_thread in waiters:
+            waiter_thread.start()
+        # Terminer la tâche une fois qu'elle est suivie par tous les appelants
+        while len(tracked) < 5:
+            time.sleep(0.001)
+
+        api.listed['pve1'] = [{'upid': upid, 'status': 'OK', 'endtime': 4001}]
+        for waiter_thread in waiters:
+            waiter_thread.join()
+
+        assert results == [True] * 5
+        assert all(task is tracked[0] for task in tracked)
+        assert tracker.stats()['tracked'] == 1
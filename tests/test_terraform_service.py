@@ -0,0 +1,225 @@
+"""
+Tests pour la génération des workspaces Terraform
+"""
+
+import os
+import stat
+import pytest
+from backend.services import terraform_service as terraform_module
+from backend.services.terraform_service import TerraformService
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv('TERRAFORM_WORK_DIR', str(tmp_path / 'workspaces'))
+    monkeypatch.setenv('TERRAFORM_STATE_DIR', str(tmp_path / 'states'))
+    monkeypatch.setenv('TERRAFORM_STATE_BACKEND', 'local')
+    monkeypatch.setenv('TEMPLATE_NAME', 'ubuntu-generic')
+    return TerraformService()
+
+def _tfvars(workspace_dir):
+    with open(f"{workspace_dir}/terraform.tfvars", encoding='utf-8') as f:
+        return f.read()
+
+class TestTemplateSelection:
+    """Tests du template cloné par les workspaces"""
+    
+    def test_generic_template_by_default(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment())
+        assert 'template_name            = "ubuntu-generic"' in _tfvars(workspace_dir)
+    
+    def test_golden_image_template(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment(source_template='golden-django-v2'))
+        assert 'template_name            = "golden-django-v2"' in _tfvars(workspace_dir)
+    
+    def test_batch_uses_shared_template(self, service, make_deployment):
+        members = [make_deployment(id=i, name=f'app-{i}', batch_id='b1', source_template='golden-django-v2')
+                   for i in (1, 2)]
+        workspace_dir = service.render_batch_workspace('b1', members)
+        tfvars = _tfvars(workspace_dir)
+        assert 'template_name            = "golden-django-v2"' in tfvars
+        assert '"2" = {' in tfvars
+    
+    def test_placement_is_rendered(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment(proxmox_node='pve3', proxmox_storage='ceph'))
+        tfvars = _tfvars(workspace_dir)
+        assert 'proxmox_node             = "pve3"' in tfvars
+        assert 'vmid                     = 0' in tfvars
+        assert 'storage                  = "ceph"' in tfvars
+        
+        members = [make_deployment(id=i, name=f'app-{i}', batch_id='b2', proxmox_node=f'pve{i}', proxmox_storage='ceph',
+                               vmid=10000 + i) for i in (1, 2)]
+        workspace_dir = service.render_batch_workspace('b2', members)
+        tfvars = _tfvars(workspace_dir)
+        assert 'node      = "pve2"' in tfvars
+        assert 'vmid      = 10002' in tfvars
+
+class TestSkeletonWorkspace:
+    """Tests de l'initialisation depuis le workspace squelette"""
+    
+    @pytest.fixture
+    def fake_terraform(self, tmp_path, monkeypatch):
+        calls = tmp_path / 'calls'
+        script = tmp_path / 'terraform'
+        script.write_text(
+            '#!/bin/bash\n'
+            f'echo "$1 $PWD" >> {calls}\n'
+            'mkdir -p .terraform/providers/proxmox\n'
+            'echo binary > .terraform/providers/proxmox/terraform-provider-proxmox\n'
+            'echo lock > .terraform.lock.hcl\n'
+        )
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv('TERRAFORM_BIN', str(script))
+        monkeypatch.setenv('TERRAFORM_PLUGIN_CACHE_DIR', str(tmp_path / 'plugins'))
+        monkeypatch.setenv('TERRAFORM_SKELETON_DIR', str(tmp_path / 'skeleton'))
+        return calls
+    
+    def test_init_runs_once_for_all_workspaces(self, service, fake_terraform, make_deployment):
+        service = TerraformService()
+        first = service.render_workspace(make_deployment(id=1))
+        second = service.render_workspace(make_deployment(id=2))
+        service.init_workspace(first)
+        service.init_workspace(second)
+        
+        assert len(fake_terraform.read_text().splitlines()) == 1
+        provider = os.path.join(second, '.terraform/providers/proxmox/terraform-provider-proxmox')
+        skeleton_provider = os.path.join(service.skeleton_path(), '.terraform/providers/proxmox/terraform-provider-proxmox')
+        assert os.path.samefile(provider, skeleton_provider)
+        assert os.path.isfile(os.path.join(second, '.terraform.lock.hcl'))
+    
+    def test_skeleton_depends_on_provider_versions(self, service, monkeypatch):
+        path = service.skeleton_path()
+        monkeypatch.setattr(service, '_get_required_providers', lambda: 'terraform {}\n')
+        assert service.skeleton_path() != path
+
+class TestStreamingApply:
+    """Tests de la diffusion de la sortie de terraform apply"""
+    
+    def test_lines_are_streamed_before_exit(self, tmp_path, monkeypatch):
+        marker = tmp_path / 'done'
+        script = tmp_path / 'terraform'
+        script.write_text(
+            '#!/bin/bash\n'
+            'echo "Creating..."\n'
+            'echo "warning" >&2\n'
+            f'while [ ! -f {marker} ]; do sleep 0.05; done\n'
+            'for i in $(seq 1 60); do echo "line $i"; done\n'
+        )
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv('TERRAFORM_BIN', str(script))
+        monkeypatch.setenv('TERRAFORM_WORK_DIR', str(tmp_path / 'workspaces'))
+        monkeypatch.setenv('TERRAFORM_STATE_DIR', str(tmp_path / 'states'))
+        service = TerraformService()
+        
+        received = []
+        
+        def on_line(stream, line):
+            received.append((stream, line))
+            # La suite n'est produite qu'une fois les premières lignes reçues
+            if len(received) == 2:
+                marker.touch()
+        
+        success, output = service.apply(str(tmp_path), on_line=on_line)
+        
+        assert success
+        assert sorted(received[:2]) == [('stderr', 'warning'), ('stdout', 'Creating...')]
+        assert len(received) == 62
+        assert output.splitlines()[-1] == 'line 60'
+        assert len(output.splitlines()) == 50
+
+class TestRenderCache:
+    """Tests de l'empreinte des fichiers d'un workspace"""
+    
+    def test_unchanged_render_keeps_hash_and_files(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment())
+        digest = service.workspace_hash(workspace_dir)
+        mtime = os.stat(os.path.join(workspace_dir, 'main.tf')).st_mtime_ns
+        
+        service.render_workspace(make_deployment())
+        assert service.workspace_hash(workspace_dir) == digest
+        assert os.stat(os.path.join(workspace_dir, 'main.tf')).st_mtime_ns == mtime
+    
+    def test_changed_resources_change_hash(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment())
+        digest = service.workspace_hash(workspace_dir)
+        
+        service.render_workspace(make_deployment(memory=4096))
+        assert service.workspace_hash(workspace_dir) != digest
+
+class TestWorkspaceCleanup:
+    """Tests du compactage, de l'archivage et de la politique de rétention"""
+    
+    def test_compact_keeps_configuration_and_state(self, service, make_deployment):
+        workspace_dir = service.render_workspace(make_deployment())
+        os.makedirs(os.path.join(workspace_dir, '.terraform', 'providers'))
+        for name in ('terraform.tfstate', 'tfplan'):
+            with open(os.path.join(workspace_dir, name), 'w') as f:
+                f.write('{"resources": []}')
+        
+        assert service.compact_workspace(workspace_dir)
+        assert not service.is_initialized(workspace_dir)
+        assert sorted(os.listdir(workspace_dir)) == [
+            'main.tf', 'terraform.tfstate', 'terraform.tfvars', 'variables.tf'
+        ]
+        assert not service.compact_workspace(workspace_dir)
+    
+    def test_remove_archives_state(self, service, make_deployment):
+        import gzip
+        workspace_dir = service.render_workspace(make_deployment())
+        with open(os.path.join(workspace_dir, 'terraform.tfstate'), 'w') as f:
+            f.write('{"version": 4}')
+        
+        archive = service.remove_workspace(workspace_dir)
+        assert not os.path.exists(workspace_dir)
+        assert os.path.basename(archive).startswith('deployment-1-')
+        with gzip.open(archive, 'rt') as f:
+            assert f.read() == '{"version": 4}'
+    
+    def test_retention_policy(self):
+        from datetime import datetime, timedelta
+        from backend.services.workspace_collector import workspace_action
+        
+        now = datetime(2024, 1, 15)
+        day, hour = timedelta(days=1), timedelta(hours=1)
+        
+        def action(statuses, idle, has_state=True):
+            return workspace_action(statuses, now - idle, has_state, now, day, hour)
+        
+        assert action(['running', 'creating'], 3 * day) == 'keep'
+        assert action(['running'], 2 * hour) == 'keep'
+        assert action(['running', 'failed'], 2 * day) == 'compact'
+        assert action(['deleted'], timedelta(minutes=30)) == 'keep'
+        assert action(['deleted', 'deleted'], 2 * hour) == 'delete'
+        assert action([], 2 * hour) == 'delete'
+        assert action(['failed'], 2 * day, has_state=False) == 'delete'
+        assert action(['failed'], 2 * day) == 'compact'
+
+class TestHttpStateBackend:
+    """Tests de la configuration du backend HTTP des états"""
+    
+    def test_workspace_uses_platform_backend(self, service, monkeypatch, make_deployment):
+        local_skeleton = service.skeleton_path()
+        monkeypatch.setenv('TERRAFORM_STATE_BACKEND', 'http')
+        monkeypatch.setenv('TERRAFORM_STATE_ADDRESS', 'http://paas.local:5000/api/terraform/state/')
+        monkeypatch.setattr(terraform_module.Config, 'TERRAFORM_STATE_PASSWORD', 'state-password')
+        service = TerraformService()
+        
+        workspace_dir = service.render_workspace(make_deployment(id=7))
+        with open(os.path.join(workspace_dir, 'main.tf'), encoding='utf-8') as f:
+            assert 'backend "http" {}' in f.read()
+        
+        env = service._env(workspace_dir)
+        assert env['TF_HTTP_ADDRESS'] == 'http://paas.local:5000/api/terraform/state/deployment-7'
+        assert env['TF_HTTP_LOCK_ADDRESS'] == env['TF_HTTP_UNLOCK_ADDRESS'] == env['TF_HTTP_ADDRESS']
+        assert (env['TF_HTTP_USERNAME'], env['TF_HTTP_PASSWORD']) == ('terraform', 'state-password')
+        
+        # Le squelette ne contient que les providers, quel que soit le backend
+        assert service.skeleton_path() == local_skeleton
+    
+    def test_state_metadata(self):
+        from backend.services.state_store import state_metadata
+        content = '{"serial": 4, "lineage": "abc", "resources": [' \
+            '{"mode": "managed", "instances": [{}, {}]}, {"mode": "data", "instances": [{}]}]}'
+        
+        metadata = state_metadata(content)
+        assert (metadata['serial'], metadata['lineage'], metadata['resource_count']) == (4, 'abc', 2)
+        assert metadata['size'] == len(content)
@@ -0,0 +1,73 @@
+"""
+Tests pour le backend HTTP des états Terraform
+"""
+
+import json
+import base64
+import hashlib
+import pytest
+from flask import current_app
+from api.terraform_state import terraform_state_bp
+from utils.config import Config
+
+URL = '/api/terraform/state/deployment-1'
+AUTH = ('terraform', 'state-password')
+STATE = json.dumps({'version': 4, 'serial': 3, 'lineage': 'abc', 'resources': []})
+
+@pytest.fixture
+def state_client(database, monkeypatch):
+    monkeypatch.setattr(Config, 'TERRAFORM_STATE_PASSWORD', 'state-password')
+    app = current_app._get_current_object()
+    app.register_blueprint(terraform_state_bp, url_prefix='/api')
+    return app.test_client()
+
+def _lock(client, lock_id, method='LOCK'):
+    return client.open(URL, method=method, auth=AUTH, json={'ID': lock_id, 'Operation': 'OperationTypeApply', 'Who': 'worker'})
+
+class TestTerraformStateApi:
+    """Tests du protocole du backend http de Terraform"""
+
+    def test_authentication_is_required(self, state_client):
+        assert state_client.get(URL).status_code == 401
+        assert state_client.get(URL, auth=('terraform', 'wrong')).status_code == 401
+
+    def test_state_is_saved_and_read(self, state_client):
+        assert state_client.get(URL, auth=AUTH).status_code == 204
+
+        assert state_client.post(URL, data=STATE, auth=AUTH).status_code == 200
+
+        response = state_client.get(URL, auth=AUTH)
+        assert response.status_code == 200
+        assert json.loads(response.data)['serial'] == 3
+        assert response.headers['Content-MD5'] == base64.b64encode(hashlib.md5(STATE.encode()).digest()).decode()
+
+    def test_content_md5_mismatch(self, state_client):
+        response = state_client.post(URL, data=STATE, auth=AUTH, headers={'Content-MD5': base64.b64encode(b'0' * 16).decode()})
+        assert response.status_code == 400
+
+    def test_lock_protects_writes(self, state_client):
+        assert _lock(state_client, 'lock-a').status_code == 200
+
+        # Autre détenteur: verrou et écriture refusés
+        assert _lock(state_client, 'lock-b').status_code == 423
+        response = state_client.post(URL + '?ID=lock-b', data=STATE, auth=AUTH)
+        assert response.status_code == 409
+        assert json.loads(response.data)['ID'] == 'lock-a'
+        assert state_client.post(URL, data=STATE, auth=AUTH).status_code == 409
+
+        # Détenteur du verrou: écriture acceptée
+        assert state_client.post(URL + '?ID=lock-a', data=STATE, auth=AUTH).status_code == 200
+
+        assert _lock(state_client, 'lock-b', 'UNLOCK').status_code == 409
+        assert _lock(state_client, 'lock-a', 'UNLOCK').status_code == 200
+        assert _lock(state_client, 'lock-b').status_code == 200
+
+    def test_inventory_and_force_unlock_require_authentication(self, state_client):
+        _lock(state_client, 'lock-a')
+
+        assert state_client.get('/api/terraform/states').status_code == 401
+        assert state_client.delete('/api/terraform/states/deployment-1/lock').status_code == 401
+        assert state_client.get('/api/terraform/states?locked=true', auth=AUTH).get_json()['total'] == 1
+
+        response = state_client.delete('/api/terraform/states/deployment-1/lock', auth=AUTH)
+        assert response.get_json()['previous_lock']['ID'] == 'lock-a'
@@ -0,0 +1,95 @@
+"""
+Tests pour le cache à durée de vie
+"""
+
+import time
+import threading
+import pytest
+from backend.services.ttl_cache import TtlCache, CacheMiss
+
+class CountingLoader:
+    def __init__(self, delay=0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('Proxmox injoignable')
+        return self.calls
+
+class TestTtlCache:
+    """Tests des lectures fraîches, périmées et manquantes"""
+
+    def test_hit_after_first_load(self):
+        loader = CountingLoader()
+        cache = TtlCache(ttl=60)
+        cache.register('resources', loader)
+
+        assert cache.get('resources')[:2] == (1, 'miss')
+        assert cache.get('resources')[:2] == (1, 'hit')
+        assert loader.calls == 1
+
+    def test_stale_served_while_refreshing(self):
+        loader = CountingLoader(delay=0.1)
+        cache = TtlCache(ttl=0.05)
+        cache.register('resources', loader)
+        cache.get('resources')
+        time.sleep(0.06)
+
+        start = time.monotonic()
+        value, state, _ = cache.get('resources')
+        assert (value, state) == (1, 'stale')
+        assert time.monotonic() - start < 0.05
+
+        # Un seul rechargement, quel que soit le nombre de lecteurs
+        for _ in range(10):
+            cache.get('resources')
+        time.sleep(0.15)
+        assert loader.calls == 2
+
+    def test_concurrent_misses_load_once(self):
+        loader = CountingLoader(delay=0.1)
+        cache = TtlCache(ttl=60)
+        cache.register('resources', loader)
+
+        threads = [threading.Thread(target=cache.get, args=('resources',)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loader.calls == 1
+
+    def test_failure_keeps_previous_value(self):
+        loader = CountingLoader()
+        cache = TtlCache(ttl=60)
+        cache.register('resources', loader)
+        cache.get('resources')
+
+        loader.fail = True
+        assert not cache.refresh('resources')
+        assert cache.get('resources')[:2] == (1, 'hit')
+        assert cache.stats()['entries']['resources']['last_error'] == 'Proxmox injoignable'
+
+    def test_first_load_failure(self):
+        cache = TtlCache(ttl=60)
+        cache.register('resources', CountingLoader(fail=True))
+
+        with pytest.raises(CacheMiss):
+            cache.get('resources')
+
+    def test_background_refresh(self):
+        loader = CountingLoader()
+        cache = TtlCache(ttl=0.6)
+        cache.register('resources', loader)
+        cache.start()
+        try:
+            time.sleep(0.2)
+            assert cache.get('resources')[1] == 'hit'
+            time.sleep(0.8)
+            assert loader.calls >= 2
+        finally:
+            cache.stop()
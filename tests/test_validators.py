@@ -5,8 +5,13 @@ Tests pour les validateurs
 import pytest
 from backend.utils.validators import (
     validate_deployment_request,
+    validate_batch_request,
+    validate_bulk_delete_request,
+    expand_batch_request,
     is_valid_github_url,
     is_valid_name,
+    is_valid_idempotency_key,
+    request_fingerprint,
     extract_repo_info
 )
 
@@ -102,6 +107,94 @@ class TestDeploymentRequestValidation:
         assert is_valid == False
         assert "CPU" in error
 
+class TestBatchRequestValidation:
+    """Tests de validation de requête de lot"""
+    
+    def test_valid_batch_with_count(self):
+        data = {
+            "type": "lxc",
+            "framework": "nodejs",
+            "github_url": "https://github.com/user/repo.git",
+            "count": 3,
+            "name_prefix": "preview"
+        }
+        is_valid, error = validate_batch_request(data)
+        assert is_valid == True
+        assert [i['name'] for i in expand_batch_request(data)] == ['preview-1', 'preview-2', 'preview-3']
+    
+    def test_instances_override_common_fields(self):
+        data = {
+            "type": "vm",
+            "framework": "django",
+            "github_url": "https://github.com/user/repo.git",
+            "instances": [{"name": "a"}, {"name": "b", "cpu": 4}]
+        }
+        is_valid, error = validate_batch_request(data)
+        assert is_valid == True
+        assert expand_batch_request(data)[1]['cpu'] == 4
+    
+    def test_batch_too_large(self):
+        data = {
+            "type": "vm",
+            "framework": "django",
+            "github_url": "https://github.com/user/repo.git",
+            "count": 10000
+        }
+        is_valid, error = validate_batch_request(data)
+        assert is_valid == False
+    
+    def test_batch_mixed_types(self):
+        data = {
+            "type": "vm",
+            "framework": "django",
+            "github_url": "https://github.com/user/repo.git",
+            "instances": [{"name": "a"}, {"name": "b", "type": "lxc"}]
+        }
+        is_valid, error = validate_batch_request(data)
+        assert is_valid == False
+        assert "type" in error
+
+class TestRequestDeduplication:
+    """Tests des clés d'idempotence et des empreintes de requête"""
+    
+    BASE = {
+        "type": "vm",
+        "framework": "django",
+        "github_url": "https://github.com/user/repo"
+    }
+    
+    def test_fingerprint_normalizes_url_and_defaults(self):
+        variant = dict(self.BASE, framework="Django", github_url="https://github.com/User/repo.git", cpu=2)
+        assert request_fingerprint(variant) == request_fingerprint(self.BASE)
+    
+    def test_fingerprint_differs_on_resources(self):
+        assert request_fingerprint(dict(self.BASE, memory=4096)) != request_fingerprint(self.BASE)
+    
+    def test_fingerprint_includes_explicit_name(self):
+        assert request_fingerprint(dict(self.BASE, name="app")) != request_fingerprint(self.BASE)
+    
+    def test_idempotency_key(self):
+        assert is_valid_idempotency_key("ci-run-42:deploy") == True
+        assert is_valid_idempotency_key("with space") == False
+        assert is_valid_idempotency_key("x" * 129) == False
+
+class TestBulkDeleteValidation:
+    """Tests des demandes de suppression groupée"""
+    
+    def test_requires_criteria(self):
+        assert validate_bulk_delete_request({})[0] == False
+        assert validate_bulk_delete_request({"ids": [], "filter": {}})[0] == False
+    
+    def test_valid_ids_and_filter(self):
+        assert validate_bulk_delete_request({"ids": [1, 2]}) == (True, None)
+        data = {"filter": {"status": ["failed", "cancelled"], "framework": "django", "older_than_hours": 12}}
+        assert validate_bulk_delete_request(data) == (True, None)
+    
+    def test_invalid_values(self):
+        assert validate_bulk_delete_request({"ids": ["1"]})[0] == False
+        assert validate_bulk_delete_request({"filter": {"owner": "me"}})[0] == False
+        assert validate_bulk_delete_request({"filter": {"older_than_hours": -1}})[0] == False
+
 class TestRepoInfoExtraction:
     """Tests d'extraction d'informations de dépôt"""
     
@@ -0,0 +1,81 @@
+"""
+Tests pour l'attribution des VMID dans la plage réservée
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from models.database import Deployment, VmidAllocation
+from services.vmid_allocator import VmidAllocator, VmidExhausted
+from services.warm_pool import WarmPool
+
+class TestVmidAllocator:
+    """Tests de l'attribution, de la quarantaine et de la libération"""
+
+    def test_allocation_is_stable_and_skips_cluster_vmids(self, database):
+        allocator = VmidAllocator(10000, 10009, 24)
+
+        assert allocator.allocate(1, exclude=[10000, 10001]) == 10002
+        assert allocator.allocate(1) == 10002
+        # Les VMID du cluster ne sont évités que lorsqu'ils sont transmis
+        assert allocator.allocate(2) == 10000
+
+    def test_concurrent_insert_is_retried(self, database):
+        allocator = VmidAllocator(10000, 10009, 24)
+
+        def cluster_vmids():
+            # Un autre processus prend 10000 après la lecture des VMID attribués
+            with database.engine.begin() as connection:
+                connection.execute(VmidAllocation.__table__.insert().values(
+                    vmid=10000, deployment_id=99, status='allocated'
+                ))
+            yield from ()
+
+        assert allocator.allocate(1, exclude=cluster_vmids()) == 10001
+        assert database.session.get(VmidAllocation, 10000).deployment_id == 99
+
+    def test_released_vmid_is_quarantined_then_recycled(self, database):
+        allocator = VmidAllocator(10000, 10009, 24)
+        allocator.allocate(1)
+
+        assert allocator.release(1) == 1
+        assert allocator.allocate(2) == 10001
+
+        # Quarantaine terminée: 10000 redevient attribuable
+        database.session.get(VmidAllocation, 10000).released_at = datetime.utcnow() - timedelta(hours=25)
+        database.session.commit()
+
+        assert allocator.allocate(3) == 10000
+        assert allocator.stats()['quarantine'] == 0
+
+    def test_exhaustion(self, database):
+        allocator = VmidAllocator(10000, 10001, 24)
+        allocator.allocate(1)
+        allocator.allocate(2)
+
+        with pytest.raises(VmidExhausted):
+            allocator.allocate(3)
+        assert allocator.stats()['free'] == 0
+
+    def test_separate_ranges_per_owner(self, database):
+        deployments = VmidAllocator(10000, 10009, 24)
+        images = VmidAllocator(20000, 20009, 24, owner='golden_image_id')
+
+        assert deployments.allocate(1) == 10000
+        assert images.allocate(1) == 20000
+
+        images.release(1)
+        assert deployments.allocate(1) == 10000
+
+    def test_retired_warm_instance_releases_its_vmid(self, database):
+        deployment = Deployment(name='warm-django-vm-1', type='vm', framework='django', github_url='',
+                                cpu=2, memory=2048, disk=20, warm_pool=True, status='failed')
+        database.session.add(deployment)
+        database.session.commit()
+
+        allocator = VmidAllocator(10000, 10009, 24)
+        vmid = allocator.allocate(deployment.id)
+        service = SimpleNamespace(vmids=allocator, destroy=lambda deployment_id: (True, "Déploiement détruit"))
+
+        assert WarmPool(service, sizes={}).retire() == 1
+        assert database.session.get(VmidAllocation, vmid).status == 'quarantine'
@@ -0,0 +1,53 @@
+"""
+Tests pour la configuration et le remplissage du pool chaud
+"""
+
+import pytest
+from types import SimpleNamespace
+from backend.services.warm_pool import parse_pool_sizes
+from models.database import Deployment
+from services.warm_pool import WarmPool
+from utils.config import Config
+
+class TestParsePoolSizes:
+    """Tests du format framework:type=taille"""
+    
+    def test_empty_value_disables_pool(self):
+        assert parse_pool_sizes('') == {}
+        assert parse_pool_sizes(None) == {}
+    
+    def test_multiple_entries(self):
+        sizes = parse_pool_sizes('django:vm=2, NodeJS:lxc=1,')
+        assert sizes == {('django', 'vm'): 2, ('nodejs', 'lxc'): 1}
+    
+    def test_invalid_format(self):
+        with pytest.raises(ValueError):
+            parse_pool_sizes('django=2')
+    
+    def test_unknown_framework_or_type(self):
+        with pytest.raises(ValueError):
+            parse_pool_sizes('rails:vm=1')
+        with pytest.raises(ValueError):
+            parse_pool_sizes('django:docker=1')
+
+class TestRefill:
+    """Tests de la limite d'instances par noeud"""
+    
+    def test_each_node_is_filled_up_to_its_limit(self, database, monkeypatch):
+        monkeypatch.setattr(Config, 'WARM_POOL_MAX_PER_NODE', 2)
+        started = []
+        service = SimpleNamespace(
+            scheduler=object(),
+            status_cache=SimpleNamespace(get=lambda key: (None, 0)),
+            image_service=SimpleNamespace(resolve_template=lambda deployment: ('ubuntu-22.04-template', None)),
+            _placement_candidates=lambda inventory, deployment_type, template=None: {'pve1': None, 'pve2': None},
+            deploy_async=started.append
+        )
+        pool = WarmPool(service, sizes={('django', 'vm'): 3, ('nodejs', 'lxc'): 3})
+        
+        assert pool.refill() == 4
+        nodes = [d.proxmox_node for d in Deployment.query.order_by(Deployment.id)]
+        assert sorted(nodes) == ['pve1', 'pve1', 'pve2', 'pve2']
+        # Limite atteinte sur les deux noeuds: plus rien à lancer
+        assert pool.refill() == 0
+        assert len(started) == 4
@@ -0,0 +1,67 @@
+"""
+Tests pour le pool de workers des déploiements
+"""
+
+import threading
+import pytest
+from backend.services.worker_pool import WorkerPool, QueueFullError
+
+class TestWorkerPool:
+    """Tests du pool borné et de sa file d'attente"""
+
+    def test_items_are_processed(self):
+        done = threading.Event()
+        processed = []
+
+        def handler(item_id):
+            processed.append(item_id)
+            if len(processed) == 3:
+                done.set()
+
+        pool = WorkerPool(handler, workers=2, max_queue=10)
+        for item_id in (1, 2, 3):
+            pool.submit(item_id)
+
+        assert done.wait(5)
+        assert sorted(processed) == [1, 2, 3]
+
+    def test_queue_full_is_rejected(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def handler(item_id):
+            started.set()
+            release.wait(5)
+
+        pool = WorkerPool(handler, workers=1, max_queue=2)
+        pool.submit(1)
+        assert started.wait(5)
+
+        assert pool.submit(2) == 1
+        assert pool.submit(3) == 2
+        with pytest.raises(QueueFullError):
+            pool.submit(4)
+
+        assert pool.stats()['rejected'] == 1
+        release.set()
+
+    def test_position_and_remove(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def handler(item_id):
+            started.set()
+            release.wait(5)
+
+        pool = WorkerPool(handler, workers=1, max_queue=5)
+        pool.submit(1)
+        assert started.wait(5)
+        pool.submit(2)
+        pool.submit(3)
+
+        assert pool.position(1) == 0
+        assert pool.position(3) == 2
+        assert pool.remove(2) == True
+        assert pool.position(3) == 1
+        assert pool.position(2) is None
+        release.set()